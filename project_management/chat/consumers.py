@@ -1,29 +1,21 @@
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from urllib.parse import parse_qs
-from asgiref.sync import sync_to_async
 from core.db_helpers import exec_sql, get_tenant_conn
-import pymysql
-import os
+from core import db_async, unread_counters
+from core.member_directory import member_directory
+from core.notifications import _group_send_all
+from .presence import PresenceMixin
 import logging
 
 # Use the project logger configured in settings.LOGGING so messages
 # route to the websocket/notifications handler (websocket.log)
 logger = logging.getLogger('notifications')
 
-# Master DB connection config
-MASTER_DB_CONFIG = {
-    'db_host': os.environ.get('MYSQL_ADMIN_HOST', '127.0.0.1'),
-    'db_port': int(os.environ.get('MYSQL_ADMIN_PORT') or 3306),
-    'db_user': os.environ.get('MYSQL_ADMIN_USER', 'root'),
-    'db_password': os.environ.get('MYSQL_ADMIN_PWD', 'root'),
-    'db_name': os.environ.get('MASTER_DB_NAME', 'master_db')
-}
-
 
 def normalize(val):
     return str(val).strip().lower() if val else ""
 
-class ChatConsumer(AsyncJsonWebsocketConsumer):
+class ChatConsumer(PresenceMixin, AsyncJsonWebsocketConsumer):
 
     async def connect(self):
         # Get session data (this app uses session-based auth, not Django User auth)
@@ -99,34 +91,13 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
 
         logger.info(f"✅ WS connected: {self.me} (tenant: {self.tenant_id})")
         
-        # Broadcast online presence to all users in tenant
-        try:
-            await self.channel_layer.group_send(
-                self.presence_group,
-                {
-                    "type": "presence_update",
-                    "status": "online",
-                    "user_email": str(self.me).strip().lower(),
-                },
-            )
-        except Exception as e:
-            logger.error(f"Error broadcasting online presence: {e}")
+        # counted by the presence service; peers get batched presence diffs
+        await self.presence_join(self.tenant_id, session)
 
     async def disconnect(self, close_code):
         logger.info(f"🔌 WS disconnect: {getattr(self, 'me', 'unknown')} (code: {close_code})")
+        await self.presence_leave()
         if hasattr(self, "presence_group"):
-            try:
-                await self.channel_layer.group_send(
-                    self.presence_group,
-                    {
-                        "type": "presence_update",
-                        "status": "offline",
-                        "user_email": str(getattr(self, "me", "unknown")).strip().lower(),
-                    },
-                )
-            except Exception as e:
-                logger.error(f"Error sending presence update: {e}")
-            
             try:
                 await self.channel_layer.group_discard(
                     self.presence_group, self.channel_name
@@ -172,8 +143,8 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             logger.info(f"💬 Saving group message from {self.me} to group {group_id}: {text[:50]}...")
             
             try:
-                saved = await sync_to_async(self.save_group_message)(
-                    self.tenant_id, group_id, self.me, text
+                saved = await db_async.run_with_tenant_conn(
+                    self.tenant_id, self.save_group_message, self.tenant_id, group_id, self.me, text
                 )
                 
                 logger.info(f"✅ Group message saved, broadcasting...")
@@ -196,6 +167,7 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
                     },
                 )
                 
+                await self.push_unread(saved.get("unread"))
                 logger.info(f"✅ Group message broadcasted successfully")
             except Exception as e:
                 logger.error(f"❌ Error processing group message: {e}")
@@ -219,8 +191,8 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         logger.info(f"💬 Saving message from {self.me} to {to_user}: {text[:50]}...")
         
         try:
-            saved = await sync_to_async(self.save_message)(
-                self.tenant_id, self.me, to_user, text
+            saved = await db_async.run_with_tenant_conn(
+                self.tenant_id, self.save_message, self.tenant_id, self.me, to_user, text
             )
 
             logger.info(f"✅ Message saved, broadcasting...")
@@ -259,25 +231,27 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
                 except Exception as e:
                     logger.error(f"❌ Error sending new_message to sender group: {e}")
 
+            await self.push_unread(saved.get("unread"))
             logger.info(f"✅ Direct message dispatch complete")
         except Exception as e:
             logger.error(f"❌ Error processing message: {e}")
             import traceback
             traceback.print_exc()
 
-    async def new_message(self, event):
+    async def push_unread(self, changes):
+        """Send unread counter changes (core.unread_counters) to the recipients."""
+        if not changes:
+            return
         try:
-            await self.send_json(event)
+            await _group_send_all(self.channel_layer, unread_counters.counter_messages(self.tenant_id, changes))
         except Exception as e:
-            logger.error(f"❌ Error in ChatConsumer.new_message: {e}")
+            logger.error(f"❌ Error pushing unread counters: {e}")
 
-    async def presence_update(self, event):
+    async def new_message(self, event):
         try:
             await self.send_json(event)
         except Exception as e:
-            logger.error(f"❌ Error in ChatConsumer.presence_update: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error(f"❌ Error in ChatConsumer.new_message: {e}")
 
     async def typing_update(self, event):
         """Handle typing indicator updates"""
@@ -287,235 +261,111 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
             logger.error(f"❌ Error in ChatConsumer.typing_update: {e}")
 
     async def chat_message_read(self, event):
-        """Handle read receipt notifications and broadcast to clients"""
-        logger.info(f"📖 Read receipt handler called: {event}")
-        logger.info(f"📖 Sending {len(event.get('message_ids', []))} message IDs as read")
-        # Forward the entire event to the client
+        """Forward a read receipt: the reader's new high-water mark (chat.read_receipts)."""
         await self.send_json({
             'type': event.get('type', 'message_read'),
             'event': 'message_read',
-            'message_ids': event.get('message_ids', []),
-            'conversation_id': event.get('conversation_id')
+            'conversation_id': event.get('conversation_id'),
+            'reader': event.get('reader'),
+            'last_read_id': event.get('last_read_id'),
         })
     
     async def chat_message(self, event):
         """Handle group chat messages"""
         await self.send_json(event)
 
-    def save_message(self, tenant, sender, receiver, text):
-        # Get tenant credentials from clients_master using direct pymysql connection
-        master_conn = pymysql.connect(
-            host=MASTER_DB_CONFIG['db_host'],
-            port=MASTER_DB_CONFIG['db_port'],
-            user=MASTER_DB_CONFIG['db_user'],
-            password=MASTER_DB_CONFIG['db_password'],
-            database=MASTER_DB_CONFIG['db_name'],
-            cursorclass=pymysql.cursors.DictCursor,
-            autocommit=True
-        )
-        
-        try:
-            with master_conn.cursor() as cur:
-                cur.execute("""
-                    SELECT db_name, db_host, db_user, db_password
-                    FROM clients_master
-                    WHERE id = %s OR client_name = %s OR domain_postfix = %s
-                    LIMIT 1
-                """, [tenant, tenant, tenant])
-                row = cur.fetchone()
-        finally:
-            master_conn.close()
+    def save_message(self, conn, tenant, sender, receiver, text):
+        """Persist a direct message. Runs on a core.db_async worker with a pooled tenant connection."""
+        with conn.cursor() as cur:
+            # Normalize sender and receiver - convert member IDs to emails
+            sender_norm = str(sender).strip().lower()
+            receiver_norm = str(receiver).strip().lower()
             
-        if not row:
-            raise Exception(f"Tenant {tenant} not found in clients_master")
-        
-        # Connect to tenant MySQL database
-        conn = pymysql.connect(
-            host=row['db_host'],
-            port=3306,  # Default MySQL port
-            user=row['db_user'],
-            password=row['db_password'],
-            database=row['db_name'],
-            cursorclass=pymysql.cursors.DictCursor,
-            autocommit=True
-        )
-        
-        try:
-            with conn.cursor() as cur:
-                # Normalize sender and receiver - convert member IDs to emails
-                sender_norm = str(sender).strip().lower()
-                receiver_norm = str(receiver).strip().lower()
-                
-                # If receiver is numeric (member ID), look up email
-                if receiver_norm.isdigit():
-                    cur.execute("SELECT email FROM members WHERE id=%s", [int(receiver_norm)])
-                    member_row = cur.fetchone()
-                    if member_row and member_row.get('email'):
-                        receiver_norm = str(member_row['email']).strip().lower()
-                
-                # If sender is numeric (member ID), look up email
-                if sender_norm.isdigit():
-                    cur.execute("SELECT email FROM members WHERE id=%s", [int(sender_norm)])
-                    member_row = cur.fetchone()
-                    if member_row and member_row.get('email'):
-                        sender_norm = str(member_row['email']).strip().lower()
-
-                # Try to resolve member ids for sender and receiver (if available)
-                sender_member_id = None
-                receiver_member_id = None
-                cur.execute("SELECT id FROM members WHERE email=%s", [sender_norm])
-                _s = cur.fetchone()
-                if _s and _s.get('id'):
-                    sender_member_id = _s.get('id')
-
-                cur.execute("SELECT id FROM members WHERE email=%s", [receiver_norm])
-                _r = cur.fetchone()
-                if _r and _r.get('id'):
-                    receiver_member_id = _r.get('id')
-                
-                # Sort users for consistent conversation matching
-                users = sorted([sender_norm, receiver_norm])
-                
-                # Find existing conversation
+            # Member ids -> emails, and the member ids of both sides (core.member_directory)
+            if receiver_norm.isdigit():
+                receiver_norm = member_directory.email_for(conn, receiver_norm) or receiver_norm
+            if sender_norm.isdigit():
+                sender_norm = member_directory.email_for(conn, sender_norm) or sender_norm
+            sender_member_id = member_directory.id_for(conn, sender_norm)
+            receiver_member_id = member_directory.id_for(conn, receiver_norm)
+            
+            # Sort users for consistent conversation matching
+            users = sorted([sender_norm, receiver_norm])
+            
+            # Find existing conversation
+            cur.execute("""
+                SELECT id FROM chat_conversation
+                WHERE tenant_id=%s AND user_a=%s AND user_b=%s
+            """, [tenant, users[0], users[1]])
+            row = cur.fetchone()
+            
+            if row:
+                conv_id = row['id']
+            else:
+                # Create new conversation
                 cur.execute("""
-                    SELECT id FROM chat_conversation
-                    WHERE tenant_id=%s AND user_a=%s AND user_b=%s
+                    INSERT INTO chat_conversation (tenant_id, user_a, user_b)
+                    VALUES (%s,%s,%s)
                 """, [tenant, users[0], users[1]])
-                row = cur.fetchone()
-                
-                if row:
-                    conv_id = row['id']
-                else:
-                    # Create new conversation
-                    cur.execute("""
-                        INSERT INTO chat_conversation (tenant_id, user_a, user_b)
-                        VALUES (%s,%s,%s)
-                    """, [tenant, users[0], users[1]])
-                    conv_id = conn.insert_id()
-                
-                # Insert message
-                cur.execute("""
-                    INSERT INTO chat_message (conversation_id, sender, text, is_read)
-                    VALUES (%s,%s,%s,0)
-                """, [conv_id, sender_norm, text])
-                
-                # Get the message ID and created_at timestamp
-                message_id = conn.insert_id()
-                cur.execute("""
-                    SELECT created_at FROM chat_message 
-                    WHERE id=%s
-                """, [message_id])
-                timestamp_row = cur.fetchone()
-                
-            return {
-                "id": message_id,
-                "created_at": timestamp_row['created_at'].isoformat() if timestamp_row else None,
-                "from_member_id": sender_member_id,
-                "to_member_id": receiver_member_id,
-            }
-        finally:
-            conn.close()
+                conv_id = conn.insert_id()
+            
+            # Insert message
+            cur.execute("""
+                INSERT INTO chat_message (conversation_id, sender, text, is_read)
+                VALUES (%s,%s,%s,0)
+            """, [conv_id, sender_norm, text])
+            
+            # Get the message ID and created_at timestamp
+            message_id = conn.insert_id()
+            cur.execute("""
+                SELECT created_at FROM chat_message 
+                WHERE id=%s
+            """, [message_id])
+            timestamp_row = cur.fetchone()
+
+        unread = unread_counters.increment(conn, unread_counters.DM, {(receiver_member_id, sender_norm): 1})
+        return {
+            "id": message_id,
+            "created_at": timestamp_row['created_at'].isoformat() if timestamp_row else None,
+            "from_member_id": sender_member_id,
+            "to_member_id": receiver_member_id,
+            "unread": unread,
+        }
     
-    def save_group_message(self, tenant, group_id, sender, text):
-        """Save a group message to the database"""
-        # Get tenant credentials from clients_master using direct pymysql connection
-        master_conn = pymysql.connect(
-            host=MASTER_DB_CONFIG['db_host'],
-            port=MASTER_DB_CONFIG['db_port'],
-            user=MASTER_DB_CONFIG['db_user'],
-            password=MASTER_DB_CONFIG['db_password'],
-            database=MASTER_DB_CONFIG['db_name'],
-            cursorclass=pymysql.cursors.DictCursor,
-            autocommit=True
-        )
-        
-        try:
-            with master_conn.cursor() as cur:
-                cur.execute("""
-                    SELECT db_name, db_host, db_user, db_password
-                    FROM clients_master
-                    WHERE id = %s OR client_name = %s OR domain_postfix = %s
-                    LIMIT 1
-                """, [tenant, tenant, tenant])
-                row = cur.fetchone()
-        finally:
-            master_conn.close()
+    def save_group_message(self, conn, tenant, group_id, sender, text):
+        """Persist a group message. Runs on a core.db_async worker with a pooled tenant connection."""
+        with conn.cursor() as cur:
+            # Normalize sender - convert member ID to email if needed
+            sender_norm = str(sender).strip().lower()
             
-        if not row:
-            raise Exception(f"Tenant {tenant} not found in clients_master")
-        
-        # Connect to tenant MySQL database
-        conn = pymysql.connect(
-            host=row['db_host'],
-            port=3306,  # Default MySQL port
-            user=row['db_user'],
-            password=row['db_password'],
-            database=row['db_name'],
-            cursorclass=pymysql.cursors.DictCursor,
-            autocommit=True
-        )
-        
-        try:
-            with conn.cursor() as cur:
-                # Normalize sender - convert member ID to email if needed
-                sender_norm = str(sender).strip().lower()
-                
-                if sender_norm.isdigit():
-                    cur.execute("SELECT email FROM members WHERE id=%s", [int(sender_norm)])
-                    member_row = cur.fetchone()
-                    if member_row and member_row.get('email'):
-                        sender_norm = str(member_row['email']).strip().lower()
-                
-                # Ensure group tables exist
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS chat_group (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        tenant_id VARCHAR(128),
-                        name VARCHAR(255),
-                        created_by VARCHAR(255),
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        INDEX idx_tenant (tenant_id)
-                    )
-                """)
-                
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS chat_group_message (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        group_id INT,
-                        sender VARCHAR(255),
-                        text TEXT,
-                        is_read TINYINT DEFAULT 0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        INDEX idx_group (group_id),
-                        INDEX idx_created (created_at)
-                    )
-                """)
-                
-                # Insert message
-                cur.execute("""
-                    INSERT INTO chat_group_message (group_id, sender, text, is_read)
-                    VALUES (%s, %s, %s, 0)
-                """, [int(group_id), sender_norm, text])
-                
-                # Get the message ID and created_at timestamp
-                message_id = conn.insert_id()
-                cur.execute("""
-                    SELECT created_at FROM chat_group_message
-                    WHERE id=%s
-                """, [message_id])
-                timestamp_row = cur.fetchone()
-                
-            return {
-                "id": message_id,
-                "created_at": timestamp_row['created_at'].isoformat() if timestamp_row else None
-            }
-        finally:
-            conn.close()
+            if sender_norm.isdigit():
+                sender_norm = member_directory.email_for(conn, sender_norm) or sender_norm
+            
+            # Insert message
+            cur.execute("""
+                INSERT INTO chat_group_message (group_id, sender, text, is_read)
+                VALUES (%s, %s, %s, 0)
+            """, [int(group_id), sender_norm, text])
+            
+            # Get the message ID and created_at timestamp
+            message_id = conn.insert_id()
+            cur.execute("""
+                SELECT created_at FROM chat_group_message
+                WHERE id=%s
+            """, [message_id])
+            timestamp_row = cur.fetchone()
+
+        unread = unread_counters.count_group_message(conn, int(group_id), sender_norm)
+        return {
+            "id": message_id,
+            "created_at": timestamp_row['created_at'].isoformat() if timestamp_row else None,
+            "unread": unread,
+        }
 
 
 
 # --- Notification and typing consumers ---
-class NotificationConsumer(AsyncJsonWebsocketConsumer):
+class NotificationConsumer(PresenceMixin, AsyncJsonWebsocketConsumer):
     """Subscribe to tenant presence/notification events and user-specific notifications.
 
     Clients that only want tenant-wide notifications (unread counts, incoming
@@ -574,10 +424,12 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
             return
 
         await self.accept()
+        await self.presence_join(tenant, session)
         logger.info(f"✅ NotificationConsumer WebSocket accepted and ready")
 
     async def disconnect(self, close_code):
         logger.info(f"🔌 NotificationConsumer disconnect: code={close_code}, member_id={getattr(self, 'member_id', 'unknown')}")
+        await self.presence_leave()
         # Leave presence group
         if getattr(self, "presence_group", None):
             await self.channel_layer.group_discard(self.presence_group, self.channel_name)
@@ -593,16 +445,6 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         # If client needs to send data, handle it here
         pass
 
-    async def presence_update(self, event):
-        # forward presence and notification events to client
-        try:
-            # Remove 'type' field and add 'event' field for client
-            client_event = {k: v for k, v in event.items() if k != 'type'}
-            client_event['event'] = 'presence_update'
-            await self.send_json(client_event)
-        except Exception as e:
-            logger.error(f"❌ Error sending presence_update: {e}")
-
     async def new_message(self, event):
         # forward new chat messages to client
         try:
@@ -646,10 +488,31 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
                 'created_at': event.get('created_at'),
             }
             await self.send_json(payload)
+            # every stored notification is one more unread (see core.unread_counters)
+            await self.send_json({'event': 'unread_counter', 'kind': unread_counters.NOTIFICATION,
+                                  'source': '', 'delta': 1})
             logger.info(f"System notification forwarded to client (member_id={getattr(self, 'member_id', None)}): {payload.get('title')}")
         except Exception as e:
             logger.error(f"❌ Error sending system_notification: {e}")
 
+    async def unread_counter(self, event):
+        """Forward an unread counter change (core.unread_counters)"""
+        try:
+            client_event = {k: v for k, v in event.items() if k != 'type'}
+            client_event['event'] = 'unread_counter'
+            await self.send_json(client_event)
+        except Exception as e:
+            logger.error(f"❌ Error sending unread_counter: {e}")
+
+    async def import_progress(self, event):
+        """Forward background import job progress (core.import_jobs)"""
+        try:
+            client_event = {k: v for k, v in event.items() if k != 'type'}
+            client_event['event'] = 'import_progress'
+            await self.send_json(client_event)
+        except Exception as e:
+            logger.error(f"❌ Error sending import_progress: {e}")
+
     async def typing_update(self, event):
         """Handle typing indicator updates"""
         try:
@@ -662,7 +525,7 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
             logger.error(f"❌ Error sending typing_update: {e}")
 
 
-class TypingIndicatorConsumer(AsyncJsonWebsocketConsumer):
+class TypingIndicatorConsumer(PresenceMixin, AsyncJsonWebsocketConsumer):
     """Broadcast typing indicators to the tenant presence group.
 
     Clients send {type: 'typing', to: '<peer>', status: 'typing'|'idle'} and
@@ -700,9 +563,11 @@ class TypingIndicatorConsumer(AsyncJsonWebsocketConsumer):
         self.presence_group = f"presence_{tenant}"
         await self.channel_layer.group_add(self.presence_group, self.channel_name)
         await self.accept()
+        await self.presence_join(tenant, session)
         logger.info(f"✅ Typing WS connected: {self.me} (tenant: {tenant})")
 
     async def disconnect(self, close_code):
+        await self.presence_leave()
         if getattr(self, "presence_group", None):
             await self.channel_layer.group_discard(self.presence_group, self.channel_name)
 
@@ -736,16 +601,6 @@ class TypingIndicatorConsumer(AsyncJsonWebsocketConsumer):
         # Forward typing event to client
         await self.send_json(event)
 
-    async def presence_update(self, event):
-        """Handle presence updates (online/offline status)"""
-        try:
-            # Remove 'type' field and add 'event' field for client
-            client_event = {k: v for k, v in event.items() if k != 'type'}
-            client_event['event'] = 'presence_update'
-            await self.send_json(client_event)
-        except Exception as e:
-            logger.error(f"❌ Error in TypingIndicatorConsumer.presence_update: {e}")
-
     async def new_message(self, event):
         """Handle new chat messages"""
         try:
@@ -0,0 +1,71 @@
+# chat/groups.py
+"""
+Group sidebar data: the groups of a tenant with their members and the caller's
+unread count, in two queries whatever the number of groups:
+  1. groups joined to their members, one row per membership;
+  2. unread messages per group, counted against the member's latest
+     chat_group_read mark (every message from others when there is none).
+
+The chat_group* tables are part of TENANT_DDL (schema migration 9).
+
+Usage:
+    groups = list_groups(tenant_conn, tenant_id, me)
+    # [{"id", "name", "created_by", "member_count", "members", "unread"}, ...]
+"""
+
+from core.db_helpers import exec_sql
+
+_GROUPS_SQL = """
+    SELECT g.id, g.name, g.created_by, gm.member
+    FROM chat_group g
+    LEFT JOIN chat_group_member gm ON gm.group_id = g.id
+    WHERE g.tenant_id = %s
+    ORDER BY g.created_at DESC, g.id DESC, gm.id
+"""
+
+_UNREAD_SQL = """
+    SELECT msg.group_id, COUNT(*) AS unread
+    FROM chat_group g
+    JOIN chat_group_message msg ON msg.group_id = g.id AND msg.sender <> %s
+    LEFT JOIN (
+        SELECT r.group_id, r.last_read_at
+        FROM chat_group_read r
+        JOIN (
+            SELECT group_id, MAX(id) AS id
+            FROM chat_group_read
+            WHERE member = %s
+            GROUP BY group_id
+        ) latest ON latest.id = r.id
+    ) lr ON lr.group_id = g.id
+    WHERE g.tenant_id = %s
+      AND (lr.last_read_at IS NULL OR msg.created_at > lr.last_read_at)
+    GROUP BY msg.group_id
+"""
+
+
+def list_groups(tenant_conn, tenant_id, me):
+    """Groups of tenant_id, newest first, with members and me's unread count."""
+    groups = {}
+    for r in exec_sql(tenant_conn, _GROUPS_SQL, [tenant_id]):
+        gid = int(r['id'])
+        group = groups.get(gid)
+        if group is None:
+            group = groups[gid] = {
+                "id": gid,
+                "name": r.get('name'),
+                "created_by": r.get('created_by'),
+                "member_count": 0,
+                "members": [],
+                "unread": 0,
+            }
+        if r.get('member'):
+            group["members"].append(r['member'])
+            group["member_count"] += 1
+    if not groups:
+        return []
+
+    for r in exec_sql(tenant_conn, _UNREAD_SQL, [me, me, tenant_id]):
+        group = groups.get(int(r['group_id']))
+        if group is not None:
+            group["unread"] = int(r.get('unread') or 0)
+    return list(groups.values())
@@ -0,0 +1,260 @@
+# chat/presence.py
+"""
+Tenant presence: which members have at least one open WebSocket.
+
+A browser tab opens several sockets (presence/notifications, chat, typing) and a
+member may have several tabs, so presence is a refcount of sockets per member,
+kept in Redis and shared by every worker process:
+
+  presence:{tenant}:sockets   ZSET  "<member> <channel_name>" -> expires_at
+  presence:{tenant}:counts    HASH  member -> open sockets
+  presence:{tenant}:pending   HASH  member -> 'online' | 'offline', not yet sent
+  presence:tenants            SET   tenants with registered sockets
+
+Only a member's 0 -> 1 and 1 -> 0 transitions are recorded; a transition that
+undoes a pending one cancels it, so a reload (offline then online) sends nothing.
+Every PRESENCE_FLUSH_INTERVAL seconds one worker process (elected with a Redis
+lock) sweeps sockets whose heartbeat expired (worker killed without
+disconnect) and sends each tenant's pending transitions as one event to
+presence_{tenant}:
+
+    {"type": "presence.diff", "online": [member, ...], "offline": [member, ...]}
+
+Each process heartbeats its own sockets every PRESENCE_HEARTBEAT seconds; a
+socket is dropped PRESENCE_TTL seconds after its last heartbeat. New clients
+read the current state from snapshot() (GET /chat/presence/) instead of
+waiting for events.
+
+Members are identified like the pages do (CURRENT_USER): the session's
+ident_email, else its member_id, lower-cased.
+
+Usage (consumers):
+    class MyConsumer(PresenceMixin, AsyncJsonWebsocketConsumer):
+        async def connect(self):
+            ...
+            await self.accept()
+            await self.presence_join(tenant, session)
+
+        async def disconnect(self, close_code):
+            await self.presence_leave()
+"""
+
+import asyncio
+import logging
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger('notifications')
+
+_REDIS_URL = getattr(settings, "PRESENCE_REDIS_URL", "redis://127.0.0.1:6379/0")
+_FLUSH_INTERVAL = getattr(settings, "PRESENCE_FLUSH_INTERVAL", 2)
+_HEARTBEAT = getattr(settings, "PRESENCE_HEARTBEAT", 30)
+_TTL = getattr(settings, "PRESENCE_TTL", 90)
+
+_TENANTS_KEY = "presence:tenants"
+_FLUSH_LOCK_KEY = "presence:flush_lock"
+
+# KEYS sockets, counts, pending, tenants; ARGV socket, member, expires_at, tenant.
+# Registers (or refreshes) a socket; 1 when the member came online.
+_CONNECT_LUA = """
+local added = redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+redis.call('SADD', KEYS[4], ARGV[4])
+if added == 1 and redis.call('HINCRBY', KEYS[2], ARGV[2], 1) == 1 then
+  if redis.call('HDEL', KEYS[3], ARGV[2]) == 0 then
+    redis.call('HSET', KEYS[3], ARGV[2], 'online')
+  end
+  return 1
+end
+return 0
+"""
+
+# KEYS sockets, counts, pending; ARGV socket, member. 1 when the member went offline.
+_DISCONNECT_LUA = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 1 and redis.call('HINCRBY', KEYS[2], ARGV[2], -1) <= 0 then
+  redis.call('HDEL', KEYS[2], ARGV[2])
+  if redis.call('HDEL', KEYS[3], ARGV[2]) == 0 then
+    redis.call('HSET', KEYS[3], ARGV[2], 'offline')
+  end
+  return 1
+end
+return 0
+"""
+
+# KEYS sockets, counts, pending, tenants; ARGV now, tenant.
+# Drops expired sockets, then pops the pending transitions (flat HGETALL list).
+_FLUSH_LUA = """
+for _, socket in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])) do
+  redis.call('ZREM', KEYS[1], socket)
+  local member = string.match(socket, '^(.*) [^ ]+$')
+  if member and redis.call('HINCRBY', KEYS[2], member, -1) <= 0 then
+    redis.call('HDEL', KEYS[2], member)
+    if redis.call('HDEL', KEYS[3], member) == 0 then
+      redis.call('HSET', KEYS[3], member, 'offline')
+    end
+  end
+end
+local changes = redis.call('HGETALL', KEYS[3])
+redis.call('DEL', KEYS[3])
+if redis.call('ZCARD', KEYS[1]) == 0 then
+  redis.call('SREM', KEYS[4], ARGV[2])
+end
+return changes
+"""
+
+
+def _keys(tenant):
+    prefix = f"presence:{tenant}"
+    return [f"{prefix}:sockets", f"{prefix}:counts", f"{prefix}:pending"]
+
+
+def member_key(session):
+    """Presence identity of a session (same as the pages' CURRENT_USER)."""
+    ident = session.get("ident_email") or session.get("member_id")
+    return str(ident).strip().lower() if ident else ""
+
+
+class _Presence:
+    """Per-process side of the presence service: Redis clients, local sockets, flush loop."""
+
+    def __init__(self):
+        self._sync_redis = None
+        self._redis = None
+        self._redis_loop = None
+        self._scripts = None
+        self._sockets = {}        # channel_name -> (tenant, member), sockets of this process
+        self._task = None
+        self._last_heartbeat = 0.0
+
+    # -- clients --
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._redis_loop is not loop:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.Redis.from_url(_REDIS_URL, decode_responses=True)
+            self._redis_loop = loop
+            self._scripts = {
+                "connect": self._redis.register_script(_CONNECT_LUA),
+                "disconnect": self._redis.register_script(_DISCONNECT_LUA),
+                "flush": self._redis.register_script(_FLUSH_LUA),
+            }
+        return self._redis
+
+    def _sync_client(self):
+        if self._sync_redis is None:
+            import redis
+            self._sync_redis = redis.Redis.from_url(_REDIS_URL, decode_responses=True)
+        return self._sync_redis
+
+    # -- sockets --
+
+    async def connect(self, tenant, member, channel_name):
+        """Register a socket of member; the member comes online with its first socket."""
+        self._async_client()
+        self._sockets[channel_name] = (str(tenant), member)
+        await self._scripts["connect"](
+            keys=_keys(tenant) + [_TENANTS_KEY],
+            args=[f"{member} {channel_name}", member, time.time() + _TTL, str(tenant)],
+        )
+        self._ensure_loop()
+
+    async def disconnect(self, channel_name):
+        """Unregister a socket; the member goes offline with its last one."""
+        entry = self._sockets.pop(channel_name, None)
+        if entry is None:
+            return
+        tenant, member = entry
+        self._async_client()
+        await self._scripts["disconnect"](
+            keys=_keys(tenant), args=[f"{member} {channel_name}", member],
+        )
+
+    def snapshot(self, tenant):
+        """Members of tenant with an open socket (sync, for HTTP views)."""
+        return sorted(self._sync_client().hkeys(_keys(tenant)[1]))
+
+    # -- flush loop --
+
+    def _ensure_loop(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        # runs for the life of the process once a socket connected: the last
+        # disconnect's transition still has to be flushed
+        while True:
+            await asyncio.sleep(_FLUSH_INTERVAL)
+            try:
+                if self._sockets and time.time() - self._last_heartbeat >= _HEARTBEAT:
+                    await self._heartbeat()
+                await self.flush()
+            except Exception as e:
+                logger.error(f"[presence] flush failed: {e}")
+
+    async def _heartbeat(self):
+        """Push back the expiry of this process's sockets (re-registering swept ones)."""
+        self._last_heartbeat = time.time()
+        expires_at = self._last_heartbeat + _TTL
+        for channel_name, (tenant, member) in list(self._sockets.items()):
+            await self._scripts["connect"](
+                keys=_keys(tenant) + [_TENANTS_KEY],
+                args=[f"{member} {channel_name}", member, expires_at, tenant],
+            )
+
+    async def flush(self):
+        """
+        Sweep expired sockets and send every tenant's pending transitions.
+        Runs in one process per interval. Returns the number of events sent.
+        """
+        redis = self._async_client()
+        if not await redis.set(_FLUSH_LOCK_KEY, "1", nx=True, px=int(_FLUSH_INTERVAL * 1000)):
+            return 0
+        channel_layer = get_channel_layer()
+        sent = 0
+        now = time.time()
+        for tenant in await redis.smembers(_TENANTS_KEY):
+            flat = await self._scripts["flush"](keys=_keys(tenant) + [_TENANTS_KEY], args=[now, tenant])
+            changes = dict(zip(flat[::2], flat[1::2]))
+            if not changes or channel_layer is None:
+                continue
+            await channel_layer.group_send(f"presence_{tenant}", {
+                "type": "presence.diff",
+                "online": sorted(m for m, status in changes.items() if status == "online"),
+                "offline": sorted(m for m, status in changes.items() if status == "offline"),
+            })
+            sent += 1
+        return sent
+
+
+presence = _Presence()
+
+
+class PresenceMixin:
+    """Registers the consumer's socket with the presence service and forwards diffs."""
+
+    async def presence_join(self, tenant, session):
+        member = member_key(session)
+        if not member:
+            return
+        try:
+            await presence.connect(tenant, member, self.channel_name)
+        except Exception as e:
+            logger.error(f"[presence] register failed for {member}: {e}")
+
+    async def presence_leave(self):
+        try:
+            await presence.disconnect(self.channel_name)
+        except Exception as e:
+            logger.error(f"[presence] unregister failed: {e}")
+
+    async def presence_diff(self, event):
+        try:
+            await self.send_json({
+                "event": "presence_diff",
+                "online": event.get("online", []),
+                "offline": event.get("offline", []),
+            })
+        except Exception as e:
+            logger.error(f"❌ Error sending presence_diff: {e}")
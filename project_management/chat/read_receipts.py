@@ -0,0 +1,170 @@
+# chat/read_receipts.py
+"""
+Direct-message read receipts, stored as a high-water mark.
+
+chat_conversation_read (table in TENANT_DDL) holds, per (conversation, member),
+the id of the last message the member has read; the mark only moves forward.
+A message has been read by its recipient when its id is at or below the
+recipient's mark, so:
+  - marking a conversation read is one upsert, whatever the number of messages;
+  - unread messages are an id range on the chat_message (conversation_id, id)
+    index;
+  - a read receipt is one number ({reader, last_read_id}) instead of id lists.
+
+Usage:
+    last_read_id = mark_read(conn, conv_id, me)              # up to the latest message
+    last_read_id = mark_read(conn, conv_id, me, up_to_id=n)  # up to what the client has shown
+    marks = read_marks(conn, conv_id)                        # {member: last_read_id}
+    n = unread_count(conn, conv_id, me)                      # messages to me above my mark
+    annotate(messages, marks, user_a, user_b)                # sets each message's is_read
+
+chat_message.is_read is no longer maintained; tenants without the table (before
+schema migration 10) keep using it.
+"""
+
+import pymysql
+
+# MySQL error: table doesn't exist
+_ER_NO_SUCH_TABLE = 1146
+
+_MARK_SQL = """
+    INSERT INTO chat_conversation_read (conversation_id, member, last_read_id)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE last_read_id = GREATEST(last_read_id, VALUES(last_read_id))
+"""
+
+# every conversation of a member, up to its latest message
+_MARK_ALL_SQL = """
+    INSERT INTO chat_conversation_read (conversation_id, member, last_read_id)
+    SELECT c.id, %s, MAX(m.id)
+    FROM chat_conversation c
+    JOIN chat_message m ON m.conversation_id = c.id
+    WHERE c.tenant_id = %s AND (c.user_a = %s OR c.user_b = %s)
+    GROUP BY c.id
+    ON DUPLICATE KEY UPDATE last_read_id = GREATEST(last_read_id, VALUES(last_read_id))
+"""
+
+# marks implied by chat_message.is_read: the last read message of each recipient
+_BACKFILL_SQL = """
+    INSERT INTO chat_conversation_read (conversation_id, member, last_read_id)
+    SELECT m.conversation_id, IF(c.user_a = m.sender, c.user_b, c.user_a) AS reader, MAX(m.id)
+    FROM chat_message m
+    JOIN chat_conversation c ON c.id = m.conversation_id
+    WHERE m.is_read = 1
+    GROUP BY m.conversation_id, reader
+    ON DUPLICATE KEY UPDATE last_read_id = GREATEST(last_read_id, VALUES(last_read_id))
+"""
+
+
+def _missing_table(exc):
+    return isinstance(exc, pymysql.err.ProgrammingError) and exc.args[0] == _ER_NO_SUCH_TABLE
+
+
+def mark_read(conn, conversation_id, member, up_to_id=None):
+    """
+    Move member's mark in conversation_id up to up_to_id (capped at the latest
+    message; the latest message when None). Returns the id marked, or None when
+    the conversation has no messages.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT MAX(id) AS id FROM chat_message WHERE conversation_id = %s", (conversation_id,))
+        row = cur.fetchone()
+        last_id = row['id'] if row else None
+        if last_id is None:
+            return None
+        if up_to_id is not None:
+            last_id = min(int(up_to_id), int(last_id))
+        try:
+            cur.execute(_MARK_SQL, (conversation_id, member, last_id))
+        except pymysql.err.ProgrammingError as e:
+            if not _missing_table(e):
+                raise
+            cur.execute(
+                "UPDATE chat_message SET is_read = 1 "
+                "WHERE conversation_id = %s AND sender <> %s AND is_read = 0 AND id <= %s",
+                (conversation_id, member, last_id),
+            )
+        return last_id
+    finally:
+        cur.close()
+
+
+def unread_count(conn, conversation_id, member):
+    """Number of messages in conversation_id sent to member above member's mark."""
+    cur = conn.cursor()
+    try:
+        try:
+            cur.execute("""
+                SELECT COUNT(*) AS n FROM chat_message
+                WHERE conversation_id = %s AND sender <> %s AND id > COALESCE((
+                    SELECT last_read_id FROM chat_conversation_read WHERE conversation_id = %s AND member = %s
+                ), 0)
+            """, (conversation_id, member, conversation_id, member))
+        except pymysql.err.ProgrammingError as e:
+            if not _missing_table(e):
+                raise
+            cur.execute(
+                "SELECT COUNT(*) AS n FROM chat_message WHERE conversation_id = %s AND sender <> %s AND is_read = 0",
+                (conversation_id, member),
+            )
+        row = cur.fetchone()
+        return int(row['n']) if row else 0
+    finally:
+        cur.close()
+
+
+def mark_all_read(conn, tenant_id, member):
+    """Mark every conversation of member read up to its latest message."""
+    cur = conn.cursor()
+    try:
+        try:
+            cur.execute(_MARK_ALL_SQL, (member, tenant_id, member, member))
+        except pymysql.err.ProgrammingError as e:
+            if not _missing_table(e):
+                raise
+            cur.execute("""
+                UPDATE chat_message m
+                JOIN chat_conversation c ON m.conversation_id = c.id
+                SET m.is_read = 1
+                WHERE c.tenant_id = %s AND m.is_read = 0 AND m.sender <> %s AND (c.user_a = %s OR c.user_b = %s)
+            """, (tenant_id, member, member, member))
+    finally:
+        cur.close()
+
+
+def read_marks(conn, conversation_id):
+    """{member: last_read_id} of conversation_id, or None without the table."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT member, last_read_id FROM chat_conversation_read WHERE conversation_id = %s",
+            (conversation_id,),
+        )
+        return {r['member']: int(r['last_read_id']) for r in cur.fetchall()}
+    except pymysql.err.ProgrammingError as e:
+        if not _missing_table(e):
+            raise
+        return None
+    finally:
+        cur.close()
+
+
+def annotate(messages, marks, user_a, user_b):
+    """Set is_read on messages of the user_a/user_b conversation from marks (left as stored if None)."""
+    if marks is None:
+        return messages
+    for m in messages:
+        recipient = user_b if m.get('sender') == user_a else user_a
+        m['is_read'] = 1 if m['id'] <= marks.get(recipient, 0) else 0
+    return messages
+
+
+def backfill(conn):
+    """Derive the marks from chat_message.is_read (schema migration). Returns the rows written."""
+    cur = conn.cursor()
+    try:
+        cur.execute(_BACKFILL_SQL)
+        return cur.rowcount
+    finally:
+        cur.close()
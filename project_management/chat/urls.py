@@ -20,5 +20,6 @@ urlpatterns = [
     path("mark_all_read/", views.mark_all_read, name="mark_all_read"),
     path("unread/", views.unread_counts, name="unread"),
     path("mark_read/", views.mark_read, name="mark_read"),
+    path("presence/", views.presence_snapshot, name="presence"),
     path("upload/", views.upload_image, name="upload"),
 ]
@@ -11,9 +11,12 @@ from asgiref.sync import sync_to_async
 
 # replace with your actual helper imports
 from core.db_helpers import get_tenant_conn, exec_sql
-import time
+from core import unread_counters
+from core.member_directory import member_directory
+from .groups import list_groups
+from . import read_receipts
+from .presence import presence
 import logging
-import pymysql
 import logging
 import os
 from django.conf import settings
@@ -77,9 +80,9 @@ def _normalize_identity(tenant_conn, val):
     # if purely numeric, try lookup
     if s.isdigit():
         try:
-            row = exec_sql(tenant_conn, "SELECT email FROM members WHERE id=%s", [int(s)])
-            if row and row[0].get('email'):
-                return str(row[0]['email']).strip().lower()
+            email = member_directory.email_for(tenant_conn, s)
+            if email:
+                return email
         except Exception:
             pass
     return s.lower()
@@ -138,11 +141,58 @@ def tenant_members(request):
 
     return JsonResponse({"members": members})
 
+
+HISTORY_PAGE_SIZE = getattr(settings, "CHAT_HISTORY_PAGE_SIZE", 50)
+HISTORY_MAX_PAGE_SIZE = 200
+
+
+def _history_page(tenant_conn, table, owner_col, owner_id, params):
+    """
+    One page of a message history, keyset-paginated on id over the
+    (owner_col, id) index:
+      - no cursor: the newest `limit` messages;
+      - before_id: the `limit` messages preceding it (scrolling back);
+      - after_id: the first `limit` messages following it (catching up).
+    Messages are returned oldest first. has_more says whether another page exists
+    in the requested direction; before_id is the cursor for the next older page.
+    Raises ValueError for malformed parameters.
+    """
+    limit = min(max(int(params.get("limit") or HISTORY_PAGE_SIZE), 1), HISTORY_MAX_PAGE_SIZE)
+    before_id = int(params["before_id"]) if params.get("before_id") else None
+    after_id = int(params["after_id"]) if params.get("after_id") else None
+
+    sql = f"SELECT id, sender, text, is_read, created_at FROM {table} WHERE {owner_col}=%s"
+    args = [owner_id]
+    if after_id is not None:
+        sql += " AND id > %s ORDER BY id ASC LIMIT %s"
+        args += [after_id, limit + 1]
+    else:
+        if before_id is not None:
+            sql += " AND id < %s"
+            args.append(before_id)
+        sql += " ORDER BY id DESC LIMIT %s"
+        args.append(limit + 1)
+
+    msgs = exec_sql(tenant_conn, sql, args)
+    has_more = len(msgs) > limit
+    msgs = msgs[:limit]
+    if after_id is None:
+        msgs.reverse()
+    # created_at is serialised by JsonResponse (ISO 8601)
+    return {
+        "messages": msgs,
+        "has_more": has_more,
+        "before_id": msgs[0]["id"] if msgs else before_id,
+    }
+
+
 @require_GET
 def conversation_history(request):
     """
-    Return conversation messages between current user and peer.
-    GET params: ?peer=<emp_code>
+    Return conversation messages between current user and peer, a page at a time
+    (see _history_page).
+    GET params: ?peer=<emp_code>[&before_id=<id>|&after_id=<id>][&limit=<n>]
+    Response: { messages: [...], has_more, before_id }
     """
     # Check authentication
     if not request.session.get('member_id'):
@@ -166,18 +216,15 @@ def conversation_history(request):
     logger.info(f"conversation_history: conversation lookup result: {conv}")
     if not conv:
             logger.warning(f"conversation_history: No conversation found for users {users}")
-            return JsonResponse({"messages": []})
+            return JsonResponse({"messages": [], "has_more": False, "before_id": None})
     conv_id = conv[0]["id"]
-    msgs = exec_sql(tenant_conn, """
-        SELECT id, sender, text, is_read, created_at
-        FROM chat_message
-        WHERE conversation_id=%s
-        ORDER BY created_at ASC
-    """, [conv_id])
-    for m in msgs:
-            m["created_at"] = m["created_at"].isoformat() if hasattr(m["created_at"], "isoformat") else str(m["created_at"])
-    logger.info(f"conversation_history: Returning {len(msgs)} messages for conv_id={conv_id}")
-    return JsonResponse({"messages": msgs})
+    try:
+        page = _history_page(tenant_conn, "chat_message", "conversation_id", conv_id, request.GET)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid 'before_id', 'after_id' or 'limit'")
+    read_receipts.annotate(page["messages"], read_receipts.read_marks(tenant_conn, conv_id), users[0], users[1])
+    logger.info(f"conversation_history: Returning {len(page['messages'])} messages for conv_id={conv_id}")
+    return JsonResponse(page)
 
 
 
@@ -234,6 +281,11 @@ def send_message(request):
     """, [conv_id, me, text])
     logger.info(f"send_message: inserted message into conv_id={conv_id}")
 
+    recipient_id = member_directory.id_for(tenant_conn, to_user)
+    if recipient_id:
+        changes = unread_counters.increment(tenant_conn, unread_counters.DM, {(recipient_id, me): 1})
+        unread_counters.push(tenant_id, changes)
+
     # Optionally notify via websocket/consumer
     return JsonResponse({"ok": True})
 
@@ -286,36 +338,39 @@ def unread_counts(request):
     tenant_conn = get_tenant_conn(request)
     if not tenant_conn:
         return JsonResponse({"unread": []})
-    # Resolve same identity as UI/session
-    me_raw = (request.session.get('ident_email') or getattr(request.user, 'email', None)) or request.session.get('member_id')
-    me = _normalize_identity(tenant_conn, me_raw)
-    tenant_id = str(request.session.get("tenant_id", ""))
 
-    # Find conversations for this tenant where messages are unread and receiver is me.
-    # Since conversation stores two users, find conversations where me appears and unread messages exist from the other side.
-    rows = exec_sql(tenant_conn, """
-      SELECT m.sender AS `from`, COUNT(*) AS cnt
-      FROM chat_conversation c
-      JOIN chat_message m ON m.conversation_id = c.id
-      WHERE c.tenant_id=%s
-        AND m.is_read = 0
-        -- message sender is not me
-        AND m.sender <> %s
-        -- conversation includes me
-        AND (c.user_a = %s OR c.user_b = %s)
-      GROUP BY m.sender
-    """, [tenant_id, me, me, me])
-
-    out = [{"from": r["from"], "count": int(r["cnt"])} for r in rows]
+    # maintained per member by core.unread_counters
+    counters = unread_counters.get_counters(tenant_conn, request.session.get('member_id'))
+    out = [{"from": sender, "count": count} for sender, count in counters["dm"].items()]
     return JsonResponse({"unread": out})
 
 
+@require_GET
+def presence_snapshot(request):
+    """
+    Members of the tenant that are online now (chat.presence); clients load it
+    once per connection and apply the presence_diff events on top.
+    Response: { online: ["<email or member id>", ...] }
+    """
+    if not request.session.get('member_id'):
+        return HttpResponseForbidden("Not authenticated")
+    tenant_id = str(request.session.get('tenant_id', ''))
+    try:
+        online = presence.snapshot(tenant_id)
+    except Exception as e:
+        logging.getLogger('project_management').error(f"presence_snapshot failed: {e}")
+        return JsonResponse({"online": [], "error": "presence_unavailable"}, status=503)
+    return JsonResponse({"online": online})
+
+
 @require_POST
 def mark_read(request):
     """
-    Mark messages in conversation between current user and 'peer' as read.
-    Accepts JSON body: { "peer": "<email>" }
+    Mark the conversation between current user and 'peer' as read (see chat.read_receipts).
+    Accepts JSON body: { "peer": "<email>", "last_read_id": <id, optional> }
     Also accepts form-encoded POST (peer param) for robustness.
+    last_read_id is the newest message the client has shown; without it the
+    whole conversation is marked.
     """
     # Check authentication
     if not request.session.get('member_id'):
@@ -330,12 +385,13 @@ def mark_read(request):
 
     # Try JSON first
     peer = None
+    up_to_id = None
     try:
         body = request.body.decode('utf-8').strip()
-        logger.info(f"mark_read request body: {body}")
         if body:
             payload = json.loads(body)
             peer = payload.get("peer")
+            up_to_id = payload.get("last_read_id")
     except Exception as e:
         logger.warning(f"mark_read JSON decode failed: {e}")
         peer = None
@@ -343,200 +399,70 @@ def mark_read(request):
     # Fallback to form POST (application/x-www-form-urlencoded) or POST param
     if not peer:
         peer = request.POST.get("peer") or request.GET.get("peer")
+    if not up_to_id:
+        up_to_id = request.POST.get("last_read_id")
 
-    logger.info(f"mark_read peer resolved: {peer}")
     if not peer:
         logger.error("Missing peer in mark_read")
         return JsonResponse({"ok": False, "error": "missing_peer"}, status=400)
+    try:
+        up_to_id = int(up_to_id) if up_to_id else None
+    except (TypeError, ValueError):
+        return JsonResponse({"ok": False, "error": "invalid_last_read_id"}, status=400)
 
     # Now do the normal logic; resolve identity from session like the UI
     me_raw = (request.session.get('ident_email') or getattr(request.user, 'email', None)) or request.session.get('member_id')
     me = _normalize_identity(tenant_conn, me_raw)
     tenant_id = str(request.session.get("tenant_id", ""))
-    logger.info(f"mark_read me: {me}, tenant_id: {tenant_id}")
 
     peer = _normalize_identity(tenant_conn, peer)
     a, b = sorted([me, peer])
     conv = exec_sql(tenant_conn, """
       SELECT id FROM chat_conversation WHERE tenant_id=%s AND user_a=%s AND user_b=%s
     """, [tenant_id, a, b])
-    logger.info(f"mark_read found conversation: {conv}")
     if not conv:
-        logger.info("No conversation found to mark as read")
-        return JsonResponse({"ok": True})  # nothing to mark
+        return JsonResponse({"ok": True, "last_read_id": None})  # nothing to mark
 
     conv_id = conv[0]["id"]
-
-    # Move ALL heavy work to background thread to avoid blocking ASGI shutdown
-    import threading
-    logger.info(f"🔧 mark_read starting background thread for conv_id={conv_id}, me={me}, peer={peer}")
-    
-    def _do_mark_read_work():
-        """Background worker to mark messages as read and send notifications."""
-        logger.info(f"🚀 Background thread STARTED for conv_id={conv_id}")
+    last_read_id = read_receipts.mark_read(tenant_conn, conv_id, me, up_to_id)
+    # messages above the mark (sent after what the client has shown) stay unread
+    unread = read_receipts.unread_count(tenant_conn, conv_id, me)
+    unread_counters.push(tenant_id, unread_counters.set_count(
+        tenant_conn, unread_counters.DM, request.session.get('member_id'), peer, unread
+    ))
+
+    # one read receipt for the conversation room: the reader's new mark
+    if last_read_id:
         try:
-            # Perform updates in small batches to reduce lock contention
-            max_retries = 3
-            total_updated = 0
-            ids = []
-
-            while True:
-                try:
-                    logger.info(f"mark_read updating messages for conv_id={conv_id}, me={me}")
-                    # FIRST: collect ALL message ids from sender (for read receipt broadcast)
-                    # This includes already-read messages so we can show blue checkmarks
-                    all_ids_rows = exec_sql(tenant_conn, """
-                        SELECT id FROM chat_message
-                        WHERE conversation_id=%s AND sender <> %s
-                        ORDER BY id DESC
-                        LIMIT 100
-                    """, [conv_id, me])
-                    if all_ids_rows:
-                        ids = [r.get('id') for r in all_ids_rows if r.get('id')]
-                    
-                    # THEN: collect only unread ids to mark
-                    unread_ids_rows = exec_sql(tenant_conn, """
-                        SELECT id FROM chat_message
-                        WHERE conversation_id=%s AND sender <> %s AND is_read = 0
-                    """, [conv_id, me])
-                    unread_count = len(unread_ids_rows) if unread_ids_rows else 0
-
-                    # Update unread messages
-                    if unread_count > 0:
-                        exec_sql(tenant_conn, """
-                            UPDATE chat_message
-                            SET is_read = 1
-                            WHERE conversation_id=%s AND sender <> %s AND is_read = 0
-                            """, [conv_id, me], fetch=False)
-                        rows_affected = tenant_conn.cursor().rowcount
-
-                        try:
-                            updated = int(rows_affected or 0)
-                        except Exception:
-                            updated = 0
-
-                        total_updated += updated
-                        logger.info(f"mark_read updated {updated} messages, total_updated={total_updated}")
-                        
-                    # Break if no unread messages found
-                    if unread_count == 0:
-                        logger.info(f"mark_read no unread messages, but will still broadcast {len(ids)} message IDs")
-                        break
-
-                    # pause briefly to yield locks if there's contention
-                    time.sleep(0.05)
-                except pymysql.err.OperationalError as oe:
-                    logger.warning(f'mark_read OperationalError, retrying: {oe}')
-                    max_retries -= 1
-                    if max_retries <= 0:
-                        logger.exception('mark_read failed after retries')
-                        return
-                    time.sleep(0.2)
-                    continue
-                except Exception as e:
-                    logger.exception(f'mark_read unexpected error: {e}')
-                    return
-
-            logger.info(f"mark_read finished, total_updated={total_updated}, broadcasting {len(ids)} message IDs")
-            
-            # Send notifications via channel layer - ALWAYS send if we have message IDs
-            if ids and len(ids) > 0:
-                try:
-                    from asgiref.sync import async_to_sync
-                    from channels.layers import get_channel_layer
-                    import re
-                    layer = get_channel_layer()
-                    
-                    # Sanitize identities for channel group names (same as ChatConsumer)
-                    # Replace invalid characters with underscores
-                    a_clean = re.sub(r'[^a-z0-9\-_.]', '_', a)
-                    b_clean = re.sub(r'[^a-z0-9\-_.]', '_', b)
-                    
-                    payload = {
-                        'type': 'chat.message_read',
-                        'event': 'message_read',
-                        'conversation_id': conv_id,
-                        'message_ids': ids,
-                    }
-                    room = f'chat_{tenant_id}_{a_clean}_{b_clean}'
-                    logger.info(f"📨 Sending read receipt to room: {room} with {len(ids)} message IDs")
-                    async_to_sync(layer.group_send)(room, payload)
-                    logger.info(f"✅ Read receipt broadcast completed for room: {room}")
-                except Exception as e:
-                    logger.exception(f"mark_read notification failed: {e}")
-            else:
-                logger.info(f"⚠️ No message IDs to broadcast")
+            from asgiref.sync import async_to_sync
+            from channels.layers import get_channel_layer
+            import re
+            layer = get_channel_layer()
+            if layer:
+                # Sanitize identities for channel group names (same as ChatConsumer)
+                a_clean = re.sub(r'[^a-z0-9\-_.]', '_', a)
+                b_clean = re.sub(r'[^a-z0-9\-_.]', '_', b)
+                async_to_sync(layer.group_send)(f'chat_{tenant_id}_{a_clean}_{b_clean}', {
+                    'type': 'chat.message_read',
+                    'event': 'message_read',
+                    'conversation_id': conv_id,
+                    'reader': me,
+                    'last_read_id': last_read_id,
+                })
         except Exception as e:
-            logger.exception(f"❌ mark_read background worker EXCEPTION: {e}")
+            logger.exception(f"mark_read notification failed: {e}")
 
-    # Start background thread (daemon=True so it won't block shutdown)
-    try:
-        thread = threading.Thread(target=_do_mark_read_work, daemon=True)
-        thread.start()
-        logger.info(f"✅ Background thread started successfully")
-    except Exception as thread_error:
-        logger.exception(f"❌ Failed to start background thread: {thread_error}")
-    
-    # Return immediately without waiting for the work to complete
-    return JsonResponse({"ok": True})
+    return JsonResponse({"ok": True, "last_read_id": last_read_id})
 
 
 # ---- Group (thread) support (server-backed) ----
-def _ensure_group_tables(tenant_conn):
-    """Create group-related tables if they do not exist."""
-    try:
-        exec_sql(tenant_conn, """
-            CREATE TABLE IF NOT EXISTS chat_group (
-                id BIGINT PRIMARY KEY AUTO_INCREMENT,
-                tenant_id VARCHAR(255) NOT NULL,
-                name VARCHAR(255) NOT NULL,
-                created_by VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        """, [], fetch=False)
-
-        exec_sql(tenant_conn, """
-            CREATE TABLE IF NOT EXISTS chat_group_member (
-                id BIGINT PRIMARY KEY AUTO_INCREMENT,
-                group_id BIGINT NOT NULL,
-                member VARCHAR(255) NOT NULL,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                INDEX (group_id),
-                INDEX (member)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        """, [], fetch=False)
-
-        exec_sql(tenant_conn, """
-            CREATE TABLE IF NOT EXISTS chat_group_message (
-                id BIGINT PRIMARY KEY AUTO_INCREMENT,
-                group_id BIGINT NOT NULL,
-                sender VARCHAR(255) NOT NULL,
-                text TEXT,
-                is_read TINYINT DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                INDEX (group_id)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        """, [], fetch=False)
-        exec_sql(tenant_conn, """
-            CREATE TABLE IF NOT EXISTS chat_group_read (
-                id BIGINT PRIMARY KEY AUTO_INCREMENT,
-                group_id BIGINT NOT NULL,
-                member VARCHAR(255) NOT NULL,
-                last_read_at TIMESTAMP NULL,
-                INDEX (group_id),
-                INDEX (member)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        """, [], fetch=False)
-    except Exception:
-        # best-effort creation; if it fails, higher-level handlers will return errors
-        pass
-
+# tables: chat_group, chat_group_member, chat_group_message, chat_group_read (TENANT_DDL)
 
 @require_GET
 def groups_list(request):
     """Return list of groups for current tenant.
 
-    Response: { groups: [{ id, name, created_by, member_count }, ...] }
+    Response: { groups: [{ id, name, created_by, member_count, members, unread }, ...] }
     """
     # Check authentication
     if not request.session.get('member_id'):
@@ -546,54 +472,12 @@ def groups_list(request):
     if not tenant_conn:
         return JsonResponse({"groups": []})
     tenant_id = str(request.session.get('tenant_id', ''))
-    _ensure_group_tables(tenant_conn)
-
-    # fetch groups
-    rows = exec_sql(tenant_conn, """
-        SELECT g.id, g.name, g.created_by
-        FROM chat_group g
-        WHERE g.tenant_id=%s
-        ORDER BY g.created_at DESC
-    """, [tenant_id])
 
     # resolve current user for unread calculations
     me_raw = (request.session.get('ident_email') or getattr(request.user, 'email', None)) or request.session.get('member_id')
     me = _normalize_identity(tenant_conn, me_raw)
 
-    out = []
-    for r in rows:
-        gid = int(r.get('id'))
-        # members
-        mems = exec_sql(tenant_conn, """
-            SELECT member FROM chat_group_member WHERE group_id=%s
-        """, [gid])
-        members = [m.get('member') for m in mems if m.get('member')]
-
-        # unread: count messages where created_at > last_read_at (per-member)
-        last_read = exec_sql(tenant_conn, """
-            SELECT last_read_at FROM chat_group_read WHERE group_id=%s AND member=%s ORDER BY id DESC LIMIT 1
-        """, [gid, me])
-        if last_read and last_read[0].get('last_read_at'):
-            lr = last_read[0]['last_read_at']
-            unread_rows = exec_sql(tenant_conn, """
-                SELECT COUNT(*) AS cnt FROM chat_group_message WHERE group_id=%s AND created_at > %s AND sender <> %s
-            """, [gid, lr, me])
-            unread = int(unread_rows[0].get('cnt') or 0) if unread_rows else 0
-        else:
-            unread_rows = exec_sql(tenant_conn, """
-                SELECT COUNT(*) AS cnt FROM chat_group_message WHERE group_id=%s AND sender <> %s
-            """, [gid, me])
-            unread = int(unread_rows[0].get('cnt') or 0) if unread_rows else 0
-
-        out.append({
-            "id": gid,
-            "name": r.get('name'),
-            "created_by": r.get('created_by'),
-            "member_count": len(members),
-            "members": members,
-            "unread": unread,
-        })
-    return JsonResponse({"groups": out})
+    return JsonResponse({"groups": list_groups(tenant_conn, tenant_id, me)})
 
 
 @require_POST
@@ -620,7 +504,6 @@ def create_group(request):
     if not tenant_conn:
         return HttpResponseForbidden('No tenant')
 
-    _ensure_group_tables(tenant_conn)
 
     # creator identity
     me_raw = (request.session.get('ident_email') or getattr(request.user, 'email', None)) or request.session.get('member_id')
@@ -664,8 +547,9 @@ def create_group(request):
 
 @require_GET
 def group_history(request):
-    """Return messages for a group. GET param: ?group_id=<id>
-    Response: { messages: [{ id, sender, text, created_at }, ...] }
+    """Return messages for a group, a page at a time (see _history_page).
+    GET params: ?group_id=<id>[&before_id=<id>|&after_id=<id>][&limit=<n>]
+    Response: { messages: [{ id, sender, text, is_read, created_at }, ...], has_more, before_id }
     """
     # Check authentication
     if not request.session.get('member_id'):
@@ -678,18 +562,12 @@ def group_history(request):
     if not tenant_conn:
         return HttpResponseForbidden('No tenant')
 
-    _ensure_group_tables(tenant_conn)
-
-    msgs = exec_sql(tenant_conn, """
-        SELECT id, sender, text, is_read, created_at
-        FROM chat_group_message
-        WHERE group_id=%s
-        ORDER BY created_at ASC
-    """, [int(group_id)])
 
-    for m in msgs:
-        m["created_at"] = m["created_at"].isoformat() if hasattr(m["created_at"], "isoformat") else str(m["created_at"])
-    return JsonResponse({"messages": msgs})
+    try:
+        page = _history_page(tenant_conn, "chat_group_message", "group_id", int(group_id), request.GET)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid group_id, before_id, after_id or limit')
+    return JsonResponse(page)
 
 
 @require_POST
@@ -716,7 +594,6 @@ def group_send(request):
     if not tenant_conn:
         return HttpResponseForbidden('No tenant')
 
-    _ensure_group_tables(tenant_conn)
 
     me_raw = (request.session.get('ident_email') or getattr(request.user, 'email', None)) or request.session.get('member_id')
     me = _normalize_identity(tenant_conn, me_raw)
@@ -725,8 +602,11 @@ def group_send(request):
         exec_sql(tenant_conn, """
             INSERT INTO chat_group_message (group_id, sender, text, is_read) VALUES (%s, %s, %s, 0)
         """, [int(group_id), me, text])
+        unread = unread_counters.count_group_message(tenant_conn, int(group_id), me)
     except Exception as e:
         return JsonResponse({"ok": False, "error": str(e)}, status=500)
+    tenant_id = str(request.session.get('tenant_id', ''))
+    unread_counters.push(tenant_id, unread)
 
     # Broadcast to channels layer so connected websocket clients receive the message
     try:
@@ -770,7 +650,6 @@ def mark_group_read(request):
     tenant_conn = get_tenant_conn(request)
     if not tenant_conn:
         return HttpResponseForbidden('No tenant')
-    _ensure_group_tables(tenant_conn)
 
     me_raw = (request.session.get('ident_email') or getattr(request.user, 'email', None)) or request.session.get('member_id')
     me = _normalize_identity(tenant_conn, me_raw)
@@ -785,6 +664,9 @@ def mark_group_read(request):
             """, [int(group_id), me], fetch=False)
         except Exception:
             pass
+    changes = unread_counters.reset(tenant_conn, unread_counters.GROUP, request.session.get('member_id'),
+                                    int(group_id))
+    unread_counters.push(str(request.session.get('tenant_id', '')), changes)
     return JsonResponse({"ok": True})
 
 
@@ -809,7 +691,6 @@ def group_update(request):
     tenant_conn = get_tenant_conn(request)
     if not tenant_conn:
         return HttpResponseForbidden('No tenant')
-    _ensure_group_tables(tenant_conn)
 
     # basic actions
     try:
@@ -860,13 +741,8 @@ def mark_all_read(request):
     tenant_id = str(request.session.get('tenant_id', ''))
 
     try:
-        # mark DM messages as read where receiver is me
-        exec_sql(tenant_conn, """
-            UPDATE chat_message m
-            JOIN chat_conversation c ON m.conversation_id = c.id
-            SET m.is_read = 1
-            WHERE c.tenant_id=%s AND m.is_read = 0 AND m.sender <> %s AND (c.user_a = %s OR c.user_b = %s)
-        """, [tenant_id, me, me, me], fetch=False)
+        # move my read mark to the end of every conversation
+        read_receipts.mark_all_read(tenant_conn, tenant_id, me)
 
         # mark all groups where I'm a member as read by inserting/updating chat_group_read
         groups = exec_sql(tenant_conn, """
@@ -888,7 +764,11 @@ def mark_all_read(request):
             except Exception:
                 continue
 
+        member_id = request.session.get('member_id')
+        changes = (unread_counters.reset(tenant_conn, unread_counters.DM, member_id)
+                   + unread_counters.reset(tenant_conn, unread_counters.GROUP, member_id))
     except Exception as e:
         return JsonResponse({"ok": False, "error": str(e)}, status=500)
 
+    unread_counters.push(tenant_id, changes)
     return JsonResponse({"ok": True})
@@ -17,3 +17,8 @@ class CoreConfig(AppConfig):
                 initialize_master_database()
             except Exception as e:
                 logger.error(f"✗ Error initializing master database: {e}")
+            try:
+                from core.tenant_registry import tenant_registry
+                tenant_registry.warm()
+            except Exception as e:
+                logger.error(f"✗ Error warming tenant registry: {e}")
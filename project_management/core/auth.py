@@ -1,6 +1,5 @@
 # auth.py
 import os
-import pymysql
 import logging
 import bcrypt
 from core.db_connector import get_connection_from_config
@@ -93,22 +92,9 @@ def check_password(plain_password: str, stored_hash: str):
     return False, False
 
 def identify_tenant_by_email(email: str):
+    from core.tenant_registry import tenant_registry
     postfix = email.split('@')[-1]
-    conn = pymysql.connect(
-        host=MASTER_DB_CONFIG['db_host'],
-        port=MASTER_DB_CONFIG['db_port'],
-        user=MASTER_DB_CONFIG['db_user'],
-        password=MASTER_DB_CONFIG['db_password'],
-        database=MASTER_DB_CONFIG['db_name'],
-        cursorclass=pymysql.cursors.DictCursor,
-        autocommit=True
-    )
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM clients_master WHERE domain_postfix = %s", ('@' + postfix,))
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
-    return row  # None or dict with client metadata
+    return tenant_registry.lookup('@' + postfix)  # None or dict with client metadata
 
 def authenticate(email: str, password: str, tenant_ident: dict):
     """
@@ -3,50 +3,47 @@
 Context processors for making data available to all templates
 """
 
+from django.utils.functional import SimpleLazyObject
+
 from .db_helpers import get_tenant_work_types
+from .tenant_config import DEFAULT_WORK_TYPES
+
+# work type -> context flag used by the sidebar menu
+_WORK_TYPE_FLAGS = {
+    'has_task': 'Task',
+    'has_bug': 'Bug',
+    'has_story': 'Story',
+    'has_defect': 'Defect',
+    'has_subtask': 'Sub Task',
+    'has_change_request': 'Change Request',
+    'has_report': 'Report',
+}
 
 
 def tenant_work_types(request):
     """
     Add tenant-specific work types to all template contexts.
     This allows the sidebar menu to show/hide work type creation links.
+
+    The work types are resolved lazily, on the first template access, so pages
+    that never show the menu do not look them up.
     """
+    if hasattr(request, 'session') and request.session:
+        work_types = SimpleLazyObject(lambda: get_tenant_work_types(request))
+    else:
+        work_types = list(DEFAULT_WORK_TYPES)
+
+    # determine admin role from session user if present
+    is_admin = False
     try:
-        if hasattr(request, 'session') and request.session:
-            work_types = get_tenant_work_types(request)
-            # determine admin role from session user if present
-            is_admin = False
-            try:
-                user = request.session.get('user')
-                role = user.get('role') if isinstance(user, dict) else getattr(user, 'role', None)
-                if role and 'admin' in str(role).lower():
-                    is_admin = True
-            except Exception:
-                is_admin = False
-
-            return {
-                'tenant_work_types': work_types,
-                'has_task': 'Task' in work_types,
-                'has_bug': 'Bug' in work_types,
-                'has_story': 'Story' in work_types,
-                'has_defect': 'Defect' in work_types,
-                'has_subtask': 'Sub Task' in work_types,
-                'has_change_request': 'Change Request' in work_types,
-                'has_report': 'Report' in work_types,
-                'is_admin': is_admin,
-            }
+        user = request.session.get('user')
+        role = user.get('role') if isinstance(user, dict) else getattr(user, 'role', None)
+        if role and 'admin' in str(role).lower():
+            is_admin = True
     except Exception:
-        pass
-    
-    # Fallback: show all work types if there's an error
-    return {
-        'tenant_work_types': ['Task', 'Bug', 'Story', 'Defect', 'Sub Task', 'Report', 'Change Request'],
-        'has_task': True,
-        'has_bug': True,
-        'has_story': True,
-        'has_defect': True,
-        'has_subtask': True,
-        'has_change_request': True,
-        'has_report': True,
-        'is_admin': False,
-    }
+        is_admin = False
+
+    context = {'tenant_work_types': work_types, 'is_admin': is_admin}
+    for flag, work_type in _WORK_TYPE_FLAGS.items():
+        context[flag] = SimpleLazyObject(lambda work_type=work_type: work_type in work_types)
+    return context
@@ -0,0 +1,238 @@
+# core/dashboard_metrics.py
+"""
+Dashboard metrics engine.
+
+All task counters shown on the dashboards (totals, status/priority breakdowns,
+open/closed per priority) are computed in a single pass over the task count rollup
+(core.task_stats) using conditional aggregation, instead of one COUNT(*) query per
+widget; the 7-day created/completed series take a second pass over the tasks of
+those days. Results are cached per (tenant, member, scope) for DASHBOARD_METRICS_TTL
+seconds.
+
+Usage:
+    from core.dashboard_metrics import get_dashboard_metrics, invalidate_dashboard_metrics
+
+    metrics = get_dashboard_metrics(conn, tenant_key, member_id, scope="team")
+    ...
+    invalidate_dashboard_metrics(tenant_key)   # after any task write
+
+A task write can change the team dashboard of every member in the tenant, so
+invalidation is tenant-wide. The cache is per process; the TTL bounds how stale
+another worker process can be.
+"""
+
+import logging
+from datetime import date, timedelta
+
+from django.conf import settings
+
+from core import task_stats
+from core.task_visibility import get_visibility_policy
+from core.tenant_cache import TenantScopedCache
+
+logger = logging.getLogger('project_management')
+
+_METRICS_TTL = getattr(settings, "DASHBOARD_METRICS_TTL", 30)
+_METRICS_MAX_ENTRIES = getattr(settings, "DASHBOARD_METRICS_MAX_ENTRIES", 10000)
+
+PRIORITIES = ('Critical', 'High', 'Normal', 'Low')
+CHART_DAYS = 7
+PLANNED_LIMIT = 10
+
+# status groups, matched case-insensitively like the original per-widget queries
+_IN_PROGRESS_STATUSES = ('In Progress', 'Review', 'In-Progress')
+_NEW_STATUSES = ('New', 'Open')
+_DONE_STATUSES = ('Completed', 'Closed')
+
+_DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+_cache = TenantScopedCache(ttl=_METRICS_TTL, max_entries=_METRICS_MAX_ENTRIES)
+
+
+def _int(value):
+    return int(value or 0)
+
+
+def _scope_predicate(tenant_key, scope, member_id):
+    """WHERE fragment (on alias t) selecting the tasks a dashboard counts."""
+    if scope == "user":
+        return "t.assigned_type = 'member' AND t.assigned_to = %s", [member_id]
+    return get_visibility_policy(tenant_key).predicate(member_id, alias="t")
+
+
+def _empty_metrics():
+    """Zeroed metrics, rendered when the aggregate query fails."""
+    today = date.today()
+    days = [today - timedelta(days=i) for i in range(CHART_DAYS - 1, -1, -1)]
+    metrics = {
+        'assigned_count': 0, 'active_projects': 0, 'projects_completed': 0,
+        'tasks_completed': 0, 'tasks_pending': 0,
+        'progress_completed': 0, 'progress_inprogress': 0, 'progress_pending': 0,
+        'board_open_count': 0, 'my_new_tasks_count': 0, 'is_team_lead': False,
+        'line_chart_labels': [_DAY_NAMES[d.weekday()] for d in days],
+        'line_chart_created': [0] * CHART_DAYS,
+        'line_chart_completed': [0] * CHART_DAYS,
+        'planned_tasks': [],
+        'planned_start': today,
+        'planned_end': today + timedelta(days=CHART_DAYS),
+    }
+    for pri in PRIORITIES:
+        key = pri.lower()
+        metrics[f'pri_{key}'] = metrics[f'pri_{key}_open'] = metrics[f'pri_{key}_closed'] = 0
+    return metrics
+
+
+def _compute(conn, tenant_key, member_id, scope):
+    where, where_params = _scope_predicate(tenant_key, scope, member_id)
+    today = date.today()
+    days = [today - timedelta(days=i) for i in range(CHART_DAYS - 1, -1, -1)]
+
+    in_progress = ','.join(['%s'] * len(_IN_PROGRESS_STATUSES))
+    new_statuses = ','.join(['%s'] * len(_NEW_STATUSES))
+    not_pending = ','.join(['%s'] * (len(_IN_PROGRESS_STATUSES) + 1))
+
+    # status / priority counters come from the task count rollup (core.task_stats):
+    # SUM((condition) * task_count) counts like SUM(condition) over tasks
+    columns = [
+        "SUM(t.task_count) AS assigned",
+        "SUM((t.status = 'Closed') * t.task_count) AS closed",
+        f"SUM((t.status IN ({in_progress})) * t.task_count) AS in_progress",
+        f"SUM((t.status NOT IN ({not_pending})) * t.task_count) AS pending",
+        "SUM((t.status <> 'Closed') * t.task_count) AS board_open",
+        f"SUM((t.status IN ({new_statuses})) * t.task_count) AS new_tasks",
+    ]
+    # the SELECT list comes before WHERE, so column params precede predicate params
+    params = list(_IN_PROGRESS_STATUSES) + ['Closed', *_IN_PROGRESS_STATUSES] + list(_NEW_STATUSES)
+
+    for i, pri in enumerate(PRIORITIES):
+        columns.append(f"SUM((COALESCE(t.priority, 'Normal') = %s) * t.task_count) AS pri_{i}")
+        columns.append(f"SUM((COALESCE(t.priority, 'Normal') = %s AND t.status = 'Closed') * t.task_count) AS pri_closed_{i}")
+        params.extend([pri, pri])
+
+    if scope == "user":
+        # active projects having at least one of this member's tasks
+        columns.append("COUNT(DISTINCT CASE WHEN p.status = 'Active' THEN p.id END) AS active_projects")
+        from_clause = "{stats} t LEFT JOIN projects p ON p.id = t.project_id"
+    else:
+        columns.append("(SELECT COUNT(*) FROM projects WHERE status = 'Active') AS active_projects")
+        from_clause = "{stats} t"
+
+    # the 7-day series depend on dates, so they are counted on tasks: only rows
+    # updated in the window (updated_at >= created_at), via idx_tasks_updated_at
+    series = []
+    series_params = []
+    for i, day in enumerate(days):
+        nxt = day + timedelta(days=1)
+        series.append(f"SUM(t.created_at >= %s AND t.created_at < %s) AS created_{i}")
+        series.append(f"SUM(t.status = 'Completed' AND t.updated_at >= %s AND t.updated_at < %s) AS completed_{i}")
+        series_params.extend([day, nxt, day, nxt])
+
+    cur = conn.cursor()
+    try:
+        rows = task_stats.query(conn, f"SELECT {', '.join(columns)} FROM {from_clause} WHERE {where}",
+                                tuple(params + where_params))
+        row = rows[0] if rows else {}
+        cur.execute(f"""
+            SELECT {', '.join(series)}
+            FROM tasks t
+            WHERE {where} AND t.updated_at >= %s
+        """, tuple(series_params + where_params + [days[0]]))
+        row.update(cur.fetchone() or {})
+
+        assigned = _int(row.get('assigned'))
+        closed = _int(row.get('closed'))
+        in_prog = _int(row.get('in_progress'))
+        metrics = {
+            'assigned_count': assigned,
+            'active_projects': _int(row.get('active_projects')),
+            'tasks_completed': closed,
+            'tasks_pending': _int(row.get('pending')),
+            'progress_completed': closed,
+            'progress_inprogress': in_prog,
+            'progress_pending': assigned - closed - in_prog,
+            'board_open_count': _int(row.get('board_open')),
+            'my_new_tasks_count': _int(row.get('new_tasks')),
+            'line_chart_labels': [_DAY_NAMES[d.weekday()] for d in days],
+            'line_chart_created': [_int(row.get(f'created_{i}')) for i in range(len(days))],
+            'line_chart_completed': [_int(row.get(f'completed_{i}')) for i in range(len(days))],
+        }
+        for i, pri in enumerate(PRIORITIES):
+            total = _int(row.get(f'pri_{i}'))
+            pri_closed = _int(row.get(f'pri_closed_{i}'))
+            key = pri.lower()
+            metrics[f'pri_{key}'] = total
+            metrics[f'pri_{key}_closed'] = pri_closed
+            metrics[f'pri_{key}_open'] = total - pri_closed
+
+        # planned work for the next week: a row list, not a counter
+        start_date, end_date = today, today + timedelta(days=CHART_DAYS)
+        done = ','.join(['%s'] * len(_DONE_STATUSES))
+        cur.execute(f"""
+            SELECT t.id, t.title, t.status, t.due_date
+            FROM tasks t
+            WHERE {where}
+              AND t.status NOT IN ({done})
+              AND t.due_date BETWEEN %s AND %s
+            ORDER BY t.due_date ASC
+            LIMIT {PLANNED_LIMIT}
+        """, tuple(where_params + list(_DONE_STATUSES) + [start_date, end_date]))
+        metrics['planned_tasks'] = [
+            {'id': r['id'], 'title': r['title'], 'status': r['status'], 'due_date': r['due_date']}
+            for r in (cur.fetchall() or [])
+        ]
+        metrics['planned_start'] = start_date
+        metrics['planned_end'] = end_date
+
+        # lookups on other tables; their columns differ between tenant schemas, so a
+        # failure only zeroes the one widget
+        metrics['projects_completed'] = 0
+        if scope == "team":
+            try:
+                cur.execute(
+                    "SELECT COUNT(*) AS c FROM projects WHERE status='Completed' "
+                    "AND (owner_id=%s OR members LIKE CONCAT('%%', %s, '%%'))",
+                    (member_id, member_id))
+                metrics['projects_completed'] = _int((cur.fetchone() or {}).get('c'))
+            except Exception:
+                pass
+
+        metrics['is_team_lead'] = False
+        try:
+            cur.execute("SELECT 1 FROM teams WHERE lead_id = %s LIMIT 1", (member_id,))
+            metrics['is_team_lead'] = cur.fetchone() is not None
+        except Exception:
+            pass
+    finally:
+        cur.close()
+    return metrics
+
+
+def get_dashboard_metrics(conn, tenant_key, member_id, scope="team"):
+    """
+    Return the dashboard metrics dict for a member.
+
+    scope="team" counts the tasks the tenant's visibility policy lets the member see
+    (the dashboard view); scope="user" counts only the member's own tasks.
+    """
+    metrics = _cache.get(tenant_key, member_id, scope)
+    if metrics is not None:
+        return metrics
+
+    generation = _cache.generation(tenant_key)
+    try:
+        metrics = _compute(conn, tenant_key, member_id, scope)
+    except Exception as e:
+        logger.error(f"ERROR dashboard metrics ({scope}, member {member_id}): {e}", exc_info=True)
+        return _empty_metrics()
+    _cache.put(tenant_key, (member_id, scope), metrics, generation)
+    return metrics
+
+
+def invalidate_dashboard_metrics(tenant_key=None):
+    """Forget cached dashboard metrics of a tenant (all tenants when tenant_key is None)."""
+    _cache.invalidate(tenant_key)
+
+
+def dashboard_metrics_stats():
+    return _cache.stats()
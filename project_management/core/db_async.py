@@ -0,0 +1,96 @@
+# core/db_async.py
+"""
+Async access to tenant databases for Channels consumers.
+
+Consumers must not block the event loop, and wrapping DB code in
+sync_to_async(thread_sensitive=True) funnels every socket of the process through
+one thread. This module runs tenant DB work on a dedicated, bounded worker pool
+with connections borrowed from the tenant connection pool (core.db_helpers), so a
+chat message costs no connect and no master_db round trip.
+
+Usage:
+    from core import db_async
+
+    row = await db_async.fetchone(tenant, "SELECT id FROM members WHERE email=%s", [email])
+    new_id = await db_async.execute(tenant, "INSERT INTO ...", params)
+
+    # several statements on one connection
+    def _work(conn, a, b):
+        with conn.cursor() as cur:
+            ...
+    result = await db_async.run_with_tenant_conn(tenant, _work, a, b)
+
+`tenant` may be any tenant alias (clients_master id, db_name, domain_postfix, ...);
+it is mapped through the tenant registry so consumers and HTTP views share one pool.
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from core.db_helpers import tenant_connection
+from core.tenant_registry import tenant_registry
+
+logger = logging.getLogger('utility')
+
+# Worker threads serving async DB calls; keep at or below TENANT_POOL_MAX_TOTAL.
+_ASYNC_DB_WORKERS = getattr(settings, "TENANT_ASYNC_DB_WORKERS", 16)
+
+_executor = ThreadPoolExecutor(max_workers=_ASYNC_DB_WORKERS, thread_name_prefix="tenant-db")
+
+
+def _pool_key(tenant):
+    """Map any tenant alias to the key HTTP requests use for the same database (db_name)."""
+    row = tenant_registry.lookup(tenant)
+    if not row:
+        raise RuntimeError(f"Tenant {tenant} not found in clients_master")
+    return row["db_name"]
+
+
+def _call_with_conn(tenant, func, args, kwargs):
+    with tenant_connection(tenant_key=_pool_key(tenant)) as conn:
+        return func(conn, *args, **kwargs)
+
+
+async def run_with_tenant_conn(tenant, func, *args, **kwargs):
+    """Run func(conn, *args, **kwargs) on a DB worker thread with a pooled tenant connection."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, functools.partial(_call_with_conn, tenant, func, args, kwargs)
+    )
+
+
+def _fetchall(conn, sql, params):
+    with conn.cursor() as cur:
+        cur.execute(sql, params or [])
+        return cur.fetchall()
+
+
+def _fetchone(conn, sql, params):
+    with conn.cursor() as cur:
+        cur.execute(sql, params or [])
+        return cur.fetchone()
+
+
+def _execute(conn, sql, params):
+    with conn.cursor() as cur:
+        cur.execute(sql, params or [])
+        return cur.lastrowid or cur.rowcount
+
+
+async def fetchall(tenant, sql, params=None):
+    """Return all rows (dicts) of a query against the tenant database."""
+    return await run_with_tenant_conn(tenant, _fetchall, sql, params)
+
+
+async def fetchone(tenant, sql, params=None):
+    """Return the first row (dict) of a query, or None."""
+    return await run_with_tenant_conn(tenant, _fetchone, sql, params)
+
+
+async def execute(tenant, sql, params=None):
+    """Execute a write; returns lastrowid when set, else the affected row count."""
+    return await run_with_tenant_conn(tenant, _execute, sql, params)
@@ -8,8 +8,8 @@ Usage (existing code compatibility):
         cur.execute("SELECT ...", (param,))
         rows = cur.fetchall()
     finally:
-        cur.close()   # keep connection cached, close cursor
-    # Do NOT close conn unless you explicitly want to remove it from cache.
+        cur.close()
+        release_tenant_conn(conn)   # returns the connection to the pool
 
 Recommended (context-managed):
     conn = get_tenant_conn(request)
@@ -20,13 +20,17 @@ Recommended (context-managed):
 Notes:
  - This tries to resolve tenant credentials from request.session first (same keys your older code uses).
  - If session does not contain the DB info, it attempts to resolve by host or from the central clients_master table using the Django default DB.
- - Caches connections per-thread to reduce overhead. If you run in async or green-thread environment, adapt caching strategy.
+ - Connections come from a process-wide pool bounded per tenant (TENANT_POOL_MAX_PER_TENANT)
+   and in total (TENANT_POOL_MAX_TOTAL). conn.close() returns the connection to the pool;
+   TenantMiddleware returns whatever a request still holds when the response goes out.
+ - Code running outside a request (threads, scripts) should use `with tenant_connection(...)`.
 """
 
 import threading
 import time
 import pymysql
 import pymysql.cursors
+from pymysql.constants import SERVER_STATUS
 from django.conf import settings
 from django.db import connection as default_connection
 from django.http import HttpRequest
@@ -37,9 +41,9 @@ from django.db import connections, connection as default_connection
 
 logger = logging.getLogger('utility')
 
-# Thread-local cache for tenant connections
+# Thread-local map of tenant_key -> PooledConnection checked out by this thread
 _tlocal = threading.local()
-# default max age for cached connections (seconds)
+# max lifetime of a pooled connection before it is recycled (seconds)
 _CONN_MAX_AGE = getattr(settings, "TENANT_CONN_MAX_AGE", 300)  # 5 minutes
 
 
@@ -77,6 +81,9 @@ def get_visible_task_user_ids(conn, current_user_id):
     - All users can see all users' tasks (full visibility for everyone)
     
     Returns: list of user IDs
+
+    Task queries should filter with core.task_visibility.get_visibility_policy(...).predicate()
+    instead of splicing this list into an IN (...) clause.
     """
     # Return all user IDs - everyone can see everyone's tasks
     cur = conn.cursor()
@@ -108,31 +115,16 @@ def _get_thread_cache():
 
 def _get_tenant_row_from_master(tenant_key):
     """
-    Query central clients_master table on default Django DB for tenant credential row.
-    Adjust the SELECT columns if your clients_master uses different names.
+    Look up the clients_master credential row for tenant_key through the tenant registry
+    (core.tenant_registry), which matches id, domain_postfix, db_name or client_name and
+    only queries master_db on a cache miss.
 
-    Expected columns: db_name, db_host, db_user, db_password, db_port (optional), domain_postfix or client_name
+    Returned columns: id, client_name, domain_postfix, db_name, db_host, db_user, db_password, db_port
     """
     if not tenant_key:
         return None
-
-    # Try several matching columns: domain_postfix, db_name, client_name
-    q = """
-        SELECT id, client_name, domain_postfix, db_name, db_host, db_user, db_password
-        FROM clients_master
-        WHERE domain_postfix = %s OR db_name = %s OR client_name = %s
-        LIMIT 1
-    """
-    with default_connection.cursor() as cur:
-        cur.execute(q, [tenant_key, tenant_key, tenant_key])
-        row = cur.fetchone()
-        if not row:
-            return None
-        cols = [c[0] for c in cur.description]
-        result = dict(zip(cols, row))
-        # Add default port if not present
-        result['db_port'] = 3306
-        return result
+    from core.tenant_registry import tenant_registry
+    return tenant_registry.lookup(tenant_key)
 
 
 def resolve_tenant_key_from_request(request: HttpRequest):
@@ -266,9 +258,334 @@ def _open_tenant_connection(creds):
     )
 
 
+# ---------------------------------------------------------------------------
+# Tenant connection pool
+# ---------------------------------------------------------------------------
+
+# Upper bound of open connections per tenant database and across all tenants.
+_POOL_MAX_PER_TENANT = getattr(settings, "TENANT_POOL_MAX_PER_TENANT", 10)
+_POOL_MAX_TOTAL = getattr(settings, "TENANT_POOL_MAX_TOTAL", 200)
+# Idle connections older than this are closed by the sweeper (seconds).
+_POOL_IDLE_TIMEOUT = getattr(settings, "TENANT_POOL_IDLE_TIMEOUT", 120)
+# Connections idle for longer than this are pinged before being handed out (seconds).
+_POOL_PING_AFTER = getattr(settings, "TENANT_POOL_PING_AFTER", 30)
+# How long a checkout may wait for a free slot before giving up (seconds).
+_POOL_CHECKOUT_TIMEOUT = getattr(settings, "TENANT_POOL_CHECKOUT_TIMEOUT", 10)
+_POOL_SWEEP_INTERVAL = 5
+
+
+class TenantPoolTimeout(RuntimeError):
+    """Raised when no tenant connection became available within the checkout timeout."""
+
+
+class TenantConnectionPool:
+    """
+    Process-wide pool of pymysql connections keyed by tenant key.
+
+    - bounded per tenant (max_per_tenant) and globally (max_total); when the global
+      bound is hit, the oldest idle connection of another tenant is evicted
+    - checkout()/checkin() semantics; callers wait on a condition when full
+    - idle connections are closed after idle_timeout, and recycled after max_age
+    - a borrowed connection is only pinged when it sat idle longer than ping_after
+    - wait-queue metrics are exposed through stats()
+    """
+
+    def __init__(self, max_per_tenant=_POOL_MAX_PER_TENANT, max_total=_POOL_MAX_TOTAL,
+                 idle_timeout=_POOL_IDLE_TIMEOUT, ping_after=_POOL_PING_AFTER,
+                 max_age=_CONN_MAX_AGE, checkout_timeout=_POOL_CHECKOUT_TIMEOUT):
+        self.max_per_tenant = max_per_tenant
+        self.max_total = max_total
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.max_age = max_age
+        self.checkout_timeout = checkout_timeout
+
+        self._cond = threading.Condition()
+        self._idle = {}        # tenant_key -> [(raw, opened_at, returned_at), ...] (LIFO)
+        self._in_use = {}      # tenant_key -> number of checked-out (or opening) connections
+        self._generation = {}  # tenant_key -> int, bumped by discard()
+        self._total = 0        # idle + in use, across all tenants
+        self._last_sweep = time.time()
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "health_check_failures": 0,
+            "waiting": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+        }
+
+    # -- internal helpers (call with self._cond held) --
+
+    def _sweep_locked(self, now, force=False):
+        """Detach idle connections past idle_timeout/max_age; returns them for closing."""
+        if not force and now - self._last_sweep < _POOL_SWEEP_INTERVAL:
+            return []
+        self._last_sweep = now
+        expired = []
+        for key, idle in list(self._idle.items()):
+            keep = []
+            for entry in idle:
+                raw, opened_at, returned_at = entry
+                if now - returned_at > self.idle_timeout or now - opened_at > self.max_age:
+                    expired.append(raw)
+                else:
+                    keep.append(entry)
+            if keep:
+                self._idle[key] = keep
+            else:
+                self._idle.pop(key, None)
+        self._total -= len(expired)
+        return expired
+
+    def _evict_oldest_idle_locked(self, exclude_key):
+        """Detach the least recently returned idle connection of any other tenant."""
+        oldest_key, oldest_idx, oldest_ts = None, None, None
+        for key, idle in self._idle.items():
+            if key == exclude_key or not idle:
+                continue
+            # idle lists are LIFO, index 0 is the oldest entry of that tenant
+            ts = idle[0][2]
+            if oldest_ts is None or ts < oldest_ts:
+                oldest_key, oldest_idx, oldest_ts = key, 0, ts
+        if oldest_key is None:
+            return None
+        raw = self._idle[oldest_key].pop(oldest_idx)[0]
+        if not self._idle[oldest_key]:
+            self._idle.pop(oldest_key, None)
+        self._total -= 1
+        return raw
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats["closed"] += 1
+
+    # -- public API --
+
+    def checkout(self, tenant_key, opener):
+        """
+        Borrow a connection for tenant_key.
+
+        opener is a zero-argument callable returning a new raw pymysql connection; it is
+        only invoked when no idle connection can be reused.
+        Returns (raw_conn, opened_at, generation).
+        """
+        to_close = []
+        reuse = None
+        wait_started = None
+        deadline = time.time() + self.checkout_timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                to_close.extend(self._sweep_locked(now))
+                idle = self._idle.get(tenant_key)
+                if idle:
+                    reuse = idle.pop()
+                    if not idle:
+                        self._idle.pop(tenant_key, None)
+                    self._in_use[tenant_key] = self._in_use.get(tenant_key, 0) + 1
+                    break
+                if self._in_use.get(tenant_key, 0) < self.max_per_tenant:
+                    if self._total < self.max_total:
+                        break
+                    victim = self._evict_oldest_idle_locked(tenant_key)
+                    if victim is not None:
+                        to_close.append(victim)
+                        break
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    if wait_started is not None:
+                        self._stats["waiting"] -= 1
+                    raise TenantPoolTimeout(
+                        f"Timed out after {self.checkout_timeout}s waiting for a connection to tenant {tenant_key}"
+                    )
+                if wait_started is None:
+                    wait_started = now
+                    self._stats["waits"] += 1
+                    self._stats["waiting"] += 1
+                self._cond.wait(remaining)
+
+            if wait_started is not None:
+                waited = time.time() - wait_started
+                self._stats["waiting"] -= 1
+                self._stats["wait_time_total"] += waited
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+            if reuse is None:
+                # reserve a slot for the connection we are about to open
+                self._in_use[tenant_key] = self._in_use.get(tenant_key, 0) + 1
+                self._total += 1
+            self._stats["checkouts"] += 1
+            generation = self._generation.get(tenant_key, 0)
+
+        for raw in to_close:
+            self._close_raw(raw)
+
+        now = time.time()
+        if reuse is not None:
+            raw, opened_at, returned_at = reuse
+            if now - opened_at > self.max_age:
+                self._close_raw(raw)
+            elif now - returned_at > self.ping_after:
+                try:
+                    raw.ping(reconnect=False)
+                    return raw, opened_at, generation
+                except Exception:
+                    with self._cond:
+                        self._stats["health_check_failures"] += 1
+                    self._close_raw(raw)
+            else:
+                return raw, opened_at, generation
+
+        # open a fresh connection in the slot reserved above
+        try:
+            raw = opener()
+        except Exception:
+            with self._cond:
+                self._in_use[tenant_key] -= 1
+                self._total -= 1
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return raw, now, generation
+
+    def checkin(self, tenant_key, raw, opened_at, generation):
+        """Return a borrowed connection; broken, stale or discarded connections are closed."""
+        reusable = False
+        try:
+            if raw.open:
+                # never hand a half-finished transaction to the next borrower
+                if raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    raw.rollback()
+                reusable = True
+        except Exception:
+            reusable = False
+
+        now = time.time()
+        with self._cond:
+            self._in_use[tenant_key] = max(0, self._in_use.get(tenant_key, 0) - 1)
+            if not self._in_use[tenant_key]:
+                self._in_use.pop(tenant_key, None)
+            if (reusable and now - opened_at < self.max_age
+                    and generation == self._generation.get(tenant_key, 0)):
+                self._idle.setdefault(tenant_key, []).append((raw, opened_at, now))
+                raw = None
+            else:
+                self._total -= 1
+            self._cond.notify_all()
+        if raw is not None:
+            self._close_raw(raw)
+
+    def discard(self, tenant_key):
+        """
+        Close idle connections of tenant_key and make checked-out ones close on return.
+        Use after the tenant's credentials changed.
+        """
+        with self._cond:
+            self._generation[tenant_key] = self._generation.get(tenant_key, 0) + 1
+            idle = self._idle.pop(tenant_key, [])
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for raw, _opened_at, _returned_at in idle:
+            self._close_raw(raw)
+
+    def close_idle(self):
+        """Close every idle connection (e.g. on worker shutdown)."""
+        with self._cond:
+            idle = [entry[0] for entries in self._idle.values() for entry in entries]
+            self._idle.clear()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for raw in idle:
+            self._close_raw(raw)
+
+    def stats(self):
+        """Snapshot of pool counters, including wait-queue metrics and per-tenant usage."""
+        with self._cond:
+            data = dict(self._stats)
+            data["total"] = self._total
+            data["max_total"] = self.max_total
+            data["max_per_tenant"] = self.max_per_tenant
+            tenants = {}
+            for key in set(self._idle) | set(self._in_use):
+                tenants[key] = {
+                    "in_use": self._in_use.get(key, 0),
+                    "idle": len(self._idle.get(key, ())),
+                }
+            data["tenants"] = tenants
+        return data
+
+
+_pool = TenantConnectionPool()
+
+
+class PooledConnection:
+    """
+    Proxy around a pymysql connection checked out of the tenant pool.
+
+    Behaves like the underlying connection (cursor(), commit(), insert_id(), ...),
+    except that close() returns it to the pool. get_tenant_conn() hands the same
+    proxy to every caller on a thread, so the connection goes back to the pool once
+    all of them have closed it, or at the end of the request (TenantMiddleware).
+    """
+
+    def __init__(self, tenant_key, raw, opened_at, generation):
+        self._tenant_key = tenant_key
+        self._raw = raw
+        self._opened_at = opened_at
+        self._generation = generation
+        self._last_used = time.time()
+        self._refs = 1
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise pymysql.err.InterfaceError(0, "Connection was returned to the tenant pool")
+        return getattr(raw, name)
+
+    @property
+    def open(self):
+        return self._raw is not None and self._raw.open
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Drop one reference; the connection is returned to the pool when none are left."""
+        self._refs -= 1
+        if self._refs <= 0:
+            self.release()
+
+    def release(self):
+        """Return the connection to the pool regardless of outstanding references."""
+        raw, self._raw = self._raw, None
+        if raw is None:
+            return
+        self._refs = 0
+        cache = _get_thread_cache()
+        if cache.get(self._tenant_key) is self:
+            cache.pop(self._tenant_key, None)
+        _pool.checkin(self._tenant_key, raw, self._opened_at, self._generation)
+
+
 def get_tenant_conn(request: HttpRequest = None, tenant_key: str = None):
     """
-    Return a pymysql.Connection for the tenant. Cached per-thread.
+    Return a pooled connection (PooledConnection) for the tenant.
+
+    Repeated calls on the same thread return the same checked-out connection until it
+    is closed or the request ends. conn.close() returns it to the pool.
 
     Use get_tenant_conn_and_cursor(request) if you want conn, cursor pair.
     """
@@ -281,32 +598,74 @@ def get_tenant_conn(request: HttpRequest = None, tenant_key: str = None):
     cache = _get_thread_cache()
     now = time.time()
 
-    cached = cache.get(tenant_key)
-    if cached:
-        conn = cached.get("conn")
-        opened_at = cached.get("opened_at", 0)
-        age = now - opened_at
-        try:
-            if conn and conn.open and age < _CONN_MAX_AGE:
-                # ping to ensure it's alive; reconnect if needed
-                conn.ping(reconnect=True)
-                return conn
-        except Exception:
-            # connection dead or ping failed; close and remove
+    pooled = cache.get(tenant_key)
+    if pooled is not None:
+        if pooled.open:
             try:
-                conn.close()
+                # connection held across requests (e.g. consumer threads): re-check it
+                if now - pooled._last_used > _POOL_PING_AFTER:
+                    pooled._raw.ping(reconnect=True)
+                pooled._last_used = now
+                pooled._refs += 1
+                return pooled
             except Exception:
                 pass
-            cache.pop(tenant_key, None)
+        pooled.release()
+
+    def _opener():
+        creds = resolve_tenant_credentials(request=request, tenant_key=tenant_key)
+        if not creds["database"] or not creds["user"]:
+            raise RuntimeError("Tenant DB credentials could not be resolved. Ensure session or clients_master is set.")
+        return _open_tenant_connection(creds)
+
+    raw, opened_at, generation = _pool.checkout(tenant_key, _opener)
+    pooled = PooledConnection(tenant_key, raw, opened_at, generation)
+    cache[tenant_key] = pooled
+    return pooled
 
-    # Not cached or stale: open new connection
+
+def release_tenant_conn(conn):
+    """
+    Hand a connection obtained from get_tenant_conn back to the pool.
+    Safe to call with None or with a plain pymysql connection (which is closed).
+    """
+    if conn is None:
+        return
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+@contextlib.contextmanager
+def tenant_connection(request: HttpRequest = None, tenant_key: str = None):
+    """
+    Context-managed checkout, for code running outside the request cycle
+    (background threads, management commands):
+
+        with tenant_connection(tenant_key=key) as conn:
+            ...
+    """
+    conn = get_tenant_conn(request=request, tenant_key=tenant_key)
+    try:
+        yield conn
+    finally:
+        release_tenant_conn(conn)
+
+
+def open_streaming_conn(request: HttpRequest = None, tenant_key: str = None):
+    """
+    A dedicated, unpooled tenant connection whose cursors are unbuffered
+    (SSDictCursor): rows are read from the server as they are fetched. Use it for
+    result sets too large to hold in memory (core.export_stream). Close it when
+    done; a connection abandoned mid-result cannot be reused, hence no pool.
+    """
+    if tenant_key is None and request is not None:
+        tenant_key = resolve_tenant_key_from_request(request)
     creds = resolve_tenant_credentials(request=request, tenant_key=tenant_key)
     if not creds["database"] or not creds["user"]:
         raise RuntimeError("Tenant DB credentials could not be resolved. Ensure session or clients_master is set.")
-
-    conn = _open_tenant_connection(creds)
-    cache[tenant_key] = {"conn": conn, "opened_at": now}
-    return conn
+    return _open_tenant_connection(dict(creds, cursorclass=pymysql.cursors.SSDictCursor))
 
 
 def get_tenant_conn_and_cursor(request: HttpRequest = None, tenant_key: str = None):
@@ -317,7 +676,8 @@ def get_tenant_conn_and_cursor(request: HttpRequest = None, tenant_key: str = No
         conn, cur = get_tenant_conn_and_cursor(request)
         cur.execute(...)
         rows = cur.fetchall()
-        cur.close()   # keep conn cached
+        cur.close()
+        release_tenant_conn(conn)
     """
     conn = get_tenant_conn(request=request, tenant_key=tenant_key)
     cur = conn.cursor()
@@ -326,16 +686,27 @@ def get_tenant_conn_and_cursor(request: HttpRequest = None, tenant_key: str = No
 
 def close_all_thread_conns():
     """
-    Close and clear all cached tenant connections for this thread.
-    Call this in management commands or on worker shutdown if desired.
+    Return every tenant connection checked out by this thread to the pool.
+    Called by TenantMiddleware at the end of each request; call it in management
+    commands or background threads when done.
     """
     cache = _get_thread_cache()
-    for k, v in list(cache.items()):
+    for pooled in list(cache.values()):
         try:
-            v["conn"].close()
+            pooled.release()
         except Exception:
-            pass
-        cache.pop(k, None)
+            logger.exception("Failed to return tenant connection to the pool")
+    cache.clear()
+
+
+def discard_tenant_pool(tenant_key):
+    """Drop pooled connections of a tenant, e.g. after its DB credentials changed."""
+    _pool.discard(tenant_key)
+
+
+def tenant_pool_stats():
+    """Pool metrics: open/idle/in-use counts, checkouts, wait-queue counters."""
+    return _pool.stats()
 
 
 # core/db_helpers.py
@@ -456,6 +827,7 @@ def get_tenant_work_types(request):
     Get enabled work types for the current tenant.
     Returns a list of work type names that are enabled for the tenant.
     If no configuration exists, returns default work types.
+    Served from the tenant configuration cache (core.tenant_config).
     
     Args:
         request: Django HttpRequest object with session data
@@ -463,54 +835,17 @@ def get_tenant_work_types(request):
     Returns:
         list: List of enabled work type names (e.g., ['Task', 'Bug', 'Defect'])
     """
-    default_work_types = ['Task', 'Bug', 'Story', 'Defect', 'Sub Task', 'Report', 'Change Request']
-    
+    from core.tenant_config import DEFAULT_WORK_TYPES, get_tenant_config
+
     try:
         # Get tenant configuration from session
         tenant_config = request.session.get("tenant_config")
         if not tenant_config or not isinstance(tenant_config, dict):
-            return default_work_types
-        
-        tenant_id = tenant_config.get("tenant_id")
-        if not tenant_id:
-            return default_work_types
+            return list(DEFAULT_WORK_TYPES)
         
-        # Connect to master_db to get work types configuration
-        from django.conf import settings
-        
-        admin_conf = {
-            'host': getattr(settings, 'MYSQL_ADMIN_HOST', '127.0.0.1'),
-            'port': int(getattr(settings, 'MYSQL_ADMIN_PORT', 3306)),
-            'user': getattr(settings, 'MYSQL_ADMIN_USER', 'root'),
-            'password': getattr(settings, 'MYSQL_ADMIN_PWD', 'root'),
-            'cursorclass': pymysql.cursors.DictCursor,
-            'autocommit': True
-        }
-        
-        admin_conn = pymysql.connect(**admin_conf)
-        cur = admin_conn.cursor()
-        
-        # Query tenant_work_types table
-        cur.execute("""
-            SELECT work_type 
-            FROM master_db.tenant_work_types 
-            WHERE tenant_id = %s AND is_enabled = TRUE
-            ORDER BY work_type
-        """, (tenant_id,))
-        
-        rows = cur.fetchall()
-        cur.close()
-        admin_conn.close()
-        
-        if rows:
-            # Return only enabled work types
-            enabled_work_types = [row['work_type'] for row in rows]
-            return enabled_work_types
-        else:
-            # No configuration found, return defaults
-            return default_work_types
+        return get_tenant_config(tenant_config.get("tenant_id"))["work_types"]
             
     except Exception as e:
         logger.error(f"Error getting tenant work types: {e}")
         # On error, return default work types
-        return default_work_types
+        return list(DEFAULT_WORK_TYPES)
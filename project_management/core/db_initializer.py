@@ -4,6 +4,8 @@ import pymysql
 import secrets
 import string
 from core.auth import hash_password
+from core.tenant_registry import tenant_registry
+from core.index_migrations import apply_index_migrations
 import logging
 
 # Use the 'utility' logger configured in settings.LOGGING
@@ -51,12 +53,21 @@ def initialize_master_database():
                 db_engine VARCHAR(50) DEFAULT 'mysql',
                 db_user VARCHAR(255),
                 db_password VARCHAR(255),
+                task_visibility VARCHAR(20) DEFAULT 'all',
                 created_at DATETIME,
                 updated_at DATETIME,
                 INDEX idx_domain (domain_postfix),
                 INDEX idx_db_name (db_name)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
         """)
+
+        # task_visibility was added after the first releases; add it to older installs
+        cur.execute("""
+            SELECT COUNT(*) AS cnt FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'clients_master' AND COLUMN_NAME = 'task_visibility'
+        """, (MASTER_DB,))
+        if cur.fetchone()['cnt'] == 0:
+            cur.execute("ALTER TABLE clients_master ADD COLUMN task_visibility VARCHAR(20) DEFAULT 'all' AFTER db_password")
         
         # Create tenants_admin table
         cur.execute("""
@@ -93,6 +104,10 @@ def initialize_master_database():
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
         """)
         
+        # per-tenant schema version, written by core.tenant_migrations
+        from core.tenant_migrations import VERSIONS_TABLE_DDL
+        cur.execute(VERSIONS_TABLE_DDL)
+
         logger.info(f"✓ Tenant management tables created or already exist.")
         
         # Create default tenant admin if not exists
@@ -514,6 +529,97 @@ CREATE TABLE IF NOT EXISTS notifications (
   INDEX idx_is_read (is_read),
   INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+""",
+    """
+CREATE TABLE IF NOT EXISTS notification_outbox (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  notification_id INT NULL,
+  group_name VARCHAR(255) NOT NULL,
+  payload JSON NOT NULL,
+  status ENUM('pending', 'sent', 'dead') NOT NULL DEFAULT 'pending',
+  attempts INT NOT NULL DEFAULT 0,
+  next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  last_error VARCHAR(500),
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  sent_at DATETIME NULL,
+  INDEX idx_outbox_pending (status, next_attempt_at),
+  INDEX idx_outbox_sent (status, sent_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+""",
+    """
+CREATE TABLE IF NOT EXISTS unread_counters (
+  member_id INT NOT NULL,
+  kind VARCHAR(16) NOT NULL,
+  source VARCHAR(255) NOT NULL DEFAULT '',
+  unread INT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (member_id, kind, source)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+""",
+    """
+CREATE TABLE IF NOT EXISTS import_jobs (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  kind VARCHAR(32) NOT NULL DEFAULT 'tasks',
+  status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+  file_name VARCHAR(255) NOT NULL,
+  file_path VARCHAR(500) NOT NULL,
+  file_size BIGINT NOT NULL DEFAULT 0,
+  options JSON DEFAULT NULL,
+  created_by INT,
+  member_id INT,
+  rows_processed INT NOT NULL DEFAULT 0,
+  inserted INT NOT NULL DEFAULT 0,
+  error_count INT NOT NULL DEFAULT 0,
+  progress DECIMAL(5,4) DEFAULT NULL,
+  warnings JSON DEFAULT NULL,
+  error VARCHAR(1000),
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  started_at DATETIME NULL,
+  finished_at DATETIME NULL,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  INDEX idx_import_jobs_status (status, updated_at),
+  INDEX idx_import_jobs_user (created_by, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+""",
+    """
+CREATE TABLE IF NOT EXISTS import_job_rows (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  job_id INT NOT NULL,
+  row_no INT NOT NULL,
+  error VARCHAR(1000) NOT NULL,
+  data JSON DEFAULT NULL,
+  INDEX idx_import_job_rows_job (job_id, row_no),
+  FOREIGN KEY (job_id) REFERENCES import_jobs(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+""",
+    """
+CREATE TABLE IF NOT EXISTS project_stats (
+  project_id INT PRIMARY KEY,
+  total_tasks INT NOT NULL DEFAULT 0,
+  completed_tasks INT NOT NULL DEFAULT 0,
+  pending_tasks INT NOT NULL DEFAULT 0,
+  inprogress_tasks INT NOT NULL DEFAULT 0,
+  critical_tasks INT NOT NULL DEFAULT 0,
+  high_tasks INT NOT NULL DEFAULT 0,
+  overdue_tasks INT NOT NULL DEFAULT 0,
+  stats_date DATE NOT NULL,
+  dirty_at DATETIME(6) NULL,
+  refreshed_at DATETIME(6) NOT NULL,
+  FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+""",
+    """
+CREATE TABLE IF NOT EXISTS task_stats (
+  project_id INT NOT NULL DEFAULT 0,
+  assigned_type VARCHAR(10) NOT NULL DEFAULT '',
+  assigned_to INT NOT NULL DEFAULT 0,
+  work_type VARCHAR(50) NOT NULL DEFAULT '',
+  status VARCHAR(50) NOT NULL DEFAULT '',
+  priority VARCHAR(20) NOT NULL DEFAULT '',
+  task_count INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (project_id, assigned_type, assigned_to, work_type, status, priority),
+  INDEX idx_task_stats_assignee (assigned_to, assigned_type)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 """,
     """
 
@@ -528,13 +634,55 @@ CREATE TABLE IF NOT EXISTS chat_message (
 );
 """,
     """
-
-CREATE INDEX idx_msg_conv_created ON chat_message (conversation_id, created_at);
+CREATE TABLE IF NOT EXISTS chat_conversation_read (
+  conversation_id INT NOT NULL,
+  member VARCHAR(128) NOT NULL,
+  last_read_id INT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (conversation_id, member),
+  FOREIGN KEY (conversation_id) REFERENCES chat_conversation(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 """,
     """
-CREATE INDEX idx_conv_tenant ON chat_conversation (tenant_id);
-
+CREATE TABLE IF NOT EXISTS chat_group (
+  id BIGINT PRIMARY KEY AUTO_INCREMENT,
+  tenant_id VARCHAR(255) NOT NULL,
+  name VARCHAR(255) NOT NULL,
+  created_by VARCHAR(255),
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+""",
     """
+CREATE TABLE IF NOT EXISTS chat_group_member (
+  id BIGINT PRIMARY KEY AUTO_INCREMENT,
+  group_id BIGINT NOT NULL,
+  member VARCHAR(255) NOT NULL,
+  added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  INDEX (group_id),
+  INDEX (member)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+""",
+    """
+CREATE TABLE IF NOT EXISTS chat_group_message (
+  id BIGINT PRIMARY KEY AUTO_INCREMENT,
+  group_id BIGINT NOT NULL,
+  sender VARCHAR(255) NOT NULL,
+  text TEXT,
+  is_read TINYINT DEFAULT 0,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  INDEX (group_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+""",
+    """
+CREATE TABLE IF NOT EXISTS chat_group_read (
+  id BIGINT PRIMARY KEY AUTO_INCREMENT,
+  group_id BIGINT NOT NULL,
+  member VARCHAR(255) NOT NULL,
+  last_read_at TIMESTAMP NULL,
+  INDEX (group_id),
+  INDEX (member)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+""",
 
 ]
 
@@ -544,9 +692,30 @@ def random_password(length=18):
 
 class DBInitializer:
     def __init__(self):
-        self.admin_conn = pymysql.connect(
-            host=ADMIN_HOST, port=ADMIN_PORT, user=ADMIN_USER, password=ADMIN_PWD,
-            cursorclass=pymysql.cursors.DictCursor, autocommit=True
+        self._admin_conn = None
+
+    @property
+    def admin_conn(self):
+        # opened on first use: the per-tenant steps below do not need it
+        if self._admin_conn is None:
+            self._admin_conn = pymysql.connect(
+                host=ADMIN_HOST, port=ADMIN_PORT, user=ADMIN_USER, password=ADMIN_PWD,
+                cursorclass=pymysql.cursors.DictCursor, autocommit=True
+            )
+        return self._admin_conn
+
+    def close(self):
+        if self._admin_conn is not None:
+            try:
+                self._admin_conn.close()
+            except Exception:
+                pass
+            self._admin_conn = None
+
+    def _tenant_conn(self, db_name, tenant_user, tenant_pwd):
+        return pymysql.connect(
+            host=ADMIN_HOST, port=ADMIN_PORT, user=tenant_user, password=tenant_pwd,
+            database=db_name, cursorclass=pymysql.cursors.DictCursor, autocommit=True
         )
 
     def get_clients(self):
@@ -584,29 +753,33 @@ class DBInitializer:
         cur.execute("FLUSH PRIVILEGES;")
         # update master_db credentials
         cur.execute(f"UPDATE {MASTER_DB}.clients_master SET db_user=%s, db_password=%s WHERE id=%s;", (tenant_user, tenant_pwd, client['id']))
+        tenant_registry.invalidate(client['id'])
         logger.info(f"[init] Created DB `{db_name}` and user `{tenant_user}` for client id {client['id']}.")
         return tenant_user, tenant_pwd
 
-    def run_ddl_on_tenant(self, db_name, tenant_user, tenant_pwd):
-        conn = pymysql.connect(
-            host=ADMIN_HOST, port=ADMIN_PORT, user=tenant_user, password=tenant_pwd,
-            database=db_name, cursorclass=pymysql.cursors.DictCursor, autocommit=True
-        )
+    def run_ddl_on_tenant(self, db_name, tenant_user, tenant_pwd, conn=None):
+        own_conn = conn is None
+        if own_conn:
+            conn = self._tenant_conn(db_name, tenant_user, tenant_pwd)
         cur = conn.cursor()
         try:
           for ddl in TENANT_DDL:
               cur.execute(ddl)
+          # secondary indexes are versioned separately (core.index_migrations)
+          apply_index_migrations(conn, db_name, lock_timeout=30)
         except Exception as e:
           logger.error(f"[init] Error executing DDL on {db_name}: {e}")
           raise e
-        cur.close()
-        conn.close()
+        finally:
+          cur.close()
+          if own_conn:
+              conn.close()
         logger.info(f"[init] Tenant DDL executed on {db_name}")
-    def seed_roles_and_permissions(self, db_name, tenant_user, tenant_pwd):
-        conn = pymysql.connect(
-            host=ADMIN_HOST, port=ADMIN_PORT, user=tenant_user, password=tenant_pwd,
-            database=db_name, cursorclass=pymysql.cursors.DictCursor, autocommit=True
-        )
+
+    def seed_roles_and_permissions(self, db_name, tenant_user, tenant_pwd, conn=None):
+        own_conn = conn is None
+        if own_conn:
+            conn = self._tenant_conn(db_name, tenant_user, tenant_pwd)
         cur = conn.cursor()
 
         # default permissions list
@@ -633,8 +806,7 @@ class DBInitializer:
         ]
 
         # insert permissions idempotently
-        for code, desc in perms:
-            cur.execute("INSERT IGNORE INTO permissions (code, description) VALUES (%s,%s)", (code, desc))
+        cur.executemany("INSERT IGNORE INTO permissions (code, description) VALUES (%s,%s)", perms)
 
         # create builtin roles
         builtin_roles = [
@@ -644,9 +816,8 @@ class DBInitializer:
             ('Collaborator', 'Collaborator role', 1),
             ('Viewer', 'Read-only', 1)
         ]
-        for name, desc, builtin in builtin_roles:
-            cur.execute("INSERT IGNORE INTO roles (name, description, is_builtin) VALUES (%s,%s,%s)",
-                        (name, desc, builtin))
+        cur.executemany("INSERT IGNORE INTO roles (name, description, is_builtin) VALUES (%s,%s,%s)",
+                        builtin_roles)
 
         # mapping: role -> permission codes (list)
         role_perm_map = {
@@ -668,16 +839,17 @@ class DBInitializer:
         p_rows = cur.fetchall()
         perm_ids = {p['code']: p['id'] for p in p_rows}
 
+        mappings = []
         for role_name, codes in role_perm_map.items():
             r_id = role_ids.get(role_name)
             if not r_id:
                 continue
             for code in codes:
                 p_id = perm_ids.get(code)
-                if not p_id:
-                    continue
-                # insert mapping idempotently
-                cur.execute("INSERT IGNORE INTO role_permissions (role_id, permission_id) VALUES (%s,%s)", (r_id, p_id))
+                if p_id:
+                    mappings.append((r_id, p_id))
+        # insert mappings idempotently, in one multi-row statement
+        cur.executemany("INSERT IGNORE INTO role_permissions (role_id, permission_id) VALUES (%s,%s)", mappings)
 
         # ensure a default password policy exists (only one row)
         cur.execute("SELECT COUNT(*) AS c FROM password_policies")
@@ -686,14 +858,14 @@ class DBInitializer:
                 "INSERT INTO password_policies (min_length, require_upper, require_lower, require_number, require_symbol) VALUES (8,1,1,1,0)")
 
         cur.close()
-        conn.close()
+        if own_conn:
+            conn.close()
         logger.info(f"[init] Seeded roles & permissions for {db_name}")
 
-    def seed_admin(self, db_name, tenant_user, tenant_pwd, domain_postfix):
-        conn = pymysql.connect(
-            host=ADMIN_HOST, port=ADMIN_PORT, user=tenant_user, password=tenant_pwd,
-            database=db_name, cursorclass=pymysql.cursors.DictCursor, autocommit=True
-        )
+    def seed_admin(self, db_name, tenant_user, tenant_pwd, domain_postfix, conn=None):
+        own_conn = conn is None
+        if own_conn:
+            conn = self._tenant_conn(db_name, tenant_user, tenant_pwd)
         cur = conn.cursor()
         cur.execute("SELECT COUNT(*) AS c FROM users;")
         row = cur.fetchone()
@@ -709,28 +881,32 @@ class DBInitializer:
                         (admin_email, "Tenant Admin", hashed, "Admin", 1))
             logger.info(f"[init] Seeded admin {admin_email} with username 'tenant' and password 'tenant' in {db_name}")
         cur.close()
-        conn.close()
+        if own_conn:
+            conn.close()
+
+    def run(self, workers=None):
+        """
+        Provision / migrate every client, `workers` tenants at a time. Tenants that
+        already have a db_user keep their credentials; the schema version each tenant
+        reached is recorded in master_db.tenant_schema_versions (core.tenant_migrations).
+        """
+        from core.tenant_migrations import TenantMigrationRunner
 
-    def run(self):
         clients = self.get_clients()
         if not clients:
             logger.info("[init] No clients found in master_db.clients_master. Insert client rows first.")
-            return
-        for client in clients:
-            # if db_user present skip creation steps (idempotent)
-            if client.get('db_user'):
-                logger.info(f"[init] client id {client['id']} already has db_user {client['db_user']}; using stored credentials.")
-                tenant_user, tenant_pwd = client['db_user'], client['db_password']
+            return []
+
+        def report(done, total, result):
+            if result.get("error"):
+                logger.error(f"[init] [{done}/{total}] Error provisioning tenant {result['db_name']}: {result['error']}")
             else:
-                tenant_user, tenant_pwd = self.create_db_and_user(client)
-            # run DDL
-            try:
-                self.run_ddl_on_tenant(client['db_name'], tenant_user, tenant_pwd)
-                self.seed_admin(client['db_name'], tenant_user, tenant_pwd, client['domain_postfix'])
-                self.seed_roles_and_permissions(client['db_name'], tenant_user, tenant_pwd)
-            except Exception as e:
-                logger.error(f"[init] Error provisioning tenant: {e}")
+                logger.info(f"[init] [{done}/{total}] {result['db_name']} at schema version "
+                            f"{result['version']} ({result['seconds']:.1f}s)")
+
+        results = TenantMigrationRunner(workers=workers).run(clients, progress=report)
         logger.info("[init] Done provisioning all tenants.")
+        return results
 
 if __name__ == "__main__":
 # validate admin creds presence
@@ -740,3 +916,4 @@ if __name__ == "__main__":
     logger.info(f"[init] Connecting to MySQL admin at {ADMIN_HOST}")
     init = DBInitializer()
     init.run()
+    init.close()
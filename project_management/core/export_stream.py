@@ -0,0 +1,236 @@
+# core/export_stream.py
+"""
+Streaming exports with memory bounded regardless of row count.
+
+Rows come from a server-side cursor (SSDictCursor on a dedicated connection,
+db_helpers.open_streaming_conn), fetched EXPORT_CHUNK_SIZE at a time, and are
+written out as they arrive:
+  - CSV goes straight into a StreamingHttpResponse, one chunk of rows per
+    write, so the download starts with the first rows;
+  - XLSX is written with openpyxl in write-only mode (rows are serialised to
+    a temporary file as they are appended, strings inline) and the finished
+    file is streamed back with FileResponse.
+
+Django consumes a streaming response completely into memory when its iterator
+does not match the handler (a sync iterator under ASGI, an async one under
+WSGI), so under ASGI (Daphne) the chunks are handed over through an async
+iterator that pulls each one in a worker thread.
+
+A Sheet describes the columns: headers, fixed widths (write-only sheets cannot
+be measured after the fact), a row function turning a result row into values
+and an optional style function naming a cell style (CELL_STYLES) per column.
+
+Usage:
+    conn = open_streaming_conn(request)
+    rows = stream_rows(conn, "SELECT ...", params)     # closes conn when done
+    return xlsx_response(request, rows, sheet, "Report.xlsx")   # or csv_response(...)
+
+scripts/bench_export.py records peak RSS against row count, including
+through Django's ASGI handler.
+"""
+
+import csv
+import logging
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+
+logger = logging.getLogger('project_management')
+
+CHUNK_SIZE = getattr(settings, "EXPORT_CHUNK_SIZE", 1000)
+# XLSX temp files stay in memory up to this size, then spill to disk
+_SPOOL_BYTES = 8 * 1024 * 1024
+# blocks of the XLSX file sent under ASGI (one worker-thread hop each)
+_ASYNC_BLOCK_BYTES = 64 * 1024
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# name -> (fill colour, font colour); bold text on a solid fill
+CELL_STYLES = {
+    'red': ('FEE2E2', '991B1B'),
+    'amber': ('FEF3C7', '92400E'),
+    'green': ('D1FAE5', '065F46'),
+    'blue': ('DBEAFE', '1E40AF'),
+    'indigo': ('E0E7FF', '4338CA'),
+}
+
+
+class Sheet:
+    """
+    Column layout of an export.
+
+    row(r) -> list of cell values for result row r.
+    style(r, values) -> {column index (0-based): CELL_STYLES name}, optional.
+    number_formats: {column index: Excel number format}.
+    """
+
+    def __init__(self, title, headers, row, widths=None, style=None, number_formats=None):
+        self.title = title
+        self.headers = headers
+        self.row = row
+        self.widths = widths or [15] * len(headers)
+        self.style = style
+        self.number_formats = number_formats or {}
+
+
+def stream_rows(conn, sql, params=None, chunk_size=None):
+    """
+    Yield the rows of sql from an unbuffered cursor on conn, chunk_size at a
+    time, and close conn once the rows are exhausted or the consumer stops.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    exhausted = False
+    try:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                exhausted = True
+                break
+            yield from rows
+        cur.close()
+    finally:
+        if not exhausted:
+            # closing the cursor would read the remaining rows; drop the connection instead
+            logger.info("[export] stream stopped before the end of the result, closing its connection")
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class _Echo:
+    """File-like object for csv.writer that hands back what is written."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, sheet, chunk_size=None):
+    """Encoded CSV (header first, UTF-8 with BOM for Excel) in chunks of rows."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    writer = csv.writer(_Echo())
+    yield ('\ufeff' + writer.writerow(sheet.headers)).encode('utf-8')
+    buffer = []
+    for r in rows:
+        buffer.append(writer.writerow(sheet.row(r)))
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def write_xlsx(rows, sheet, fileobj):
+    """Write rows to fileobj as a styled XLSX workbook in openpyxl write-only mode."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet.title)
+
+    # named styles: one lookup per cell instead of one per style attribute
+    side = Side(style='thin', color='E5E7EB')
+    border = Border(left=side, right=side, top=side, bottom=side)
+    wb.add_named_style(NamedStyle(
+        name='export_header', border=border,
+        fill=PatternFill(start_color='2563EB', end_color='2563EB', fill_type='solid'),
+        font=Font(bold=True, color='FFFFFF', size=11),
+        alignment=Alignment(horizontal='center', vertical='center'),
+    ))
+    data_alignment = Alignment(vertical='top', wrap_text=True)
+    wb.add_named_style(NamedStyle(name='export_data', border=border, alignment=data_alignment))
+    for name, (fill, font) in CELL_STYLES.items():
+        wb.add_named_style(NamedStyle(
+            name=f'export_{name}', border=border, alignment=data_alignment,
+            fill=PatternFill(start_color=fill, end_color=fill, fill_type='solid'),
+            font=Font(color=font, bold=True),
+        ))
+
+    # dimensions must be set before the first row is written
+    for col_num, width in enumerate(sheet.widths, 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = width
+    ws.row_dimensions[1].height = 25
+
+    header = []
+    for value in sheet.headers:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = 'export_header'
+        header.append(cell)
+    ws.append(header)
+
+    for r in rows:
+        values = sheet.row(r)
+        cell_styles = sheet.style(r, values) if sheet.style else {}
+        cells = []
+        for col, value in enumerate(values):
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = f'export_{cell_styles[col]}' if col in cell_styles else 'export_data'
+            if col in sheet.number_formats:
+                cell.number_format = sheet.number_formats[col]
+            cells.append(cell)
+        ws.append(cells)
+
+    wb.save(fileobj)
+
+
+_END = object()
+
+
+async def _aiter_sync(iterator, closers=()):
+    """
+    Async iterator over the items of a sync iterator, each pulled in a worker
+    thread. Calls closers (in a worker thread) when done or when the client
+    goes away.
+    """
+    # not thread-sensitive: the rows' connection belongs to this stream only
+    pull = sync_to_async(next, thread_sensitive=False)
+    try:
+        while True:
+            item = await pull(iterator, _END)
+            if item is _END:
+                break
+            yield item
+    finally:
+        for close in closers:
+            await sync_to_async(close, thread_sensitive=False)()
+
+
+def _is_asgi(request):
+    return isinstance(request, ASGIRequest)
+
+
+def csv_response(request, rows, sheet, filename):
+    content = iter_csv(rows, sheet)
+    if _is_asgi(request):
+        closers = [c.close for c in (content, rows) if hasattr(c, 'close')]
+        content = _aiter_sync(content, closers)
+    response = StreamingHttpResponse(content, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_response(request, rows, sheet, filename):
+    tmp = tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES)
+    try:
+        write_xlsx(rows, sheet, tmp)
+    except Exception:
+        tmp.close()
+        raise
+    finally:
+        # releases the rows' connection if writing stopped early
+        if hasattr(rows, 'close'):
+            rows.close()
+    tmp.seek(0)
+    # FileResponse streams the file in blocks and closes it at the end
+    response = FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+    if _is_asgi(request):
+        # keeps the headers set from tmp and tmp.close among the response's closers
+        response.streaming_content = _aiter_sync(iter(lambda: tmp.read(_ASYNC_BLOCK_BYTES), b''))
+    return response
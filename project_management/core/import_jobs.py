@@ -0,0 +1,320 @@
+# core/import_jobs.py
+"""
+Background jobs for bulk task imports.
+
+bulk_import_csv_view no longer imports inside the request: enqueue_import()
+stores the upload under MEDIA_ROOT/import_jobs/, records an import_jobs row
+(table in TENANT_DDL) and hands the job to a per-process worker pool
+(IMPORT_WORKERS threads). The worker runs core.task_import.TaskImporter on its
+own tenant connection and, at most every IMPORT_PROGRESS_INTERVAL seconds:
+  - updates the job row (rows_processed, inserted, error_count, progress);
+  - writes the new row errors to import_job_rows;
+  - sends an 'import.progress' event to the uploader's
+    user_notifications_{tenant}_{member_id} group (NotificationConsumer).
+
+job_status() is what the progress endpoint returns:
+    {"id", "status", "file_name", "rows_processed", "inserted", "error_count",
+     "progress", "eta_seconds", "warnings", "error", ...}
+
+Jobs run in the process that accepted the upload. A queued or running job
+whose row has not moved for IMPORT_JOB_STALE_SECONDS (the process went away)
+is reported as failed; it is not restarted, since part of it may be committed.
+While jobs wait for a worker, the busy workers of their process keep their rows
+fresh.
+"""
+
+import os
+import json
+import uuid
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.files import File
+
+from .db_helpers import tenant_connection
+from .task_import import MAX_REPORTED_ERRORS, ImportFileError, TaskImporter, open_upload
+
+logger = logging.getLogger('project_management')
+
+WORKERS = getattr(settings, "IMPORT_WORKERS", 2)
+PROGRESS_INTERVAL = getattr(settings, "IMPORT_PROGRESS_INTERVAL", 1.0)
+STALE_SECONDS = getattr(settings, "IMPORT_JOB_STALE_SECONDS", 300)
+
+_JOB_COLUMNS = """
+    id, kind, status, file_name, file_size, created_by, member_id, rows_processed,
+    inserted, error_count, progress, warnings, error, created_at, started_at,
+    finished_at, updated_at, TIMESTAMPDIFF(SECOND, updated_at, NOW()) AS idle_seconds
+"""
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# (tenant_key, job_id) of the jobs waiting in this process's pool
+_waiting = set()
+_waiting_lock = threading.Lock()
+_last_touch = 0.0
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="import-worker")
+        return _executor
+
+
+def _upload_dir():
+    path = os.path.join(settings.MEDIA_ROOT, 'import_jobs')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def enqueue_import(conn, tenant_key, ws_tenant_id, uploaded_file, work_type="Task",
+                   user_id=None, member_id=None, on_inserted=None):
+    """
+    Store uploaded_file and queue its import. Returns the job id.
+    on_inserted() is called from the worker once tasks were created.
+    Raises ImportFileError for uploads that are rejected up front.
+    """
+    # type and size checks, before anything is written
+    open_upload(uploaded_file).close()
+
+    file_path = os.path.join(_upload_dir(), f"{uuid.uuid4().hex}_{os.path.basename(uploaded_file.name)}")
+    with open(file_path, 'wb') as dest:
+        for chunk in uploaded_file.chunks():
+            dest.write(chunk)
+
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """INSERT INTO import_jobs (kind, file_name, file_path, file_size, options, created_by, member_id)
+               VALUES ('tasks', %s, %s, %s, %s, %s, %s)""",
+            (uploaded_file.name[:255], file_path, uploaded_file.size,
+             json.dumps({"work_type": work_type}), user_id, member_id),
+        )
+        job_id = cur.lastrowid
+    except Exception:
+        os.remove(file_path)
+        raise
+    finally:
+        cur.close()
+
+    with _waiting_lock:
+        _waiting.add((tenant_key, job_id))
+    _pool().submit(_run_job, tenant_key, ws_tenant_id, job_id, on_inserted)
+    logger.info(f"[import] queued job {job_id} ({uploaded_file.name}, {uploaded_file.size} bytes) tenant={tenant_key}")
+    return job_id
+
+
+def _touch_waiting():
+    """
+    Refresh the rows of the jobs waiting in this process's pool, at most every
+    STALE_SECONDS / 3: they are only behind the running ones, not stale.
+    """
+    global _last_touch
+    with _waiting_lock:
+        if not _waiting or time.monotonic() - _last_touch < STALE_SECONDS / 3:
+            return
+        _last_touch = time.monotonic()
+        by_tenant = {}
+        for tenant_key, job_id in _waiting:
+            by_tenant.setdefault(tenant_key, []).append(job_id)
+    for tenant_key, job_ids in by_tenant.items():
+        try:
+            with tenant_connection(tenant_key=tenant_key) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"UPDATE import_jobs SET updated_at = NOW() "
+                        f"WHERE status = 'queued' AND id IN ({', '.join(['%s'] * len(job_ids))})",
+                        job_ids,
+                    )
+        except Exception as e:
+            logger.warning(f"[import] could not refresh queued jobs for tenant={tenant_key}: {e}")
+
+
+def _format_job(row):
+    job = dict(row)
+    idle = job.pop('idle_seconds', None)
+    # a running job touches its row after every chunk, a queued one is touched
+    # while it waits (_touch_waiting)
+    if job['status'] in ('queued', 'running') and idle is not None and idle > STALE_SECONDS:
+        if job['status'] == 'queued':
+            job['error'] = job['error'] or "The import did not start (server restarted). No rows were imported."
+        else:
+            job['error'] = job['error'] or "The import was interrupted (server restarted). Rows already imported were kept."
+        job['status'] = 'failed'
+    job['progress'] = float(job['progress']) if job['progress'] is not None else None
+    if isinstance(job.get('warnings'), str):
+        job['warnings'] = json.loads(job['warnings'])
+    job['warnings'] = job.get('warnings') or []
+    job['eta_seconds'] = None
+    if job['status'] == 'running' and job['progress'] and job['started_at']:
+        elapsed = (job['updated_at'] - job['started_at']).total_seconds()
+        if elapsed > 0:
+            job['eta_seconds'] = round(elapsed * (1 - job['progress']) / job['progress'])
+    for key in ('created_at', 'started_at', 'finished_at', 'updated_at'):
+        if job.get(key) is not None:
+            job[key] = job[key].isoformat()
+    return job
+
+
+def job_status(conn, job_id, user_id=None, with_errors=False):
+    """
+    The job as a dict (see the module docstring), or None. With with_errors the
+    first MAX_REPORTED_ERRORS row errors are included as "errors".
+    """
+    cur = conn.cursor()
+    try:
+        sql = f"SELECT {_JOB_COLUMNS} FROM import_jobs WHERE id = %s"
+        params = [job_id]
+        if user_id is not None:
+            sql += " AND created_by = %s"
+            params.append(user_id)
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        if not row:
+            return None
+        job = _format_job(row)
+        if with_errors:
+            cur.execute(
+                "SELECT row_no, error, data FROM import_job_rows WHERE job_id = %s ORDER BY row_no, id LIMIT %s",
+                (job_id, MAX_REPORTED_ERRORS),
+            )
+            job['errors'] = [
+                {"row": r['row_no'], "error": r['error'],
+                 "data": json.loads(r['data']) if isinstance(r['data'], str) else (r['data'] or {})}
+                for r in cur.fetchall()
+            ]
+        return job
+    finally:
+        cur.close()
+
+
+class _JobImporter(TaskImporter):
+    """TaskImporter that persists its errors and reports progress as it goes."""
+
+    def __init__(self, conn, job_id, publish, **kwargs):
+        super().__init__(conn, **kwargs)
+        self.job_id = job_id
+        self.publish = publish
+        self.reader = None
+        self._pending_errors = []
+        self._last_report = 0
+
+    def _error(self, row_number, message, data=None):
+        super()._error(row_number, message, data)
+        self._pending_errors.append((self.job_id, row_number, str(message)[:1000],
+                                     json.dumps(dict(data or {}), default=str)))
+
+    def _write(self, pending):
+        super()._write(pending)
+        if time.monotonic() - self._last_report >= PROGRESS_INTERVAL:
+            self.report()
+
+    def report(self, status='running'):
+        progress = self.reader.progress(self.total_rows) if self.reader is not None else None
+        if status == 'done':
+            progress = 1.0
+        cur = self.conn.cursor()
+        try:
+            if self._pending_errors:
+                cur.executemany(
+                    "INSERT INTO import_job_rows (job_id, row_no, error, data) VALUES (%s, %s, %s, %s)",
+                    self._pending_errors,
+                )
+                self._pending_errors = []
+            cur.execute(
+                """UPDATE import_jobs
+                   SET rows_processed = %s, inserted = %s, error_count = %s, progress = %s, warnings = %s
+                   WHERE id = %s""",
+                (self.total_rows, self.inserted, self.error_count, progress,
+                 json.dumps(self.result()['warnings']), self.job_id),
+            )
+        finally:
+            cur.close()
+        self._last_report = time.monotonic()
+        self.publish()
+        _touch_waiting()
+
+    def run(self, reader):
+        self.reader = reader
+        return super().run(reader)
+
+
+def _publish(conn, ws_tenant_id, job_id):
+    """Send the job's current state to its uploader's notification socket."""
+    job = job_status(conn, job_id)
+    if not job or not job.get('member_id'):
+        return
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            f"user_notifications_{ws_tenant_id}_{job['member_id']}",
+            dict(job, type='import.progress', job_id=job_id),
+        )
+    except Exception as e:
+        logger.warning(f"[import] progress push failed for job {job_id}: {e}")
+
+
+def _finish(conn, job_id, status, error=None):
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "UPDATE import_jobs SET status = %s, error = %s, finished_at = NOW() WHERE id = %s",
+            (status, (error or '')[:1000] or None, job_id),
+        )
+    finally:
+        cur.close()
+
+
+def _run_job(tenant_key, ws_tenant_id, job_id, on_inserted=None):
+    with _waiting_lock:
+        _waiting.discard((tenant_key, job_id))
+    file_path, importer = None, None
+    try:
+        with tenant_connection(tenant_key=tenant_key) as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT file_name, file_path, options, created_by FROM import_jobs WHERE id = %s", (job_id,))
+                job = cur.fetchone()
+                cur.execute("UPDATE import_jobs SET status = 'running', started_at = NOW() WHERE id = %s", (job_id,))
+            finally:
+                cur.close()
+            if not job:
+                return
+            file_path = job['file_path']
+            options = json.loads(job['options'] or '{}')
+            publish = lambda: _publish(conn, ws_tenant_id, job_id)
+            importer = _JobImporter(conn, job_id, publish, work_type=options.get('work_type'),
+                                    user_id=job['created_by'])
+            started = time.perf_counter()
+            try:
+                with open(file_path, 'rb') as fh:
+                    with open_upload(File(fh, name=job['file_name'])) as reader:
+                        result = importer.run(reader)
+                importer.report(status='done')
+                _finish(conn, job_id, 'done')
+                logger.info(f"[import] job {job_id} done in {time.perf_counter() - started:.1f}s: "
+                            f"{result['inserted']} inserted, {result['error_count']} error(s)")
+            except Exception as e:
+                logger.error(f"[import] job {job_id} failed: {e}", exc_info=True)
+                try:
+                    importer.report()
+                except Exception:
+                    pass
+                _finish(conn, job_id, 'failed', str(e) if isinstance(e, ImportFileError) else f"Unexpected error: {e}")
+            publish()
+        if importer and importer.inserted and on_inserted:
+            on_inserted()
+    except Exception as e:
+        logger.error(f"[import] job {job_id} could not run for tenant={tenant_key}: {e}", exc_info=True)
+    finally:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
@@ -0,0 +1,271 @@
+# core/index_migrations.py
+"""
+Versioned secondary-index migrations for tenant databases.
+
+INDEX_MIGRATIONS is an ordered list of index sets. Each tenant records the
+versions it has completed in its own `index_migrations` table. Applying is
+idempotent and resumable:
+  - every run reconciles all versions up to the target against
+    information_schema and creates only the indexes that are missing, so a run
+    interrupted half way through a version simply continues;
+  - a version is recorded once all of its indexes exist (indexes on tables the
+    tenant does not have yet are skipped and picked up by a later run);
+  - a per-tenant MySQL named lock (GET_LOCK) keeps two runners, or provisioning
+    and a runner, from migrating the same tenant at once.
+Indexes are built online (ALGORITHM=INPLACE, LOCK=NONE) so tenants stay writable.
+FULLTEXT indexes cannot be built that way: they are built in place with
+LOCK=SHARED (reads continue, writes wait), rebuilding the table for the first one.
+
+verify_hot_queries() runs EXPLAIN over HOT_QUERIES, the catalogue of the app's
+most frequent tenant queries, and flags full table scans.
+
+Used by DBInitializer.run_ddl_on_tenant (new tenants) and
+scripts/migrate_tenant_indexes.py (existing tenants).
+"""
+
+import time
+import logging
+
+import pymysql
+
+logger = logging.getLogger('utility')
+
+# (version, description, [(table, index name, columns[, kind]), ...]); append only.
+# kind is "INDEX" (default) or "FULLTEXT".
+INDEX_MIGRATIONS = [
+    (1, "chat lookups, board columns and delta sync", [
+        ("chat_message", "idx_msg_conv_created", "conversation_id, created_at"),
+        ("chat_conversation", "idx_conv_tenant", "tenant_id"),
+        # Kanban columns / keyset pagination: WHERE status=? ORDER BY id DESC
+        ("tasks", "idx_tasks_status_id", "status, id"),
+        # visibility and assignee filters
+        ("tasks", "idx_tasks_assignee_status", "assigned_type, assigned_to, status"),
+        # board delta sync: WHERE updated_at >= ?
+        ("tasks", "idx_tasks_updated_at", "updated_at"),
+    ]),
+    (2, "hot query indexes for tasks, activity log, notifications and chat", [
+        ("tasks", "idx_tasks_project_status", "project_id, status"),
+        ("tasks", "idx_tasks_assigned_to", "assigned_to"),
+        ("activity_log", "idx_activity_entity", "entity_type, entity_id"),
+        ("notifications", "idx_notif_user_read_created", "user_id, is_read, created_at"),
+        ("chat_message", "idx_msg_conv_read", "conversation_id, is_read"),
+    ]),
+    (3, "full-text search on tasks and projects (core.search)", [
+        ("tasks", "ft_tasks_title", "title", "FULLTEXT"),
+        ("tasks", "ft_tasks_text", "title, description", "FULLTEXT"),
+        ("projects", "ft_projects_name", "name", "FULLTEXT"),
+    ]),
+    (4, "keyset pagination of chat histories: WHERE conversation/group = ? AND id < ? ORDER BY id DESC", [
+        ("chat_message", "idx_msg_conv_id", "conversation_id, id"),
+        ("chat_group_message", "idx_group_msg_group_id", "group_id, id"),
+    ]),
+    (5, "chat group sidebar (chat.groups): groups of a tenant, a member's latest read marks", [
+        ("chat_group", "idx_group_tenant_created", "tenant_id, created_at"),
+        ("chat_group_read", "idx_group_read_member", "member, group_id"),
+    ]),
+    (6, "board delta sync of deleted tasks: activity_log WHERE entity_type = ? AND action = ? AND timestamp >= ?", [
+        ("activity_log", "idx_activity_action_time", "entity_type, action, timestamp"),
+    ]),
+]
+
+LATEST_INDEX_VERSION = INDEX_MIGRATIONS[-1][0]
+
+MIGRATIONS_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS index_migrations (
+      version INT PRIMARY KEY,
+      name VARCHAR(255) NOT NULL,
+      duration_ms INT DEFAULT 0,
+      applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+# MySQL errors meaning the server cannot build this index online
+_NO_ONLINE_DDL = (1845, 1846)
+
+
+class MigrationLocked(RuntimeError):
+    """Another runner holds the tenant's migration lock."""
+
+
+def _lock_name(db_name):
+    # GET_LOCK names are limited to 64 characters
+    return f"index_migrations:{db_name}"[:64]
+
+
+def _existing_indexes(cur, db_name):
+    cur.execute(
+        "SELECT DISTINCT TABLE_NAME, INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = %s",
+        (db_name,),
+    )
+    return {(r['TABLE_NAME'], r['INDEX_NAME']) for r in cur.fetchall()}
+
+
+def _existing_tables(cur, db_name):
+    cur.execute("SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s", (db_name,))
+    return {r['TABLE_NAME'] for r in cur.fetchall()}
+
+
+def _create_index(cur, table, index_name, columns, kind="INDEX"):
+    add = f"ADD FULLTEXT INDEX `{index_name}` ({columns})" if kind == "FULLTEXT" \
+        else f"ADD INDEX `{index_name}` ({columns})"
+    lock = "SHARED" if kind == "FULLTEXT" else "NONE"
+    try:
+        cur.execute(f"ALTER TABLE `{table}` {add}, ALGORITHM=INPLACE, LOCK={lock}")
+    except pymysql.err.OperationalError as e:
+        if e.args[0] not in _NO_ONLINE_DDL:
+            raise
+        logger.warning(f"[indexes] Online build not possible for {table}.{index_name}; using a locking build")
+        cur.execute(f"ALTER TABLE `{table}` {add}")
+
+
+def applied_index_versions(cur):
+    """Versions recorded in the tenant's index_migrations table (which must exist)."""
+    cur.execute("SELECT version FROM index_migrations")
+    return {r['version'] for r in cur.fetchall()}
+
+
+def apply_index_migrations(conn, db_name, target=None, dry_run=False, lock_timeout=0):
+    """
+    Bring a tenant database up to `target` (default: latest) index version.
+
+    conn must be an autocommit DictCursor connection to db_name. Returns a dict:
+    {"db_name", "applied": [versions], "created": [index names],
+     "skipped": [table.index on missing tables], "pending": [versions not complete]}.
+    Raises MigrationLocked if another runner is migrating this tenant.
+    """
+    target = LATEST_INDEX_VERSION if target is None else target
+    result = {"db_name": db_name, "applied": [], "created": [], "skipped": [], "pending": []}
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, %s) AS got", (_lock_name(db_name), lock_timeout))
+        if not (cur.fetchone() or {}).get('got'):
+            raise MigrationLocked(f"{db_name} is being migrated by another runner")
+        try:
+            tables = _existing_tables(cur, db_name)
+            if "index_migrations" in tables:
+                done = applied_index_versions(cur)
+            elif dry_run:
+                done = set()
+            else:
+                cur.execute(MIGRATIONS_TABLE_DDL)
+                done = set()
+            indexes = _existing_indexes(cur, db_name)
+
+            for version, name, index_set in INDEX_MIGRATIONS:
+                if version > target:
+                    break
+                started = time.perf_counter()
+                complete = True
+                for table, index_name, columns, *kind in index_set:
+                    if (table, index_name) in indexes:
+                        continue
+                    if table not in tables:
+                        complete = False
+                        result["skipped"].append(f"{table}.{index_name}")
+                        continue
+                    if not dry_run:
+                        _create_index(cur, table, index_name, columns, *kind)
+                        indexes.add((table, index_name))
+                    result["created"].append(f"{table}.{index_name}")
+                if dry_run:
+                    continue
+                if complete and version not in done:
+                    duration_ms = int((time.perf_counter() - started) * 1000)
+                    cur.execute(
+                        "INSERT INTO index_migrations (version, name, duration_ms) VALUES (%s, %s, %s)",
+                        (version, name, duration_ms),
+                    )
+                    result["applied"].append(version)
+                elif not complete:
+                    result["pending"].append(version)
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (_lock_name(db_name),))
+    finally:
+        cur.close()
+
+    if result["created"] and not dry_run:
+        logger.info(f"[indexes] {db_name}: created {', '.join(result['created'])}")
+    return result
+
+
+# ---------------------------------------------------------------------------
+# EXPLAIN verifier
+# ---------------------------------------------------------------------------
+
+# (name, sql, sample params) of the queries behind the busiest pages and sockets
+HOT_QUERIES = [
+    ("board column page",
+     "SELECT t.id FROM tasks t WHERE t.assigned_type = 'member' AND t.status = %s ORDER BY t.id DESC LIMIT 21",
+     ("Open",)),
+    ("my open tasks",
+     "SELECT t.id FROM tasks t WHERE t.assigned_type = 'member' AND t.assigned_to = %s AND t.status <> 'Closed'",
+     (1,)),
+    ("tasks of a project",
+     "SELECT t.id, t.status FROM tasks t WHERE t.project_id = %s",
+     (1,)),
+    ("board delta sync",
+     "SELECT t.id FROM tasks t WHERE t.updated_at >= NOW() - INTERVAL 1 MINUTE",
+     ()),
+    ("board delta sync, deleted tasks",
+     "SELECT DISTINCT entity_id FROM activity_log "
+     "WHERE entity_type = 'task' AND action = 'deleted' AND timestamp >= NOW() - INTERVAL 1 MINUTE",
+     ()),
+    ("task activity",
+     "SELECT al.action FROM activity_log al WHERE al.entity_type = 'task' AND al.entity_id = %s ORDER BY al.timestamp",
+     (1,)),
+    ("unread notifications",
+     "SELECT id FROM notifications WHERE user_id = %s AND is_read = 0 ORDER BY created_at DESC LIMIT 50",
+     (1,)),
+    ("unread notification count",
+     "SELECT COUNT(*) FROM notifications WHERE user_id = %s AND is_read = 0",
+     (1,)),
+    ("conversation lookup",
+     "SELECT id FROM chat_conversation WHERE tenant_id = %s AND user_a = %s AND user_b = %s",
+     ("1", "a@example.com", "b@example.com")),
+    ("chat history page",
+     "SELECT id FROM chat_message WHERE conversation_id = %s AND id < %s ORDER BY id DESC LIMIT 51",
+     (1, 1000000)),
+    ("group chat history page",
+     "SELECT id FROM chat_group_message WHERE group_id = %s AND id < %s ORDER BY id DESC LIMIT 51",
+     (1, 1000000)),
+    ("task quick search",
+     "SELECT id FROM tasks WHERE MATCH(title, description) AGAINST (%s IN BOOLEAN MODE) LIMIT 20",
+     ("+report*",)),
+    ("unread chat messages",
+     "SELECT COUNT(*) FROM chat_message WHERE conversation_id = %s AND id > %s AND sender <> %s",
+     (1, 0, "a@example.com")),
+]
+
+
+def verify_hot_queries(conn, min_rows=0):
+    """
+    EXPLAIN every HOT_QUERIES entry. Returns a list of dicts
+    {"name", "table", "type", "key", "rows", "full_scan", "error"}, one per
+    EXPLAIN row. full_scan is set for access type ALL on tables estimated at
+    min_rows rows or more (small tables are legitimately scanned).
+    """
+    report = []
+    cur = conn.cursor()
+    try:
+        for name, sql, params in HOT_QUERIES:
+            try:
+                cur.execute("EXPLAIN " + sql, params or None)
+                rows = cur.fetchall()
+            except pymysql.MySQLError as e:
+                report.append({"name": name, "table": None, "type": None, "key": None,
+                               "rows": None, "full_scan": False, "error": str(e)})
+                continue
+            for r in rows:
+                est = int(r.get('rows') or 0)
+                report.append({
+                    "name": name,
+                    "table": r.get('table'),
+                    "type": r.get('type'),
+                    "key": r.get('key'),
+                    "rows": est,
+                    "full_scan": r.get('type') == 'ALL' and est >= min_rows,
+                    "error": None,
+                })
+    finally:
+        cur.close()
+    return report
@@ -0,0 +1,276 @@
+# core/member_directory.py
+"""
+In-process directory of tenant members: member id <-> email, and display name.
+
+Chat (views and consumers) and the task views translate between member ids and
+emails and look up display names for every message / notification. The
+directory serves those lookups from an LRU cache with a TTL, so a member is
+read from the members table once per TTL instead of once per use.
+
+Entries are keyed by the tenant database the connection points at, so HTTP
+views, Channels consumers (core.db_async workers) and scripts share them
+whatever tenant alias they started from.
+
+Usage:
+    from core.member_directory import member_directory
+
+    email = member_directory.email_for(conn, member_id)    # lower-cased, or None
+    member_id = member_directory.id_for(conn, email)       # or None
+    name = member_directory.name_for(conn, member_id)      # "First Last", or None
+    names = member_directory.names_for(conn, member_ids)   # {id: name}, one query for misses
+
+    member_directory.invalidate(conn)   # after creating / changing / deleting members
+
+The cache is per process; MEMBER_DIRECTORY_TTL bounds how long another worker
+process may keep serving a member that was changed elsewhere.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+_DIRECTORY_TTL = getattr(settings, "MEMBER_DIRECTORY_TTL", 300)
+_DIRECTORY_MAX_ENTRIES = getattr(settings, "MEMBER_DIRECTORY_MAX_ENTRIES", 20000)
+# unknown ids / emails (deleted members, non-member identities) are remembered briefly
+_DIRECTORY_NEGATIVE_TTL = getattr(settings, "MEMBER_DIRECTORY_NEGATIVE_TTL", 30)
+
+_CHUNK = 500
+
+
+class Member(namedtuple("Member", "id email first_name last_name")):
+    __slots__ = ()
+
+    @property
+    def name(self):
+        """CONCAT(first_name, ' ', last_name), i.e. None when either part is NULL."""
+        if self.first_name is None or self.last_name is None:
+            return None
+        return f"{self.first_name} {self.last_name}"
+
+
+def _norm_email(email):
+    return str(email).strip().lower() if email is not None else ""
+
+
+def _tenant_of(conn):
+    """Database name of a tenant connection (pooled proxy or raw pymysql), or None."""
+    db = getattr(conn, "db", None)
+    if isinstance(db, bytes):
+        db = db.decode()
+    return db or None
+
+
+def _member(row):
+    return Member(int(row["id"]), _norm_email(row.get("email")) or None,
+                  row.get("first_name"), row.get("last_name"))
+
+
+class MemberDirectory:
+    """LRU/TTL cache of members rows, reachable by id and by email, per tenant."""
+
+    def __init__(self, ttl=_DIRECTORY_TTL, max_entries=_DIRECTORY_MAX_ENTRIES,
+                 negative_ttl=_DIRECTORY_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._members = OrderedDict()  # (tenant, id) -> (Member, expires_at); LRU order
+        self._emails = {}              # (tenant, email) -> id
+        self._misses = {}              # (tenant, id or email) -> expires_at
+        self._generations = {}         # tenant -> generation, bumped on invalidation
+        self._epoch = 0                # bumped when every tenant is invalidated
+        self.hits = 0
+        self.loads = 0
+
+    # -- members table access --
+
+    def _fetch_ids(self, conn, ids):
+        rows = []
+        with conn.cursor() as cur:
+            for i in range(0, len(ids), _CHUNK):
+                chunk = ids[i:i + _CHUNK]
+                cur.execute(
+                    f"SELECT id, email, first_name, last_name FROM members "
+                    f"WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                    chunk,
+                )
+                rows.extend(cur.fetchall())
+        return [_member(r) for r in rows]
+
+    def _fetch_email(self, conn, email):
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, email, first_name, last_name FROM members WHERE email=%s ORDER BY id LIMIT 1",
+                [email],
+            )
+            row = cur.fetchone()
+        return _member(row) if row else None
+
+    # -- cache maintenance (call with self._lock held) --
+
+    def _generation_locked(self, tenant):
+        """Token a load captures before reading members; stale once tenant or cache is invalidated."""
+        return self._epoch, self._generations.get(tenant, 0)
+
+    def _store_locked(self, tenant, member, generation, now):
+        if generation != self._generation_locked(tenant):
+            return
+        key = (tenant, member.id)
+        self._drop_locked(key)
+        self._members[key] = (member, now + self.ttl)
+        self._misses.pop(key, None)
+        if member.email:
+            self._emails[(tenant, member.email)] = member.id
+            self._misses.pop((tenant, member.email), None)
+        while len(self._members) > self.max_entries:
+            self._drop_locked(next(iter(self._members)))
+
+    def _drop_locked(self, key):
+        entry = self._members.pop(key, None)
+        if entry is not None and entry[0].email:
+            email_key = (key[0], entry[0].email)
+            if self._emails.get(email_key) == key[1]:
+                self._emails.pop(email_key, None)
+
+    def _miss_locked(self, tenant, value, generation, now):
+        if generation != self._generation_locked(tenant):
+            return
+        if len(self._misses) >= self.max_entries:
+            self._misses = {k: v for k, v in self._misses.items() if v > now}
+            if len(self._misses) >= self.max_entries:
+                self._misses.clear()
+        self._misses[(tenant, value)] = now + self.negative_ttl
+
+    def _cached_locked(self, key, now):
+        """(found, Member or None) for a (tenant, id) key."""
+        entry = self._members.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                self._members.move_to_end(key)
+                return True, entry[0]
+            self._drop_locked(key)
+        if self._misses.get(key, 0) > now:
+            return True, None
+        return False, None
+
+    # -- public API --
+
+    def get_many(self, conn, member_ids):
+        """{id: Member} for the member_ids that exist; misses are read in one query."""
+        ids = set()
+        for i in member_ids:
+            try:
+                ids.add(int(i))
+            except (TypeError, ValueError):
+                continue
+        tenant = _tenant_of(conn)
+        if tenant is None:
+            return {m.id: m for m in self._fetch_ids(conn, sorted(ids))} if ids else {}
+
+        found, missing = {}, []
+        now = time.time()
+        with self._lock:
+            for member_id in ids:
+                cached, member = self._cached_locked((tenant, member_id), now)
+                if not cached:
+                    missing.append(member_id)
+                elif member is not None:
+                    found[member_id] = member
+            self.hits += len(ids) - len(missing)
+            generation = self._generation_locked(tenant)
+        if not missing:
+            return found
+
+        loaded = {m.id: m for m in self._fetch_ids(conn, sorted(missing))}
+        with self._lock:
+            self.loads += 1
+            for member_id in missing:
+                if member_id in loaded:
+                    self._store_locked(tenant, loaded[member_id], generation, now)
+                else:
+                    self._miss_locked(tenant, member_id, generation, now)
+        found.update(loaded)
+        return found
+
+    def get(self, conn, member_id):
+        """Member for member_id, or None."""
+        try:
+            member_id = int(member_id)
+        except (TypeError, ValueError):
+            return None
+        return self.get_many(conn, [member_id]).get(member_id)
+
+    def by_email(self, conn, email):
+        """Member with this email (case-insensitive; lowest id if several), or None."""
+        email = _norm_email(email)
+        if not email:
+            return None
+        tenant = _tenant_of(conn)
+        if tenant is None:
+            return self._fetch_email(conn, email)
+
+        now = time.time()
+        with self._lock:
+            member_id = self._emails.get((tenant, email))
+            if member_id is not None:
+                cached, member = self._cached_locked((tenant, member_id), now)
+                if cached and member is not None:
+                    self.hits += 1
+                    return member
+            elif self._misses.get((tenant, email), 0) > now:
+                self.hits += 1
+                return None
+            generation = self._generation_locked(tenant)
+
+        member = self._fetch_email(conn, email)
+        with self._lock:
+            self.loads += 1
+            if member is None:
+                self._miss_locked(tenant, email, generation, now)
+            else:
+                self._store_locked(tenant, member, generation, now)
+        return member
+
+    def email_for(self, conn, member_id):
+        member = self.get(conn, member_id)
+        return member.email if member else None
+
+    def id_for(self, conn, email):
+        member = self.by_email(conn, email)
+        return member.id if member else None
+
+    def name_for(self, conn, member_id):
+        member = self.get(conn, member_id)
+        return member.name if member else None
+
+    def names_for(self, conn, member_ids):
+        """{id: display name} for the member_ids that exist."""
+        return {i: m.name for i, m in self.get_many(conn, member_ids).items()}
+
+    def invalidate(self, conn=None):
+        """Drop the members of conn's tenant, or of every tenant when conn is None."""
+        with self._lock:
+            if conn is None:
+                self._members.clear()
+                self._emails.clear()
+                self._misses.clear()
+                self._epoch += 1
+                return
+            tenant = _tenant_of(conn)
+            if tenant is None:
+                return
+            self._generations[tenant] = self._generations.get(tenant, 0) + 1
+            for key in [k for k in self._members if k[0] == tenant]:
+                self._drop_locked(key)
+            for key in [k for k in self._misses if k[0] == tenant]:
+                self._misses.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._members), "misses": len(self._misses),
+                    "hits": self.hits, "loads": self.loads}
+
+
+member_directory = MemberDirectory()
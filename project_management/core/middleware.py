@@ -1,6 +1,7 @@
 # middleware.py
 from django.utils.deprecation import MiddlewareMixin
 from core.tenant_context import set_current_tenant
+from core.db_helpers import close_all_thread_conns
 
 class TenantMiddleware(MiddlewareMixin):
     def process_request(self, request):
@@ -10,4 +11,6 @@ class TenantMiddleware(MiddlewareMixin):
     def process_response(self, request, response):
         # clear threadlocal to avoid leakage
         set_current_tenant(None)
+        # hand pooled tenant connections still held by this request back to the pool
+        close_all_thread_conns()
         return response
@@ -0,0 +1,257 @@
+# core/notification_outbox.py
+"""
+Transactional outbox for real-time notifications.
+
+Views write the notification rows and one `notification_outbox` row (table in
+TENANT_DDL) per recipient in the same transaction as the change that triggers them
+(NotificationManager.queue_bulk_notification). After COMMIT they wake the
+dispatcher (NotificationManager.dispatch_queued), so the request never waits
+on the channel layer.
+
+The dispatcher is a daemon thread, started on first use in every process. It
+drains a tenant's outbox in batches:
+  - rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    processes can dispatch the same tenant without sending twice;
+  - each batch is sent with one concurrent group_send round;
+  - a failed send is retried with exponential backoff
+    (OUTBOX_RETRY_BASE * 2**attempts, capped at OUTBOX_RETRY_MAX seconds), and
+    after OUTBOX_MAX_ATTEMPTS it is marked 'dead';
+  - tenants with rows left (retries) are swept every OUTBOX_SWEEP_INTERVAL
+    seconds, and sent rows older than OUTBOX_RETENTION_HOURS are pruned.
+
+outbox_metrics() reports queue depth per tenant and dispatch counters.
+scripts/dispatch_notifications.py drains every tenant, e.g. after a restart.
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import pymysql
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from core.db_helpers import tenant_connection
+from core.notifications import _group_send_all
+
+logger = logging.getLogger('notifications')
+
+_BATCH_SIZE = getattr(settings, "OUTBOX_BATCH_SIZE", 200)
+_MAX_ATTEMPTS = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 8)
+_RETRY_BASE = getattr(settings, "OUTBOX_RETRY_BASE", 2)
+_RETRY_MAX = getattr(settings, "OUTBOX_RETRY_MAX", 300)
+_SWEEP_INTERVAL = getattr(settings, "OUTBOX_SWEEP_INTERVAL", 5)
+_RETENTION_HOURS = getattr(settings, "OUTBOX_RETENTION_HOURS", 24)
+_PRUNE_INTERVAL = 600
+
+_INSERT_SQL = """
+    INSERT INTO notification_outbox (notification_id, group_name, payload)
+    VALUES (%s, %s, %s)
+"""
+
+# MySQL errors: table doesn't exist / syntax error (SKIP LOCKED before MySQL 8.0)
+_ER_NO_SUCH_TABLE = 1146
+_ER_PARSE_ERROR = 1064
+
+
+def write_outbox(conn, messages):
+    """
+    Insert (notification_id, group_name, payload dict) rows on conn, inside the
+    caller's transaction. Returns False when the tenant has no outbox table yet.
+    """
+    cur = conn.cursor()
+    try:
+        cur.executemany(_INSERT_SQL, [
+            (notification_id, group, json.dumps(payload, default=str))
+            for notification_id, group, payload in messages
+        ])
+    except pymysql.err.ProgrammingError as e:
+        if e.args[0] != _ER_NO_SUCH_TABLE:
+            raise
+        return False
+    finally:
+        cur.close()
+    return True
+
+
+def _backoff(attempts):
+    return min(_RETRY_MAX, _RETRY_BASE * (2 ** max(0, attempts - 1)))
+
+
+class NotificationDispatcher:
+    """Background thread draining tenant outboxes."""
+
+    def __init__(self, batch_size=_BATCH_SIZE, max_attempts=_MAX_ATTEMPTS, sweep_interval=_SWEEP_INTERVAL):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.sweep_interval = sweep_interval
+        self._cond = threading.Condition()
+        self._queue = OrderedDict()   # tenant keys waiting to be drained, FIFO
+        self._depth = {}              # tenant key -> pending rows after the last drain
+        self._pruned = {}             # tenant key -> last prune time
+        self._thread = None
+        self._skip_locked = True
+        self.dispatched = 0
+        self.retried = 0
+        self.dead = 0
+        self.batches = 0
+        self.last_batch_ms = 0
+
+    # -- producer side --
+
+    def wake(self, tenant_key):
+        """Schedule a drain of tenant_key's outbox (call after COMMIT)."""
+        with self._cond:
+            self._queue[str(tenant_key)] = None
+            self._ensure_started_locked()
+            self._cond.notify()
+
+    def _ensure_started_locked(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+            self._thread.start()
+
+    # -- worker side --
+
+    def _run(self):
+        last_sweep = time.time()
+        while True:
+            with self._cond:
+                if not self._queue:
+                    self._cond.wait(timeout=max(0.1, self.sweep_interval - (time.time() - last_sweep)))
+                if time.time() - last_sweep >= self.sweep_interval:
+                    # retries whose backoff may have expired
+                    for key, depth in self._depth.items():
+                        if depth:
+                            self._queue.setdefault(key, None)
+                    last_sweep = time.time()
+                if not self._queue:
+                    continue
+                tenant_key = self._queue.popitem(last=False)[0]
+            try:
+                self.drain(tenant_key)
+            except Exception as e:
+                logger.error(f"[outbox] Drain failed for tenant={tenant_key}: {e}", exc_info=True)
+
+    def _claim_sql(self):
+        return (
+            "SELECT id, group_name, payload, attempts FROM notification_outbox "
+            "WHERE status = 'pending' AND next_attempt_at <= NOW() "
+            "ORDER BY id LIMIT %s FOR UPDATE" + (" SKIP LOCKED" if self._skip_locked else "")
+        )
+
+    def _dispatch_batch(self, conn, cur, channel_layer):
+        """Claim, send and mark one batch. Returns the number of rows claimed."""
+        conn.begin()
+        try:
+            try:
+                cur.execute(self._claim_sql(), (self.batch_size,))
+            except pymysql.err.ProgrammingError as e:
+                if e.args[0] != _ER_PARSE_ERROR or not self._skip_locked:
+                    raise
+                # MySQL 5.7: no SKIP LOCKED, concurrent dispatchers simply wait on each other
+                self._skip_locked = False
+                cur.execute(self._claim_sql(), (self.batch_size,))
+            rows = cur.fetchall()
+            if not rows:
+                conn.commit()
+                return 0
+
+            started = time.perf_counter()
+            messages = []
+            for r in rows:
+                payload = r['payload']
+                messages.append((r['group_name'], json.loads(payload) if isinstance(payload, (str, bytes)) else payload))
+            outcomes = async_to_sync(_group_send_all)(channel_layer, messages)
+
+            sent = [r['id'] for r, exc in zip(rows, outcomes) if not isinstance(exc, Exception)]
+            retries = []
+            for r, exc in zip(rows, outcomes):
+                if isinstance(exc, Exception):
+                    attempts = r['attempts'] + 1
+                    status = 'dead' if attempts >= self.max_attempts else 'pending'
+                    retries.append((attempts, status, _backoff(attempts), str(exc)[:500], r['id']))
+            if sent:
+                placeholders = ",".join(["%s"] * len(sent))
+                cur.execute(
+                    f"UPDATE notification_outbox SET status = 'sent', sent_at = NOW(), attempts = attempts + 1 "
+                    f"WHERE id IN ({placeholders})",
+                    sent,
+                )
+            if retries:
+                cur.executemany(
+                    "UPDATE notification_outbox SET attempts = %s, status = %s, "
+                    "next_attempt_at = NOW() + INTERVAL %s SECOND, last_error = %s WHERE id = %s",
+                    retries,
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        dead = sum(1 for r in retries if r[1] == 'dead')
+        with self._cond:
+            self.batches += 1
+            self.dispatched += len(sent)
+            self.retried += len(retries) - dead
+            self.dead += dead
+            self.last_batch_ms = int((time.perf_counter() - started) * 1000)
+        if retries:
+            logger.warning(f"[outbox] {len(retries)} notification(s) failed to send ({dead} dead)")
+        return len(rows)
+
+    def drain(self, tenant_key):
+        """Send every due outbox row of a tenant. Returns the rows still pending."""
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return 0
+        tenant_key = str(tenant_key)
+        with tenant_connection(tenant_key=tenant_key) as conn:
+            cur = conn.cursor()
+            try:
+                while self._dispatch_batch(conn, cur, channel_layer) == self.batch_size:
+                    pass
+                cur.execute("SELECT COUNT(*) AS c FROM notification_outbox WHERE status = 'pending'")
+                depth = int((cur.fetchone() or {}).get('c') or 0)
+
+                now = time.time()
+                if now - self._pruned.get(tenant_key, 0) > _PRUNE_INTERVAL:
+                    cur.execute(
+                        "DELETE FROM notification_outbox WHERE status = 'sent' "
+                        "AND sent_at < NOW() - INTERVAL %s HOUR LIMIT 5000",
+                        (_RETENTION_HOURS,),
+                    )
+                    self._pruned[tenant_key] = now
+            finally:
+                cur.close()
+        with self._cond:
+            if depth:
+                self._depth[tenant_key] = depth
+            else:
+                self._depth.pop(tenant_key, None)
+        return depth
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "queued_tenants": len(self._queue),
+                "depth": dict(self._depth),
+                "total_depth": sum(self._depth.values()),
+                "dispatched": self.dispatched,
+                "retried": self.retried,
+                "dead": self.dead,
+                "batches": self.batches,
+                "last_batch_ms": self.last_batch_ms,
+            }
+
+
+dispatcher = NotificationDispatcher()
+
+
+def outbox_metrics():
+    """Queue depth and dispatch counters of this process's dispatcher."""
+    return dispatcher.metrics()
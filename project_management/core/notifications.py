@@ -2,20 +2,60 @@
 """
 Notification utility functions for sending real-time notifications to users.
 """
+import asyncio
 import logging
 from datetime import datetime
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from .db_helpers import get_tenant_conn, exec_sql
+from . import unread_counters
+from .db_helpers import get_tenant_conn, release_tenant_conn, tenant_connection, exec_sql
 
 logger = logging.getLogger('notifications')
 
 
+# A multi-row INSERT is split into statements of at most this many bytes. Each
+# statement is a "simple insert", so InnoDB hands it consecutive AUTO_INCREMENT ids
+# and the ids of its rows follow from the first one (LAST_INSERT_ID()).
+_MAX_INSERT_BYTES = 512 * 1024
+
+# every VALUES slot must be a placeholder: pymysql only folds executemany() into
+# one multi-row INSERT when the VALUES list matches RE_INSERT_VALUES (is_read
+# comes from the column default)
+_INSERT_SQL = """
+    INSERT INTO notifications (user_id, title, message, type, link, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+
+def _insert_chunks(rows):
+    """Split rows into chunks that stay well below pymysql's executemany statement limit."""
+    chunk, size = [], 0
+    for row in rows:
+        # escaping can double a string, plus per-row overhead
+        row_size = 2 * sum(len(str(v)) for v in row if v is not None) + 64
+        if chunk and size + row_size > _MAX_INSERT_BYTES:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(row)
+        size += row_size
+    if chunk:
+        yield chunk
+
+
+async def _group_send_all(channel_layer, messages):
+    """group_send every (group, payload) concurrently; returns one result/exception each."""
+    return await asyncio.gather(
+        *(channel_layer.group_send(group, payload) for group, payload in messages),
+        return_exceptions=True,
+    )
+
+
 class NotificationManager:
     """Manages sending and storing notifications."""
 
     @staticmethod
-    def send_notification(tenant_id, user_id, title, message, notification_type='info', link=None, created_by_id=None):
+    def send_notification(tenant_id, user_id, title, message, notification_type='info', link=None,
+                          created_by_id=None, conn=None):
         """
         Send a real-time notification to a specific user and save to database.
         
@@ -27,114 +67,202 @@ class NotificationManager:
             notification_type (str): Type of notification (info, success, warning, error, task, project, team)
             link (str): Optional URL link for the notification
             created_by_id (int): ID of user who triggered the notification
+            conn: Optional tenant connection to insert with (defaults to the tenant's pooled connection)
             
         Returns:
             dict: Notification data with ID
         """
+        results = NotificationManager.send_bulk_notification(
+            tenant_id, [user_id], title, message,
+            notification_type=notification_type, link=link, created_by_id=created_by_id, conn=conn,
+        )
+        return results[0] if results else None
+
+    @staticmethod
+    def _save_notifications(conn, rows):
+        """
+        Insert notification rows (user_id, title, message, type, link, created_at) with
+        multi-row INSERTs, bump the recipients' unread counters and return the ids,
+        in row order.
+        """
+        ids = []
+        cur = conn.cursor()
         try:
-            # Prepare notification data
+            for chunk in _insert_chunks(rows):
+                cur.executemany(_INSERT_SQL, chunk)
+                first_id = cur.lastrowid
+                if first_id:
+                    ids.extend(range(first_id, first_id + len(chunk)))
+                else:
+                    ids.extend([None] * len(chunk))
+        finally:
+            cur.close()
+        counts = {}
+        for row in rows:
+            counts[(row[0], '')] = counts.get((row[0], ''), 0) + 1
+        # pushed by NotificationConsumer with each notification
+        unread_counters.increment(conn, unread_counters.NOTIFICATION, counts)
+        return ids
+
+    @staticmethod
+    def send_bulk_notification(tenant_id, user_ids, title, message, notification_type='info', link=None,
+                               created_by_id=None, conn=None):
+        """
+        Send notification to multiple users.
+
+        All rows are written with one multi-row INSERT (ids recovered from the first
+        inserted id) and all WebSocket messages are sent in one async batch.
+        
+        Args:
+            tenant_id (str): Tenant ID
+            user_ids (list): List of target user/member IDs
+            title (str): Notification title
+            message (str): Notification message
+            notification_type (str): Type of notification
+            link (str): Optional URL link
+            created_by_id (int): ID of user who triggered the notification
+            conn: Optional tenant connection to insert with (defaults to the tenant's pooled connection)
+            
+        Returns:
+            list: List of notification data
+        """
+        try:
+            # one notification per user, in the given order
+            user_ids = [uid for uid in dict.fromkeys(user_ids or []) if uid]
+            if not user_ids:
+                return []
+
             now = datetime.now()
             created_at_str = now.strftime('%Y-%m-%d %H:%M:%S')
-
-            notification_id = None
+            ids = [None] * len(user_ids)
             saved_to_db = False
 
-            # Try to save notification to tenant DB; if this fails, log and continue to broadcast
+            # Try to save notifications to tenant DB; if this fails, log and continue to broadcast
+            own_conn = conn is None
             try:
-                conn = get_tenant_conn(tenant_key=tenant_id)
-                if conn:
-                    # Save notification to database
-                    exec_sql(
-                        conn,
-                        """
-                        INSERT INTO notifications (user_id, title, message, type, link, is_read, created_at)
-                        VALUES (%s, %s, %s, %s, %s, 0, %s)
-                        """,
-                        [user_id, title, message, notification_type, link, now],
-                        fetch=False
-                    )
-                    # Attempt to fetch last inserted id (works on some connectors)
-                    try:
-                        notification_id_result = exec_sql(conn, "SELECT LAST_INSERT_ID() as id", [])
-                        notification_id = notification_id_result[0]['id'] if notification_id_result else None
-                    except Exception:
-                        notification_id = None
-                    saved_to_db = True
-                    logger.info(f"Notification saved to DB for tenant={tenant_id}: user_id={user_id}, title={title}")
-                else:
-                    logger.warning(f"No tenant DB connection available for tenant: {tenant_id}; skipping DB save")
+                if own_conn:
+                    conn = get_tenant_conn(tenant_key=tenant_id)
+                rows = [(uid, title, message, notification_type, link, now) for uid in user_ids]
+                ids = NotificationManager._save_notifications(conn, rows)
+                saved_to_db = True
+                logger.info(f"{len(rows)} notification(s) saved to DB for tenant={tenant_id}: title={title}")
             except Exception as db_exc:
-                logger.warning(f"Failed to save notification to tenant DB (tenant={tenant_id}): {db_exc}")
-
-            # Broadcast notification via WebSocket regardless of DB save success
-            channel_layer = get_channel_layer()
-            group_name = f'user_notifications_{tenant_id}_{user_id}'
-            notification_data = {
-                'type': 'system.notification',  # Maps to system_notification method in consumer
-                'notification_id': notification_id,
-                'notification_type': notification_type,
-                'title': title,
-                'message': message,
-                'link': link,
-                'created_at': created_at_str,
-            }
-
-            if channel_layer:
-                try:
-                    logger.debug(f"Attempting group_send to {group_name} with payload: {notification_data}")
-                    async_to_sync(channel_layer.group_send)(group_name, notification_data)
-                    logger.info(f"Notification broadcast to WebSocket group: {group_name}")
-                except Exception as e:
-                    logger.error(f"Failed to group_send notification to {group_name}: {e}", exc_info=True)
+                logger.warning(f"Failed to save notifications to tenant DB (tenant={tenant_id}): {db_exc}")
+            finally:
+                if own_conn:
+                    release_tenant_conn(conn)
 
-            return {
+            results = [{
                 'id': notification_id,
-                'user_id': user_id,
+                'user_id': uid,
                 'title': title,
                 'message': message,
                 'type': notification_type,
                 'link': link,
                 'created_at': created_at_str,
                 'saved_to_db': saved_to_db,
-            }
+            } for uid, notification_id in zip(user_ids, ids)]
+
+            # Broadcast via WebSocket regardless of DB save success
+            NotificationManager._broadcast(tenant_id, results)
+
+            return results
 
         except Exception as e:
-            logger.error(f"Error sending notification: {e}", exc_info=True)
-            return None
+            logger.error(f"Error sending notifications: {e}", exc_info=True)
+            return []
 
     @staticmethod
-    def send_bulk_notification(tenant_id, user_ids, title, message, notification_type='info', link=None, created_by_id=None):
+    def queue_bulk_notification(conn, tenant_id, user_ids, title, message, notification_type='info', link=None,
+                                created_by_id=None):
         """
-        Send notification to multiple users.
-        
-        Args:
-            tenant_id (str): Tenant ID
-            user_ids (list): List of target user/member IDs
-            title (str): Notification title
-            message (str): Notification message
-            notification_type (str): Type of notification
-            link (str): Optional URL link
-            created_by_id (int): ID of user who triggered the notification
-            
+        Write notifications for multiple users inside the caller's transaction on conn,
+        together with their outbox entries (core.notification_outbox). Nothing is sent
+        yet: after COMMIT pass the result to dispatch_queued().
+
         Returns:
-            list: List of notification data
+            list: List of notification data ('queued' is False when the tenant has no
+                  outbox table yet; dispatch_queued() then sends those directly)
         """
-        results = []
-        for user_id in user_ids:
-            result = NotificationManager.send_notification(
-                tenant_id=tenant_id,
-                user_id=user_id,
-                title=title,
-                message=message,
-                notification_type=notification_type,
-                link=link,
-                created_by_id=created_by_id
-            )
-            if result:
-                results.append(result)
-        
+        from .notification_outbox import write_outbox
+
+        user_ids = [uid for uid in dict.fromkeys(user_ids or []) if uid]
+        if not user_ids:
+            return []
+        now = datetime.now()
+        created_at_str = now.strftime('%Y-%m-%d %H:%M:%S')
+        rows = [(uid, title, message, notification_type, link, now) for uid in user_ids]
+        ids = NotificationManager._save_notifications(conn, rows)
+
+        results = [{
+            'id': notification_id,
+            'user_id': uid,
+            'title': title,
+            'message': message,
+            'type': notification_type,
+            'link': link,
+            'created_at': created_at_str,
+            'saved_to_db': True,
+            'tenant_id': tenant_id,
+        } for uid, notification_id in zip(user_ids, ids)]
+        queued = write_outbox(conn, [
+            (r['id'], f'user_notifications_{tenant_id}_{r["user_id"]}', NotificationManager._payload(r))
+            for r in results
+        ])
+        for r in results:
+            r['queued'] = queued
         return results
 
+    @staticmethod
+    def dispatch_queued(results):
+        """
+        Hand notifications written by queue_bulk_notification() to the background
+        dispatcher. Call after the transaction that wrote them has committed.
+        """
+        from .notification_outbox import dispatcher
+
+        queued, direct = set(), {}
+        for r in results or []:
+            if r.get('queued'):
+                queued.add(r['tenant_id'])
+            else:
+                direct.setdefault(r['tenant_id'], []).append(r)
+        for tenant_id in queued:
+            dispatcher.wake(tenant_id)
+        # tenant not migrated to the outbox yet: broadcast in the request
+        for tenant_id, tenant_results in direct.items():
+            NotificationManager._broadcast(tenant_id, tenant_results)
+
+    @staticmethod
+    def _payload(result):
+        return {
+            'type': 'system.notification',  # Maps to system_notification method in consumer
+            'notification_id': result['id'],
+            'notification_type': result['type'],
+            'title': result['title'],
+            'message': result['message'],
+            'link': result['link'],
+            'created_at': result['created_at'],
+        }
+
+    @staticmethod
+    def _broadcast(tenant_id, results):
+        """Send the WebSocket messages of results in one async batch."""
+        channel_layer = get_channel_layer()
+        if not channel_layer:
+            return
+        messages = [(f'user_notifications_{tenant_id}_{r["user_id"]}', NotificationManager._payload(r))
+                    for r in results]
+        try:
+            outcomes = async_to_sync(_group_send_all)(channel_layer, messages)
+            failed = [(group, exc) for (group, _), exc in zip(messages, outcomes)
+                      if isinstance(exc, Exception)]
+            for group, exc in failed:
+                logger.error(f"Failed to group_send notification to {group}: {exc}")
+            logger.info(f"Notification broadcast to {len(messages) - len(failed)} WebSocket group(s)")
+        except Exception as e:
+            logger.error(f"Failed to broadcast notifications for tenant={tenant_id}: {e}", exc_info=True)
+
     @staticmethod
     def mark_as_read(tenant_id, notification_id):
         """
@@ -148,16 +276,20 @@ class NotificationManager:
             bool: Success status
         """
         try:
-            conn = get_tenant_conn(tenant_key=tenant_id)
-            if not conn:
-                return False
-
-            exec_sql(
-                conn,
-                "UPDATE notifications SET is_read = 1 WHERE id = %s",
-                [notification_id],
-                fetch=False
-            )
+            with tenant_connection(tenant_key=tenant_id) as conn:
+                rows = exec_sql(conn, "SELECT user_id FROM notifications WHERE id = %s AND is_read = 0",
+                                [notification_id])
+                if not rows:
+                    return True
+                updated = exec_sql(
+                    conn,
+                    "UPDATE notifications SET is_read = 1 WHERE id = %s AND is_read = 0",
+                    [notification_id],
+                    fetch=False
+                )
+                changes = unread_counters.decrement(conn, unread_counters.NOTIFICATION, rows[0]['user_id'],
+                                                    n=updated or 0)
+            unread_counters.push(tenant_id, changes)
             return True
         except Exception as e:
             logger.error(f"Error marking notification as read: {e}")
@@ -176,16 +308,15 @@ class NotificationManager:
             bool: Success status
         """
         try:
-            conn = get_tenant_conn(tenant_key=tenant_id)
-            if not conn:
-                return False
-
-            exec_sql(
-                conn,
-                "UPDATE notifications SET is_read = 1 WHERE user_id = %s AND is_read = 0",
-                [user_id],
-                fetch=False
-            )
+            with tenant_connection(tenant_key=tenant_id) as conn:
+                exec_sql(
+                    conn,
+                    "UPDATE notifications SET is_read = 1 WHERE user_id = %s AND is_read = 0",
+                    [user_id],
+                    fetch=False
+                )
+                changes = unread_counters.reset(conn, unread_counters.NOTIFICATION, user_id)
+            unread_counters.push(tenant_id, changes)
             return True
         except Exception as e:
             logger.error(f"Error marking all notifications as read: {e}")
@@ -238,7 +369,7 @@ class NotificationManager:
     @staticmethod
     def get_unread_count(tenant_id, user_id):
         """
-        Get count of unread notifications for a user.
+        Get count of unread notifications for a user (from core.unread_counters).
         
         Args:
             tenant_id (str): Tenant ID
@@ -248,16 +379,8 @@ class NotificationManager:
             int: Count of unread notifications
         """
         try:
-            conn = get_tenant_conn(tenant_id=tenant_id)
-            if not conn:
-                return 0
-
-            result = exec_sql(
-                conn,
-                "SELECT COUNT(*) as count FROM notifications WHERE user_id = %s AND is_read = 0",
-                [user_id]
-            )
-            return result[0]['count'] if result else 0
+            with tenant_connection(tenant_key=tenant_id) as conn:
+                return unread_counters.get_counters(conn, user_id)["notifications"]
         except Exception as e:
             logger.error(f"Error getting unread count: {e}")
             return 0
@@ -275,16 +398,21 @@ class NotificationManager:
             bool: Success status
         """
         try:
-            conn = get_tenant_conn(tenant_id=tenant_id)
-            if not conn:
-                return False
-
-            exec_sql(
-                conn,
-                "DELETE FROM notifications WHERE id = %s",
-                [notification_id],
-                fetch=False
-            )
+            with tenant_connection(tenant_key=tenant_id) as conn:
+                rows = exec_sql(conn, "SELECT user_id, is_read FROM notifications WHERE id = %s",
+                                [notification_id])
+                if not rows:
+                    return True
+                deleted = exec_sql(
+                    conn,
+                    "DELETE FROM notifications WHERE id = %s",
+                    [notification_id],
+                    fetch=False
+                )
+                changes = []
+                if deleted and not rows[0]['is_read']:
+                    changes = unread_counters.decrement(conn, unread_counters.NOTIFICATION, rows[0]['user_id'])
+            unread_counters.push(tenant_id, changes)
             return True
         except Exception as e:
             logger.error(f"Error deleting notification: {e}")
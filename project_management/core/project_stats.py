@@ -0,0 +1,178 @@
+# core/project_stats.py
+"""
+Per-project task statistics, materialized in project_stats (table in TENANT_DDL).
+
+One row per project holds the counts the projects report and export show:
+total, completed, pending, in progress, critical, high and overdue tasks. They
+are computed for many projects at once by a single grouped pass over tasks
+(refresh()), never by per-project subqueries.
+
+Rows are refreshed incrementally:
+  - task writers mark the projects they touch with mark_projects() /
+    mark_tasks() (dirty_at = NOW(6)) after the write; a DELETE reads the
+    task's project_id first and marks that project;
+  - readers call refresh_stale() first, which recomputes only the projects
+    that are dirty, have no row yet, or were computed on an earlier day
+    (overdue counts depend on CURDATE()).
+A refresh records the time it started; a mark made while it runs leaves the
+row dirty for the next read.
+
+Tenants without the table fall back to computing the counts on the fly.
+"""
+
+import logging
+
+import pymysql
+
+logger = logging.getLogger('project_management')
+
+STAT_COLUMNS = (
+    "total_tasks", "completed_tasks", "pending_tasks", "inprogress_tasks",
+    "critical_tasks", "high_tasks", "overdue_tasks",
+)
+
+# MySQL error: table doesn't exist
+_ER_NO_SUCH_TABLE = 1146
+
+_CHUNK = 1000
+
+# one grouped pass over tasks for the selected projects
+_AGGREGATE_SQL = """
+    SELECT
+        p.id AS project_id,
+        COUNT(t.id) AS total_tasks,
+        COALESCE(SUM(t.status = 'Completed'), 0) AS completed_tasks,
+        COALESCE(SUM(t.status IN ('New', 'In Progress', 'Pending')), 0) AS pending_tasks,
+        COALESCE(SUM(t.status = 'In Progress'), 0) AS inprogress_tasks,
+        COALESCE(SUM(t.priority = 'Critical'), 0) AS critical_tasks,
+        COALESCE(SUM(t.priority = 'High'), 0) AS high_tasks,
+        COALESCE(SUM(t.due_date < CURDATE() AND t.status != 'Completed'), 0) AS overdue_tasks
+    FROM projects p
+    LEFT JOIN tasks t ON t.project_id = p.id
+    {where}
+    GROUP BY p.id
+"""
+
+_STALE_SQL = """
+    SELECT p.id
+    FROM projects p
+    LEFT JOIN project_stats ps ON ps.project_id = p.id
+    WHERE ps.project_id IS NULL
+       OR ps.stats_date < CURDATE()
+       OR ps.dirty_at >= ps.refreshed_at
+"""
+
+
+def _missing_table(exc):
+    return isinstance(exc, pymysql.err.ProgrammingError) and exc.args[0] == _ER_NO_SUCH_TABLE
+
+
+def _ids(values):
+    return sorted({int(v) for v in values or [] if v})
+
+
+def _chunks(ids):
+    for i in range(0, len(ids), _CHUNK):
+        yield ids[i:i + _CHUNK]
+
+
+def mark_projects(conn, project_ids):
+    """Flag the stats of project_ids for recomputation (on conn, in the caller's transaction)."""
+    ids = _ids(project_ids)
+    if not ids:
+        return
+    cur = conn.cursor()
+    try:
+        for chunk in _chunks(ids):
+            cur.execute(
+                f"UPDATE project_stats SET dirty_at = NOW(6) WHERE project_id IN ({', '.join(['%s'] * len(chunk))})",
+                chunk,
+            )
+    except pymysql.err.ProgrammingError as e:
+        if not _missing_table(e):
+            raise
+    finally:
+        cur.close()
+
+
+def mark_tasks(conn, task_ids):
+    """Flag the stats of the projects task_ids currently belong to."""
+    ids = _ids(task_ids)
+    if not ids:
+        return
+    cur = conn.cursor()
+    try:
+        for chunk in _chunks(ids):
+            cur.execute(f"""
+                UPDATE project_stats ps
+                JOIN tasks t ON t.project_id = ps.project_id
+                SET ps.dirty_at = NOW(6)
+                WHERE t.id IN ({', '.join(['%s'] * len(chunk))})
+            """, chunk)
+    except pymysql.err.ProgrammingError as e:
+        if not _missing_table(e):
+            raise
+    finally:
+        cur.close()
+
+
+def refresh(conn, project_ids=None):
+    """
+    Recompute the stats of project_ids (every project when None) and store
+    them. Returns the number of projects refreshed.
+    """
+    columns = ", ".join(STAT_COLUMNS)
+    updates = ", ".join(f"{c} = VALUES({c})" for c in STAT_COLUMNS + ("stats_date", "refreshed_at"))
+    cur = conn.cursor()
+    try:
+        if project_ids is None:
+            cur.execute("SELECT id FROM projects")
+            project_ids = [r['id'] for r in cur.fetchall()]
+        ids = _ids(project_ids)
+        if not ids:
+            return 0
+        cur.execute("SELECT NOW(6) AS started")
+        started = cur.fetchone()['started']
+        for chunk in _chunks(ids):
+            where = f"WHERE p.id IN ({', '.join(['%s'] * len(chunk))})"
+            cur.execute(f"""
+                INSERT INTO project_stats (project_id, {columns}, stats_date, refreshed_at)
+                SELECT agg.project_id, {', '.join('agg.' + c for c in STAT_COLUMNS)}, CURDATE(), %s
+                FROM ({_AGGREGATE_SQL.format(where=where)}) agg
+                ON DUPLICATE KEY UPDATE {updates}
+            """, [started] + chunk)
+    finally:
+        cur.close()
+    return len(ids)
+
+
+def refresh_stale(conn):
+    """Refresh the projects whose stats are missing, dirty or from an earlier day."""
+    cur = conn.cursor()
+    try:
+        cur.execute(_STALE_SQL)
+        stale = [r['id'] for r in cur.fetchall()]
+    except pymysql.err.ProgrammingError as e:
+        if not _missing_table(e):
+            raise
+        return None
+    finally:
+        cur.close()
+    if stale:
+        refresh(conn, stale)
+        logger.debug(f"[project_stats] refreshed {len(stale)} project(s)")
+    return len(stale)
+
+
+def stats_join(conn, alias="ps"):
+    """
+    Bring project_stats up to date and return (select columns, join clause) to
+    add to a query over `projects p`. Without the table the join computes the
+    counts in a derived table instead.
+    """
+    select = ", ".join(f"COALESCE({alias}.{c}, 0) AS {c}" for c in STAT_COLUMNS)
+    if refresh_stale(conn) is None:
+        join = f"LEFT JOIN ({_AGGREGATE_SQL.format(where='')}) {alias} ON {alias}.project_id = p.id"
+    else:
+        join = f"LEFT JOIN project_stats {alias} ON {alias}.project_id = p.id"
+    return select, join
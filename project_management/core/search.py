@@ -0,0 +1,169 @@
+# core/search.py
+"""
+Full-text search over tasks and projects (global quick-search, project picker).
+
+Backed by InnoDB FULLTEXT indexes (core.index_migrations, version 3):
+    tasks     ft_tasks_title (title), ft_tasks_text (title, description)
+    projects  ft_projects_name (name)
+InnoDB maintains them on every INSERT and UPDATE, so a task is searchable as
+soon as the transaction that creates or edits it commits.
+
+The query text becomes a BOOLEAN MODE expression in which every word is
+required and matched as a prefix ("login err" -> "+login* +err*"). Tasks are
+ranked by relevance, a title match weighing SEARCH_TITLE_WEIGHT times a
+description match, newest first on ties.
+
+Words shorter than the index's minimum token size (innodb_ft_min_token_size,
+SEARCH_MIN_TOKEN_SIZE here, 3 by default) are not indexed. Queries made only of
+such words, and tenants whose indexes are not built yet, fall back to the
+former LIKE '%q%' scan.
+
+Usage:
+    from core.search import search_tasks, search_projects
+
+    tasks = search_tasks(conn, "login err", limit=20)
+    projects = search_projects(conn, "mob", limit=10)
+"""
+
+import re
+import logging
+
+import pymysql
+from django.conf import settings
+
+logger = logging.getLogger('utility')
+
+MIN_TOKEN_SIZE = getattr(settings, "SEARCH_MIN_TOKEN_SIZE", 3)
+TITLE_WEIGHT = getattr(settings, "SEARCH_TITLE_WEIGHT", 2)
+MAX_TERMS = 8
+
+# MySQL error: no FULLTEXT index matching the column list
+_ER_FT_MATCHING_KEY_NOT_FOUND = 1191
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_warned = set()
+
+_TASK_COLUMNS = """
+    t.id,
+    COALESCE(t.title, '') AS title,
+    COALESCE(t.status, '') AS status,
+    CASE
+        WHEN t.assigned_type = 'member' THEN CONCAT(m.first_name, ' ', m.last_name)
+        WHEN t.assigned_type = 'team' THEN tm.name
+        ELSE NULL
+    END AS assigned_to_display,
+    p.name AS project_name
+"""
+
+_TASK_JOINS = """
+    LEFT JOIN members m ON t.assigned_type = 'member' AND m.id = t.assigned_to
+    LEFT JOIN teams tm ON t.assigned_type = 'team' AND tm.id = t.assigned_to
+    LEFT JOIN projects p ON p.id = t.project_id
+"""
+
+
+def boolean_query(q):
+    """
+    BOOLEAN MODE expression for q: every indexable word required, as a prefix.
+    Returns '' when q has no word long enough to be in the index.
+    """
+    terms = []
+    for word in _WORD_RE.findall((q or "").lower()):
+        if len(word) >= MIN_TOKEN_SIZE and word not in terms:
+            terms.append(word)
+    return " ".join(f"+{term}*" for term in terms[:MAX_TERMS])
+
+
+def _missing_index(exc, table):
+    if not (exc.args and exc.args[0] == _ER_FT_MATCHING_KEY_NOT_FOUND):
+        return False
+    if table not in _warned:
+        _warned.add(table)
+        logger.warning(f"[search] {table} FULLTEXT index missing, using LIKE; "
+                       f"run scripts/migrate_tenant_indexes.py")
+    return True
+
+
+def _task_row(r):
+    return {
+        'id': r['id'],
+        'title': r['title'] or '',
+        'status': r['status'] or '',
+        'assigned_to_display': r['assigned_to_display'] or '',
+        'project_name': r['project_name'] or '',
+    }
+
+
+def search_tasks(conn, q, limit=20):
+    """
+    Tasks matching q, best match first:
+    [{id, title, status, assigned_to_display, project_name}, ...].
+    """
+    q = (q or "").strip()
+    if not q:
+        return []
+    expr = boolean_query(q)
+    cur = conn.cursor()
+    try:
+        if expr:
+            try:
+                # rank on the index alone, then join the display columns of the page
+                cur.execute(f"""
+                    SELECT {_TASK_COLUMNS}
+                    FROM (
+                        SELECT id,
+                               MATCH(title) AGAINST (%s IN BOOLEAN MODE) * %s
+                               + MATCH(title, description) AGAINST (%s IN BOOLEAN MODE) AS score
+                        FROM tasks
+                        WHERE MATCH(title, description) AGAINST (%s IN BOOLEAN MODE)
+                        ORDER BY score DESC, id DESC
+                        LIMIT %s
+                    ) hit
+                    JOIN tasks t ON t.id = hit.id
+                    {_TASK_JOINS}
+                    ORDER BY hit.score DESC, t.id DESC
+                """, (expr, TITLE_WEIGHT, expr, expr, limit))
+                return [_task_row(r) for r in cur.fetchall()]
+            except pymysql.MySQLError as e:
+                if not _missing_index(e, "tasks"):
+                    raise
+
+        like = f"%{q}%"
+        cur.execute(f"""
+            SELECT {_TASK_COLUMNS}
+            FROM tasks t
+            {_TASK_JOINS}
+            WHERE (t.title LIKE %s OR t.description LIKE %s)
+            ORDER BY t.id DESC
+            LIMIT %s
+        """, (like, like, limit))
+        return [_task_row(r) for r in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def search_projects(conn, q, limit=10):
+    """Projects whose name matches q, best match first: [{id, name}, ...]."""
+    q = (q or "").strip()
+    expr = boolean_query(q)
+    cur = conn.cursor()
+    try:
+        if expr:
+            try:
+                cur.execute("""
+                    SELECT id, name
+                    FROM projects
+                    WHERE MATCH(name) AGAINST (%s IN BOOLEAN MODE)
+                    ORDER BY MATCH(name) AGAINST (%s IN BOOLEAN MODE) DESC, name
+                    LIMIT %s
+                """, (expr, expr, limit))
+                return cur.fetchall()
+            except pymysql.MySQLError as e:
+                if not _missing_index(e, "projects"):
+                    raise
+
+        cur.execute("SELECT id, name FROM projects WHERE name LIKE %s LIMIT %s", (f"%{q}%", limit))
+        return cur.fetchall()
+    finally:
+        cur.close()
@@ -49,15 +49,14 @@
         // Setup WebSocket connection
         setupNotificationWebSocket();
         
-        // Load initial notification count
-        updateNotificationCount();
+        // Badge follows the pushed unread counters (unread_counters.js)
+        window.addEventListener('unread-counters', function(e) {
+            setBadgeCount(e.detail.state.notifications);
+        });
         
         // Setup dropdown close handler
         setupDropdownHandlers();
         
-        // Auto-refresh count every 30 seconds (backup)
-        setInterval(updateNotificationCount, 30000);
-        
         console.log('✅ Notification system initialized');
     }
 
@@ -142,6 +141,7 @@
             
             notificationWS.onopen = function() {
                 console.log('✅ Notification WebSocket connected');
+                // snapshot once per connection, the socket pushes every change after it
                 updateNotificationCount();
             };
             
@@ -179,8 +179,15 @@
             case 'new_group_message':
                 handleChatMessage(data);
                 break;
-            case 'presence_update':
-                handlePresenceUpdate(data);
+            case 'presence_diff':
+                handlePresenceDiff(data);
+                break;
+            case 'unread_counter':
+                if (window.UnreadCounters) window.UnreadCounters.apply(data);
+                break;
+            case 'import_progress':
+                // followed by the bulk import page
+                window.dispatchEvent(new CustomEvent('import-progress', { detail: data }));
                 break;
             default:
                 console.log('Unknown event type:', eventType);
@@ -205,8 +212,7 @@
             // 3. Animate bell icon
             animateBellIcon();
             
-            // 4. Update badge count
-            updateNotificationCount();
+            // 4. Badge count: the server follows up with an unread_counter event
             
             // 5. Show in-page popup notification (only if user is on the website)
             showToastNotification(data);
@@ -236,13 +242,7 @@
                 showChatPopupNotification(data);
             }
             
-            // 3. Update badge count
-            const badge = document.getElementById('notif-badge');
-            if (badge) {
-                let count = parseInt(badge.textContent || '0') || 0;
-                count += 1;
-                setBadgeCount(count);
-            }
+            // 3. Chat badges follow the unread_counter event sent with the message
             
             // 4. Play sound for chat messages
             playNotificationSound();
@@ -253,9 +253,10 @@
         }
     }
 
-    function handlePresenceUpdate(data) {
-        // Update online status indicators in chat
-        updateOnlineStatus(data.user_id, data.status);
+    function handlePresenceDiff(data) {
+        // Update online status indicators in chat (members that came online / went offline)
+        (data.online || []).forEach(member => updateOnlineStatus(member, 'online'));
+        (data.offline || []).forEach(member => updateOnlineStatus(member, 'offline'));
     }
 
     function playNotificationSound() {
@@ -500,6 +501,10 @@
     }
 
     function updateNotificationCount() {
+        if (window.UnreadCounters) {
+            window.UnreadCounters.refresh();
+            return;
+        }
         fetch('/api/notifications/unread-count')
             .then(res => res.json())
             .then(data => {
@@ -624,7 +629,6 @@
             body: JSON.stringify({ id: id })
         })
         .then(() => {
-            updateNotificationCount();
             if (link && link !== 'null' && link !== '') {
                 window.location.href = link;
             } else {
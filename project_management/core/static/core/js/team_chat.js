@@ -46,6 +46,12 @@
         let pendingImagePreviewEl = null;
         // track appended messages to avoid re-rendering the feed (prevents blinking)
         let existingMessageIds = new Set();
+        // history is loaded a page at a time, newest first (see loadOlderMessages)
+        const HISTORY_PAGE_SIZE = 50;
+        let historyBeforeId = null;   // cursor of the next older page
+        let historyHasMore = false;
+        let historyLoading = false;
+        let lastSeenMessageId = 0;    // newest message id shown; polling asks for what follows
 
         // Utility: normalize ID
         function normId(v) {
@@ -82,11 +88,6 @@
             }
         }
 
-        // Periodic refresh for unread counts (DMs + Groups)
-        setInterval(() => {
-            try { refreshUnreadCounts(); } catch(e) { /* ignore */ }
-        }, 8000);
-
         // Play notification sound
         function playNotificationSound() {
             if (notificationSound) {
@@ -227,6 +228,27 @@
             return v ? v.pop() : '';
         }
 
+        // Toggle the presence indicators of a member (email or member id)
+        function setPresence(member, online) {
+            const userEmail = String(member || '').toLowerCase();
+            if (!userEmail) return;
+            document.querySelectorAll(`.user-pic-sm[data-user-email="${userEmail}"] .presence-indicator`).forEach(indicator => {
+                indicator.classList.toggle('online', !!online);
+            });
+        }
+
+        // Current presence, once per page load; presence_diff events keep it up to date
+        async function loadPresence() {
+            try {
+                const res = await fetch('/chat/presence/', { credentials: 'same-origin' });
+                if (!res.ok) return;
+                const data = await res.json();
+                (data.online || []).forEach(m => setPresence(m, true));
+            } catch (e) {
+                console.warn('loadPresence failed', e);
+            }
+        }
+
         // Load members into sidebar
         async function loadMembers() {
             const dmList = document.getElementById('dm-list');
@@ -291,73 +313,49 @@
                     } catch (e) { console.warn('auto-select initial peer failed', e); }
 
                 refreshUnreadCounts();
+                loadPresence();
             } catch (e) {
                 console.error('loadMembers error', e);
                 dmList.innerHTML = '<div style="padding:16px;color:#ff6b6b;">Error loading members</div>';
             }
         }
 
-        // Refresh unread counts for DMs and groups and update the overall unread badge
-        async function refreshUnreadCounts() {
-            try {
-                // Fetch DM unread counts
-                const res = await fetch('/chat/unread/', { credentials: 'same-origin' });
-                let dmUnread = {};
-                if (res.ok) {
-                    const data = await res.json();
-                    (data.unread || []).forEach(u => {
-                        dmUnread[(u.from||'').toString().toLowerCase()] = parseInt(u.count||0, 10);
-                    });
-                }
+        // Render the unread badges (DMs, groups, overall) from the pushed unread counters
+        function refreshUnreadCounts() {
+            const counters = window.UnreadCounters;
+            if (!counters) return;
 
-                // Update DM badges
-                let total = 0;
-                document.querySelectorAll('#dm-list .dm-item').forEach(el => {
-                    const badge = el.querySelector('.badge[data-unread-for]');
-                    const email = (el.dataset.userEmail || '').toString().toLowerCase();
-                    const id = (el.dataset.id || '').toString();
-                    const count = dmUnread[email] || dmUnread[id] || 0;
-                    if (badge) {
-                        if (count > 0) {
-                            badge.textContent = count;
-                            badge.style.display = '';
-                            el.classList.add('unread');
-                        } else {
-                            badge.style.display = 'none';
-                            el.classList.remove('unread');
-                        }
-                    }
-                    total += count;
-                });
-
-                // Refresh group unread counts from server to remain authoritative
-                try {
-                    const gr = await fetch('/chat/groups/', { credentials: 'same-origin' });
-                    if (gr.ok) {
-                        const gdata = await gr.json();
-                        (gdata.groups || []).forEach(g => {
-                            const badge = document.querySelector(`.badge[data-unread-for-group="${g.id}"]`);
-                            const count = parseInt(g.unread||0,10) || 0;
-                            if (badge) {
-                                if (count > 0) { badge.textContent = count; badge.style.display = ''; } else { badge.style.display = 'none'; }
-                            }
-                            total += count;
-                        });
-                    }
-                } catch (e) { /* ignore group refresh errors */ }
-
-                // Update overall unread badge
-                const overall = document.getElementById('unread-badge');
-                if (overall) {
-                    if (total > 0) {
-                        overall.textContent = total;
-                        overall.style.display = '';
+            document.querySelectorAll('#dm-list .dm-item').forEach(el => {
+                const badge = el.querySelector('.badge[data-unread-for]');
+                const email = (el.dataset.userEmail || '').toString().toLowerCase();
+                const id = (el.dataset.id || '').toString();
+                const count = counters.dm(email) || counters.dm(id);
+                if (badge) {
+                    if (count > 0) {
+                        badge.textContent = count;
+                        badge.style.display = '';
+                        el.classList.add('unread');
                     } else {
-                        overall.style.display = 'none';
+                        badge.style.display = 'none';
+                        el.classList.remove('unread');
                     }
                 }
-            } catch (e) {
-                console.error('refreshUnreadCounts error', e);
+            });
+
+            document.querySelectorAll('.badge[data-unread-for-group]').forEach(badge => {
+                const count = counters.group(badge.dataset.unreadForGroup);
+                if (count > 0) { badge.textContent = count; badge.style.display = ''; } else { badge.style.display = 'none'; }
+            });
+
+            const total = counters.chatTotal();
+            const overall = document.getElementById('unread-badge');
+            if (overall) {
+                if (total > 0) {
+                    overall.textContent = total;
+                    overall.style.display = '';
+                } else {
+                    overall.style.display = 'none';
+                }
             }
         }
 
@@ -397,18 +395,42 @@
             if (badge) badge.style.display = 'none';
         }
 
+        // History endpoint of the open conversation or group
+        function historyUrl(params) {
+            const base = currentMode === 'group'
+                ? `/chat/group/history/?group_id=${encodeURIComponent(selectedGroup)}`
+                : `/chat/history/?peer=${encodeURIComponent(selectedPeer)}`;
+            return params ? `${base}&${new URLSearchParams(params)}` : base;
+        }
+
+        // Polling asks for the messages after the newest one shown (the newest page before any)
+        function newMessagesParams() {
+            return lastSeenMessageId
+                ? { after_id: lastSeenMessageId, limit: HISTORY_PAGE_SIZE }
+                : { limit: HISTORY_PAGE_SIZE };
+        }
+
+        // Start a fresh feed from the newest page of a history response
+        function resetHistory(data) {
+            existingMessageIds = new Set();
+            lastMessageDate = 0;
+            lastSeenMessageId = 0;
+            historyBeforeId = data.before_id;
+            historyHasMore = !!data.has_more;
+        }
+
         // Load chat history
         async function loadHistory() {
             const feed = document.getElementById('messages-feed');
             feed.innerHTML = '<div class="loading"><i class="fas fa-spinner fa-spin"></i> Loading messages...</div>';
 
             try {
-                const res = await fetch(`/chat/history/?peer=${encodeURIComponent(selectedPeer)}`, { credentials: 'same-origin' });
+                const res = await fetch(historyUrl({ limit: HISTORY_PAGE_SIZE }), { credentials: 'same-origin' });
                 if (!res.ok) throw new Error('Failed to load');
                 const data = await res.json();
                 
                 // reset tracking for this conversation (initial load)
-                existingMessageIds = new Set();
+                resetHistory(data);
                 feed.innerHTML = '';
                 const msgs = (data.messages || []).sort((a, b) => new Date(a.created_at) - new Date(b.created_at));
 
@@ -420,7 +442,7 @@
                         </div>
                     `;
                 } else {
-                    msgs.forEach(m => appendMessage(m));
+                    msgs.forEach(m => appendMessage(m, { scroll: false }));
                 }
                 feed.scrollTop = feed.scrollHeight;
             } catch (e) {
@@ -429,6 +451,50 @@
             }
         }
 
+        // Prepend the page preceding the oldest message shown (lazy scroll-back)
+        async function loadOlderMessages() {
+            if (historyLoading || !historyHasMore || historyBeforeId == null) return;
+            if (currentMode !== 'dm' && currentMode !== 'group') return;
+            const mode = currentMode;
+            const target = mode === 'group' ? selectedGroup : selectedPeer;
+            historyLoading = true;
+            try {
+                const res = await fetch(historyUrl({ before_id: historyBeforeId, limit: HISTORY_PAGE_SIZE }), { credentials: 'same-origin' });
+                if (!res.ok) throw new Error('Failed to load');
+                const data = await res.json();
+                // another conversation was opened meanwhile
+                if (mode !== currentMode || target !== (mode === 'group' ? selectedGroup : selectedPeer)) return;
+
+                const feed = document.getElementById('messages-feed');
+                const fromBottom = feed.scrollHeight - feed.scrollTop;
+                const first = feed.firstElementChild;
+                const batch = document.createDocumentFragment();
+                const shownDate = lastMessageDate;
+                lastMessageDate = 0;
+                (data.messages || []).forEach(m => appendMessage(m, { target: batch, scroll: false }));
+                // the page ends on the day the feed starts with: keep a single separator
+                if (first && first.classList.contains('date-sep') && first.dataset.day === lastMessageDate) first.remove();
+                lastMessageDate = shownDate;
+                feed.insertBefore(batch, feed.firstChild);
+                feed.scrollTop = feed.scrollHeight - fromBottom;
+
+                historyBeforeId = data.before_id;
+                historyHasMore = !!data.has_more;
+            } catch (e) {
+                console.error('loadOlderMessages error', e);
+            } finally {
+                historyLoading = false;
+            }
+        }
+
+        (function(){
+            const feed = document.getElementById('messages-feed');
+            if (!feed) return;
+            feed.addEventListener('scroll', () => {
+                if (feed.scrollTop < 80) loadOlderMessages();
+            });
+        })();
+
         // Append a message to the feed
         // Find member name by id/email
         function getMemberNameById(id) {
@@ -441,7 +507,9 @@
             return id;
         }
 
-        function appendMessage(m) {
+        // opts.target: element to append to (default the feed); opts.scroll: false keeps the scroll position
+        function appendMessage(m, opts) {
+            opts = opts || {};
             // Check for duplicates before appending
             if (m.id && existingMessageIds.has(String(m.id))) {
                 console.log('⏭️ Skipping duplicate message with id:', m.id);
@@ -452,7 +520,7 @@
                 return;
             }
             
-            const feed = document.getElementById('messages-feed');
+            const feed = opts.target || document.getElementById('messages-feed');
             const sender = normId(m.sender || m.from);
             // console.log('appendMessage:', {CURRENT_USER, sender, m});
             const isMe = sender === normId(CURRENT_USER);
@@ -505,6 +573,7 @@
                         lastMessageDate = day;
                         const sep = document.createElement('div');
                         sep.className = 'date-sep';
+                        sep.dataset.day = day;
                         sep.textContent = d.toLocaleDateString(undefined, { weekday: 'long', month: 'short', day: 'numeric' });
                         feed.appendChild(sep);
                     }
@@ -542,11 +611,14 @@
             }
             feed.appendChild(msgEl);
             // smooth scroll into view
-            try { feed.scroll({ top: feed.scrollHeight, behavior: 'smooth' }); } catch (e) { feed.scrollTop = feed.scrollHeight; }
+            if (opts.scroll !== false) {
+                try { feed.scroll({ top: feed.scrollHeight, behavior: 'smooth' }); } catch (e) { feed.scrollTop = feed.scrollHeight; }
+            }
             // record message identifiers so polling doesn't duplicate
             try {
                 if (m.id) existingMessageIds.add(String(m.id));
                 if (m.cid) existingMessageIds.add(String(m.cid));
+                if (m.id && Number(m.id) > lastSeenMessageId) lastSeenMessageId = Number(m.id);
             } catch (e) { /* ignore */ }
         }
 
@@ -801,55 +873,29 @@
                                     }
                     }
 
-                    // Read receipts: server broadcasts which message ids were marked read
-                    if (msg.event === 'message_read' && msg.message_ids && Array.isArray(msg.message_ids)) {
-                        console.log('📖 Received read receipts for message IDs:', msg.message_ids);
-                        msg.message_ids.forEach(id => {
+                    // Read receipts: the reader's high-water mark; my messages up to it are read
+                    if (msg.event === 'message_read' && msg.last_read_id && normId(msg.reader) !== normId(CURRENT_USER)) {
+                        const lastReadId = Number(msg.last_read_id);
+                        document.querySelectorAll('#messages-feed [data-message-id]').forEach(el => {
                             try {
-                                const el = document.querySelector(`[data-message-id="${id}"]`);
-                                if (el) {
-                                    console.log('✅ Updating read status for message:', id);
-                                    // update or add status icon to show read
-                                    let st = el.querySelector('.msg-status');
-                                    if (!st) {
-                                        st = document.createElement('span');
-                                        st.className = 'msg-status';
-                                        const ic = document.createElement('i');
-                                        ic.className = 'fas fa-check-double';
-                                        st.appendChild(ic);
-                                        el.querySelector('.message-content').appendChild(st);
-                                    }
-                                    // mark as read style and double-check icon with blue color
-                                    st.classList.add('read');
-                                    const ic = st.querySelector('i');
-                                    if (ic) {
-                                        ic.className = 'fas fa-check-double';
-                                        ic.style.color = '#0A7AFF';
-                                    }
+                                if (Number(el.dataset.messageId) > lastReadId) return;
+                                // only my own messages carry a status icon
+                                const st = el.querySelector('.msg-status');
+                                if (!st || st.classList.contains('read')) return;
+                                st.classList.add('read');
+                                const ic = st.querySelector('i');
+                                if (ic) {
+                                    ic.className = 'fas fa-check-double';
+                                    ic.style.color = '#0A7AFF';
                                 }
                             } catch(e){ console.error('Error updating read receipt:', e); }
                         });
                     }
 
-                    // Handle presence updates
-                    if (msg.type === 'presence_update') {
-                        const userEmail = (msg.user_email || '').toLowerCase();
-                        const status = msg.status || 'offline';
-                        console.log('👤 Presence update:', userEmail, status);
-                        // Find all user-pic-sm elements for this user and update their presence indicators
-                        const userPics = document.querySelectorAll(`.user-pic-sm[data-user-email="${userEmail}"]`);
-                        userPics.forEach(userPic => {
-                            const indicator = userPic.querySelector('.presence-indicator');
-                            if (indicator) {
-                                if (status === 'online') {
-                                    indicator.classList.add('online');
-                                    console.log('✅ Set online indicator for:', userEmail);
-                                } else {
-                                    indicator.classList.remove('online');
-                                    console.log('❌ Removed online indicator for:', userEmail);
-                                }
-                            }
-                        });
+                    // Handle presence diffs (members that came online / went offline)
+                    if (msg.event === 'presence_diff') {
+                        (msg.online || []).forEach(m => setPresence(m, true));
+                        (msg.offline || []).forEach(m => setPresence(m, false));
                     }
                     
                     // presence / notification events (unread badges)
@@ -1044,7 +1090,7 @@
         async function pollForNewMessages() {
             if (!selectedPeer) return;
             try {
-                const res = await fetch(`/chat/history/?peer=${encodeURIComponent(selectedPeer)}`, { credentials: 'same-origin' });
+                const res = await fetch(historyUrl(newMessagesParams()), { credentials: 'same-origin' });
                 if (!res.ok) return;
                 const data = await res.json();
                 const msgs = (data.messages || []).sort((a, b) => new Date(a.created_at) - new Date(b.created_at));
@@ -1065,7 +1111,7 @@
         async function pollForNewGroupMessages() {
             if (!selectedGroup) return;
             try {
-                const res = await fetch(`/chat/group/history/?group_id=${encodeURIComponent(selectedGroup)}`, { credentials: 'same-origin' });
+                const res = await fetch(historyUrl(newMessagesParams()), { credentials: 'same-origin' });
                 if (!res.ok) return;
                 const data = await res.json();
                 const msgs = (data.messages || []).sort((a, b) => new Date(a.created_at) - new Date(b.created_at));
@@ -1152,17 +1198,17 @@
             const feed = document.getElementById('messages-feed');
             feed.innerHTML = '<div class="loading"><i class="fas fa-spinner fa-spin"></i> Loading messages...</div>';
             try {
-                const res = await fetch(`/chat/group/history/?group_id=${encodeURIComponent(selectedGroup)}`, { credentials: 'same-origin' });
+                const res = await fetch(historyUrl({ limit: HISTORY_PAGE_SIZE }), { credentials: 'same-origin' });
                 if (!res.ok) throw new Error('Failed');
                 const data = await res.json();
                 // reset tracking for this group (initial load)
-                existingMessageIds = new Set();
+                resetHistory(data);
                 feed.innerHTML = '';
                 const msgs = (data.messages || []).sort((a,b)=>new Date(a.created_at)-new Date(b.created_at));
                 if (!msgs.length) {
                     feed.innerHTML = `<div class="no-messages"><i class="far fa-comment-dots"></i><p>No messages yet in this group.</p></div>`;
                 } else {
-                    msgs.forEach(m=> appendMessage(m));
+                    msgs.forEach(m=> appendMessage(m, { scroll: false }));
                 }
                 feed.scrollTop = feed.scrollHeight;
             } catch (e) {
@@ -1402,32 +1448,6 @@
             }
         }
 
-        // Unread counts
-        async function refreshUnreadCounts() {
-            try {
-                const resp = await fetch('/chat/unread/');
-                if (!resp.ok) return;
-                const data = await resp.json();
-                let total = 0;
-                if (data && data.unread) {
-                    for (const item of data.unread) {
-                        total += item.count;
-                    }
-                }
-                const badge = document.getElementById('unread-badge');
-                if (badge) {
-                    if (total > 0) {
-                        badge.textContent = total;
-                        badge.style.display = '';
-                    } else {
-                        badge.style.display = 'none';
-                    }
-                }
-            } catch (e) {
-                // Optionally log error
-            }
-        }
-
         // Mark read
         async function markRead(peer) {
             try {
@@ -1439,7 +1459,8 @@
                         'Content-Type': 'application/json',
                         'X-CSRFToken': getCookie('csrftoken'),
                     },
-                    body: JSON.stringify({ peer: normId(peer) })
+                    // mark only what has been shown; later messages stay unread
+                    body: JSON.stringify({ peer: normId(peer), last_read_id: lastSeenMessageId || null })
                 });
                 const data = await resp.json();
                 console.log('✅ markRead response:', data, '- This will trigger blue checkmarks on sender side');
@@ -1997,5 +2018,5 @@
         // Init
         loadMembers();
         loadGroups();
-        refreshUnreadCounts();
-        setInterval(refreshUnreadCounts, 6000);
\ No newline at end of file
+        window.addEventListener('unread-counters', refreshUnreadCounts);
+        if (window.UnreadCounters) window.UnreadCounters.connect(TENANT_ID);
\ No newline at end of file
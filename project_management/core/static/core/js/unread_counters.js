@@ -0,0 +1,109 @@
+// core/static/core/js/unread_counters.js
+/**
+ * Unread counters pushed by the server (core/unread_counters.py).
+ *
+ * A snapshot is loaded from /api/unread-counters whenever the notification
+ * WebSocket (re)connects; 'unread_counter' events then keep it current:
+ *   { kind: 'notification'|'dm'|'group', source, delta }  relative change
+ *   { kind, source, count }                                absolute value (source null: every source)
+ * Every change is announced with a window 'unread-counters' event whose detail
+ * is window.UnreadCounters; nothing here polls.
+ */
+
+(function() {
+    'use strict';
+
+    if (window.UnreadCounters) return;
+
+    const state = { notifications: 0, dm: {}, groups: {} };
+    let loading = null;
+    let socket = null;
+
+    function sum(map) {
+        return Object.values(map).reduce((total, n) => total + (parseInt(n, 10) || 0), 0);
+    }
+
+    function emit() {
+        window.dispatchEvent(new CustomEvent('unread-counters', { detail: api }));
+    }
+
+    function refresh() {
+        if (loading) return loading;
+        loading = fetch('/api/unread-counters', { credentials: 'same-origin' })
+            .then(res => res.ok ? res.json() : null)
+            .then(data => {
+                if (!data) return;
+                state.notifications = parseInt(data.notifications || 0, 10) || 0;
+                state.dm = data.dm || {};
+                state.groups = data.groups || {};
+                emit();
+            })
+            .catch(error => console.error('Error loading unread counters:', error))
+            .finally(() => { loading = null; });
+        return loading;
+    }
+
+    function applyTo(map, event) {
+        const source = event.source === null || event.source === undefined ? null : String(event.source).toLowerCase();
+        if (source === null) {
+            if ('count' in event) Object.keys(map).forEach(key => { map[key] = event.count; });
+            return;
+        }
+        const current = parseInt(map[source] || 0, 10) || 0;
+        map[source] = 'count' in event ? event.count : Math.max(0, current + (event.delta || 0));
+    }
+
+    function apply(event) {
+        if (!event || !event.kind) return;
+        if (event.kind === 'notification') {
+            state.notifications = 'count' in event
+                ? event.count
+                : Math.max(0, state.notifications + (event.delta || 0));
+        } else if (event.kind === 'dm') {
+            applyTo(state.dm, event);
+        } else if (event.kind === 'group') {
+            applyTo(state.groups, event);
+        } else {
+            return;
+        }
+        emit();
+    }
+
+    /**
+     * Open a notification socket just for the counters, for pages that do not
+     * load notifications.js (which feeds its own socket's events to apply()).
+     */
+    function connect(tenantId) {
+        if (!tenantId || socket) return;
+        const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        socket = new WebSocket(`${scheme}://${window.location.host}/ws/notifications/?tenant=${encodeURIComponent(tenantId)}`);
+        socket.onopen = refresh;
+        socket.onmessage = function(ev) {
+            try {
+                const data = JSON.parse(ev.data);
+                if ((data.event || data.type) === 'unread_counter') apply(data);
+            } catch (e) { /* ignore */ }
+        };
+        socket.onclose = function() {
+            socket = null;
+            setTimeout(() => connect(tenantId), 3000);
+        };
+    }
+
+    const api = {
+        state: state,
+        refresh: refresh,
+        apply: apply,
+        connect: connect,
+        dm: source => parseInt(state.dm[String(source || '').toLowerCase()] || 0, 10) || 0,
+        group: groupId => parseInt(state.groups[String(groupId)] || 0, 10) || 0,
+        chatTotal: () => sum(state.dm) + sum(state.groups),
+    };
+
+    window.UnreadCounters = api;
+
+    // counters may have moved while the tab was hidden and the socket asleep
+    document.addEventListener('visibilitychange', function() {
+        if (!document.hidden) refresh();
+    });
+})();
@@ -0,0 +1,571 @@
+# core/task_import.py
+"""
+Streaming bulk import of tasks from CSV / Excel uploads (bulk_import_csv_view).
+
+The upload is never held in memory as a whole:
+  - CSV is decoded and parsed incrementally (csv.DictReader over a text wrapper
+    of the uploaded file, which Django spools to disk above
+    FILE_UPLOAD_MAX_MEMORY_SIZE);
+  - Excel is read with openpyxl in read-only mode, one row at a time.
+
+Rows are validated against lookups loaded once per import (projects, members,
+teams, subprojects); parent tasks of Subtask rows are checked with one query
+per chunk. Valid rows are written TASK_IMPORT_CHUNK_SIZE at a time with
+multi-row INSERTs, each chunk and its activity_log entries in one transaction.
+A chunk the database rejects is retried row by row so the error lands on the
+offending row.
+
+Usage:
+    with open_upload(request.FILES["csv_file"]) as reader:
+        result = TaskImporter(conn, work_type="Task", user_id=5).run(reader)
+    # {"inserted", "total_rows", "errors", "error_count", "warnings"}
+"""
+
+import csv
+import io
+import os
+import time
+import logging
+import datetime
+
+import pymysql
+from django.conf import settings
+
+from .notifications import _insert_chunks
+from . import project_stats, task_stats
+
+logger = logging.getLogger('project_management')
+
+MAX_UPLOAD_BYTES = getattr(settings, "TASK_IMPORT_MAX_BYTES", 500 * 1024 * 1024)
+CHUNK_SIZE = getattr(settings, "TASK_IMPORT_CHUNK_SIZE", 1000)
+# rows listed on the result page; the rest are only counted
+MAX_REPORTED_ERRORS = getattr(settings, "TASK_IMPORT_MAX_ERRORS", 500)
+
+VALID_STATUSES = ["Open", "In Progress", "Review", "Blocked", "Closed", "Pending", "New"]
+VALID_PRIORITIES = ["Low", "Normal", "High", "Critical"]
+VALID_SEVERITIES = ["Low", "Medium", "High", "Critical"]
+
+# Support both old (ID) and new (name) template formats
+REQUIRED_COLS_OLD = {"title", "project_id"}
+REQUIRED_COLS_NEW = {"title", "project_name"}
+OPTIONAL_COLS_OLD = {"description", "subproject_id", "status", "priority", "assigned_to", "due_date", "work_type", "file_attachment"}
+OPTIONAL_COLS_NEW = {
+    "description", "subproject_name", "status", "priority", "assigned_to_name", "due_date", "work_type", "note", "file_attachment",
+    # Bug/Defect specific
+    "severity", "steps_to_reproduce", "expected_behavior", "actual_behavior",
+    # Story specific
+    "story_points", "acceptance_criteria",
+    # Subtask specific
+    "parent_task_id",
+    # Report specific
+    "report_type",
+    # Change Request specific
+    "change_type", "impact"
+}
+
+# every VALUES slot must be a placeholder: pymysql only folds executemany() into
+# one multi-row INSERT when the VALUES list matches RE_INSERT_VALUES (created_at
+# comes from the column default)
+_INSERT_SQL = """
+    INSERT INTO tasks
+      (project_id, subproject_id, title, description, status, priority, work_type,
+       assigned_to, assigned_type, created_by, due_date)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+_ACTIVITY_SQL = "INSERT INTO activity_log (entity_type, entity_id, action, performed_by) VALUES (%s, %s, %s, %s)"
+
+
+class ImportFileError(Exception):
+    """The upload as a whole cannot be read (reported as row 0)."""
+
+
+class RowError(ValueError):
+    """A row fails validation; the message is shown next to the row."""
+
+
+class UploadReader:
+    """
+    Rows of an uploaded CSV or Excel file as dicts, read lazily. fieldnames is
+    available as soon as the reader is open. Use as a context manager.
+    """
+
+    def __init__(self, uploaded_file):
+        name = uploaded_file.name.lower()
+        if not (name.endswith('.csv') or name.endswith('.xlsx') or name.endswith('.xls')):
+            raise ImportFileError("Invalid file type. Please upload a CSV or Excel file (.csv, .xlsx, .xls)")
+        if uploaded_file.size > MAX_UPLOAD_BYTES:
+            raise ImportFileError(f"File size exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)}MB limit")
+
+        self._workbook = None
+        self._text = None
+        self._raw = uploaded_file.file
+        self._size = uploaded_file.size
+        self._total_rows = None
+        if name.endswith('.csv'):
+            uploaded_file.seek(0)
+            # utf-8-sig also reads files without a BOM
+            self._text = io.TextIOWrapper(uploaded_file.file, encoding="utf-8-sig", newline="")
+            try:
+                self._reader = csv.DictReader(self._text)
+                self.fieldnames = self._reader.fieldnames or []
+            except UnicodeDecodeError:
+                self.close()
+                raise ImportFileError("Unable to decode CSV file. Please ensure it's UTF-8 encoded.")
+            self._rows = self._csv_rows()
+        else:
+            from openpyxl import load_workbook
+            try:
+                self._workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+                ws = self._workbook.active
+                self._sheet_rows = ws.iter_rows(values_only=True)
+                header = next(self._sheet_rows, None) or ()
+                # from the sheet's <dimension>, when the writer recorded one
+                self._total_rows = (ws.max_row - 1) if ws.max_row else None
+            except Exception as e:
+                self.close()
+                raise ImportFileError(f"Unable to read Excel file: {str(e)}")
+            self.fieldnames = [str(cell).strip() if cell else '' for cell in header]
+            self._rows = self._excel_rows()
+
+    def _csv_rows(self):
+        try:
+            for row in self._reader:
+                yield row
+        except UnicodeDecodeError:
+            raise ImportFileError(
+                f"Unable to decode CSV file after line {self._reader.line_num}. "
+                f"Please ensure it's UTF-8 encoded."
+            )
+
+    def _excel_rows(self):
+        headers = self.fieldnames
+        for row in self._sheet_rows:
+            if not any(row):  # Skip empty rows
+                continue
+            row_dict = {}
+            for col_idx, value in enumerate(row[:len(headers)]):
+                row_dict[headers[col_idx]] = _cell_text(value)
+            yield row_dict
+
+    def __iter__(self):
+        return self._rows
+
+    def progress(self, rows_read):
+        """Estimated fraction of the file read (0..1), or None when unknown."""
+        if self._total_rows:
+            return min(1.0, rows_read / self._total_rows)
+        if self._text is not None and self._size:
+            try:
+                # position of the raw upload; the text layer reads a little ahead
+                return min(1.0, self._raw.tell() / self._size)
+            except (OSError, ValueError):
+                return None
+        return None
+
+    def close(self):
+        if self._workbook is not None:
+            # read-only workbooks keep the file open until closed
+            self._workbook.close()
+            self._workbook = None
+        if self._text is not None:
+            # leave the upload itself open for Django to clean up
+            self._text.detach()
+            self._text = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_upload(uploaded_file):
+    """UploadReader over a Django UploadedFile; raises ImportFileError."""
+    return UploadReader(uploaded_file)
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'strftime'):  # Date object
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, float) and value.is_integer():
+        # numeric ids typed into Excel come back as floats
+        return str(int(value))
+    return str(value).strip()
+
+
+class TaskImporter:
+    """
+    Validates and inserts the rows of one upload into a tenant database.
+    conn is an autocommit tenant connection; every chunk runs in its own
+    transaction on it.
+    """
+
+    def __init__(self, conn, work_type="Task", user_id=None, chunk_size=None):
+        self.conn = conn
+        self.work_type = work_type or "Task"
+        self.user_id = user_id
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.inserted = 0
+        self.total_rows = 0
+        self.errors = []
+        self.error_count = 0
+        self.warnings = []
+
+    # ------------------------------------------------------------------
+    # results
+    # ------------------------------------------------------------------
+    def _error(self, row_number, message, data=None):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message, "data": dict(data or {})})
+
+    def result(self):
+        warnings = list(self.warnings)
+        if self.error_count > len(self.errors):
+            warnings.append(f"Only the first {len(self.errors)} of {self.error_count} errors are listed.")
+        return {
+            "inserted": self.inserted,
+            "total_rows": self.total_rows,
+            "errors": self.errors,
+            "error_count": self.error_count,
+            "warnings": warnings,
+        }
+
+    # ------------------------------------------------------------------
+    # lookups
+    # ------------------------------------------------------------------
+    def _load_lookups(self):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT id, name FROM projects")
+            projects = cur.fetchall()
+            self.projects_by_name = {row['name']: row['id'] for row in projects}
+            self.valid_projects = {str(row['id']) for row in projects}
+
+            cur.execute("SELECT id, CONCAT(first_name, ' ', last_name) as name FROM members")
+            members = cur.fetchall()
+            self.members_by_name = {row['name']: row['id'] for row in members}
+            self.valid_members = {str(row['id']) for row in members}
+
+            cur.execute("SELECT id, name, project_id FROM subprojects")
+            subprojects = cur.fetchall()
+            self.subprojects_by_name = {(row['name'], row['project_id']): row['id'] for row in subprojects}
+            self.valid_subprojects = {(str(row['id']), row['project_id']) for row in subprojects}
+
+            cur.execute("SELECT id FROM teams")
+            self.valid_teams = {str(row['id']) for row in cur.fetchall()}
+        finally:
+            cur.close()
+
+    # ------------------------------------------------------------------
+    # validation
+    # ------------------------------------------------------------------
+    def _check_columns(self, fieldnames):
+        present = set(fieldnames or [])
+        self.using_names = "project_name" in present
+        if self.using_names:
+            required_cols, optional_cols = REQUIRED_COLS_NEW, OPTIONAL_COLS_NEW
+        else:
+            required_cols, optional_cols = REQUIRED_COLS_OLD, OPTIONAL_COLS_OLD
+
+        missing = required_cols - present
+        if missing:
+            raise ImportFileError(f"Missing required columns: {', '.join(sorted(missing))}")
+
+        # Warn about unexpected columns
+        unexpected = present - (required_cols | optional_cols)
+        if unexpected:
+            self.warnings.append(f"Unexpected columns will be ignored: {', '.join(sorted(unexpected))}")
+
+    def _project(self, row):
+        if self.using_names:
+            project_name = row.get("project_name") or ""
+            if not project_name:
+                raise RowError("Missing required field: project_name")
+            if project_name not in self.projects_by_name:
+                raise RowError(f"Invalid project_name: '{project_name}'. Project does not exist.")
+            return self.projects_by_name[project_name]
+
+        project_id = str(row.get("project_id") or "")
+        if not project_id:
+            raise RowError("Missing required field: project_id")
+        if project_id not in self.valid_projects:
+            raise RowError(f"Invalid project_id: {project_id}. Project does not exist.")
+        return int(project_id)
+
+    def _subproject(self, row, project_id):
+        if self.using_names:
+            subproject_name = row.get("subproject_name") or ""
+            if not subproject_name:
+                return None
+            key = (subproject_name, project_id)
+            if key not in self.subprojects_by_name:
+                raise RowError(f"Invalid subproject_name: '{subproject_name}' for selected project")
+            return self.subprojects_by_name[key]
+
+        subproject_id = row.get("subproject_id") or ""
+        if not subproject_id:
+            return None
+        if (subproject_id, project_id) not in self.valid_subprojects:
+            raise RowError(f"Invalid subproject_id: {subproject_id} for project {project_id}")
+        return int(subproject_id)
+
+    def _assignee(self, row):
+        """(assigned_to, assigned_type)"""
+        if self.using_names:
+            # New format: assigned_to_name column with member names
+            assigned_name = row.get("assigned_to_name") or ""
+            if not assigned_name:
+                return None, None
+            if assigned_name not in self.members_by_name:
+                raise RowError(f"Invalid assigned_to_name: '{assigned_name}'. Member does not exist.")
+            return self.members_by_name[assigned_name], "member"
+
+        # Old format: assigned_to column with 'member:ID' or 'team:ID' or plain ID
+        assigned_raw = row.get("assigned_to") or ""
+        if not assigned_raw:
+            return None, None
+        if ":" in assigned_raw:
+            atype, aid = assigned_raw.split(":", 1)
+            atype = atype.strip().lower()
+            aid = aid.strip()
+            if atype not in ("member", "team"):
+                raise RowError(f"Invalid assigned_to type '{atype}'. Use 'member:ID' or 'team:ID'.")
+            if not aid.isdigit():
+                raise RowError(f"Invalid assigned_to id '{aid}'. Must be numeric.")
+            if atype == "member" and aid not in self.valid_members:
+                raise RowError(f"Invalid member ID: {aid}. Member does not exist.")
+            if atype == "team" and aid not in self.valid_teams:
+                raise RowError(f"Invalid team ID: {aid}. Team does not exist.")
+            return int(aid), atype
+
+        # Assume member id
+        if not assigned_raw.isdigit():
+            raise RowError(f"Invalid assigned_to value '{assigned_raw}'. Use 'member:ID', 'team:ID', or numeric member ID.")
+        if assigned_raw not in self.valid_members:
+            raise RowError(f"Invalid member ID: {assigned_raw}. Member does not exist.")
+        return int(assigned_raw), "member"
+
+    def _validate(self, row):
+        """
+        (task params, parent_task_id, file_attachment) for a stripped row;
+        raises RowError.
+        """
+        if not row.get("title"):
+            raise RowError("Missing required field: title")
+
+        project_id = self._project(row)
+        subproject_id = self._subproject(row, project_id)
+        assigned_to, assigned_type = self._assignee(row)
+
+        status = row.get("status") or "Open"
+        if status not in VALID_STATUSES:
+            raise RowError(f"Invalid status: {status}. Must be one of: {', '.join(VALID_STATUSES)}")
+
+        priority = row.get("priority") or "Normal"
+        if priority not in VALID_PRIORITIES:
+            raise RowError(f"Invalid priority: {priority}. Must be one of: {', '.join(VALID_PRIORITIES)}")
+
+        # Validate due_date (empty allowed, YYYY-MM-DD only)
+        due_date = row.get("due_date") or None
+        if due_date:
+            try:
+                datetime.datetime.strptime(due_date, "%Y-%m-%d")
+            except ValueError:
+                raise RowError("Invalid due_date. Use YYYY-MM-DD format (e.g., 2024-12-31).")
+
+        # work_type from the file if present, otherwise from the form
+        row_work_type = row.get("work_type") or self.work_type
+
+        # Build description with work-type-specific fields
+        description = row.get("description") or ""
+        parent_task_id = None
+        if row_work_type in ["Bug", "Defect"]:
+            severity = row.get("severity") or ""
+            if severity:
+                if severity not in VALID_SEVERITIES:
+                    raise RowError(f"Invalid severity: {severity}. Must be one of: {', '.join(VALID_SEVERITIES)}")
+                # Use severity as priority for bugs/defects
+                priority = severity
+            if row.get("steps_to_reproduce"):
+                description += f"\n\n**Steps to Reproduce:**\n{row.get('steps_to_reproduce')}"
+            if row.get("expected_behavior"):
+                description += f"\n\n**Expected Behavior:**\n{row.get('expected_behavior')}"
+            if row.get("actual_behavior"):
+                description += f"\n\n**Actual Behavior:**\n{row.get('actual_behavior')}"
+
+        elif row_work_type == "Story":
+            if row.get("story_points"):
+                description += f"\n\n**Story Points:** {row.get('story_points')}"
+            if row.get("acceptance_criteria"):
+                description += f"\n\n**Acceptance Criteria:**\n{row.get('acceptance_criteria')}"
+
+        elif row_work_type == "Subtask":
+            parent = row.get("parent_task_id") or ""
+            if parent:
+                if not parent.isdigit():
+                    raise RowError(f"Invalid parent_task_id: {parent}. Parent task does not exist.")
+                # existence is checked per chunk (_check_parents)
+                parent_task_id = int(parent)
+                description += f"\n\n**Parent Task ID:** {parent}"
+
+        elif row_work_type == "Report":
+            if row.get("report_type"):
+                description += f"\n\n**Report Type:** {row.get('report_type')}"
+
+        elif row_work_type == "Change Request":
+            if row.get("change_type"):
+                description += f"\n\n**Change Type:** {row.get('change_type')}"
+            if row.get("impact"):
+                description += f"\n\n**Impact:** {row.get('impact')}"
+
+        params = (
+            project_id, subproject_id, row["title"], description, status, priority,
+            row_work_type, assigned_to, assigned_type, self.user_id, due_date,
+        )
+        return params, parent_task_id, row.get("file_attachment") or ""
+
+    # ------------------------------------------------------------------
+    # writing
+    # ------------------------------------------------------------------
+    def _check_parents(self, pending):
+        """Drop (and report) pending rows whose parent task does not exist."""
+        parent_ids = {p[3] for p in pending if p[3]}
+        if not parent_ids:
+            return pending
+        cur = self.conn.cursor()
+        try:
+            placeholders = ", ".join(["%s"] * len(parent_ids))
+            cur.execute(f"SELECT id FROM tasks WHERE id IN ({placeholders})", tuple(parent_ids))
+            existing = {row['id'] for row in cur.fetchall()}
+        finally:
+            cur.close()
+        kept = []
+        for p in pending:
+            if p[3] and p[3] not in existing:
+                self._error(p[0], f"Invalid parent_task_id: {p[3]}. Parent task does not exist.", p[1])
+            else:
+                kept.append(p)
+        return kept
+
+    def _insert(self, cur, params_list):
+        """Multi-row INSERT of params_list; returns the new task ids in order."""
+        ids = []
+        for chunk in _insert_chunks(params_list):
+            cur.executemany(_INSERT_SQL, chunk)
+            # one simple insert per chunk: consecutive ids from LAST_INSERT_ID()
+            ids.extend(range(cur.lastrowid, cur.lastrowid + len(chunk)))
+        return ids
+
+    def _log_activity(self, cur, task_ids):
+        try:
+            cur.executemany(_ACTIVITY_SQL, [
+                ("task", task_id, "created via bulk import", self.user_id) for task_id in task_ids
+            ])
+        except pymysql.MySQLError as e:
+            # Don't fail import if logging fails
+            logger.warning(f"[bulk_import] activity_log insert failed: {e}")
+
+    def _write(self, pending):
+        """pending: [(row_number, raw_row, params, parent_task_id, file_attachment)]"""
+        pending = self._check_parents(pending)
+        if not pending:
+            return
+        cur = self.conn.cursor()
+        try:
+            self.conn.begin()
+            try:
+                task_ids = self._insert(cur, [p[2] for p in pending])
+                self._log_activity(cur, task_ids)
+                task_stats.added(self.conn, task_ids)
+                self.conn.commit()
+                written = list(zip(pending, task_ids))
+            except pymysql.MySQLError as e:
+                self.conn.rollback()
+                logger.warning(f"[bulk_import] chunk of {len(pending)} rows failed ({e}), retrying row by row")
+                written = self._write_rows(cur, pending)
+            self.inserted += len(written)
+            project_stats.mark_tasks(self.conn, [task_id for _, task_id in written])
+            for p, task_id in written:
+                if p[4]:
+                    self._attach_file(cur, p[0], task_id, p[4])
+        finally:
+            cur.close()
+
+    def _write_rows(self, cur, pending):
+        written = []
+        for p in pending:
+            try:
+                self.conn.begin()
+                task_id = self._insert(cur, [p[2]])[0]
+                self._log_activity(cur, [task_id])
+                task_stats.added(self.conn, [task_id])
+                self.conn.commit()
+                written.append((p, task_id))
+            except pymysql.MySQLError as e:
+                self.conn.rollback()
+                self._error(p[0], str(e), p[1])
+        return written
+
+    def _attach_file(self, cur, row_number, task_id, file_path):
+        """Copy a file referenced by path on the server into task_attachments."""
+        if not os.path.exists(file_path):
+            self.warnings.append(f"Row {row_number}: File not found: '{file_path}'")
+            return
+        try:
+            filename = os.path.basename(file_path)
+            unique_filename = f"{task_id}_{int(time.time())}_{filename}"
+            upload_dir = os.path.join(settings.MEDIA_ROOT, 'task_attachments')
+            os.makedirs(upload_dir, exist_ok=True)
+            with open(file_path, 'rb') as src, open(os.path.join(upload_dir, unique_filename), 'wb') as dest:
+                while True:
+                    block = src.read(1024 * 1024)
+                    if not block:
+                        break
+                    dest.write(block)
+            cur.execute(
+                """INSERT INTO task_attachments
+                   (task_id, file_path, uploaded_by, uploaded_at)
+                   VALUES (%s, %s, %s, NOW())""",
+                (task_id, f'task_attachments/{unique_filename}', self.user_id)
+            )
+        except Exception as e:
+            self.warnings.append(f"Row {row_number}: Could not attach file '{file_path}': {str(e)}")
+
+    # ------------------------------------------------------------------
+    # driver
+    # ------------------------------------------------------------------
+    def run(self, reader):
+        """
+        Import every row of reader (an UploadReader, or any object with
+        fieldnames that iterates dict rows). Returns result().
+        """
+        try:
+            self._check_columns(reader.fieldnames)
+        except ImportFileError as e:
+            self._error(0, str(e))
+            return self.result()
+        self._load_lookups()
+
+        pending = []
+        try:
+            for i, raw_row in enumerate(reader, start=1):
+                self.total_rows = i
+                # Normalize/strip all values
+                row = {k: (v.strip() if isinstance(v, str) else v) for k, v in raw_row.items()}
+                try:
+                    params, parent_task_id, attachment = self._validate(row)
+                except RowError as e:
+                    self._error(i, str(e), raw_row)
+                    continue
+                pending.append((i, raw_row, params, parent_task_id, attachment))
+                if len(pending) >= self.chunk_size:
+                    self._write(pending)
+                    pending = []
+        except ImportFileError as e:
+            self._error(0, str(e))
+        self._write(pending)
+        return self.result()
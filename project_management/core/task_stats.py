@@ -0,0 +1,233 @@
+# core/task_stats.py
+"""
+Task count rollup.
+
+task_stats (table in TENANT_DDL) holds one row per
+(project_id, assigned_type, assigned_to, work_type, status, priority) with the
+number of tasks having those values, so the analytics page, the dashboards and
+the team summary aggregate a few hundred rollup rows instead of every task.
+NULLs are stored as 0 / '' (key columns cannot be NULL) and restored on read.
+
+Writers keep the rollup in sync in the transaction of the change:
+
+    with task_stats.tracking(conn, [task_id]):          # UPDATE / DELETE
+        cur.execute("UPDATE tasks SET status = %s WHERE id = %s", ...)
+
+    with task_stats.tracking(conn) as tracked:          # INSERT
+        cur.execute("INSERT INTO tasks ...")
+        tracked.add([cur.lastrowid])
+
+tracking() locks the tasks' rows and reads their keys before the block, reads
+them again after it and applies the difference as +n / -n upserts. It opens a
+transaction when the connection is not already in one and commits it at the
+end of the block. added() applies new task ids inside a caller's transaction.
+Rows that drop to 0 stay until reconcile() removes them; readers skip them.
+
+reconcile() recomputes the rollup from tasks and repairs rows that drifted
+(writes that bypassed tracking, failed requests); scripts/reconcile_task_stats.py
+runs it for every tenant, once or every N seconds.
+
+Readers write their query over "{stats} t", which exposes the key columns
+(NULLs restored) and task_count; query() fills it in and falls back to the
+tasks table for tenants without the rollup:
+
+    rows = task_stats.query(conn,
+        "SELECT t.status, SUM(t.task_count) AS c FROM {stats} t WHERE ... GROUP BY t.status", params)
+"""
+
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+logger = logging.getLogger('project_management')
+
+KEY_COLUMNS = ("project_id", "assigned_type", "assigned_to", "work_type", "status", "priority")
+
+# MySQL error: table doesn't exist
+_ER_NO_SUCH_TABLE = 1146
+
+_CHUNK = 1000
+
+# a task's rollup key, NULLs mapped to the stored sentinels
+_KEY_SELECT = """
+    COALESCE(project_id, 0) AS project_id,
+    COALESCE(assigned_type, '') AS assigned_type,
+    COALESCE(assigned_to, 0) AS assigned_to,
+    COALESCE(work_type, '') AS work_type,
+    COALESCE(status, '') AS status,
+    COALESCE(priority, '') AS priority
+"""
+
+_ROLLUP_SOURCE = """(
+    SELECT NULLIF(project_id, 0) AS project_id, NULLIF(assigned_type, '') AS assigned_type,
+           NULLIF(assigned_to, 0) AS assigned_to, NULLIF(work_type, '') AS work_type,
+           NULLIF(status, '') AS status, NULLIF(priority, '') AS priority, task_count
+    FROM task_stats
+    WHERE task_count <> 0
+)"""
+
+_TASKS_SOURCE = """(
+    SELECT project_id, assigned_type, assigned_to, work_type, status, priority, 1 AS task_count
+    FROM tasks
+)"""
+
+_ADD_SQL = f"""
+    INSERT INTO task_stats ({', '.join(KEY_COLUMNS)}, task_count)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE task_count = task_count + VALUES(task_count)
+"""
+
+_SET_SQL = f"""
+    INSERT INTO task_stats ({', '.join(KEY_COLUMNS)}, task_count)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE task_count = VALUES(task_count)
+"""
+
+
+def _missing_table(exc):
+    return isinstance(exc, pymysql.err.ProgrammingError) and exc.args[0] == _ER_NO_SUCH_TABLE
+
+
+def _key(row):
+    return tuple(row[c] for c in KEY_COLUMNS)
+
+
+def _match_key(key):
+    """Key as the table's primary key compares it (case-insensitive, trailing spaces ignored)."""
+    return tuple(v.rstrip().casefold() if isinstance(v, str) else v for v in key)
+
+
+def _keys(conn, task_ids, lock=False):
+    """Counter of rollup keys of task_ids."""
+    keys = Counter()
+    ids = sorted({int(i) for i in task_ids if i})
+    if not ids:
+        return keys
+    cur = conn.cursor()
+    try:
+        for i in range(0, len(ids), _CHUNK):
+            chunk = ids[i:i + _CHUNK]
+            cur.execute(
+                f"SELECT {_KEY_SELECT} FROM tasks WHERE id IN ({', '.join(['%s'] * len(chunk))})"
+                + (" FOR UPDATE" if lock else ""),
+                chunk,
+            )
+            keys.update(_key(r) for r in cur.fetchall())
+    finally:
+        cur.close()
+    return keys
+
+
+def apply(conn, before, after):
+    """Apply the difference between two key Counters to the rollup."""
+    delta = Counter(after)
+    delta.subtract(before)
+    rows = [key + (n,) for key, n in sorted(delta.items(), key=lambda kv: _match_key(kv[0])) if n]
+    if not rows:
+        return
+    cur = conn.cursor()
+    try:
+        cur.executemany(_ADD_SQL, rows)
+    except pymysql.err.ProgrammingError as e:
+        if not _missing_table(e):
+            raise
+    finally:
+        cur.close()
+
+
+def added(conn, task_ids):
+    """Count newly inserted task_ids (call in the transaction of the INSERT)."""
+    apply(conn, Counter(), _keys(conn, task_ids))
+
+
+class _Tracked:
+    def __init__(self, task_ids):
+        self.task_ids = list(task_ids or [])
+        self.new_ids = []
+
+    def add(self, task_ids):
+        """Register tasks inserted inside the block."""
+        self.new_ids.extend(task_ids)
+
+
+@contextmanager
+def tracking(conn, task_ids=None):
+    """
+    Keep the rollup in sync with the task writes made inside the block (see the
+    module docstring). The write and the rollup change commit together.
+    """
+    tracked = _Tracked(task_ids)
+    own_transaction = not (conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS)
+    if own_transaction:
+        conn.begin()
+    try:
+        before = _keys(conn, tracked.task_ids, lock=True)
+        yield tracked
+        apply(conn, before, _keys(conn, tracked.task_ids + tracked.new_ids))
+    except Exception:
+        if own_transaction:
+            conn.rollback()
+        raise
+    if own_transaction:
+        conn.commit()
+
+
+def query(conn, sql, params=None):
+    """Run sql with {stats} replaced by the rollup (or tasks, without the table); returns the rows."""
+    cur = conn.cursor()
+    try:
+        try:
+            cur.execute(sql.format(stats=_ROLLUP_SOURCE), params)
+        except pymysql.err.ProgrammingError as e:
+            if not _missing_table(e):
+                raise
+            cur.execute(sql.format(stats=_TASKS_SOURCE), params)
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+def reconcile(conn):
+    """
+    Recompute the rollup from tasks and repair the rows that differ.
+    Returns the number of rows written or deleted.
+
+    The rollup rows are locked first, so writers wait for the repair and their
+    deltas apply on top of it; their task changes are either committed before
+    the count (and counted) or applied after it.
+    """
+    cur = conn.cursor()
+    try:
+        conn.begin()
+        try:
+            cur.execute(f"SELECT {', '.join(KEY_COLUMNS)}, task_count FROM task_stats FOR UPDATE")
+            current = {_match_key(_key(r)): (_key(r), r['task_count']) for r in cur.fetchall()}
+            cur.execute(f"""
+                SELECT {_KEY_SELECT}, COUNT(*) AS task_count
+                FROM tasks
+                GROUP BY 1, 2, 3, 4, 5, 6
+            """)
+            actual = {_match_key(_key(r)): (_key(r), r['task_count']) for r in cur.fetchall()}
+
+            repairs = [key + (n,) for k, (key, n) in actual.items() if current.get(k, (None, None))[1] != n]
+            stale = [key for k, (key, _) in current.items() if k not in actual]
+            if repairs:
+                cur.executemany(_SET_SQL, repairs)
+            if stale:
+                where = " AND ".join(f"{c} = %s" for c in KEY_COLUMNS)
+                cur.executemany(f"DELETE FROM task_stats WHERE {where}", stale)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            if _missing_table(e):
+                logger.info("[task_stats] no task_stats table, nothing to reconcile")
+                return 0
+            raise
+    finally:
+        cur.close()
+    if repairs or stale:
+        logger.info(f"[task_stats] reconciled: {len(repairs)} row(s) corrected, {len(stale)} removed")
+    return len(repairs) + len(stale)
@@ -0,0 +1,116 @@
+# core/task_visibility.py
+"""
+Task visibility policies.
+
+A policy turns "which members' tasks may this member see" into a SQL predicate on
+the tasks table, so views filter in the database instead of materializing the
+member list and splicing it into `assigned_to IN (...)`.
+
+Modes (clients_master.task_visibility, falling back to settings.TASK_VISIBILITY_MODE):
+    all   - everyone sees every member-assigned task (no extra filter)
+    team  - own tasks, tasks of members sharing a team, and of members of teams one leads
+    own   - only tasks assigned to the member
+
+Usage:
+    from core.task_visibility import get_visibility_policy
+
+    vis_sql, vis_params = get_visibility_policy(tenant_key).predicate(member_id, alias="t")
+    cur.execute(f"SELECT ... FROM tasks t WHERE {vis_sql} AND ...", vis_params + other_params)
+
+Policies are cached per tenant for TASK_VISIBILITY_CACHE_TTL seconds.
+"""
+
+import threading
+import time
+import logging
+
+from django.conf import settings
+
+from core.tenant_registry import tenant_registry
+
+logger = logging.getLogger('utility')
+
+_DEFAULT_MODE = getattr(settings, "TASK_VISIBILITY_MODE", "all")
+_POLICY_CACHE_TTL = getattr(settings, "TASK_VISIBILITY_CACHE_TTL", 300)
+
+
+class VisibilityPolicy:
+    """Compiles a visibility mode into a WHERE fragment over the tasks table."""
+
+    MODES = ("all", "team", "own")
+
+    def __init__(self, mode):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown task visibility mode: {mode}")
+        self.mode = mode
+
+    def predicate(self, member_id, alias="t"):
+        """
+        Return (sql, params) selecting the tasks member_id may see. Tasks assigned
+        to teams are not member-visible here, matching the existing board filters.
+        """
+        col = f"{alias}." if alias else ""
+        if not member_id:
+            return "1 = 0", []
+        if self.mode == "all":
+            return f"{col}assigned_type = 'member'", []
+        if self.mode == "own":
+            return f"({col}assigned_type = 'member' AND {col}assigned_to = %s)", [member_id]
+        return (
+            f"({col}assigned_type = 'member' AND ("
+            f"{col}assigned_to = %s"
+            f" OR EXISTS (SELECT 1 FROM team_memberships vis_me"
+            f" JOIN team_memberships vis_tm ON vis_tm.team_id = vis_me.team_id"
+            f" WHERE vis_me.member_id = %s AND vis_tm.member_id = {col}assigned_to)"
+            f" OR EXISTS (SELECT 1 FROM teams vis_lead"
+            f" JOIN team_memberships vis_ltm ON vis_ltm.team_id = vis_lead.id"
+            f" WHERE vis_lead.team_lead_id = %s AND vis_ltm.member_id = {col}assigned_to)"
+            f"))",
+            [member_id, member_id, member_id],
+        )
+
+    def __repr__(self):
+        return f"<VisibilityPolicy {self.mode}>"
+
+
+_POLICIES = {mode: VisibilityPolicy(mode) for mode in VisibilityPolicy.MODES}
+
+_lock = threading.Lock()
+_tenant_policies = {}  # tenant_key -> (policy, expires_at)
+
+
+def _resolve_mode(tenant_key):
+    mode = None
+    try:
+        row = tenant_registry.lookup(tenant_key) if tenant_key else None
+        mode = (row or {}).get("task_visibility")
+    except Exception as e:
+        logger.error(f"Error resolving task visibility for {tenant_key}: {e}")
+    mode = (mode or _DEFAULT_MODE or "all").strip().lower()
+    if mode not in _POLICIES:
+        logger.warning(f"Unknown task visibility mode '{mode}' for {tenant_key}; using 'all'")
+        mode = "all"
+    return mode
+
+
+def get_visibility_policy(tenant_key):
+    """Return the VisibilityPolicy of a tenant (cached per tenant)."""
+    key = str(tenant_key or "")
+    now = time.time()
+    with _lock:
+        entry = _tenant_policies.get(key)
+        if entry and entry[1] > now:
+            return entry[0]
+    policy = _POLICIES[_resolve_mode(tenant_key)]
+    with _lock:
+        _tenant_policies[key] = (policy, now + _POLICY_CACHE_TTL)
+    return policy
+
+
+def invalidate_visibility_policy(tenant_key=None):
+    """Forget the cached policy of a tenant (all tenants when tenant_key is None)."""
+    with _lock:
+        if tenant_key is None:
+            _tenant_policies.clear()
+        else:
+            _tenant_policies.pop(str(tenant_key), None)
@@ -0,0 +1,91 @@
+# core/tenant_cache.py
+"""
+Small in-process TTL cache whose entries belong to a tenant.
+
+Entries are keyed by (tenant_key, *parts). invalidate(tenant_key) bumps the
+tenant's generation, so a value computed before the invalidation is never stored
+afterwards (a request racing a write cannot re-cache stale data).
+
+Usage:
+    _counts = TenantScopedCache(ttl=30)
+
+    gen = _counts.generation(tenant_key)
+    value = _counts.get(tenant_key, member_id, "open")
+    if value is None:
+        value = compute()
+        _counts.put(tenant_key, (member_id, "open"), value, gen)
+    ...
+    _counts.invalidate(tenant_key)   # after a write
+
+The cache is per process; the TTL bounds how stale another worker process can be.
+"""
+
+import copy
+import threading
+import time
+
+
+class TenantScopedCache:
+    """Thread-safe TTL cache with tenant-wide invalidation."""
+
+    def __init__(self, ttl, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}       # (tenant, *parts) -> (value, generation, expires_at)
+        self._generations = {}   # tenant -> generation, bumped on invalidation
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, tenant_key, parts):
+        return (str(tenant_key),) + tuple(str(p) for p in parts)
+
+    def get(self, tenant_key, *parts):
+        """Return a copy of the cached value, or None."""
+        key = self._key(tenant_key, parts)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, generation, expires_at = entry
+                if expires_at > now and generation == self._generations.get(key[0], 0):
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                self._entries.pop(key, None)
+            self.misses += 1
+        return None
+
+    def generation(self, tenant_key):
+        """Read before computing a value; pass it to put()."""
+        with self._lock:
+            return self._generations.get(str(tenant_key), 0)
+
+    def put(self, tenant_key, parts, value, generation):
+        """Store value computed under `generation`; dropped if the tenant was invalidated meanwhile."""
+        key = self._key(tenant_key, parts)
+        now = time.time()
+        with self._lock:
+            if generation != self._generations.get(key[0], 0):
+                return
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[2] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = (copy.deepcopy(value), generation, now + self.ttl)
+
+    def invalidate(self, tenant_key=None):
+        """Drop cached values of one tenant, or of every tenant when tenant_key is None."""
+        with self._lock:
+            if tenant_key is None:
+                self._entries.clear()
+                for key in self._generations:
+                    self._generations[key] += 1
+                return
+            tenant_key = str(tenant_key)
+            self._generations[tenant_key] = self._generations.get(tenant_key, 0) + 1
+            for key in [k for k in self._entries if k[0] == tenant_key]:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
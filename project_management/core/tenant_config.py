@@ -0,0 +1,84 @@
+# core/tenant_config.py
+"""
+Per-tenant configuration kept in master_db (currently the enabled work types),
+cached in-process and shared by all threads.
+
+A tenant's configuration is loaded on first use with one master_db query and
+served from memory afterwards, so the context processor and the task views no
+longer open a master_db connection per page.
+
+Usage:
+    from core.tenant_config import get_tenant_config, invalidate_tenant_config
+
+    config = get_tenant_config(tenant_id)    # clients_master.id
+    config["work_types"]                     # ['Bug', 'Task', ...]
+    ...
+    invalidate_tenant_config(tenant_id)      # after editing the tenant's settings
+
+The cache is per process; TENANT_CONFIG_TTL bounds how stale another worker
+process can be.
+"""
+
+import logging
+
+from django.conf import settings
+
+from core.auth import MASTER_DB_CONFIG
+from core.db_connector import get_connection_from_config
+from core.tenant_cache import TenantScopedCache
+
+logger = logging.getLogger('utility')
+
+_CONFIG_TTL = getattr(settings, "TENANT_CONFIG_TTL", 300)
+
+DEFAULT_WORK_TYPES = ['Task', 'Bug', 'Story', 'Defect', 'Sub Task', 'Report', 'Change Request']
+
+_cache = TenantScopedCache(ttl=_CONFIG_TTL, max_entries=5000)
+
+
+def _load(tenant_id):
+    conn = get_connection_from_config(MASTER_DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT work_type
+                FROM tenant_work_types
+                WHERE tenant_id = %s AND is_enabled = TRUE
+                ORDER BY work_type
+            """, (tenant_id,))
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+    return {
+        # no configuration rows means every work type is enabled
+        "work_types": [r['work_type'] for r in rows] or list(DEFAULT_WORK_TYPES),
+    }
+
+
+def get_tenant_config(tenant_id):
+    """
+    Return the configuration dict of a tenant (clients_master.id). Falls back to
+    the defaults, without caching them, when master_db cannot be read.
+    """
+    if not tenant_id:
+        return {"work_types": list(DEFAULT_WORK_TYPES)}
+    config = _cache.get(tenant_id, "config")
+    if config is not None:
+        return config
+    generation = _cache.generation(tenant_id)
+    try:
+        config = _load(tenant_id)
+    except Exception as e:
+        logger.error(f"Error loading tenant configuration for {tenant_id}: {e}")
+        return {"work_types": list(DEFAULT_WORK_TYPES)}
+    _cache.put(tenant_id, ("config",), config, generation)
+    return config
+
+
+def invalidate_tenant_config(tenant_id=None):
+    """Forget the cached configuration of a tenant (all tenants when tenant_id is None)."""
+    _cache.invalidate(tenant_id)
+
+
+def tenant_config_stats():
+    return _cache.stats()
@@ -0,0 +1,331 @@
+# core/tenant_migrations.py
+"""
+Versioned schema migrations for tenant databases, run across tenants in parallel.
+
+SCHEMA_MIGRATIONS is an ordered list of idempotent steps (base DDL, seed data,
+columns added after the first releases). master_db.tenant_schema_versions
+records, per tenant, the last completed step, the run status, the last error
+and the run duration, so:
+  - a tenant already at the target version is skipped;
+  - a failed or interrupted run resumes at the first step not recorded;
+  - a per-tenant MySQL named lock keeps two runners off the same tenant.
+After the schema steps every run reconciles secondary indexes
+(core.index_migrations), which are versioned separately in each tenant.
+
+Tenants without credentials in clients_master (db_user IS NULL) are created
+first (database, user, grants).
+
+Usage:
+    from core.tenant_migrations import TenantMigrationRunner
+
+    runner = TenantMigrationRunner(workers=8)
+    results = runner.run(clients, progress=lambda done, total, result: ...)
+
+    runner.migrate(client_row)    # one tenant, in the calling thread
+
+New steps are appended to SCHEMA_MIGRATIONS; never renumber or edit a shipped
+step, existing tenants will not run it again.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pymysql
+from django.conf import settings
+
+from core.db_connector import get_connection_from_config
+from core.db_initializer import (
+    ADMIN_HOST, ADMIN_PORT, ADMIN_USER, ADMIN_PWD, MASTER_DB, DBInitializer,
+)
+from core.index_migrations import MigrationLocked, apply_index_migrations
+from core.unread_counters import rebuild_counters
+from core import project_stats, task_stats
+from chat import read_receipts
+
+logger = logging.getLogger('utility')
+
+DEFAULT_WORKERS = getattr(settings, "TENANT_MIGRATION_WORKERS", 4)
+
+VERSIONS_TABLE_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {MASTER_DB}.tenant_schema_versions (
+      tenant_id BIGINT UNSIGNED NOT NULL PRIMARY KEY,
+      schema_version INT NOT NULL DEFAULT 0,
+      status VARCHAR(20) NOT NULL DEFAULT 'pending',
+      last_error TEXT,
+      duration_ms INT DEFAULT 0,
+      updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+      FOREIGN KEY (tenant_id) REFERENCES clients_master(id) ON DELETE CASCADE,
+      INDEX idx_schema_status (status)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+# columns added by the old scripts/add_*.py migrations; new tenants get them from
+# TENANT_DDL already. (table, column, definition), in the order they were added
+_POST_RELEASE_COLUMNS = [
+    ("members", "profile_photo", "VARCHAR(512) NULL"),
+    ("tasks", "work_type", "VARCHAR(50) DEFAULT 'Task'"),
+    ("tasks", "si_browser", "VARCHAR(255) DEFAULT NULL"),
+    ("tasks", "si_resolution", "VARCHAR(50) DEFAULT NULL"),
+    ("tasks", "si_os", "VARCHAR(100) DEFAULT NULL"),
+    ("tasks", "si_timestamp", "VARCHAR(50) DEFAULT NULL"),
+    ("timer_sessions", "paused", "TINYINT(1) DEFAULT 0"),
+    ("timer_sessions", "paused_at", "DATETIME NULL"),
+    ("timer_sessions", "paused_duration", "INT DEFAULT 0"),
+    ("time_entries", "description", "TEXT"),
+    ("time_entries", "status", "ENUM('pending', 'approved', 'rejected') DEFAULT 'pending'"),
+    ("time_entries", "approved_by", "INT"),
+    ("time_entries", "approved_at", "TIMESTAMP NULL"),
+    ("time_entries", "updated_at", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"),
+]
+
+
+def add_missing_columns(conn, db_name, columns):
+    """
+    Add the (table, column, definition) entries a tenant lacks. All missing columns
+    of a table go into one ALTER TABLE, so each table is rebuilt at most once.
+    Tables the tenant does not have are left alone. Returns ["table.column", ...].
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s",
+            (db_name,),
+        )
+        existing = {}
+        for r in cur.fetchall():
+            existing.setdefault(r['TABLE_NAME'], set()).add(r['COLUMN_NAME'])
+
+        missing = {}
+        for table, column, definition in columns:
+            if table in existing and column not in existing[table]:
+                missing.setdefault(table, []).append((column, definition))
+
+        added = []
+        for table, cols in missing.items():
+            clauses = ", ".join(f"ADD COLUMN `{col}` {definition}" for col, definition in cols)
+            cur.execute(f"ALTER TABLE `{table}` {clauses}")
+            added.extend(f"{table}.{col}" for col, _ in cols)
+    finally:
+        cur.close()
+    return added
+
+
+# ---------------------------------------------------------------------------
+# steps: step(init, conn, client) -> None; must be idempotent
+# ---------------------------------------------------------------------------
+
+def _step_base_schema(init, conn, client):
+    init.run_ddl_on_tenant(client['db_name'], client['db_user'], client['db_password'], conn=conn)
+
+
+def _step_seed(init, conn, client):
+    init.seed_admin(client['db_name'], client['db_user'], client['db_password'],
+                    client['domain_postfix'], conn=conn)
+    init.seed_roles_and_permissions(client['db_name'], client['db_user'], client['db_password'], conn=conn)
+
+
+def _step_post_release_columns(init, conn, client):
+    added = add_missing_columns(conn, client['db_name'], _POST_RELEASE_COLUMNS)
+    if added:
+        logger.info(f"[migrate] {client['db_name']}: added {', '.join(added)}")
+
+
+def _step_unread_counters(init, conn, client):
+    init.run_ddl_on_tenant(client['db_name'], client['db_user'], client['db_password'], conn=conn)
+    rows = rebuild_counters(conn)
+    logger.info(f"[migrate] {client['db_name']}: {rows} unread counter(s) backfilled")
+
+
+def _step_project_stats(init, conn, client):
+    init.run_ddl_on_tenant(client['db_name'], client['db_user'], client['db_password'], conn=conn)
+    rows = project_stats.refresh(conn)
+    logger.info(f"[migrate] {client['db_name']}: stats computed for {rows} project(s)")
+
+
+def _step_task_stats(init, conn, client):
+    init.run_ddl_on_tenant(client['db_name'], client['db_user'], client['db_password'], conn=conn)
+    rows = task_stats.reconcile(conn)
+    logger.info(f"[migrate] {client['db_name']}: {rows} task rollup row(s) backfilled")
+
+
+def _step_read_receipts(init, conn, client):
+    init.run_ddl_on_tenant(client['db_name'], client['db_user'], client['db_password'], conn=conn)
+    rows = read_receipts.backfill(conn)
+    counters = rebuild_counters(conn)
+    logger.info(f"[migrate] {client['db_name']}: {rows} read mark(s) backfilled, "
+                f"{counters} unread counter(s) rebuilt")
+
+
+# (version, description, step); append only
+SCHEMA_MIGRATIONS = [
+    (1, "base schema", _step_base_schema),
+    (2, "tenant admin, roles and permissions", _step_seed),
+    (3, "post-release columns (profile photo, work type, system info, timer pause, time approval)",
+     _step_post_release_columns),
+    # TENANT_DDL is CREATE TABLE IF NOT EXISTS only: re-running it adds new tables
+    (4, "notification outbox table", _step_base_schema),
+    (5, "unread counters", _step_unread_counters),
+    (6, "background import jobs", _step_base_schema),
+    (7, "project stats", _step_project_stats),
+    (8, "task count rollup", _step_task_stats),
+    (9, "chat group tables (previously created on first use)", _step_base_schema),
+    (10, "direct message read marks", _step_read_receipts),
+]
+
+LATEST_SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+def _master_conn():
+    return pymysql.connect(
+        host=ADMIN_HOST, port=ADMIN_PORT, user=ADMIN_USER, password=ADMIN_PWD,
+        database=MASTER_DB, cursorclass=pymysql.cursors.DictCursor, autocommit=True
+    )
+
+
+_table_lock = threading.Lock()
+_table_ready = False
+
+
+def ensure_versions_table(cur):
+    """Create master_db.tenant_schema_versions once per process."""
+    global _table_ready
+    with _table_lock:
+        if not _table_ready:
+            cur.execute(VERSIONS_TABLE_DDL)
+            _table_ready = True
+
+
+def _lock_name(tenant_id):
+    return f"tenant_migrations:{tenant_id}"
+
+
+def get_schema_versions(cur):
+    """{tenant_id: row} of master_db.tenant_schema_versions."""
+    ensure_versions_table(cur)
+    cur.execute(f"SELECT * FROM {MASTER_DB}.tenant_schema_versions")
+    return {r['tenant_id']: r for r in cur.fetchall()}
+
+
+def _record(cur, tenant_id, version, status, error=None, duration_ms=0):
+    cur.execute(f"""
+        INSERT INTO {MASTER_DB}.tenant_schema_versions
+          (tenant_id, schema_version, status, last_error, duration_ms)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE schema_version=VALUES(schema_version), status=VALUES(status),
+          last_error=VALUES(last_error), duration_ms=VALUES(duration_ms)
+    """, (tenant_id, version, status, error, duration_ms))
+
+
+class TenantMigrationRunner:
+    """Brings tenants up to a schema version, `workers` tenants at a time."""
+
+    def __init__(self, workers=None, target=None, dry_run=False, lock_timeout=0):
+        self.workers = max(1, workers or DEFAULT_WORKERS)
+        self.target = LATEST_SCHEMA_VERSION if target is None else target
+        self.dry_run = dry_run
+        self.lock_timeout = lock_timeout
+
+    def migrate(self, client):
+        """
+        Migrate one clients_master row. Returns a dict:
+        {"tenant_id", "db_name", "from_version", "version", "steps": [(version, name, ms)],
+         "indexes": [created index names], "created_db": bool, "seconds"}.
+        Raises MigrationLocked if another runner holds the tenant; other errors are
+        recorded in tenant_schema_versions and re-raised.
+        """
+        started = time.perf_counter()
+        tenant_id = client['id']
+        result = {"tenant_id": tenant_id, "db_name": client['db_name'], "from_version": 0,
+                  "version": 0, "steps": [], "indexes": [], "created_db": False, "seconds": 0.0}
+
+        master = _master_conn()
+        mcur = master.cursor()
+        try:
+            ensure_versions_table(mcur)
+            mcur.execute("SELECT GET_LOCK(%s, %s) AS got", (_lock_name(tenant_id), self.lock_timeout))
+            if not (mcur.fetchone() or {}).get('got'):
+                raise MigrationLocked(f"{client['db_name']} is being migrated by another runner")
+            try:
+                mcur.execute(
+                    f"SELECT schema_version FROM {MASTER_DB}.tenant_schema_versions WHERE tenant_id = %s",
+                    (tenant_id,),
+                )
+                row = mcur.fetchone()
+                version = row['schema_version'] if row else 0
+                result["from_version"] = result["version"] = version
+                pending = [m for m in SCHEMA_MIGRATIONS if version < m[0] <= self.target]
+
+                if self.dry_run:
+                    result["steps"] = [(v, name, 0) for v, name, _ in pending]
+                    return result
+
+                try:
+                    self._apply(client, pending, mcur, result)
+                except Exception as e:
+                    duration_ms = int((time.perf_counter() - started) * 1000)
+                    _record(mcur, tenant_id, result["version"], 'failed', str(e)[:2000], duration_ms)
+                    logger.error(f"[migrate] {client['db_name']} failed at version "
+                                 f"{result['version']}: {e}")
+                    raise
+                duration_ms = int((time.perf_counter() - started) * 1000)
+                _record(mcur, tenant_id, result["version"], 'ok', None, duration_ms)
+            finally:
+                mcur.execute("SELECT RELEASE_LOCK(%s)", (_lock_name(tenant_id),))
+        finally:
+            mcur.close()
+            master.close()
+            result["seconds"] = time.perf_counter() - started
+        return result
+
+    def _apply(self, client, pending, mcur, result):
+        init = DBInitializer()
+        try:
+            if not client.get('db_user'):
+                tenant_user, tenant_pwd = init.create_db_and_user(client)
+                client = dict(client, db_user=tenant_user, db_password=tenant_pwd)
+                result["created_db"] = True
+        finally:
+            init.close()
+
+        _record(mcur, client['id'], result["version"], 'running')
+        conn = get_connection_from_config(client)
+        try:
+            for version, name, step in pending:
+                step_started = time.perf_counter()
+                step(init, conn, client)
+                ms = int((time.perf_counter() - step_started) * 1000)
+                result["version"] = version
+                result["steps"].append((version, name, ms))
+                _record(mcur, client['id'], version, 'running')
+            if result["version"] >= 1:
+                indexes = apply_index_migrations(conn, client['db_name'], lock_timeout=30)
+                result["indexes"] = indexes["created"]
+        finally:
+            conn.close()
+
+    def run(self, clients, progress=None):
+        """
+        Migrate every client in the worker pool. Returns one result per client, in
+        completion order; a failed tenant's result carries "error" (and "locked"
+        when another runner held it) instead of stopping the run.
+        progress(done, total, result) is called as each tenant finishes.
+        """
+        results = []
+        total = len(clients)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.migrate, c): c for c in clients}
+            for done, future in enumerate(as_completed(futures), 1):
+                client = futures[future]
+                try:
+                    result = future.result()
+                except MigrationLocked as e:
+                    result = {"tenant_id": client['id'], "db_name": client['db_name'],
+                              "error": str(e), "locked": True}
+                except Exception as e:
+                    result = {"tenant_id": client['id'], "db_name": client['db_name'], "error": str(e)}
+                results.append(result)
+                if progress:
+                    progress(done, total, result)
+        return results
@@ -6,6 +6,14 @@ from django.shortcuts import redirect
 from django.conf import settings
 from django.utils import timezone
 import secrets, string
+from .db_helpers import release_tenant_conn, resolve_tenant_key_from_request
+from .tenant_cache import TenantScopedCache
+
+# Effective permissions are cached per (tenant, member, project) as a bitmask over the
+# tenant's permission codes, next to one mask per role. roles_save, roles_delete and
+# assign_role invalidate the tenant; the TTL bounds staleness across worker processes.
+_PERMISSION_CACHE_TTL = getattr(settings, "PERMISSION_CACHE_TTL", 300)
+_permission_cache = TenantScopedCache(ttl=_PERMISSION_CACHE_TTL)
 
 # If you already have a tenant connector (get_tenant_conn), import it.
 # from core.db import get_tenant_conn
@@ -67,16 +75,67 @@ def get_permissions_for_role_ids(conn, role_ids):
     cur.close()
     return [r['code'] for r in rows]
 
-def user_has_permission(request, member_id, project_id, permission_code):
+def load_role_bitsets(conn):
+    """
+    Return (bits, role_masks) for the tenant: bits maps permission code -> bit
+    number, role_masks maps role_id -> bitmask of the role's permissions.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT p.code, rp.role_id
+            FROM permissions p
+            LEFT JOIN role_permissions rp ON rp.permission_id = p.id
+            ORDER BY p.id
+        """)
+        bits, role_masks = {}, {}
+        for r in cur.fetchall():
+            bit = bits.setdefault(r['code'], len(bits))
+            if r['role_id'] is not None:
+                role_id = int(r['role_id'])
+                role_masks[role_id] = role_masks.get(role_id, 0) | (1 << bit)
+    finally:
+        cur.close()
+    return bits, role_masks
+
+
+def _effective_mask(request, member_id, project_id):
+    """(bits, mask) of member_id on project_id (None = tenant-wide), from the cache when possible."""
+    tenant_key = resolve_tenant_key_from_request(request)
+    project_key = "" if project_id is None else project_id
+    roles = _permission_cache.get(tenant_key, "roles")
+    mask = _permission_cache.get(tenant_key, "member", member_id, project_key)
+    if roles is not None and mask is not None:
+        return roles[0], mask
+
+    generation = _permission_cache.generation(tenant_key)
     conn = get_tenant_conn_from_request(request)
     try:
-        role_ids = get_user_project_role_ids(conn, member_id, project_id)
-        if not role_ids:
-            return False
-        perms = get_permissions_for_role_ids(conn, role_ids)
-        return permission_code in perms
+        if roles is None:
+            roles = load_role_bitsets(conn)
+            _permission_cache.put(tenant_key, ("roles",), roles, generation)
+        if mask is None:
+            mask = 0
+            role_masks = roles[1]
+            for role_id in get_user_project_role_ids(conn, member_id, project_id):
+                mask |= role_masks.get(role_id, 0)
+            _permission_cache.put(tenant_key, ("member", member_id, project_key), mask, generation)
     finally:
-        conn.close()
+        release_tenant_conn(conn)
+    return roles[0], mask
+
+
+def user_has_permission(request, member_id, project_id, permission_code):
+    if not member_id:
+        return False
+    bits, mask = _effective_mask(request, member_id, project_id)
+    bit = bits.get(permission_code)
+    return bit is not None and bool(mask >> bit & 1)
+
+
+def invalidate_permissions(tenant_key=None):
+    """Forget cached roles and effective permissions of a tenant (all tenants when None)."""
+    _permission_cache.invalidate(tenant_key)
 
 def require_permission(permission_code, project_param='project_id'):
     def decorator(view_func):
@@ -99,14 +158,10 @@ def require_permission(permission_code, project_param='project_id'):
 
 # Utility: fetch effective permissions for a member on a project
 def get_effective_permissions(request, member_id, project_id):
-    conn = get_tenant_conn_from_request(request)
-    try:
-        role_ids = get_user_project_role_ids(conn, member_id, project_id)
-        if not role_ids:
-            return []
-        return get_permissions_for_role_ids(conn, role_ids)
-    finally:
-        conn.close()
+    if not member_id:
+        return []
+    bits, mask = _effective_mask(request, member_id, project_id)
+    return [code for code, bit in bits.items() if mask >> bit & 1]
 
 # Utility: create a secure random token
 def generate_token(length=48):
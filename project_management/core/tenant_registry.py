@@ -0,0 +1,203 @@
+# core/tenant_registry.py
+"""
+In-process registry of master_db.clients_master rows.
+
+Every tenant row is reachable through all of its aliases: clients_master.id,
+client_name, domain_postfix and db_name. Lookups are served from an LRU cache with
+a TTL, so resolving tenant credentials (login, tenant connections, chat consumers)
+does not need a master_db round trip once the row is known.
+
+Usage:
+    from core.tenant_registry import tenant_registry
+    row = tenant_registry.lookup('@acme.com')      # or id / client_name / db_name
+    tenant_registry.invalidate(row['id'])          # after changing the row
+
+The cache is per process; TENANT_REGISTRY_TTL bounds how long another worker
+process may keep serving a row that was changed elsewhere.
+"""
+
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core.db_connector import get_connection_from_config
+
+logger = logging.getLogger('utility')
+
+_REGISTRY_TTL = getattr(settings, "TENANT_REGISTRY_TTL", 300)
+_REGISTRY_MAX_ENTRIES = getattr(settings, "TENANT_REGISTRY_MAX_ENTRIES", 5000)
+# unknown aliases (e.g. a bare host name) are remembered briefly to spare master_db
+_REGISTRY_NEGATIVE_TTL = getattr(settings, "TENANT_REGISTRY_NEGATIVE_TTL", 30)
+
+_ALIAS_COLUMNS = ("id", "client_name", "domain_postfix", "db_name")
+
+
+def _norm(alias):
+    return str(alias).strip().lower() if alias is not None else ""
+
+
+class TenantRegistry:
+    """LRU/TTL cache of clients_master rows indexed by every alias of a tenant."""
+
+    def __init__(self, ttl=_REGISTRY_TTL, max_entries=_REGISTRY_MAX_ENTRIES,
+                 negative_ttl=_REGISTRY_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self._lock = threading.RLock()
+        self._rows = OrderedDict()  # tenant id -> (row, expires_at); LRU order
+        self._aliases = {}          # normalized alias -> tenant id
+        self._misses = {}           # normalized alias -> expires_at
+        self.hits = 0
+        self.loads = 0
+
+    # -- master_db access --
+
+    def _master_conn(self):
+        # imported lazily: core.auth imports this module
+        from core.auth import MASTER_DB_CONFIG
+        return get_connection_from_config(MASTER_DB_CONFIG)
+
+    def _fetch(self, alias):
+        alias = str(alias).strip()
+        where = ["client_name = %s", "domain_postfix = %s", "db_name = %s"]
+        params = [alias, alias, alias]
+        if alias.isdigit():
+            where.insert(0, "id = %s")
+            params.insert(0, int(alias))
+        conn = self._master_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT * FROM clients_master WHERE {' OR '.join(where)} LIMIT 1",
+                    params,
+                )
+                return cur.fetchone()
+        finally:
+            conn.close()
+
+    # -- cache maintenance (call with self._lock held) --
+
+    def _store_locked(self, row, now):
+        row = dict(row)
+        row.setdefault("db_port", 3306)
+        tid = row["id"]
+        self._drop_locked(tid)
+        self._rows[tid] = (row, now + self.ttl)
+        for col in _ALIAS_COLUMNS:
+            key = _norm(row.get(col))
+            if key:
+                self._aliases[key] = tid
+                self._misses.pop(key, None)
+        while len(self._rows) > self.max_entries:
+            oldest = next(iter(self._rows))
+            self._drop_locked(oldest)
+        return row
+
+    def _drop_locked(self, tid):
+        entry = self._rows.pop(tid, None)
+        if entry is None:
+            return None
+        row = entry[0]
+        for col in _ALIAS_COLUMNS:
+            key = _norm(row.get(col))
+            if key and self._aliases.get(key) == tid:
+                self._aliases.pop(key, None)
+        return row
+
+    # -- public API --
+
+    def lookup(self, alias):
+        """
+        Return a copy of the clients_master row for alias (id, client_name,
+        domain_postfix or db_name), or None if no tenant matches.
+        """
+        key = _norm(alias)
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            tid = self._aliases.get(key)
+            if tid is not None:
+                row, expires_at = self._rows[tid]
+                if expires_at > now:
+                    self._rows.move_to_end(tid)
+                    self.hits += 1
+                    return dict(row)
+                self._drop_locked(tid)
+            elif self._misses.get(key, 0) > now:
+                self.hits += 1
+                return None
+
+        row = self._fetch(alias)
+        with self._lock:
+            self.loads += 1
+            if not row:
+                self._misses[key] = now + self.negative_ttl
+                return None
+            return dict(self._store_locked(row, now))
+
+    def warm(self):
+        """Load every clients_master row (up to max_entries). Called at startup."""
+        conn = self._master_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM clients_master ORDER BY id DESC LIMIT %s", (self.max_entries,))
+                rows = cur.fetchall()
+        finally:
+            conn.close()
+        now = time.time()
+        with self._lock:
+            for row in rows:
+                self._store_locked(row, now)
+        logger.info(f"[registry] Warmed tenant registry with {len(rows)} tenants")
+        return len(rows)
+
+    def invalidate(self, alias=None):
+        """
+        Forget a tenant (by any alias) so the next lookup re-reads master_db, and drop
+        its pooled connections. Without an alias the whole registry is cleared.
+        """
+        with self._lock:
+            self._misses.clear()
+            if alias is None:
+                dropped = [entry[0] for entry in self._rows.values()]
+                self._rows.clear()
+                self._aliases.clear()
+            else:
+                tid = self._aliases.get(_norm(alias))
+                row = self._drop_locked(tid) if tid is not None else None
+                dropped = [row] if row else []
+
+        # credentials may have changed: connections opened with the old ones must go
+        from core.db_helpers import discard_tenant_pool
+        from core.task_visibility import invalidate_visibility_policy
+        from core.tenant_config import invalidate_tenant_config
+        keys = {alias, str(alias)} if alias is not None else set()
+        for row in dropped:
+            for col in _ALIAS_COLUMNS:
+                if row.get(col):
+                    keys.update((row[col], str(row[col])))
+        for key in keys:
+            discard_tenant_pool(key)
+            invalidate_visibility_policy(key)
+            invalidate_tenant_config(key)
+        if alias is None:
+            invalidate_visibility_policy()
+            invalidate_tenant_config()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tenants": len(self._rows),
+                "aliases": len(self._aliases),
+                "negative": len(self._misses),
+                "hits": self.hits,
+                "loads": self.loads,
+            }
+
+
+tenant_registry = TenantRegistry()
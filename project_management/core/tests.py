@@ -1,3 +1,508 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import re
+from unittest import mock
 
-# Create your tests here.
+import pymysql
+from pymysql.constants import SERVER_STATUS
+from django.core.handlers.asgi import ASGIRequest
+from django.test import RequestFactory, SimpleTestCase
+
+from . import db_helpers, import_jobs, member_directory, notification_outbox, notifications, task_stats, unread_counters, views, views_tasks
+from .export_stream import Sheet, csv_response, iter_csv, xlsx_response
+from .notifications import NotificationManager
+from .task_import import TaskImporter
+from .task_visibility import VisibilityPolicy
+
+
+class _RecordingCursor(pymysql.cursors.DictCursor):
+    """
+    pymysql cursor that records the statements it would send; INSERTs get
+    consecutive AUTO_INCREMENT ids like InnoDB hands a simple insert.
+    """
+
+    def execute(self, query, args=None):
+        if args is not None:
+            query = self.mogrify(query, args)
+        if isinstance(query, (bytes, bytearray)):
+            query = query.decode("utf8")
+        rows = query.count("),(") + 1 if query.lstrip().upper().startswith("INSERT") else 0
+        self.connection.statements.append(query)
+        self.lastrowid = self.connection.next_id
+        self.connection.next_id += rows
+        self.rowcount = rows
+        self._result_rows = self.connection.answer(query)
+        return rows
+
+    def fetchone(self):
+        rows = getattr(self, "_result_rows", [])
+        return rows.pop(0) if rows else None
+
+    def fetchall(self):
+        rows, self._result_rows = getattr(self, "_result_rows", []), []
+        return rows
+
+
+class _RecordingConnection(pymysql.connections.Connection):
+    """Unconnected pymysql connection whose cursors record their statements."""
+
+    def __init__(self, next_id=1):
+        super().__init__(defer_connect=True, charset="utf8mb4", cursorclass=_RecordingCursor)
+        self.server_status = 0
+        self.statements = []
+        self.next_id = next_id
+
+    def answer(self, query):
+        """Result rows of a statement (none: tables start empty)."""
+        return []
+
+    def begin(self):
+        self.statements.append("BEGIN")
+        self.server_status |= SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+    def commit(self):
+        self.statements.append("COMMIT")
+        self.server_status &= ~SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+    def rollback(self):
+        self.statements.append("ROLLBACK")
+        self.server_status &= ~SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+
+class _CounterConnection(_RecordingConnection):
+    """Recording connection that keeps the unread_counters table in memory."""
+
+    _UPSERT_ROW = re.compile(r"\('?(\d+)'?,\s*'(\w+)',\s*'([^']*)',\s*(\d+)\)")
+
+    def __init__(self, next_id=1):
+        super().__init__(next_id)
+        self.counters = {}
+
+    def answer(self, query):
+        if query.lstrip().startswith("INSERT INTO unread_counters"):
+            for member_id, kind, source, n in self._UPSERT_ROW.findall(query):
+                key = (int(member_id), kind, source)
+                self.counters[key] = self.counters.get(key, 0) + int(n)
+        elif "FROM unread_counters WHERE member_id" in query:
+            member_id = int(re.search(r"member_id = '?(\d+)", query).group(1))
+            return [{"kind": kind, "source": source, "unread": n}
+                    for (m, kind, source), n in self.counters.items() if m == member_id and n > 0]
+        return []
+
+
+class _TaskStatsConnection(_RecordingConnection):
+    """
+    Recording connection over in-memory tasks and task_stats tables; task_stats
+    keys compare like its primary key (case-insensitive, trailing spaces ignored).
+    """
+
+    _STATS_ROW = re.compile(r"\((\d+), '([^']*)', (\d+), '([^']*)', '([^']*)', '([^']*)', (-?\d+)\)")
+
+    def __init__(self, tasks=None):
+        super().__init__(next_id=1)
+        self.tasks = tasks or {}
+        self.stats = {}  # match key -> [stored key, task_count]
+
+    def task_key(self, task):
+        return (task["project_id"] or 0, task["assigned_type"] or "", task["assigned_to"] or 0,
+                task["work_type"] or "", task["status"] or "", task["priority"] or "")
+
+    def _row(self, key, **extra):
+        return dict(zip(task_stats.KEY_COLUMNS, key), **extra)
+
+    def answer(self, query):
+        sql = " ".join(query.split())
+        if sql.startswith("INSERT INTO task_stats"):
+            absolute = "task_count = VALUES(task_count)" in sql
+            for *key, n in self._STATS_ROW.findall(sql):
+                key = (int(key[0]), key[1], int(key[2]), key[3], key[4], key[5])
+                entry = self.stats.setdefault(task_stats._match_key(key), [key, 0])
+                entry[1] = int(n) if absolute else entry[1] + int(n)
+        elif sql.startswith("DELETE FROM task_stats"):
+            for key in re.findall(r"project_id = (\d+) AND assigned_type = '([^']*)' AND assigned_to = (\d+) "
+                                  r"AND work_type = '([^']*)' AND status = '([^']*)' AND priority = '([^']*)'", sql):
+                self.stats.pop(task_stats._match_key((int(key[0]), key[1], int(key[2])) + key[3:]), None)
+        elif "FROM task_stats FOR UPDATE" in sql:
+            return [self._row(key, task_count=n) for key, n in self.stats.values()]
+        elif "FROM tasks WHERE id IN" in sql:
+            ids = [int(i) for i in re.search(r"id IN \(([^)]*)\)", sql).group(1).split(",")]
+            return [self._row(self.task_key(self.tasks[i])) for i in ids if i in self.tasks]
+        elif "FROM tasks GROUP BY" in sql:
+            # GROUP BY compares like the key columns' collation
+            groups = {}
+            for task in self.tasks.values():
+                key = self.task_key(task)
+                groups.setdefault(task_stats._match_key(key), [key, 0])[1] += 1
+            return [self._row(key, task_count=n) for key, n in groups.values()]
+        return []
+
+    def counts(self):
+        """{stored key: task_count} of the non-zero rollup rows."""
+        return {key: n for key, n in self.stats.values() if n}
+
+
+class _PoolConnection(_RecordingConnection):
+    """Recording connection the tenant pool sees as open until it is closed."""
+
+    def __init__(self):
+        super().__init__()
+        self.closed = False
+
+    @property
+    def open(self):
+        return not self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class TaskStatsTests(SimpleTestCase):
+    """The rollup follows inserts, updates and deletes through tracking(), and reconcile() repairs it."""
+
+    def _task(self, status="Open", **values):
+        return dict({"project_id": 1, "assigned_type": "member", "assigned_to": 5, "work_type": "Task",
+                     "status": status, "priority": "High"}, **values)
+
+    def _key(self, status="Open", **values):
+        return _TaskStatsConnection().task_key(self._task(status, **values))
+
+    def test_insert(self):
+        conn = _TaskStatsConnection()
+        with task_stats.tracking(conn) as tracked:
+            conn.tasks[1] = self._task(project_id=None, assigned_type=None, assigned_to=None)
+            tracked.add([1])
+
+        # NULL key columns are stored as 0 / ''
+        self.assertEqual(conn.counts(), {(0, "", 0, "Task", "Open", "High"): 1})
+        self.assertEqual(conn.statements[0], "BEGIN")
+        self.assertEqual(conn.statements[-1], "COMMIT")
+
+    def test_status_change(self):
+        conn = _TaskStatsConnection({1: self._task(), 2: self._task()})
+        task_stats.added(conn, [1, 2])
+        with task_stats.tracking(conn, [1]):
+            conn.tasks[1]["status"] = "Closed"
+
+        self.assertEqual(conn.counts(), {self._key(): 1, self._key("Closed"): 1})
+        self.assertTrue(any("FOR UPDATE" in s for s in conn.statements))
+
+    def test_delete(self):
+        conn = _TaskStatsConnection({1: self._task(), 2: self._task()})
+        task_stats.added(conn, [1, 2])
+        with task_stats.tracking(conn, [2]):
+            del conn.tasks[2]
+
+        self.assertEqual(conn.counts(), {self._key(): 1})
+
+    def test_case_only_change(self):
+        conn = _TaskStatsConnection({1: self._task(), 2: self._task()})
+        task_stats.added(conn, [1, 2])
+        with task_stats.tracking(conn, [1]):
+            conn.tasks[1]["status"] = "OPEN"
+
+        # "Open" and "OPEN" are one rollup row: -1 and +1 on the same key
+        self.assertEqual(conn.counts(), {self._key(): 2})
+        self.assertEqual(task_stats.reconcile(conn), 0)
+
+    def test_joins_open_transaction(self):
+        conn = _TaskStatsConnection({1: self._task()})
+        conn.begin()
+        with task_stats.tracking(conn, [1]):
+            conn.tasks[1]["status"] = "Closed"
+
+        self.assertEqual(conn.statements.count("BEGIN"), 1)
+        self.assertNotIn("COMMIT", conn.statements)
+
+    def test_reconcile_repairs_drift(self):
+        conn = _TaskStatsConnection({1: self._task(), 2: self._task("Closed")})
+        # a write that bypassed tracking, and a row for tasks that no longer exist
+        conn.stats[task_stats._match_key(self._key())] = [self._key(), 5]
+        conn.stats[task_stats._match_key(self._key("Review"))] = [self._key("Review"), 1]
+
+        self.assertEqual(task_stats.reconcile(conn), 3)
+        self.assertEqual(conn.counts(), {self._key(): 1, self._key("Closed"): 1})
+        self.assertEqual(task_stats.reconcile(conn), 0)
+
+
+class BatchedInsertTests(SimpleTestCase):
+    """executemany() must fold each chunk into one INSERT so the ids follow from lastrowid."""
+
+    def test_task_importer_insert_ids(self):
+        conn = _RecordingConnection(next_id=500)
+        rows = [(1, None, f"Task {i}", "", "todo", "Medium", "Task", None, None, 7, None)
+                for i in range(4)]
+        with conn.cursor() as cur:
+            ids = TaskImporter(conn)._insert(cur, rows)
+
+        self.assertEqual(len(conn.statements), 1)
+        self.assertIn("'Task 0'", conn.statements[0])
+        self.assertIn("'Task 3'", conn.statements[0])
+        self.assertEqual(ids, [500, 501, 502, 503])
+
+    def test_task_importer_insert_ids_per_chunk(self):
+        conn = _RecordingConnection(next_id=10)
+        rows = [(1, None, f"Task {i}", "", "todo", "Medium", "Task", None, None, 7, None)
+                for i in range(5)]
+        with mock.patch.object(notifications, "_MAX_INSERT_BYTES", 300):
+            with conn.cursor() as cur:
+                ids = TaskImporter(conn)._insert(cur, rows)
+
+        self.assertEqual(len(conn.statements), 3)
+        self.assertEqual(ids, [10, 11, 12, 13, 14])
+
+    def test_save_notifications_ids(self):
+        conn = _RecordingConnection(next_id=40)
+        rows = [(uid, "New Task Assigned", "msg", "task", "/tasks/1/view/", "2026-01-01 00:00:00")
+                for uid in (3, 4, 5)]
+        with mock.patch.object(unread_counters, "increment") as increment:
+            ids = NotificationManager._save_notifications(conn, rows)
+
+        self.assertEqual(len(conn.statements), 1)
+        self.assertEqual(ids, [40, 41, 42])
+        increment.assert_called_once_with(
+            conn, unread_counters.NOTIFICATION, {(3, ''): 1, (4, ''): 1, (5, ''): 1}
+        )
+
+    def test_save_notifications_ids_per_chunk(self):
+        conn = _RecordingConnection(next_id=1)
+        rows = [(uid, "New Task Assigned", "msg", "task", None, "2026-01-01 00:00:00")
+                for uid in range(1, 6)]
+        with mock.patch.object(notifications, "_MAX_INSERT_BYTES", 320), \
+                mock.patch.object(unread_counters, "increment"):
+            ids = NotificationManager._save_notifications(conn, rows)
+
+        self.assertEqual(len(conn.statements), 3)
+        self.assertEqual(ids, [1, 2, 3, 4, 5])
+
+
+class NotificationCounterTests(SimpleTestCase):
+    """Notifications written by the views count towards the recipient's unread badge."""
+
+    def setUp(self):
+        self.conn = _CounterConnection(next_id=100)
+        self.factory = RequestFactory()
+        patches = [
+            mock.patch.object(views_tasks, "get_tenant_conn", return_value=self.conn),
+            mock.patch.object(views_tasks, "get_tenant_work_types", return_value=["Task", "Bug"]),
+            mock.patch.object(views, "get_tenant_conn", return_value=self.conn),
+            mock.patch.object(views, "release_tenant_conn"),
+            mock.patch.object(notification_outbox, "dispatcher"),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _request(self, method, path, data=None, **session):
+        request = getattr(self.factory, method)(path, data or {})
+        request.session = dict(session, tenant_id="acme")
+        return request
+
+    def _unread_count(self, member_id):
+        request = self._request("get", "/api/notifications/unread-count/", user="bob@example.com",
+                                member_id=member_id)
+        return views.api_notifications_unread_count(request)
+
+    def test_task_assignment_counts_as_unread(self):
+        cache = views_tasks._board_count_cache
+        cache.put("testserver", (2, "", "", False), 41, cache.generation("testserver"))
+        request = self._request("post", "/tasks/create-bug/", {
+            "title": "Login fails", "description": "", "assigned_to": "member:5",
+        }, user_id=2)
+        response = views_tasks.create_bug_view(request)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.conn.counters, {(5, unread_counters.NOTIFICATION, ""): 1})
+        self.assertJSONEqual(self._unread_count(5).content, {"count": 1})
+        self.assertJSONEqual(self._unread_count(2).content, {"count": 0})
+        notification_outbox.dispatcher.wake.assert_called_once_with("acme")
+        # board_data_api recounts after a task was created
+        self.assertIsNone(cache.get("testserver", 2, "", "", False))
+
+    def test_task_and_outbox_commit_together(self):
+        request = self._request("post", "/tasks/create-bug/", {
+            "title": "Login fails", "description": "", "assigned_to": "member:5",
+        }, user_id=2)
+        views_tasks.create_bug_view(request)
+
+        writes = [s.split("(")[0].split()[:3] for s in self.conn.statements
+                  if s in ("BEGIN", "COMMIT") or s.lstrip().startswith(("INSERT", "UPDATE", "DELETE"))]
+        commands = [w[0] for w in writes]
+        self.assertEqual(commands[0], "BEGIN")
+        self.assertEqual(commands.count("BEGIN"), 1)
+        self.assertEqual(commands.count("COMMIT"), 1)
+        self.assertEqual(commands[-1], "COMMIT")
+        tables = [w[2] for w in writes if w[0] == "INSERT"]
+        for table in ("tasks", "activity_log", "notifications", "notification_outbox"):
+            self.assertIn(table, tables)
+
+
+class ExportStreamTests(SimpleTestCase):
+    """Export responses hand Django the iterator kind its handler streams without buffering."""
+
+    sheet = Sheet("Tasks", ["Id", "Title"], lambda r: [r["id"], r["title"]])
+
+    def _rows(self, count):
+        self.closed = False
+
+        def rows():
+            try:
+                for i in range(count):
+                    yield {"id": i, "title": f"Task {i}"}
+            finally:
+                self.closed = True
+        return rows()
+
+    def _asgi_request(self):
+        scope = {"type": "http", "method": "GET", "path": "/export/", "headers": [], "query_string": b""}
+        return ASGIRequest(scope, io.BytesIO())
+
+    def _consume(self, response):
+        async def consume():
+            return b"".join([part async for part in response])
+        return asyncio.run(consume())
+
+    def test_csv_sync_iterator_under_wsgi(self):
+        response = csv_response(RequestFactory().get("/export/"), self._rows(3), self.sheet, "t.csv")
+        self.assertFalse(response.is_async)
+        self.assertEqual(b"".join(response), b"".join(iter_csv(self._rows(3), self.sheet)))
+
+    def test_csv_async_iterator_under_asgi(self):
+        response = csv_response(self._asgi_request(), self._rows(2500), self.sheet, "t.csv")
+        self.assertTrue(response.is_async)
+        self.assertEqual(self._consume(response), b"".join(iter_csv(self._rows(2500), self.sheet)))
+        self.assertTrue(self.closed)
+
+    def test_xlsx_async_iterator_under_asgi(self):
+        response = xlsx_response(self._asgi_request(), self._rows(50), self.sheet, "t.xlsx")
+        self.assertTrue(response.is_async)
+        body = self._consume(response)
+        response.close()
+        self.assertEqual(len(body), int(response["Content-Length"]))
+        self.assertTrue(body.startswith(b"PK"))
+
+
+class ImportJobStatusTests(SimpleTestCase):
+    """Jobs whose row stopped moving (their process went away) are reported as failed."""
+
+    def _row(self, status, idle_seconds):
+        now = datetime.datetime(2026, 1, 1, 12, 0)
+        return {"id": 1, "status": status, "progress": None, "warnings": None, "error": None,
+                "created_at": now, "started_at": now if status == "running" else None,
+                "finished_at": None, "updated_at": now, "idle_seconds": idle_seconds}
+
+    def test_stale_jobs_fail(self):
+        for status in ("queued", "running"):
+            with self.subTest(status=status):
+                job = import_jobs._format_job(self._row(status, import_jobs.STALE_SECONDS + 1))
+                self.assertEqual(job["status"], "failed")
+                self.assertTrue(job["error"])
+
+    def test_fresh_jobs_keep_their_status(self):
+        for status in ("queued", "running"):
+            with self.subTest(status=status):
+                job = import_jobs._format_job(self._row(status, 5))
+                self.assertEqual(job["status"], status)
+                self.assertIsNone(job["error"])
+
+
+class BoardDataTests(SimpleTestCase):
+    """board_data_api pages through the columns board_columns_api returns."""
+
+    def test_other_column_cursor(self):
+        conn = _RecordingConnection()
+        conn.answer = lambda query: [{"c": 0}] if "COUNT(*)" in query else []
+        request = RequestFactory().get("/tasks/api/board-data/", {"status": "other", "after_id": "90"})
+        request.session = {}
+        with mock.patch.object(views_tasks, "get_tenant_conn", return_value=conn), \
+                mock.patch.object(views_tasks, "get_visibility_policy", return_value=VisibilityPolicy("all")):
+            response = views_tasks.board_data_api(request)
+
+        self.assertEqual(response.status_code, 200)
+        columns = ", ".join(f"'{col}'" for col in views_tasks.BOARD_STATUS_COLUMNS)
+        select = conn.statements[-1]
+        self.assertIn(f"(t.status IS NULL OR t.status NOT IN ({columns}))", select)
+        self.assertNotIn("t.status = 'other'", select)
+        self.assertIn("t.id < 90", select)
+
+
+class TenantPoolTests(SimpleTestCase):
+    """TenantConnectionPool checkin and PooledConnection reference counting."""
+
+    def setUp(self):
+        self.pool = db_helpers.TenantConnectionPool(ping_after=3600)
+        self.opened = []
+
+    def opener(self):
+        raw = _PoolConnection()
+        self.opened.append(raw)
+        return raw
+
+    def test_checkin_rolls_back_open_transaction(self):
+        raw, opened_at, generation = self.pool.checkout("acme", self.opener)
+        raw.begin()
+        self.pool.checkin("acme", raw, opened_at, generation)
+
+        self.assertEqual(raw.statements, ["BEGIN", "ROLLBACK"])
+        self.assertFalse(raw.closed)
+        reused, _opened_at, _generation = self.pool.checkout("acme", self.opener)
+        self.assertIs(reused, raw)
+        self.assertFalse(reused.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS)
+
+    def test_discarded_generation_is_closed_on_checkin(self):
+        raw, opened_at, generation = self.pool.checkout("acme", self.opener)
+        self.pool.discard("acme")
+        self.pool.checkin("acme", raw, opened_at, generation)
+
+        self.assertTrue(raw.closed)
+        self.assertEqual(self.pool.stats()["total"], 0)
+        fresh, _opened_at, fresh_generation = self.pool.checkout("acme", self.opener)
+        self.assertIsNot(fresh, raw)
+        self.assertEqual(fresh_generation, generation + 1)
+        self.assertEqual(len(self.opened), 2)
+
+    def test_shared_connection_is_checked_in_once(self):
+        # leave one idle connection so get_tenant_conn reuses it instead of connecting
+        raw, opened_at, generation = self.pool.checkout("acme", self.opener)
+        self.pool.checkin("acme", raw, opened_at, generation)
+
+        with mock.patch.object(db_helpers, "_pool", self.pool):
+            first = db_helpers.get_tenant_conn(tenant_key="acme")
+            second = db_helpers.get_tenant_conn(tenant_key="acme")
+            self.assertIs(first, second)
+            self.assertEqual(self.pool.stats()["tenants"]["acme"], {"in_use": 1, "idle": 0})
+
+            first.close()
+            self.assertEqual(self.pool.stats()["tenants"]["acme"], {"in_use": 1, "idle": 0})
+            second.close()
+            self.assertEqual(self.pool.stats()["tenants"]["acme"], {"in_use": 0, "idle": 1})
+            second.close()
+            first.release()
+
+        stats = self.pool.stats()
+        self.assertEqual(stats["tenants"]["acme"], {"in_use": 0, "idle": 1})
+        self.assertEqual(stats["total"], 1)
+        self.assertEqual(len(self.opened), 1)
+        self.assertFalse(raw.closed)
+
+
+class MemberDirectoryTests(SimpleTestCase):
+    """MemberDirectory keeps no rows read before an invalidation."""
+
+    def test_global_invalidate_during_first_load(self):
+        directory = member_directory.MemberDirectory()
+        conn = _RecordingConnection()
+        conn.db = b"acme"
+
+        def answer(query):
+            # the members row changes (and the whole cache is dropped) while this load runs
+            directory.invalidate()
+            return [{"id": 7, "email": "old@example.com", "first_name": "Old", "last_name": "Name"}]
+
+        conn.answer = answer
+        self.assertEqual(directory.get(conn, 7).email, "old@example.com")
+        self.assertEqual(directory.stats()["entries"], 0)
+
+        conn.answer = lambda query: [{"id": 7, "email": "new@example.com", "first_name": "New", "last_name": "Name"}]
+        self.assertEqual(directory.get(conn, 7).email, "new@example.com")
+        self.assertEqual(directory.stats()["loads"], 2)
@@ -0,0 +1,308 @@
+# core/unread_counters.py
+"""
+Per-member unread counters, maintained on write and pushed to the browser.
+
+unread_counters (table in TENANT_DDL) holds one row per (member_id, kind, source):
+  kind 'notification'  source ''            unread rows of notifications
+  kind 'dm'            source sender email  messages from that sender after the member's
+                                            chat_conversation_read mark
+  kind 'group'         source group id      group messages after the member's last read
+
+Writers adjust the counters on the connection (and in the transaction) of the
+change itself with increment() / decrement() / set_count() / reset(). These
+return the changes, which are pushed after COMMIT with push() to the member's
+user_notifications_{tenant}_{member_id} group as 'unread.counter' events:
+    {"kind", "source", "delta"}    relative change
+    {"kind", "source", "count"}    absolute value; source None means every source
+New notifications are not pushed separately: NotificationConsumer turns each
+system notification into a +1 event.
+
+The browser loads one snapshot per WebSocket connection (get_counters(), via
+api_unread_counters) and applies the events to it, instead of polling the COUNT
+endpoints.
+
+Tenants created before the table existed keep working: writes are skipped and
+get_counters() counts from the source tables. rebuild_counters() recomputes
+the rows (migration backfill, drift repair).
+"""
+
+import logging
+
+import pymysql
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger('notifications')
+
+NOTIFICATION = 'notification'
+DM = 'dm'
+GROUP = 'group'
+
+# MySQL error: table doesn't exist
+_ER_NO_SUCH_TABLE = 1146
+
+_UPSERT_SQL = """
+    INSERT INTO unread_counters (member_id, kind, source, unread)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE unread = unread + VALUES(unread)
+"""
+
+# (kind, SELECT member_id, source, unread with a {member} filter placeholder, member column)
+_SOURCES = [
+    (NOTIFICATION, """
+        SELECT user_id AS member_id, '' AS source, COUNT(*) AS unread
+        FROM notifications
+        WHERE is_read = 0 {member}
+        GROUP BY user_id
+    """, "user_id"),
+    # the recipient of a direct message is the conversation member that did not send it
+    (DM, """
+        SELECT mem.id AS member_id, m.sender AS source, COUNT(*) AS unread
+        FROM chat_message m
+        JOIN chat_conversation c ON c.id = m.conversation_id
+        JOIN members mem ON mem.email = IF(c.user_a = m.sender, c.user_b, c.user_a)
+        LEFT JOIN chat_conversation_read r ON r.conversation_id = m.conversation_id AND r.member = mem.email
+        WHERE m.id > COALESCE(r.last_read_id, 0) {member}
+        GROUP BY mem.id, m.sender
+    """, "mem.id"),
+    (GROUP, """
+        SELECT mem.id AS member_id, CAST(gm.group_id AS CHAR) AS source, COUNT(*) AS unread
+        FROM chat_group_member gm
+        JOIN members mem ON mem.email = gm.member
+        JOIN chat_group_message msg ON msg.group_id = gm.group_id AND msg.sender <> gm.member
+        LEFT JOIN (
+            SELECT group_id, member, MAX(last_read_at) AS last_read_at
+            FROM chat_group_read GROUP BY group_id, member
+        ) r ON r.group_id = gm.group_id AND r.member = gm.member
+        WHERE (r.last_read_at IS NULL OR msg.created_at > r.last_read_at) {member}
+        GROUP BY mem.id, gm.group_id
+    """, "mem.id"),
+]
+
+
+def _missing_table(exc):
+    return isinstance(exc, pymysql.err.ProgrammingError) and exc.args[0] == _ER_NO_SUCH_TABLE
+
+
+def _source(source):
+    return str(source).strip().lower() if source is not None else ''
+
+
+def increment(conn, kind, counts):
+    """
+    Add counts {(member_id, source): n} to the counters of kind. Returns the
+    changes to push().
+    """
+    rows = [(member_id, kind, _source(source), n)
+            for (member_id, source), n in counts.items() if member_id and n]
+    if not rows:
+        return []
+    cur = conn.cursor()
+    try:
+        cur.executemany(_UPSERT_SQL, rows)
+    except pymysql.err.ProgrammingError as e:
+        if not _missing_table(e):
+            raise
+        return []
+    finally:
+        cur.close()
+    return [(member_id, {"kind": kind, "source": source, "delta": n})
+            for member_id, kind, source, n in rows]
+
+
+def decrement(conn, kind, member_id, source='', n=1):
+    """Subtract n from one counter (never below zero). Returns the changes to push()."""
+    if not member_id or n <= 0:
+        return []
+    source = _source(source)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "UPDATE unread_counters SET unread = GREATEST(unread - %s, 0) "
+            "WHERE member_id = %s AND kind = %s AND source = %s",
+            (n, member_id, kind, source),
+        )
+    except pymysql.err.ProgrammingError as e:
+        if not _missing_table(e):
+            raise
+        return []
+    finally:
+        cur.close()
+    return [(member_id, {"kind": kind, "source": source, "delta": -n})]
+
+
+def set_count(conn, kind, member_id, source, n):
+    """Set one counter to n (recomputed by the caller). Returns the changes to push()."""
+    if not member_id:
+        return []
+    source = _source(source)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "INSERT INTO unread_counters (member_id, kind, source, unread) VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE unread = VALUES(unread)",
+            (member_id, kind, source, n),
+        )
+    except pymysql.err.ProgrammingError as e:
+        if not _missing_table(e):
+            raise
+        return []
+    finally:
+        cur.close()
+    return [(member_id, {"kind": kind, "source": source, "count": n})]
+
+
+def reset(conn, kind, member_id, source=None):
+    """
+    Zero a member's counter of kind for one source (every source when source is
+    None). Returns the changes to push().
+    """
+    if not member_id:
+        return []
+    sql = "UPDATE unread_counters SET unread = 0 WHERE member_id = %s AND kind = %s AND unread <> 0"
+    params = [member_id, kind]
+    if source is not None:
+        source = _source(source)
+        sql += " AND source = %s"
+        params.append(source)
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+    except pymysql.err.ProgrammingError as e:
+        if not _missing_table(e):
+            raise
+        return []
+    finally:
+        cur.close()
+    return [(member_id, {"kind": kind, "source": source, "count": 0})]
+
+
+def count_group_message(conn, group_id, sender):
+    """
+    Count one new group message for every member of the group but its sender.
+    Returns the changes to push().
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT DISTINCT mem.id
+            FROM chat_group_member gm
+            JOIN members mem ON mem.email = gm.member
+            WHERE gm.group_id = %s AND gm.member <> %s
+        """, (group_id, sender))
+        member_ids = [r['id'] for r in cur.fetchall()]
+    finally:
+        cur.close()
+    return increment(conn, GROUP, {(member_id, group_id): 1 for member_id in member_ids})
+
+
+def counter_messages(tenant_id, changes):
+    """(group, payload) channel-layer messages for changes."""
+    return [(f'user_notifications_{tenant_id}_{member_id}', dict(event, type='unread.counter'))
+            for member_id, event in changes or []]
+
+
+def push(tenant_id, changes):
+    """Send changes to the members' WebSocket groups. Call after COMMIT."""
+    if not changes:
+        return
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        return
+    from core.notifications import _group_send_all
+
+    try:
+        outcomes = async_to_sync(_group_send_all)(channel_layer, counter_messages(tenant_id, changes))
+        failed = sum(1 for exc in outcomes if isinstance(exc, Exception))
+        if failed:
+            logger.warning(f"[unread] {failed} counter update(s) failed to send for tenant={tenant_id}")
+    except Exception as e:
+        logger.error(f"[unread] Failed to push counters for tenant={tenant_id}: {e}")
+
+
+def _count_from_sources(conn, member_id):
+    rows = []
+    cur = conn.cursor()
+    try:
+        for kind, sql, column in _SOURCES:
+            try:
+                cur.execute(sql.format(member=f"AND {column} = %s"), (member_id,))
+            except pymysql.err.ProgrammingError as e:
+                # chat group tables are created on first use
+                if not _missing_table(e):
+                    raise
+                continue
+            rows.extend(dict(r, kind=kind) for r in cur.fetchall())
+    finally:
+        cur.close()
+    return rows
+
+
+def get_counters(conn, member_id):
+    """
+    Snapshot of a member's unread counters:
+    {"notifications": n, "dm": {sender: n}, "groups": {group_id: n}, "chat_total": n}.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT kind, source, unread FROM unread_counters WHERE member_id = %s AND unread > 0",
+            (member_id,),
+        )
+        rows = cur.fetchall()
+    except pymysql.err.ProgrammingError as e:
+        if not _missing_table(e):
+            raise
+        rows = None
+    finally:
+        cur.close()
+    if rows is None:
+        rows = _count_from_sources(conn, member_id)
+
+    snapshot = {"notifications": 0, "dm": {}, "groups": {}}
+    for r in rows:
+        unread = int(r['unread'] or 0)
+        if r['kind'] == NOTIFICATION:
+            snapshot["notifications"] += unread
+        elif r['kind'] == DM:
+            snapshot["dm"][r['source']] = unread
+        elif r['kind'] == GROUP:
+            snapshot["groups"][r['source']] = unread
+    snapshot["chat_total"] = sum(snapshot["dm"].values()) + sum(snapshot["groups"].values())
+    return snapshot
+
+
+def rebuild_counters(conn, member_id=None):
+    """
+    Recompute unread_counters from the source tables, for one member or all.
+    Runs in its own transaction on conn. Returns the number of counter rows.
+    """
+    params = (member_id,) if member_id else ()
+    total = 0
+    conn.begin()
+    cur = conn.cursor()
+    try:
+        if member_id:
+            cur.execute("DELETE FROM unread_counters WHERE member_id = %s", params)
+        else:
+            cur.execute("DELETE FROM unread_counters")
+        for kind, sql, column in _SOURCES:
+            select = sql.format(member=f"AND {column} = %s" if member_id else "")
+            try:
+                cur.execute(
+                    f"INSERT INTO unread_counters (member_id, kind, source, unread) "
+                    f"SELECT member_id, '{kind}', source, unread FROM ({select}) AS src",
+                    params,
+                )
+            except pymysql.err.ProgrammingError as e:
+                if not _missing_table(e):
+                    raise
+                continue
+            total += cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return total
@@ -57,6 +57,7 @@ urlpatterns = [
     path("tasks/create/report/", views_tasks.create_report_view, name="create_report"),
     path("tasks/create/change-request/", views_tasks.create_change_request_view, name="create_change_request"),
     path("tasks/bulk-import/", views_tasks.bulk_import_csv_view, name="bulk_import"),
+    path("tasks/bulk-import/jobs/<int:job_id>/", views_tasks.api_import_job_status, name="api_import_job_status"),
     path("tasks/bulk-import/download-template/", views_tasks.download_excel_template, name="download_excel_template"),
     path("tasks/bulk-import/download-csv-template/", views_tasks.download_csv_template, name="download_csv_template"),
     path("tasks/board/", views_tasks.task_board_view, name="task_board"),
@@ -79,6 +80,7 @@ urlpatterns = [
     path("tasks/api/assign/", views_tasks.assign_task_api, name="api_assign_task"),
     path("tasks/api/update-status/", views_tasks.api_update_status, name="api_update_status"),
     path("tasks/api/board-data/", views_tasks.board_data_api, name="board_data"),
+    path("tasks/api/board-columns/", views_tasks.board_columns_api, name="board_columns"),
     path('api/task/detail/', views_tasks.api_task_detail, name='api_task_detail'),
     path('api/task/update/', views_tasks.api_task_update, name='api_task_update'),
     path('tasks/api/search/', views_tasks.api_tasks_search, name='api_tasks_search'),
@@ -112,6 +114,7 @@ urlpatterns = [
     path('api/notifications/mark-read', views.api_notifications_mark_read, name='api_notifications_mark_read'),
     path('api/notifications/delete', views.api_notifications_delete, name='api_notifications_delete'),
     path('api/notifications/unread-count', views.api_notifications_unread_count, name='api_notifications_unread_count'),
+    path('api/unread-counters', views.api_unread_counters, name='api_unread_counters'),
     
     path('profile/', views.profile_view, name='profile'),
     path('profile/edit/', views.profile_edit_view, name='profile_edit'),
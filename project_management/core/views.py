@@ -2,16 +2,20 @@
 from django.shortcuts import render, redirect
 from django.views.decorators.csrf import csrf_exempt
 from .auth import identify_tenant_by_email, authenticate
-from .db_connector import get_connection_from_config
 from math import ceil
 from django.shortcuts import render, redirect
 from django.utils import timezone
 from .tenant_context import get_current_tenant , set_current_tenant
-from .db_helpers import get_tenant_conn, get_visible_task_user_ids
+from .db_helpers import get_tenant_conn, release_tenant_conn, resolve_tenant_key_from_request
+from .dashboard_metrics import get_dashboard_metrics, PLANNED_LIMIT
+from . import unread_counters
+from . import project_stats, task_stats
+from .member_directory import member_directory
 from math import ceil
 from django.shortcuts import render, redirect
 from django.utils import timezone
 from datetime import date, datetime
+import json
 import logging
 
 logger = logging.getLogger('project_management')
@@ -158,7 +162,7 @@ def login_password_view(request):
                 else:
                     user_fullname = row[0]
             cur.close()
-            conn.close()
+            release_tenant_conn(conn)
         except Exception:
             user_fullname = None
 
@@ -196,8 +200,9 @@ def login_password_view(request):
             """, (email, first_name, last_name, None, None, None, timezone.now()))
             member_id = cur.lastrowid
             member_name = (first_name + ' ' + last_name).strip()
+            member_directory.invalidate(conn)
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
     except Exception as ex:
         logger.error(f"ensure_member_and_set_session failed: {ex}")
         member_id = None
@@ -261,6 +266,7 @@ def ensure_member_and_set_session(request, user_email, user_fullname=None, creat
                 VALUES (%s,%s,%s,%s,%s,%s,%s)
             """, (user_email, first_name, last_name, None, None, created_by, timezone.now()))
             member_id = cur.lastrowid
+            member_directory.invalidate(conn)
 
         # 3) set session
         request.session['member_id'] = int(member_id)
@@ -277,7 +283,7 @@ def ensure_member_and_set_session(request, user_email, user_fullname=None, creat
 
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 def logout_view(request):
@@ -286,7 +292,16 @@ def logout_view(request):
 
 
 
-# If your project uses get_tenant_conn(request) instead, swap usage accordingly.
+def _dashboard_context(request, metrics):
+    """Template context shared by dashboard_view and user_dashboard_view."""
+    ctx = dict(metrics)
+    ctx['user'] = request.session.get('user')
+    ctx['line_chart_labels'] = json.dumps(metrics['line_chart_labels'])
+    ctx['line_chart_created'] = json.dumps(metrics['line_chart_created'])
+    ctx['line_chart_completed'] = json.dumps(metrics['line_chart_completed'])
+    ctx['planned_limit'] = PLANNED_LIMIT
+    return ctx
+
 
 def dashboard_view(request):
     """
@@ -303,341 +318,15 @@ def dashboard_view(request):
     if not member_id:
         return redirect('login_password')
 
-    # Open DB connection for current tenant (adapt function name if needed)
-    conn = get_connection_from_config({
-        'db_engine': tenant.get('db_engine', 'mysql'),
-        'db_name': tenant.get('db_name'),
-        'db_host': tenant.get('db_host'),
-        'db_port': tenant.get('db_port'),
-        'db_user': tenant.get('db_user'),
-        'db_password': tenant.get('db_password')
-    })
-    cur = conn.cursor()
-
-    def scalar_from_row(row, key_alias='c'):
-        if row is None:
-            return 0
-        if isinstance(row, dict):
-            return int(row.get(key_alias) or next(iter(row.values()), 0))
-        if isinstance(row, (list, tuple)):
-            return int(row[0]) if len(row) > 0 and row[0] is not None else 0
-        return 0
-
-    # Get visible task user IDs based on Alex Carter visibility rules
-    visible_user_ids = get_visible_task_user_ids(conn, member_id)
-    
-    assigned_count = 0
-    try:
-        if visible_user_ids:
-            placeholders = ','.join(['%s'] * len(visible_user_ids))
-            cur.execute(f"SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to IN ({placeholders})", tuple(visible_user_ids))
-            assigned_count = scalar_from_row(cur.fetchone(), 'c')
-    except Exception:
-        assigned_count = 0
-
-    active_projects = 0
-    try:
-        cur.execute("""
-            SELECT COUNT(*) AS c
-            FROM projects
-            WHERE status = 'Active'
-        """)
-        active_projects = scalar_from_row(cur.fetchone(), 'c')
-    except Exception as e:
-        logger.error(f"ERROR active_projects: {e}")
-        active_projects = 0
-
-    projects_completed = 0
-    try:
-        cur.execute("SELECT COUNT(*) AS c FROM projects WHERE status='Completed' AND (owner_id=%s OR members LIKE CONCAT('%', %s, '%'))", (member_id, member_id))
-        projects_completed = scalar_from_row(cur.fetchone(), 'c')
-    except Exception:
-        projects_completed = 0
-
-    tasks_completed = 0
-    try:
-        if visible_user_ids:
-            placeholders = ','.join(['%s'] * len(visible_user_ids))
-            cur.execute(
-                f"SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to IN ({placeholders}) AND status = 'Closed'",
-                tuple(visible_user_ids))
-            tasks_completed = scalar_from_row(cur.fetchone(), 'c')
-    except Exception:
-        tasks_completed = 0
-
-    tasks_pending = 0
-    try:
-        if visible_user_ids:
-            placeholders = ','.join(['%s'] * len(visible_user_ids))
-            cur.execute(
-                f"SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to IN ({placeholders}) AND status NOT IN ('Closed', 'In Progress', 'Review', 'In-Progress')",
-                tuple(visible_user_ids))
-            tasks_pending = scalar_from_row(cur.fetchone(), 'c')
-    except Exception as e:
-        logger.error(f"ERROR tasks_pending: {e}")
-        tasks_pending = 0
-
-    progress_completed = progress_inprogress = progress_pending = 0
-    try:
-        if visible_user_ids:
-            placeholders = ','.join(['%s'] * len(visible_user_ids))
-            cur.execute(f"""
-                SELECT status, COUNT(*) AS c
-                FROM tasks
-                WHERE assigned_type='member' AND assigned_to IN ({placeholders})
-                GROUP BY status
-            """, tuple(visible_user_ids))
-            rows = cur.fetchall() or []
-            if rows:
-                if isinstance(rows[0], dict):
-                    items = [(r.get('status'), int(r.get('c') or 0)) for r in rows]
-                else:
-                    items = [(r[0], int(r[1] or 0)) for r in rows]
-                for status, cnt in items:
-                    s = (status or '').lower()
-                    if s == 'closed':
-                        progress_completed += cnt
-                    elif s in ('in progress', 'review', 'in-progress'):
-                        progress_inprogress += cnt
-                    else:
-                        progress_pending += cnt
-    except Exception as e:
-        logger.error(f"ERROR progress counts: {e}")
-        progress_completed = progress_inprogress = progress_pending = 0
-
-    priority_buckets = {'Critical': 0, 'High': 0, 'Normal': 0, 'Low': 0}
-    try:
-        if visible_user_ids:
-            placeholders = ','.join(['%s'] * len(visible_user_ids))
-            cur.execute(f"""
-                SELECT COALESCE(priority,'Normal') AS p, COUNT(*) AS c
-                FROM tasks
-                WHERE assigned_type='member' AND assigned_to IN ({placeholders})
-                GROUP BY p
-            """, tuple(visible_user_ids))
-            rows = cur.fetchall() or []
-            if rows:
-                if isinstance(rows[0], dict):
-                    items = [(r.get('p'), int(r.get('c') or 0)) for r in rows]
-                else:
-                    items = [(r[0], int(r[1] or 0)) for r in rows]
-                for p, cnt in items:
-                    key = (p or 'Normal').title()
-                    priority_buckets[key] = cnt
-    except Exception:
-        pass
-
-    pri_keys = ['Critical', 'High', 'Normal', 'Low']
-    pri_open = {k: 0 for k in pri_keys}
-    pri_closed = {k: 0 for k in pri_keys}
-    try:
-        if visible_user_ids:
-            placeholders = ','.join(['%s'] * len(visible_user_ids))
-            cur.execute(f"""
-                SELECT COALESCE(priority,'Normal') AS p, status, COUNT(*) AS c
-                FROM tasks
-                WHERE assigned_type='member' AND assigned_to IN ({placeholders})
-                GROUP BY p, status
-            """, tuple(visible_user_ids))
-            rows = cur.fetchall() or []
-            if rows:
-                if isinstance(rows[0], dict):
-                    for r in rows:
-                        p = (r.get('p') or 'Normal').title()
-                        st = (r.get('status') or '').lower()
-                        cnt = int(r.get('c') or 0)
-                        if st == 'closed':
-                            pri_closed[p] = pri_closed.get(p, 0) + cnt
-                        else:
-                            pri_open[p] = pri_open.get(p, 0) + cnt
-                else:
-                    for r in rows:
-                        p = (r[0] or 'Normal').title()
-                        st = (r[1] or '').lower()
-                        cnt = int(r[2] or 0)
-                        if st == 'closed':
-                            pri_closed[p] = pri_closed.get(p, 0) + cnt
-                        else:
-                            pri_open[p] = pri_open.get(p, 0) + cnt
-    except Exception:
-        pass
-
-    is_team_lead = False
-    try:
-        cur.execute("SELECT 1 FROM teams WHERE lead_id = %s LIMIT 1", (member_id,))
-        row = cur.fetchone()
-        if row:
-            is_team_lead = True
-    except Exception:
-        is_team_lead = False
-
-    # Board open count: tasks assigned to visible users and not closed (for board view)
-    board_open_count = 0
-    try:
-        if visible_user_ids:
-            placeholders = ','.join(['%s'] * len(visible_user_ids))
-            cur.execute(f"SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to IN ({placeholders}) AND NOT (status = 'Closed')", tuple(visible_user_ids))
-            board_open_count = scalar_from_row(cur.fetchone(), 'c')
-    except Exception as e:
-        logger.error(f"ERROR: board_open_count {e}")
-        board_open_count = 0
-
-    # My new tasks count: tasks assigned to visible users and status is 'New' (or similar)
-    my_new_tasks_count = 0
-    try:
-        if visible_user_ids:
-            placeholders = ','.join(['%s'] * len(visible_user_ids))
-            cur.execute(f"SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to IN ({placeholders}) AND status IN ('New','Open')", tuple(visible_user_ids))
-            my_new_tasks_count = scalar_from_row(cur.fetchone(), 'c')
-    except Exception as e:
-        logger.error(f"ERROR: my_new_tasks_count {e}")
-        my_new_tasks_count = 0
-
-    # ---------------------- PLANNED TASKS (Show all pending tasks) ----------------------
-    from datetime import datetime, timedelta
-    import json
-    planned_tasks = []
-    try:
-        # Show tasks with due dates within the next 7 days (inclusive)
-        from datetime import date, timedelta
-        start_date = date.today()
-        end_date = start_date + timedelta(days=7)
-        if visible_user_ids:
-            placeholders = ','.join(['%s'] * len(visible_user_ids))
-            params = list(visible_user_ids) + [start_date, end_date]
-            cur.execute(f"""
-                SELECT id, title, status, due_date, created_at
-                FROM tasks
-                WHERE assigned_type='member' AND assigned_to IN ({placeholders})
-                  AND status NOT IN ('Completed', 'Closed', 'completed', 'closed')
-                  AND due_date IS NOT NULL
-                  AND DATE(due_date) BETWEEN %s AND %s
-                ORDER BY due_date ASC
-                            LIMIT 10
-                    """, tuple(params))
-            rows = cur.fetchall() or []
-            logger.debug(f"DEBUG: planned_tasks found {len(rows)} tasks for visible users between {start_date} and {end_date}")
-
-        for r in rows:
-            if isinstance(r, dict):
-                planned_tasks.append({
-                    'id': r.get('id'),
-                    'title': r.get('title'),
-                    'status': r.get('status'),
-                    'due_date': r.get('due_date'),
-                })
-            else:
-                planned_tasks.append({
-                    'id': r[0],
-                    'title': r[1],
-                    'status': r[2],
-                    'due_date': r[3],
-                })
-    except Exception as e:
-        logger.error(f"ERROR: planned_tasks {e}")
-        import traceback
-        traceback.print_exc()
-        planned_tasks = []
-
-    # ---------------------- LINE CHART DATA (Tasks created/completed last 7 days) ----------------------
-    line_chart_labels = []
-    line_chart_created = []
-    line_chart_completed = []
+    tenant_key = resolve_tenant_key_from_request(request)
+    conn = get_tenant_conn(request)
     try:
-        today = datetime.now().date()
-        # Get day names for last 7 days
-        day_names = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        for i in range(6, -1, -1):
-            day = today - timedelta(days=i)
-            line_chart_labels.append(day_names[day.weekday()])
-            
-            # Count tasks created on this day for visible users
-            if visible_user_ids:
-                placeholders = ','.join(['%s'] * len(visible_user_ids))
-                params = list(visible_user_ids) + [day]
-                cur.execute(f"""
-                    SELECT COUNT(*) as cnt FROM tasks 
-                    WHERE assigned_type='member' AND assigned_to IN ({placeholders})
-                    AND DATE(created_at) = %s
-                """, tuple(params))
-                created_row = cur.fetchone()
-                if created_row:
-                    if isinstance(created_row, dict):
-                        line_chart_created.append(created_row.get('cnt', 0) or 0)
-                    else:
-                        line_chart_created.append(created_row[0] or 0)
-                else:
-                    line_chart_created.append(0)
-            else:
-                line_chart_created.append(0)
-            
-            # Count tasks completed on this day for visible users
-            if visible_user_ids:
-                placeholders = ','.join(['%s'] * len(visible_user_ids))
-                params = list(visible_user_ids) + [day]
-                cur.execute(f"""
-                    SELECT COUNT(*) as cnt FROM tasks 
-                    WHERE assigned_type='member' AND assigned_to IN ({placeholders})
-                    AND status='Completed' AND DATE(updated_at) = %s
-                """, tuple(params))
-                completed_row = cur.fetchone()
-                if completed_row:
-                    if isinstance(completed_row, dict):
-                        line_chart_completed.append(completed_row.get('cnt', 0) or 0)
-                    else:
-                        line_chart_completed.append(completed_row[0] or 0)
-                else:
-                    line_chart_completed.append(0)
-            else:
-                line_chart_completed.append(0)
-    except Exception as e:
-        logger.error(f"ERROR: line_chart_data {e}", exc_info=True)
-        line_chart_labels = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        line_chart_created = [0, 0, 0, 0, 0, 0, 0]
-        line_chart_completed = [0, 0, 0, 0, 0, 0, 0]
-
-        
-    
-
-
-
-    cur.close()
-    conn.close()
-
-    ctx = {
-        'user': request.session.get('user'),
-        'assigned_count': assigned_count,
-        'active_projects': active_projects,
-        'projects_completed': projects_completed,
-        'tasks_completed': tasks_completed,
-        'tasks_pending': tasks_pending,
-        'progress_completed': progress_completed,
-        'progress_inprogress': progress_inprogress,
-        'progress_pending': progress_pending,
-        'pri_critical': priority_buckets.get('Critical', 0),
-        'pri_high': priority_buckets.get('High', 0),
-        'pri_normal': priority_buckets.get('Normal', 0),
-        'pri_low': priority_buckets.get('Low', 0),
-        'pri_critical_open': pri_open.get('Critical', 0),
-        'pri_high_open': pri_open.get('High', 0),
-        'pri_normal_open': pri_open.get('Normal', 0),
-        'pri_low_open': pri_open.get('Low', 0),
-        'pri_critical_closed': pri_closed.get('Critical', 0),
-        'pri_high_closed': pri_closed.get('High', 0),
-        'pri_normal_closed': pri_closed.get('Normal', 0),
-        'pri_low_closed': pri_closed.get('Low', 0),
-        'is_team_lead': is_team_lead,
-        'board_open_count': board_open_count,
-        'my_new_tasks_count': my_new_tasks_count,
-        'planned_tasks': planned_tasks,
-        'line_chart_labels': json.dumps(line_chart_labels),
-        'line_chart_created': json.dumps(line_chart_created),
-        'line_chart_completed': json.dumps(line_chart_completed),
-        'planned_start': start_date,
-        'planned_end': end_date,
-        'planned_limit': 10,
-    }
+        # all counters in one aggregated pass, cached per (tenant, member)
+        metrics = get_dashboard_metrics(conn, tenant_key, member_id, scope="team")
+    finally:
+        release_tenant_conn(conn)
 
+    ctx = _dashboard_context(request, metrics)
     return render(request, 'core/dashboard.html', ctx)
 
 
@@ -655,305 +344,17 @@ def user_dashboard_view(request):
     if not member_id:
         return redirect('login_password')
 
-    # Open DB connection for current tenant
-    conn = get_connection_from_config({
-        'db_engine': tenant.get('db_engine', 'mysql'),
-        'db_name': tenant.get('db_name'),
-        'db_host': tenant.get('db_host'),
-        'db_port': tenant.get('db_port'),
-        'db_user': tenant.get('db_user'),
-        'db_password': tenant.get('db_password')
-    })
-    cur = conn.cursor()
-
-    def scalar_from_row(row, key_alias='c'):
-        if row is None:
-            return 0
-        if isinstance(row, dict):
-            return int(row.get(key_alias) or next(iter(row.values()), 0))
-        if isinstance(row, (list, tuple)):
-            return int(row[0]) if len(row) > 0 and row[0] is not None else 0
-        return 0
-
-    # Get tasks assigned ONLY to this user (not using visible_user_ids)
-    assigned_count = 0
-    try:
-        cur.execute("SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to=%s", (member_id,))
-        assigned_count = scalar_from_row(cur.fetchone(), 'c')
-    except Exception:
-        assigned_count = 0
-
-    # Get active projects that have tasks assigned to this user
-    active_projects = 0
-    try:
-        cur.execute("""
-            SELECT COUNT(DISTINCT p.id) AS c
-            FROM projects p
-            INNER JOIN tasks t ON t.project_id = p.id
-            WHERE p.status = 'Active' 
-            AND t.assigned_type = 'member'
-            AND t.assigned_to = %s
-        """, (member_id,))
-        active_projects = scalar_from_row(cur.fetchone(), 'c')
-    except Exception as e:
-        logger.error(f"ERROR active_projects: {e}")
-        active_projects = 0
-
-    # Get completed tasks for this user only
-    tasks_completed = 0
-    try:
-        cur.execute(
-            "SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to=%s AND status = 'Closed'",
-            (member_id,))
-        tasks_completed = scalar_from_row(cur.fetchone(), 'c')
-    except Exception:
-        tasks_completed = 0
-
-    # Get pending tasks for this user only
-    tasks_pending = 0
-    try:
-        cur.execute(
-            "SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to=%s AND status NOT IN ('Closed', 'In Progress', 'Review', 'In-Progress')",
-            (member_id,))
-        tasks_pending = scalar_from_row(cur.fetchone(), 'c')
-    except Exception as e:
-        logger.error(f"ERROR tasks_pending: {e}")
-        tasks_pending = 0
-
-    # Task breakdown by status for this user
-    progress_completed = progress_inprogress = progress_pending = 0
-    try:
-        cur.execute("""
-            SELECT status, COUNT(*) AS c
-            FROM tasks
-            WHERE assigned_type='member' AND assigned_to=%s
-            GROUP BY status
-        """, (member_id,))
-        rows = cur.fetchall() or []
-        if rows:
-            if isinstance(rows[0], dict):
-                items = [(r.get('status'), int(r.get('c') or 0)) for r in rows]
-            else:
-                items = [(r[0], int(r[1] or 0)) for r in rows]
-            for status, cnt in items:
-                s = (status or '').lower()
-                if s == 'closed':
-                    progress_completed += cnt
-                elif s in ('in progress', 'review', 'in-progress'):
-                    progress_inprogress += cnt
-                else:
-                    progress_pending += cnt
-    except Exception as e:
-        logger.error(f"ERROR progress counts: {e}")
-        progress_completed = progress_inprogress = progress_pending = 0
-
-    # Priority breakdown for this user
-    priority_buckets = {'Critical': 0, 'High': 0, 'Normal': 0, 'Low': 0}
-    try:
-        cur.execute("""
-            SELECT COALESCE(priority,'Normal') AS p, COUNT(*) AS c
-            FROM tasks
-            WHERE assigned_type='member' AND assigned_to=%s
-            GROUP BY p
-        """, (member_id,))
-        rows = cur.fetchall() or []
-        if rows:
-            if isinstance(rows[0], dict):
-                items = [(r.get('p'), int(r.get('c') or 0)) for r in rows]
-            else:
-                items = [(r[0], int(r[1] or 0)) for r in rows]
-            for p, cnt in items:
-                key = (p or 'Normal').title()
-                priority_buckets[key] = cnt
-    except Exception:
-        pass
-
-    # Priority open/closed breakdown
-    pri_keys = ['Critical', 'High', 'Normal', 'Low']
-    pri_open = {k: 0 for k in pri_keys}
-    pri_closed = {k: 0 for k in pri_keys}
-    try:
-        cur.execute("""
-            SELECT COALESCE(priority,'Normal') AS p, status, COUNT(*) AS c
-            FROM tasks
-            WHERE assigned_type='member' AND assigned_to=%s
-            GROUP BY p, status
-        """, (member_id,))
-        rows = cur.fetchall() or []
-        if rows:
-            if isinstance(rows[0], dict):
-                for r in rows:
-                    p = (r.get('p') or 'Normal').title()
-                    st = (r.get('status') or '').lower()
-                    cnt = int(r.get('c') or 0)
-                    if st == 'closed':
-                        pri_closed[p] = pri_closed.get(p, 0) + cnt
-                    else:
-                        pri_open[p] = pri_open.get(p, 0) + cnt
-            else:
-                for r in rows:
-                    p = (r[0] or 'Normal').title()
-                    st = (r[1] or '').lower()
-                    cnt = int(r[2] or 0)
-                    if st == 'closed':
-                        pri_closed[p] = pri_closed.get(p, 0) + cnt
-                    else:
-                        pri_open[p] = pri_open.get(p, 0) + cnt
-    except Exception:
-        pass
-
-    # Check if user is team lead
-    is_team_lead = False
-    try:
-        cur.execute("SELECT 1 FROM teams WHERE lead_id = %s LIMIT 1", (member_id,))
-        row = cur.fetchone()
-        if row:
-            is_team_lead = True
-    except Exception:
-        is_team_lead = False
-
-    # Board open count for this user
-    board_open_count = 0
-    try:
-        cur.execute("SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to=%s AND NOT (status = 'Closed')", (member_id,))
-        board_open_count = scalar_from_row(cur.fetchone(), 'c')
-    except Exception as e:
-        logger.error(f"ERROR: board_open_count {e}")
-        board_open_count = 0
-
-    # My new tasks count
-    my_new_tasks_count = 0
-    try:
-        cur.execute("SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to=%s AND status IN ('New','Open')", (member_id,))
-        my_new_tasks_count = scalar_from_row(cur.fetchone(), 'c')
-    except Exception as e:
-        logger.error(f"ERROR: my_new_tasks_count {e}")
-        my_new_tasks_count = 0
-
-    # Planned tasks for this user (next 7 days)
-    from datetime import datetime, timedelta
-    import json
-    planned_tasks = []
-    try:
-        from datetime import date, timedelta
-        start_date = date.today()
-        end_date = start_date + timedelta(days=7)
-        cur.execute("""
-            SELECT id, title, status, due_date, created_at
-            FROM tasks
-            WHERE assigned_type='member' AND assigned_to=%s
-              AND status NOT IN ('Completed', 'Closed', 'completed', 'closed')
-              AND due_date IS NOT NULL
-              AND DATE(due_date) BETWEEN %s AND %s
-            ORDER BY due_date ASC
-            LIMIT 10
-        """, (member_id, start_date, end_date))
-        rows = cur.fetchall() or []
-        for r in rows:
-            if isinstance(r, dict):
-                planned_tasks.append({
-                    'id': r.get('id'),
-                    'title': r.get('title'),
-                    'status': r.get('status'),
-                    'due_date': r.get('due_date'),
-                })
-            else:
-                planned_tasks.append({
-                    'id': r[0],
-                    'title': r[1],
-                    'status': r[2],
-                    'due_date': r[3],
-                })
-    except Exception as e:
-        logger.error(f"ERROR: planned_tasks {e}")
-        import traceback
-        traceback.print_exc()
-        planned_tasks = []
-
-    # Line chart data (tasks created/completed last 7 days) for this user
-    line_chart_labels = []
-    line_chart_created = []
-    line_chart_completed = []
+    tenant_key = resolve_tenant_key_from_request(request)
+    conn = get_tenant_conn(request)
     try:
-        today = datetime.now().date()
-        day_names = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        for i in range(6, -1, -1):
-            day = today - timedelta(days=i)
-            line_chart_labels.append(day_names[day.weekday()])
-            
-            # Count tasks created on this day
-            cur.execute("""
-                SELECT COUNT(*) as cnt FROM tasks 
-                WHERE assigned_type='member' AND assigned_to=%s 
-                AND DATE(created_at) = %s
-            """, (member_id, day))
-            created_row = cur.fetchone()
-            if created_row:
-                if isinstance(created_row, dict):
-                    line_chart_created.append(created_row.get('cnt', 0) or 0)
-                else:
-                    line_chart_created.append(created_row[0] or 0)
-            else:
-                line_chart_created.append(0)
-            
-            # Count tasks completed on this day
-            cur.execute("""
-                SELECT COUNT(*) as cnt FROM tasks 
-                WHERE assigned_type='member' AND assigned_to=%s 
-                AND status='Completed' AND DATE(updated_at) = %s
-            """, (member_id, day))
-            completed_row = cur.fetchone()
-            if completed_row:
-                if isinstance(completed_row, dict):
-                    line_chart_completed.append(completed_row.get('cnt', 0) or 0)
-                else:
-                    line_chart_completed.append(completed_row[0] or 0)
-            else:
-                line_chart_completed.append(0)
-    except Exception as e:
-        logger.error(f"ERROR: line_chart_data {e}", exc_info=True)
-        line_chart_labels = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        line_chart_created = [0, 0, 0, 0, 0, 0, 0]
-        line_chart_completed = [0, 0, 0, 0, 0, 0, 0]
-
-    cur.close()
-    conn.close()
-
-    ctx = {
-        'user': request.session.get('user'),
-        'assigned_count': assigned_count,
-        'active_projects': active_projects,
-        'projects_completed': 0,  # Not tracking individual user project completion
-        'tasks_completed': tasks_completed,
-        'tasks_pending': tasks_pending,
-        'progress_completed': progress_completed,
-        'progress_inprogress': progress_inprogress,
-        'progress_pending': progress_pending,
-        'pri_critical': priority_buckets.get('Critical', 0),
-        'pri_high': priority_buckets.get('High', 0),
-        'pri_normal': priority_buckets.get('Normal', 0),
-        'pri_low': priority_buckets.get('Low', 0),
-        'pri_critical_open': pri_open.get('Critical', 0),
-        'pri_high_open': pri_open.get('High', 0),
-        'pri_normal_open': pri_open.get('Normal', 0),
-        'pri_low_open': pri_open.get('Low', 0),
-        'pri_critical_closed': pri_closed.get('Critical', 0),
-        'pri_high_closed': pri_closed.get('High', 0),
-        'pri_normal_closed': pri_closed.get('Normal', 0),
-        'pri_low_closed': pri_closed.get('Low', 0),
-        'is_team_lead': is_team_lead,
-        'board_open_count': board_open_count,
-        'my_new_tasks_count': my_new_tasks_count,
-        'planned_tasks': planned_tasks,
-        'line_chart_labels': json.dumps(line_chart_labels),
-        'line_chart_created': json.dumps(line_chart_created),
-        'line_chart_completed': json.dumps(line_chart_completed),
-        'planned_start': start_date,
-        'planned_end': end_date,
-        'planned_limit': 10,
-        'is_user_dashboard': True,  # Flag to indicate this is user-specific view
-    }
+        # only tasks assigned to this member (no visibility expansion)
+        metrics = get_dashboard_metrics(conn, tenant_key, member_id, scope="user")
+    finally:
+        release_tenant_conn(conn)
 
+    ctx = _dashboard_context(request, metrics)
+    ctx['projects_completed'] = 0  # Not tracking individual user project completion
+    ctx['is_user_dashboard'] = True  # Flag to indicate this is user-specific view
     return render(request, 'core/dashboard.html', ctx)
 
 
@@ -1010,7 +411,7 @@ def api_team_list(request):
         teams = []
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
     return JsonResponse({'teams': teams})
 
 
@@ -1056,7 +457,7 @@ def api_team_summary(request):
     # If still empty: return early
     if not members:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
         return JsonResponse({'members': [], 'totals': {}})
 
     # For each member, compute assigned_count, completed, pending and priority buckets
@@ -1069,60 +470,44 @@ def api_team_summary(request):
         totals['priorities'][f'{pk}_open'] = 0
         totals['priorities'][f'{pk}_closed'] = 0
 
+    # one pass over the task count rollup for the whole team
+    counts = {}
+    try:
+        member_ids = [m['id'] for m in members]
+        rows = task_stats.query(conn, f"""
+            SELECT t.assigned_to AS member_id, COALESCE(t.priority, 'Normal') AS p, t.status,
+                   SUM(t.task_count) AS c
+            FROM {{stats}} t
+            WHERE t.assigned_type = 'member' AND t.assigned_to IN ({', '.join(['%s'] * len(member_ids))})
+            GROUP BY t.assigned_to, 2, t.status
+        """, member_ids)
+        for r in rows:
+            counts.setdefault(r['member_id'], []).append(r)
+    except Exception:
+        counts = {}
+
     for m in members:
         mid = m['id']
-        # counts: assigned total, completed, pending
-        try:
-            cur.execute("SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to = %s", (mid,))
-            assigned = _scalar_from_row(cur.fetchone(), 'c')
-            cur.execute("SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to = %s AND status = 'Closed'", (mid,))
-            completed = _scalar_from_row(cur.fetchone(), 'c')
-            cur.execute("SELECT COUNT(*) AS c FROM tasks WHERE assigned_type='member' AND assigned_to = %s AND NOT (status = 'Closed')", (mid,))
-            pending = _scalar_from_row(cur.fetchone(), 'c')
-        except Exception:
-            assigned = completed = pending = 0
-
-        # priorities per member (flat counts)
-        try:
-            cur.execute("""
-                SELECT COALESCE(priority,'Normal') AS p, status, COUNT(*) AS c
-                FROM tasks
-                WHERE assigned_type='member' AND assigned_to = %s
-                GROUP BY p, status
-            """, (mid,))
-            rows = cur.fetchall() or []
-            # build dict priorities
-            pmap = {'Critical':0,'High':0,'Normal':0,'Low':0}
-            if rows:
-                if isinstance(rows[0], dict):
-                    for r in rows:
-                        p = (r.get('p') or 'Normal').title()
-                        st = (r.get('status') or '').lower()
-                        cnt = int(r.get('c') or 0)
-                        if p not in pmap: pmap[p] = 0
-                        pmap[p] += cnt
-                        # update totals open/closed
-                        if st == 'closed':
-                            totals['priorities'].setdefault(f'{p}_closed',0)
-                            totals['priorities'][f'{p}_closed'] += cnt
-                        else:
-                            totals['priorities'].setdefault(f'{p}_open',0)
-                            totals['priorities'][f'{p}_open'] += cnt
-                else:
-                    for r in rows:
-                        p = (r[0] or 'Normal').title()
-                        st = (r[1] or '').lower()
-                        cnt = int(r[2] or 0)
-                        if p not in pmap: pmap[p] = 0
-                        pmap[p] += cnt
-                        if st == 'closed':
-                            totals['priorities'].setdefault(f'{p}_closed',0)
-                            totals['priorities'][f'{p}_closed'] += cnt
-                        else:
-                            totals['priorities'].setdefault(f'{p}_open',0)
-                            totals['priorities'][f'{p}_open'] += cnt
-        except Exception:
-            pmap = {'Critical':0,'High':0,'Normal':0,'Low':0}
+        # counts: assigned total, completed, pending and priority buckets
+        assigned = completed = pending = 0
+        pmap = {'Critical':0,'High':0,'Normal':0,'Low':0}
+        for r in counts.get(mid, []):
+            p = (r.get('p') or 'Normal').title()
+            st = r.get('status')
+            cnt = int(r.get('c') or 0)
+            assigned += cnt
+            if p not in pmap: pmap[p] = 0
+            pmap[p] += cnt
+            # update totals open/closed
+            if (st or '').lower() == 'closed':
+                completed += cnt
+                totals['priorities'].setdefault(f'{p}_closed',0)
+                totals['priorities'][f'{p}_closed'] += cnt
+            else:
+                if st is not None:
+                    pending += cnt
+                totals['priorities'].setdefault(f'{p}_open',0)
+                totals['priorities'][f'{p}_open'] += cnt
 
         member_summaries.append({
             'id': mid,
@@ -1143,7 +528,7 @@ def api_team_summary(request):
         totals['priorities'].setdefault(f'{pk}_closed', 0)
 
     cur.close()
-    conn.close()
+    release_tenant_conn(conn)
     return JsonResponse({'members': member_summaries, 'totals': totals})
 
 def api_get_team_members(request):
@@ -1207,7 +592,7 @@ def api_get_team_members(request):
         members = []
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
     # Include debug info when DEBUG is True to aid troubleshooting
     debug_info = {}
     try:
@@ -1313,7 +698,7 @@ def profile_view(request):
         social_links = {}
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
     return render(request, 'core/profile_view.html', {'profile': profile, 'social_links': social_links})
 def profile_edit_view(request):
@@ -1388,6 +773,7 @@ def profile_edit_view(request):
                     linkedin_url=VALUES(linkedin_url)
             """, (member_id, github_url, twitter_url, facebook_url, linkedin_url))
             conn.commit()
+            member_directory.invalidate(conn)
             
             # Update session with new profile photo if uploaded
             if profile_photo_path:
@@ -1466,7 +852,7 @@ def profile_edit_view(request):
         social_links = {}
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
     # ---------------------- RENDER PAGE ----------------------
     return render(request, 'core/profile_edit.html', {
@@ -1513,7 +899,7 @@ def profile_change_password_view(request):
                         error_msg = "Failed to update password: " + str(e)
                     finally:
                         cur.close()
-                        conn.close()
+                        release_tenant_conn(conn)
             except Exception as e:
                 error_msg = "Authentication error: " + str(e)
     else:
@@ -1539,9 +925,11 @@ def projects_report_view(request):
     summary = {}
     
     try:
-        # Fetch comprehensive project data with employee info and task statistics
+        # Task statistics come from project_stats (one grouped pass, refreshed
+        # for changed projects only) instead of seven subqueries per project
+        stats_columns, stats_join = project_stats.stats_join(conn)
         cur = conn.cursor()
-        cur.execute("""
+        cur.execute(f"""
             SELECT 
                 p.id,
                 p.name,
@@ -1560,16 +948,11 @@ def projects_report_view(request):
                 e.designation,
                 e.status AS employee_status,
                 u.full_name AS created_by_name,
-                (SELECT COUNT(*) FROM tasks WHERE project_id = p.id) AS total_tasks,
-                (SELECT COUNT(*) FROM tasks WHERE project_id = p.id AND status = 'Completed') AS completed_tasks,
-                (SELECT COUNT(*) FROM tasks WHERE project_id = p.id AND status IN ('New', 'In Progress', 'Pending')) AS pending_tasks,
-                (SELECT COUNT(*) FROM tasks WHERE project_id = p.id AND status = 'In Progress') AS inprogress_tasks,
-                (SELECT COUNT(*) FROM tasks WHERE project_id = p.id AND priority = 'Critical') AS critical_tasks,
-                (SELECT COUNT(*) FROM tasks WHERE project_id = p.id AND priority = 'High') AS high_tasks,
-                (SELECT COUNT(*) FROM tasks WHERE project_id = p.id AND due_date < CURDATE() AND status != 'Completed') AS overdue_tasks
+                {stats_columns}
             FROM projects p
             LEFT JOIN employees e ON p.employee_id = e.id
             LEFT JOIN users u ON p.created_by = u.id
+            {stats_join}
             ORDER BY p.created_at DESC
         """)
         rows = cur.fetchall()
@@ -1649,17 +1032,12 @@ def projects_report_view(request):
         total_overdue_tasks = sum(p['overdue_tasks'] for p in projects)
         
         # Calculate employee counts by status - get distinct employees from employees table
-        cur.execute("SELECT COUNT(*) as count FROM employees WHERE status = 'Active'")
-        active_employees = cur.fetchone()['count'] or 0
-        
-        cur.execute("SELECT COUNT(*) as count FROM employees WHERE status = 'Inactive'")
-        inactive_employees = cur.fetchone()['count'] or 0
-        
-        cur.execute("SELECT COUNT(*) as count FROM employees WHERE status = 'Terminated'")
-        terminated_employees = cur.fetchone()['count'] or 0
-        
-        cur.execute("SELECT COUNT(*) as count FROM employees WHERE status = 'On Leave'")
-        onleave_employees = cur.fetchone()['count'] or 0
+        cur.execute("SELECT status, COUNT(*) AS count FROM employees GROUP BY status")
+        employee_counts = {r['status']: r['count'] for r in cur.fetchall()}
+        active_employees = employee_counts.get('Active', 0)
+        inactive_employees = employee_counts.get('Inactive', 0)
+        terminated_employees = employee_counts.get('Terminated', 0)
+        onleave_employees = employee_counts.get('On Leave', 0)
         
         summary = {
             'total_projects': total_projects,
@@ -1759,7 +1137,7 @@ def projects_report_view(request):
     finally:
         # Close connection after all queries are complete
         if conn:
-            conn.close()
+            release_tenant_conn(conn)
 
     # Fetch all teams for filter dropdown
     teams = []
@@ -1769,7 +1147,7 @@ def projects_report_view(request):
         cur.execute("SELECT id, name FROM teams ORDER BY name")
         teams = cur.fetchall()
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
     except Exception as e:
         logger.error(f"Error fetching teams: {e}", exc_info=True)
         teams = []
@@ -1849,7 +1227,7 @@ def api_employees_list(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
     return JsonResponse({'employees': employees})
 
@@ -1923,7 +1301,7 @@ def api_create_employee(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
     return JsonResponse({'success': True, 'employee_id': employee_id})
 
@@ -1979,7 +1357,7 @@ def api_update_employee(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
     return JsonResponse({'success': True})
 
@@ -2017,7 +1395,7 @@ def api_delete_employee(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
     return JsonResponse({'success': True})
 
@@ -2077,7 +1455,7 @@ def api_employee_detail(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
     return JsonResponse({'employee': employee})
 
@@ -2134,7 +1512,7 @@ def api_notifications_list(request):
         if not table_exists:
             # Table doesn't exist yet, return empty
             cur.close()
-            conn.close()
+            release_tenant_conn(conn)
             return JsonResponse({
                 'notifications': [],
                 'unread_count': 0,
@@ -2169,7 +1547,7 @@ def api_notifications_list(request):
         unread_count = cur.fetchone()['count']
         
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
         
         return JsonResponse({
             'notifications': notifications_list,
@@ -2205,20 +1583,24 @@ def api_notifications_mark_read(request):
     
     conn = get_tenant_conn(request)
     cur = conn.cursor()
+    changes = []
     
     try:
+        conn.begin()
         if mark_all:
             cur.execute("""
                 UPDATE notifications 
                 SET is_read = 1
                 WHERE user_id = %s AND is_read = 0
             """, (member_id,))
+            changes = unread_counters.reset(conn, unread_counters.NOTIFICATION, member_id)
         elif notification_id:
             cur.execute("""
                 UPDATE notifications 
                 SET is_read = 1
-                WHERE id = %s AND user_id = %s
+                WHERE id = %s AND user_id = %s AND is_read = 0
             """, (notification_id, member_id))
+            changes = unread_counters.decrement(conn, unread_counters.NOTIFICATION, member_id, n=cur.rowcount)
         
         conn.commit()
     except Exception as e:
@@ -2226,8 +1608,9 @@ def api_notifications_mark_read(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
     
+    unread_counters.push(request.session.get('tenant_id') or resolve_tenant_key_from_request(request), changes)
     return JsonResponse({'success': True})
 
 
@@ -2251,17 +1634,26 @@ def api_notifications_delete(request):
     
     conn = get_tenant_conn(request)
     cur = conn.cursor()
+    changes = []
     
     try:
-        cur.execute("DELETE FROM notifications WHERE id = %s AND user_id = %s", (notification_id, member_id))
+        conn.begin()
+        # an unread notification also leaves the unread counter
+        cur.execute("DELETE FROM notifications WHERE id = %s AND user_id = %s AND is_read = 0",
+                    (notification_id, member_id))
+        if cur.rowcount:
+            changes = unread_counters.decrement(conn, unread_counters.NOTIFICATION, member_id, n=cur.rowcount)
+        else:
+            cur.execute("DELETE FROM notifications WHERE id = %s AND user_id = %s", (notification_id, member_id))
         conn.commit()
     except Exception as e:
         conn.rollback()
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
     
+    unread_counters.push(request.session.get('tenant_id') or resolve_tenant_key_from_request(request), changes)
     return JsonResponse({'success': True})
 
 
@@ -2275,38 +1667,43 @@ def api_notifications_unread_count(request):
     if not member_id:
         return JsonResponse({'count': 0})
     
+    conn = None
     try:
         conn = get_tenant_conn(request)
         if not conn:
             return JsonResponse({'count': 0})
-            
-        cur = conn.cursor()
-        
-        # Check if notifications table exists
-        cur.execute("""
-            SELECT COUNT(*) as count 
-            FROM information_schema.tables 
-            WHERE table_schema = DATABASE() AND table_name = 'notifications'
-        """)
-        table_exists = cur.fetchone()['count'] > 0
-        
-        if not table_exists:
-            cur.close()
-            conn.close()
-            return JsonResponse({'count': 0})
-        
-        cur.execute("SELECT COUNT(*) as count FROM notifications WHERE user_id = %s AND is_read = 0", (member_id,))
-        result = cur.fetchone()
-        count = result['count'] if result else 0
-        
-        cur.close()
-        conn.close()
-        
-        return JsonResponse({'count': count})
-        
+        return JsonResponse({'count': unread_counters.get_counters(conn, member_id)['notifications']})
     except Exception as e:
         logger.error(f"Error getting unread count: {e}", exc_info=True)
         return JsonResponse({'count': 0})
+    finally:
+        if conn:
+            release_tenant_conn(conn)
+
+
+def api_unread_counters(request):
+    """
+    Unread counters of the current member (notifications, direct messages, chat
+    groups). Loaded once per WebSocket connection; 'unread_counter' events keep it
+    current afterwards.
+    """
+    empty = {'notifications': 0, 'dm': {}, 'groups': {}, 'chat_total': 0}
+    member_id = request.session.get('member_id')
+    if not request.session.get('user') or not member_id:
+        return JsonResponse(empty, status=401)
+    
+    conn = None
+    try:
+        conn = get_tenant_conn(request)
+        if not conn:
+            return JsonResponse(empty)
+        return JsonResponse(unread_counters.get_counters(conn, member_id))
+    except Exception as e:
+        logger.error(f"Error getting unread counters: {e}", exc_info=True)
+        return JsonResponse(empty)
+    finally:
+        if conn:
+            release_tenant_conn(conn)
 
 
 # ============================================================================
@@ -2385,7 +1782,7 @@ def api_timer_start(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 def api_timer_stop(request):
@@ -2461,7 +1858,7 @@ def api_timer_stop(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 def api_timer_pause(request):
@@ -2537,7 +1934,7 @@ def api_timer_pause(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 def api_timer_resume(request):
@@ -2612,7 +2009,7 @@ def api_timer_resume(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 def api_timer_current(request):
@@ -2667,7 +2064,7 @@ def api_timer_current(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 def api_timer_history(request):
@@ -2711,7 +2108,7 @@ def api_timer_history(request):
         logger.error(f"Error in api_timer_history: {e}", exc_info=True)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 # ============================================================================
@@ -2803,7 +2200,7 @@ def api_time_entries_list(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 def api_time_entries_create(request):
@@ -2846,7 +2243,7 @@ def api_time_entries_create(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 def api_time_entries_update(request):
@@ -2920,7 +2317,7 @@ def api_time_entries_update(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 def api_time_entries_delete(request):
@@ -2968,7 +2365,7 @@ def api_time_entries_delete(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 def api_time_entries_approve(request):
@@ -3021,7 +2418,7 @@ def api_time_entries_approve(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
 
 def api_time_entries_reject(request):
@@ -3074,4 +2471,4 @@ def api_time_entries_reject(request):
         return JsonResponse({'error': str(e)}, status=500)
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
@@ -12,7 +12,7 @@ from django.utils import timezone
 from datetime import timedelta
 
 # Helper: tenant connection (replace with your actual function if different)
-from .db_helpers import get_tenant_conn  # your existing helper (adapt import path)
+from .db_helpers import get_tenant_conn, release_tenant_conn, resolve_tenant_key_from_request  # your existing helper (adapt import path)
 
 # --- Change Password (user) ---
 def change_password_page(request):
@@ -50,7 +50,7 @@ def change_password_page(request):
             except Exception:
                 pass
             try:
-                conn.close()
+                release_tenant_conn(conn)
             except Exception:
                 pass
 
@@ -96,7 +96,7 @@ def change_password_page(request):
                     except Exception:
                         pass
                     try:
-                        conn_up.close()
+                        release_tenant_conn(conn_up)
                     except Exception:
                         pass
             except Exception as e:
@@ -115,7 +115,7 @@ def change_password_page(request):
             except Exception:
                 pass
             try:
-                conn2.close()
+                release_tenant_conn(conn2)
             except Exception:
                 pass
 
@@ -157,7 +157,7 @@ def change_password_page(request):
                 except Exception:
                     pass
                 try:
-                    conn3.close()
+                    release_tenant_conn(conn3)
                 except Exception:
                     pass
         except Exception as e:
@@ -195,7 +195,7 @@ def password_reset_request(request):
         # Use your email send function, for now print/log
         print("[reset] Password reset link for", email, reset_link)
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
         messages.success(request, "If that email exists, we sent a reset link (check logs).")
         return redirect('password_reset_request')
     return render(request, 'core/password_reset_request.html', {})
@@ -229,7 +229,7 @@ def password_reset_confirm(request):
         cur.execute("UPDATE users SET password_hash=%s WHERE id=%s", (new_hash, row['user_id']))
         cur.execute("UPDATE password_reset_tokens SET used=1 WHERE id=%s", (row['id'],))
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
         messages.success(request, "Password reset successful. Please login.")
         return redirect('login')
 
@@ -257,7 +257,7 @@ def roles_page(request):
     cur.execute("SELECT role_id, permission_id FROM role_permissions")
     rp = cur.fetchall()
     cur.close()
-    conn.close()
+    release_tenant_conn(conn)
 
     rp_map = {}
     for r in rp:
@@ -297,7 +297,8 @@ def roles_save(request):
             cur.execute("INSERT INTO role_permissions (role_id, permission_id) VALUES (%s,%s)", (new_rid, pid))
         messages.success(request, "Role created.")
     cur.close()
-    conn.close()
+    release_tenant_conn(conn)
+    tp.invalidate_permissions(resolve_tenant_key_from_request(request))
     return redirect('roles_page')
 
 
@@ -321,7 +322,8 @@ def roles_delete(request):
         cur.execute("DELETE FROM roles WHERE id=%s", (role_id,))
         messages.success(request, "Role deleted.")
     cur.close()
-    conn.close()
+    release_tenant_conn(conn)
+    tp.invalidate_permissions(resolve_tenant_key_from_request(request))
     return redirect('roles_page')
 
 
@@ -346,7 +348,7 @@ def access_control_page(request):
     cur.execute("SELECT project_id, member_id, role_id FROM project_role_assignments")
     assign_rows = cur.fetchall()
     cur.close()
-    conn.close()
+    release_tenant_conn(conn)
     # Build a string-keyed map: "projectid,memberid" -> [role_id, ...]
     assign_map = {}
     for a in assign_rows:
@@ -386,7 +388,8 @@ def assign_role(request):
                     (project_id, target_member_id, role_id))
         messages.success(request, "Role removed.")
     cur.close()
-    conn.close()
+    release_tenant_conn(conn)
+    tp.invalidate_permissions(resolve_tenant_key_from_request(request))
     return redirect('access_control_page')
 
 
@@ -414,11 +417,11 @@ def password_policy_page(request):
                         (min_length, require_upper, require_lower, require_number, require_symbol))
         messages.success(request, "Password policy updated.")
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
         return redirect('password_policy_page')
 
     cur.execute("SELECT * FROM password_policies LIMIT 1")
     policy = cur.fetchone()
     cur.close()
-    conn.close()
+    release_tenant_conn(conn)
     return render(request, 'core/password_policy.html', {'policy': policy})
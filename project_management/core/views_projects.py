@@ -4,7 +4,10 @@ from django.shortcuts import render, redirect
 from django.urls import reverse
 from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseForbidden
 from django.contrib import messages
-from .db_helpers import get_tenant_conn_and_cursor
+from .db_helpers import get_tenant_conn, get_tenant_conn_and_cursor, release_tenant_conn, resolve_tenant_key_from_request
+from .notifications import NotificationManager
+from .search import search_projects
+from .member_directory import member_directory
 from .forms import ProjectForm, SubprojectForm
 import math
 
@@ -56,7 +59,7 @@ def can_manage_project(request, project_id, conn=None):
     finally:
         cur.close()
         if close_conn:
-            conn.close()
+            release_tenant_conn(conn)
 
 PAGE_SIZE = 10
 
@@ -107,7 +110,7 @@ def can_manage_project(request, project_id, conn=None):
     finally:
         cur.close()
         if close_conn:
-            conn.close()
+            release_tenant_conn(conn)
 
 def projects_list(request):
     page = int(request.GET.get('page', 1))
@@ -138,7 +141,7 @@ def projects_list(request):
         rows = cur.fetchall()
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
     return render(request, "core/projects_list.html", {
         "projects": rows,
@@ -152,13 +155,11 @@ def projects_list(request):
 
 def projects_search_ajax(request):
     q = request.GET.get('q', '').strip()
-    conn, cur = get_tenant_conn_and_cursor(request)
+    conn = get_tenant_conn(request)
     try:
-        cur.execute("SELECT id, name FROM projects WHERE name LIKE %s LIMIT 10", (f"%{q}%",))
-        rows = cur.fetchall()
+        rows = search_projects(conn, q, limit=10)
     finally:
-        cur.close()
-        conn.close()
+        release_tenant_conn(conn)
     return JsonResponse({"results": rows})
 
 def project_create(request):
@@ -191,7 +192,7 @@ def project_create(request):
         """)
         employees = cur.fetchall()
     finally:
-        cur.close(); conn.close()
+        cur.close(); release_tenant_conn(conn)
     
     # Build employee choices
     employee_choices = [('', '-- Select Employee --')] + [
@@ -205,7 +206,11 @@ def project_create(request):
         if form.is_valid():
             data = form.cleaned_data
             conn, cur = get_tenant_conn_and_cursor(request)
+            tenant_key = request.session.get('tenant_id') or resolve_tenant_key_from_request(request)
+            queued = []
             try:
+                # project, activity, notification and its outbox row commit together
+                conn.begin()
                 employee_id = data.get('employee_id') or None
                 if employee_id == '':
                     employee_id = None
@@ -226,9 +231,7 @@ def project_create(request):
                     emp = cur.fetchone()
                     if emp:
                         # Get creator name
-                        cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (request.session.get('user_id'),))
-                        creator = cur.fetchone()
-                        creator_name = creator['name'] if creator else 'Someone'
+                        creator_name = member_directory.name_for(conn, request.session.get('user_id')) or 'Someone'
                         
                         # Note: We need to find the member_id for this employee
                         # If employees table has a member_id field, use it. Otherwise, match by email or name
@@ -240,22 +243,23 @@ def project_create(request):
                         member = cur.fetchone()
                         
                         if member:
-                            cur.execute("""
-                                INSERT INTO notifications (user_id, title, message, type, link)
-                                VALUES (%s, %s, %s, %s, %s)
-                            """, (
-                                member['id'],
+                            queued += NotificationManager.queue_bulk_notification(
+                                conn,
+                                tenant_key,
+                                [member['id']],
                                 "Assigned to New Project",
                                 f"{creator_name} assigned you to project '{data['name']}'",
-                                "project",
-                                f"/projects/{new_id}"
-                            ))
+                                notification_type="project",
+                                link=f"/projects/{new_id}",
+                                created_by_id=request.session.get('user_id'),
+                            )
                 
                 conn.commit()
-                # Previously redirected to configuration step. Skip that and go to projects list.
-                return redirect(reverse('projects_list'))
             finally:
-                cur.close(); conn.close()
+                cur.close(); release_tenant_conn(conn)
+            NotificationManager.dispatch_queued(queued)
+            # Previously redirected to configuration step. Skip that and go to projects list.
+            return redirect(reverse('projects_list'))
     else:
         form = ProjectForm()
         form.fields['employee_id'].choices = employee_choices
@@ -285,7 +289,7 @@ def project_edit(request, project_id):
         """)
         employees = cur.fetchall()
     finally:
-        cur.close(); conn.close()
+        cur.close(); release_tenant_conn(conn)
     
     # Build employee choices
     employee_choices = [('', '-- Select Employee --')] + [
@@ -299,8 +303,12 @@ def project_edit(request, project_id):
         if form.is_valid():
             data = form.cleaned_data
             conn, cur = get_tenant_conn_and_cursor(request)
+            tenant_key = request.session.get('tenant_id') or resolve_tenant_key_from_request(request)
+            queued = []
 
             try:
+                # update, activity, notifications and their outbox rows commit together
+                conn.begin()
                 employee_id = data.get('employee_id') or None
                 if employee_id == '':
                     employee_id = None
@@ -357,9 +365,7 @@ def project_edit(request, project_id):
                 # Create notification if employee assignment changed
                 if employee_id and str(employee_id) != str(project.get('employee_id')):
                     # Get updater name
-                    cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (request.session.get('user_id'),))
-                    updater = cur.fetchone()
-                    updater_name = updater['name'] if updater else 'Someone'
+                    updater_name = member_directory.name_for(conn, request.session.get('user_id')) or 'Someone'
                     
                     # Find member_id for the employee
                     cur.execute("""
@@ -370,36 +376,34 @@ def project_edit(request, project_id):
                     member = cur.fetchone()
                     
                     if member:
-                        cur.execute("""
-                            INSERT INTO notifications (user_id, title, message, type, link)
-                            VALUES (%s, %s, %s, %s, %s)
-                        """, (
-                            member['id'],
+                        queued += NotificationManager.queue_bulk_notification(
+                            conn,
+                            tenant_key,
+                            [member['id']],
                             "Assigned to Project",
                             f"{updater_name} assigned you to project '{data['name']}'",
-                            "project",
-                            f"/projects/{project_id}"
-                        ))
+                            notification_type="project",
+                            link=f"/projects/{project_id}",
+                            created_by_id=request.session.get('user_id'),
+                        )
                 
                 # Notify if project is completed
                 if data['status'] == 'Completed' and project.get('status') != 'Completed':
                     # Get updater name
-                    cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (request.session.get('user_id'),))
-                    updater = cur.fetchone()
-                    updater_name = updater['name'] if updater else 'Someone'
+                    updater_name = member_directory.name_for(conn, request.session.get('user_id')) or 'Someone'
                     
                     # Notify project creator if different from updater
                     if project.get('created_by') and str(project.get('created_by')) != str(request.session.get('user_id')):
-                        cur.execute("""
-                            INSERT INTO notifications (user_id, title, message, type, link)
-                            VALUES (%s, %s, %s, %s, %s)
-                        """, (
-                            project['created_by'],
+                        queued += NotificationManager.queue_bulk_notification(
+                            conn,
+                            tenant_key,
+                            [project['created_by']],
                             "Project Completed",
                             f"{updater_name} marked project '{data['name']}' as completed",
-                            "success",
-                            f"/projects/{project_id}"
-                        ))
+                            notification_type="success",
+                            link=f"/projects/{project_id}",
+                            created_by_id=request.session.get('user_id'),
+                        )
                     
                     # Notify assigned employee
                     if employee_id:
@@ -411,21 +415,22 @@ def project_edit(request, project_id):
                         member = cur.fetchone()
                         
                         if member and str(member['id']) != str(request.session.get('user_id')):
-                            cur.execute("""
-                                INSERT INTO notifications (user_id, title, message, type, link)
-                                VALUES (%s, %s, %s, %s, %s)
-                            """, (
-                                member['id'],
+                            queued += NotificationManager.queue_bulk_notification(
+                                conn,
+                                tenant_key,
+                                [member['id']],
                                 "Project Completed",
                                 f"Project '{data['name']}' has been completed",
-                                "success",
-                                f"/projects/{project_id}"
-                            ))
+                                notification_type="success",
+                                link=f"/projects/{project_id}",
+                                created_by_id=request.session.get('user_id'),
+                            )
 
                 conn.commit()
             finally:
                 cur.close()
-                conn.close()
+                release_tenant_conn(conn)
+            NotificationManager.dispatch_queued(queued)
 
             messages.success(request, "Project updated.")
             return redirect(reverse('projects_list'))
@@ -477,7 +482,7 @@ def subprojects_list(request, project_id):
 
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
     return render(request, "core/subprojects_list.html", {
         "project": project,
@@ -497,7 +502,7 @@ def subproject_create(request, project_id):
             return HttpResponseBadRequest("Project not found")
     finally:
         cur.close()
-        conn.close()
+        release_tenant_conn(conn)
 
     if request.method == "POST":
         form = SubprojectForm(request.POST)
@@ -514,7 +519,7 @@ def subproject_create(request, project_id):
                 cur.execute("INSERT INTO activity_log (entity_type, entity_id, action, performed_by) VALUES (%s,%s,%s,%s)",
                             ("subproject", new_id, "created subproject", request.session.get('user_id')))
             finally:
-                cur.close(); conn.close()
+                cur.close(); release_tenant_conn(conn)
             messages.success(request, "Subproject created.")
             return redirect(reverse('subprojects_list', args=[project_id]))
     else:
@@ -542,7 +547,7 @@ def subproject_edit(request, project_id, sub_id):
         if not subproject:
             return HttpResponseBadRequest("Subproject not found")
     finally:
-        cur.close(); conn.close()
+        cur.close(); release_tenant_conn(conn)
 
     if request.method == "POST":
         form = SubprojectForm(request.POST)
@@ -572,7 +577,7 @@ def subproject_edit(request, project_id, sub_id):
                 conn.commit()
             finally:
                 cur.close()
-                conn.close()
+                release_tenant_conn(conn)
 
             messages.success(request, "Subproject updated.")
             return redirect(reverse('subprojects_list', args=[project_id]))
@@ -612,7 +617,7 @@ def project_configure(request, project_id):
         if not project:
             return HttpResponseBadRequest("Project not found")
     finally:
-        cur.close(); conn.close()
+        cur.close(); release_tenant_conn(conn)
     
     # Available work types (similar to Jira)
     available_work_types = [
@@ -660,7 +665,7 @@ def project_configure(request, project_id):
             conn.commit()
             messages.success(request, f"Project '{project['name']}' configured successfully!")
         finally:
-            cur.close(); conn.close()
+            cur.close(); release_tenant_conn(conn)
         
         return redirect(reverse('projects_list'))
     
@@ -673,7 +678,7 @@ def project_configure(request, project_id):
         cur.execute("SELECT status_name FROM project_statuses WHERE project_id=%s ORDER BY status_order", (project_id,))
         existing_statuses = [row['status_name'] for row in cur.fetchall()]
     finally:
-        cur.close(); conn.close()
+        cur.close(); release_tenant_conn(conn)
     
     return render(request, "core/project_configure.html", {
         "project": project,
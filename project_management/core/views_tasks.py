@@ -1,5 +1,5 @@
 
-import csv, io, datetime, os
+import io, datetime, os
 from django.shortcuts import render, redirect
 from django.http import JsonResponse, HttpResponseBadRequest, HttpResponse
 from django.views.decorators.http import require_POST
@@ -11,8 +11,16 @@ from django.conf import settings
 from django.core.files.storage import default_storage
 
 # helper: get connection for current tenant
-from .db_helpers import get_tenant_conn, get_visible_task_user_ids, get_tenant_work_types, resolve_tenant_key_from_request
+from .db_helpers import get_tenant_conn, get_tenant_work_types, resolve_tenant_key_from_request
+from .task_visibility import get_visibility_policy
 from .notifications import NotificationManager
+from .dashboard_metrics import invalidate_dashboard_metrics
+from . import project_stats, task_stats
+from .tenant_cache import TenantScopedCache
+from .search import search_tasks
+from .member_directory import member_directory
+from .task_import import MAX_UPLOAD_BYTES, ImportFileError
+from .import_jobs import enqueue_import, job_status
 import json
 
 # PDF generation
@@ -135,32 +143,38 @@ def create_task_view(request):
                 assigned_type, assigned_to = "member", assigned_raw
 
         # --- INSERT ---
-        cur.execute(
-            """INSERT INTO tasks
-               (project_id, subproject_id, title, description, status, priority,
-                assigned_to, assigned_type, created_by, due_date, closure_date, work_type, 
-                si_browser, si_resolution, si_os, si_timestamp, created_at)
-               VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
-            (
-                project_id,
-                subproject_id,
-                title,
-                description,
-                status,
-                priority,
-                assigned_to,
-                assigned_type,
-                created_by,
-                due_date,
-                closure_date,
-                work_type,
-                si_browser,
-                si_resolution,
-                si_os,
-                si_timestamp,
-            ),
-        )
-        task_id = cur.lastrowid
+        # task, activity, notifications and their outbox rows commit together
+        conn.begin()
+        with task_stats.tracking(conn) as tracked:
+            cur.execute(
+                """INSERT INTO tasks
+                   (project_id, subproject_id, title, description, status, priority,
+                    assigned_to, assigned_type, created_by, due_date, closure_date, work_type, 
+                    si_browser, si_resolution, si_os, si_timestamp, created_at)
+                   VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
+                (
+                    project_id,
+                    subproject_id,
+                    title,
+                    description,
+                    status,
+                    priority,
+                    assigned_to,
+                    assigned_type,
+                    created_by,
+                    due_date,
+                    closure_date,
+                    work_type,
+                    si_browser,
+                    si_resolution,
+                    si_os,
+                    si_timestamp,
+                ),
+            )
+            task_id = cur.lastrowid
+            tracked.add([task_id])
+        project_stats.mark_projects(conn, [project_id])
+        queued = []
 
         # Log activity
         cur.execute(
@@ -171,48 +185,45 @@ def create_task_view(request):
         # Create notification if task is assigned to a member
         if assigned_type == "member" and assigned_to:
             # Get creator name
-            cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (created_by,))
-            creator = cur.fetchone()
-            creator_name = creator['name'] if creator else 'Someone'
+            creator_name = member_directory.name_for(conn, created_by) or 'Someone'
             
-            cur.execute("""
-                INSERT INTO notifications (user_id, title, message, type, link)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                assigned_to,
+            queued = NotificationManager.queue_bulk_notification(
+                conn,
+                request.session.get('tenant_id') or resolve_tenant_key_from_request(request),
+                [assigned_to],
                 "New Task Assigned",
                 f"{creator_name} assigned you to '{title}'",
-                "task",
-                f"/tasks/{task_id}/view/"
-            ))
+                notification_type="task",
+                link=f"/tasks/{task_id}/view/",
+                created_by_id=created_by,
+            )
         
         # Create notification for team members if assigned to a team
         elif assigned_type == "team" and assigned_to:
-            cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (created_by,))
-            creator = cur.fetchone()
-            creator_name = creator['name'] if creator else 'Someone'
+            creator_name = member_directory.name_for(conn, created_by) or 'Someone'
             
             # Get all team members
             cur.execute("SELECT member_id FROM team_memberships WHERE team_id=%s", (assigned_to,))
             team_members = cur.fetchall()
             
-            for member in team_members:
-                cur.execute("""
-                    INSERT INTO notifications (user_id, title, message, type, link)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    member['member_id'],
-                    "New Team Task Assigned",
-                    f"{creator_name} assigned a task to your team: '{title}'",
-                    "task",
-                    f"/tasks/{task_id}/view/"
-                ))
+            queued = NotificationManager.queue_bulk_notification(
+                conn,
+                request.session.get('tenant_id') or resolve_tenant_key_from_request(request),
+                [member['member_id'] for member in team_members],
+                "New Team Task Assigned",
+                f"{creator_name} assigned a task to your team: '{title}'",
+                notification_type="task",
+                link=f"/tasks/{task_id}/view/",
+                created_by_id=created_by,
+            )
 
         # Handle file attachments using helper function
         save_task_attachments(request, task_id, cur, created_by)
 
         conn.commit()
         cur.close()
+        _invalidate_task_caches(request)
+        NotificationManager.dispatch_queued(queued)
         return redirect("task_board")
 
     # --- GET ---
@@ -255,35 +266,26 @@ def my_tasks_view(request):
         # Try to resolve from email if available
         email = request.session.get("auth_email")
         if email:
-            cur.execute("SELECT id FROM members WHERE email = %s", (email,))
-            row = cur.fetchone()
-            if row:
-                user_id = row["id"]
+            user_id = member_directory.id_for(conn, email)
+            if user_id:
                 request.session["user_id"] = user_id
     if not user_id:
         return redirect("login")
 
-    # Get visible task user IDs based on Alex Carter visibility rules
-    visible_user_ids = get_visible_task_user_ids(conn, user_id)
-    
-    # Show tasks assigned to visible users (current user's tasks + Alex Carter's tasks, 
-    # or all tasks if current user is Alex Carter)
-    if visible_user_ids:
-        placeholders = ','.join(['%s'] * len(visible_user_ids))
-        cur.execute(
-            f"""SELECT t.id, t.title, t.status, t.priority, t.due_date, t.closure_date, 
-                       COALESCE(t.work_type, 'Task') AS work_type,
-                       t.assigned_to, t.project_id, p.name AS project_name
-               FROM tasks t
-               LEFT JOIN projects p ON p.id = t.project_id
-               WHERE t.assigned_type='member' AND t.assigned_to IN ({placeholders})
-               ORDER BY FIELD(t.status,'Open','In Progress','Review','Blocked','Closed'),
-                        t.due_date IS NULL, t.due_date ASC""",
-            tuple(visible_user_ids),
-        )
-        tasks = cur.fetchall()
-    else:
-        tasks = []
+    # Show tasks the tenant's visibility policy allows this user to see
+    vis_sql, vis_params = get_visibility_policy(resolve_tenant_key_from_request(request)).predicate(user_id)
+    cur.execute(
+        f"""SELECT t.id, t.title, t.status, t.priority, t.due_date, t.closure_date, 
+                   COALESCE(t.work_type, 'Task') AS work_type,
+                   t.assigned_to, t.project_id, p.name AS project_name
+           FROM tasks t
+           LEFT JOIN projects p ON p.id = t.project_id
+           WHERE {vis_sql}
+           ORDER BY FIELD(t.status,'Open','In Progress','Review','Blocked','Closed'),
+                    t.due_date IS NULL, t.due_date ASC""",
+        tuple(vis_params),
+    )
+    tasks = cur.fetchall()
     
     cur.close()
 
@@ -349,21 +351,69 @@ from math import ceil
 from .db_helpers import get_tenant_conn
 
 
+# Kanban columns, in display order
+BOARD_STATUS_COLUMNS = ["Open", "In Progress", "Review", "Blocked", "Closed"]
+
+# card fields for the board; assignee names come from one join instead of a
+# correlated subquery per row
+_BOARD_CARD_SELECT = """
+    SELECT
+        t.id,
+        COALESCE(t.title, '(Untitled)') AS title,
+        COALESCE(t.status, 'Open') AS status,
+        COALESCE(t.priority, 'Normal') AS priority,
+        t.due_date,
+        COALESCE(t.work_type, 'Task') AS work_type,
+
+        CONCAT_WS(':', t.assigned_type, t.assigned_to) AS assigned_to,
+
+        CASE
+            WHEN t.assigned_type = 'member' THEN CONCAT(m.first_name, ' ', m.last_name)
+            WHEN t.assigned_type = 'team' THEN tm.name
+            ELSE NULL
+        END AS assigned_to_display{extra}
+
+    FROM tasks t
+    LEFT JOIN members m ON t.assigned_type = 'member' AND m.id = t.assigned_to
+    LEFT JOIN teams tm ON t.assigned_type = 'team' AND tm.id = t.assigned_to
+"""
+
+# cached board totals; a task write invalidates the tenant's counts
+_BOARD_COUNT_TTL = getattr(settings, "BOARD_COUNT_TTL", 30)
+_board_count_cache = TenantScopedCache(ttl=_BOARD_COUNT_TTL)
+
+
+def _invalidate_task_caches(request):
+    """Drop cached dashboard metrics and board totals after a task write."""
+    _invalidate_tenant_task_caches(resolve_tenant_key_from_request(request))
+
+
+def _invalidate_tenant_task_caches(tenant_key):
+    invalidate_dashboard_metrics(tenant_key)
+    _board_count_cache.invalidate(tenant_key)
+
+
 def board_data_api(request):
     """
-    Paginated task data for the Kanban board.
-    Compatible with both dict and tuple-returning cursors.
+    Task data for the Kanban board.
+
+    Page mode (default): ?page=N, 20 tasks per page ordered by id DESC.
+    Cursor mode: ?after_id=<id> returns the next tasks with id < after_id (empty or 0
+    starts from the newest) plus next_after_id; combine with ?status= to stream one
+    column (?status=other: the tasks whose status is not in BOARD_STATUS_COLUMNS).
+    total_count is cached per tenant/user/filter for BOARD_COUNT_TTL seconds.
     """
     conn = get_tenant_conn(request)
     cur = conn.cursor()
+    tenant_key = resolve_tenant_key_from_request(request)
 
     # Get current user ID
     user_id = request.session.get("user_id")
     if not user_id:
         user_id = request.session.get("member_id")
     
-    # Get visible task user IDs based on Alex Carter visibility rules
-    visible_user_ids = get_visible_task_user_ids(conn, user_id) if user_id else []
+    # Visibility rule of this tenant, compiled to a SQL predicate
+    vis_sql, vis_params = get_visibility_policy(tenant_key).predicate(user_id)
 
     # ---- Status Filter + Assigned Filter ----
     status = request.GET.get("status")
@@ -371,6 +421,13 @@ def board_data_api(request):
     exclude_closed = request.GET.get("exclude_closed")  # For timer dropdown
 
     # ---- Pagination ----
+    cursor_mode = "after_id" in request.GET
+    after_id = None
+    if cursor_mode:
+        try:
+            after_id = int(request.GET.get("after_id") or 0)
+        except ValueError:
+            return HttpResponseBadRequest("Invalid after_id")
     try:
         page = int(request.GET.get("page", "1"))
     except:
@@ -381,101 +438,66 @@ def board_data_api(request):
     per_page = 20
     offset = (page - 1) * per_page
 
-    # ---- Total Count Query ----
-    count_sql = "SELECT COUNT(*) FROM tasks"
-    count_params = []
-
-    # build optional filters
-    count_filters = []
+    # ---- Filters (shared by the count and the main query) ----
+    filters = []
+    filter_params = []
     
     # Apply visibility filter for member-assigned tasks
-    if visible_user_ids:
-        placeholders = ','.join(['%s'] * len(visible_user_ids))
-        count_filters.append(f"(assigned_type = 'member' AND assigned_to IN ({placeholders}))")
-        count_params.extend(visible_user_ids)
-    
-    if status:
-        count_filters.append("status = %s")
-        count_params.append(status)
+    if user_id:
+        filters.append(vis_sql)
+        filter_params.extend(vis_params)
+    
+    if status == "other":
+        # board_columns_api's "other" column: every status that is not a board column
+        filters.append(f"(t.status IS NULL OR t.status NOT IN ({', '.join(['%s'] * len(BOARD_STATUS_COLUMNS))}))")
+        filter_params.extend(BOARD_STATUS_COLUMNS)
+    elif status:
+        filters.append("t.status = %s")
+        filter_params.append(status)
     if assigned_to:
         # Only member-assigned tasks should be considered when filtering by assigned_to
-        count_filters.append("assigned_type = 'member' AND assigned_to = %s")
-        count_params.append(assigned_to)
+        filters.append("t.assigned_type = 'member' AND t.assigned_to = %s")
+        filter_params.append(assigned_to)
     if exclude_closed:
         # Exclude closed, cancelled, and completed tasks (for timer dropdown)
-        count_filters.append("status NOT IN ('Closed', 'Cancelled', 'Completed')")
-
-    if count_filters:
-        count_sql += " WHERE " + " AND ".join(count_filters)
+        filters.append("t.status NOT IN ('Closed', 'Cancelled', 'Completed')")
 
-    cur.execute(count_sql, tuple(count_params))
-    row = cur.fetchone()
+    where_sql = (" WHERE " + " AND ".join(filters)) if filters else ""
 
-    # Handle dict / tuple cursor
-    if isinstance(row, dict):
-        total_count = row.get("COUNT(*)", 0)
-    else:
-        total_count = row[0]
+    # ---- Total Count (cached) ----
+    count_key = (user_id, status or "", assigned_to or "", bool(exclude_closed))
+    total_count = _board_count_cache.get(tenant_key, *count_key)
+    if total_count is None:
+        generation = _board_count_cache.generation(tenant_key)
+        cur.execute("SELECT COUNT(*) AS c FROM tasks t" + where_sql, tuple(filter_params))
+        row = cur.fetchone()
+        # Handle dict / tuple cursor
+        if isinstance(row, dict):
+            total_count = row.get("c", 0)
+        else:
+            total_count = row[0]
+        _board_count_cache.put(tenant_key, count_key, total_count, generation)
 
     # Calculate total pages
     total_pages = (total_count + per_page - 1) // per_page if total_count > 0 else 1
 
     # ---- MAIN QUERY ----
-    sql = """
-        SELECT
-            t.id,
-            COALESCE(t.title, '(Untitled)') AS title,
-            COALESCE(t.status, 'Open') AS status,
-            COALESCE(t.priority, 'Normal') AS priority,
-            t.due_date,
-            COALESCE(t.work_type, 'Task') AS work_type,
-
-            CONCAT_WS(':', t.assigned_type, t.assigned_to) AS assigned_to,
-
-            CASE
-                WHEN t.assigned_type = 'member' THEN (
-                    SELECT CONCAT(m.first_name, ' ', m.last_name)
-                    FROM members m
-                    WHERE m.id = t.assigned_to
-                )
-                WHEN t.assigned_type = 'team' THEN (
-                    SELECT tm.name
-                    FROM teams tm
-                    WHERE tm.id = t.assigned_to
-                )
-                ELSE NULL
-            END AS assigned_to_display
-
-        FROM tasks t
-    """
-
-    # ---- Apply Status Filter ----
-    # ---- Apply optional filters to main query ----
-    params = []
-    main_filters = []
-    
-    # Apply visibility filter for member-assigned tasks
-    if visible_user_ids:
-        placeholders = ','.join(['%s'] * len(visible_user_ids))
-        main_filters.append(f"(t.assigned_type = 'member' AND t.assigned_to IN ({placeholders}))")
-        params.extend(visible_user_ids)
-    
-    if status:
-        main_filters.append("t.status = %s")
-        params.append(status)
-    if assigned_to:
-        main_filters.append("t.assigned_type = 'member' AND t.assigned_to = %s")
-        params.append(assigned_to)
-    if exclude_closed:
-        # Exclude closed, cancelled, and completed tasks (for timer dropdown)
-        main_filters.append("t.status NOT IN ('Closed', 'Cancelled', 'Completed')")
-
-    if main_filters:
-        sql += " WHERE " + " AND ".join(main_filters)
-
-    # ---- ORDER + Pagination ----
-    sql += " ORDER BY t.id DESC LIMIT %s OFFSET %s"
-    params.extend([per_page, offset])
+    sql = _BOARD_CARD_SELECT.format(extra="")
+    params = list(filter_params)
+
+    if cursor_mode:
+        # keyset pagination: served by idx_tasks_status_id, cost independent of depth
+        if after_id:
+            sql += " WHERE " + " AND ".join(filters + ["t.id < %s"])
+            params.append(after_id)
+        else:
+            sql += where_sql
+        sql += " ORDER BY t.id DESC LIMIT %s"
+        params.append(per_page + 1)
+    else:
+        sql += where_sql
+        sql += " ORDER BY t.id DESC LIMIT %s OFFSET %s"
+        params.extend([per_page, offset])
 
     cur.execute(sql, tuple(params))
 
@@ -485,13 +507,24 @@ def board_data_api(request):
     if not rows:
         tasks = []
     elif isinstance(rows[0], dict):
-        tasks = rows
+        tasks = list(rows)
     else:
         cols = [desc[0] for desc in cur.description]
         tasks = [dict(zip(cols, r)) for r in rows]
 
     cur.close()
 
+    if cursor_mode:
+        has_more = len(tasks) > per_page
+        tasks = tasks[:per_page]
+        return JsonResponse({
+            "tasks": tasks,
+            "per_page": per_page,
+            "has_more": has_more,
+            "next_after_id": tasks[-1]["id"] if has_more else None,
+            "total_count": total_count,
+        })
+
     return JsonResponse({
         "tasks": tasks,
         "page": page,
@@ -501,7 +534,144 @@ def board_data_api(request):
     })
 
 
+# most cards a delta sync returns before asking the client to reload the board
+_BOARD_DELTA_MAX = getattr(settings, "BOARD_DELTA_MAX", 500)
+
+
+def _board_rows(cur, rows):
+    if not rows:
+        return []
+    if isinstance(rows[0], dict):
+        return list(rows)
+    cols = [desc[0] for desc in cur.description]
+    return [dict(zip(cols, r)) for r in rows]
+
+
+@require_GET
+def board_columns_api(request):
+    """
+    Kanban board in one round trip.
+
+    GET /tasks/api/board-columns/?limit=N
+        First N cards (default 20, max 100) of every column in BOARD_STATUS_COLUMNS,
+        newest first, with per-column counts and next_after_id for loading more
+        through board_data_api (?status=<col>&after_id=<id>). Tasks whose status is
+        not a board column are returned under "other" (?status=other to load more).
+
+    GET /tasks/api/board-columns/?since=<sync_token>
+        Delta mode: cards changed since the token (tasks.updated_at), ids of cards
+        that were deleted or are no longer visible, and a new sync_token. Returns
+        {"reset": true} when more than BOARD_DELTA_MAX tasks changed.
+
+    Both modes return sync_token, the database clock at the start of the request.
+    """
+    conn = get_tenant_conn(request)
+    cur = conn.cursor()
+    tenant_key = resolve_tenant_key_from_request(request)
+
+    user_id = request.session.get("user_id") or request.session.get("member_id")
+    if user_id:
+        vis_sql, vis_params = get_visibility_policy(tenant_key).predicate(user_id)
+    else:
+        # same as board_data_api: no session user, no visibility filter
+        vis_sql, vis_params = "1 = 1", []
+
+    try:
+        cur.execute("SELECT NOW() AS now")
+        sync_token = cur.fetchone()["now"].strftime("%Y-%m-%d %H:%M:%S")
+
+        since = request.GET.get("since")
+        if since:
+            try:
+                datetime.datetime.strptime(since, "%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                return HttpResponseBadRequest("Invalid since")
+
+            # >= rather than >: updated_at has one-second resolution
+            sql = _BOARD_CARD_SELECT.format(extra=f",\n        ({vis_sql}) AS visible")
+            sql += " WHERE t.updated_at >= %s ORDER BY t.updated_at, t.id LIMIT %s"
+            cur.execute(sql, tuple(vis_params) + (since, _BOARD_DELTA_MAX + 1))
+            changed = _board_rows(cur, cur.fetchall())
+            if len(changed) > _BOARD_DELTA_MAX:
+                return JsonResponse({"reset": True, "sync_token": sync_token})
+
+            tasks, removed_ids = [], []
+            for task in changed:
+                if task.pop("visible"):
+                    tasks.append(task)
+                else:
+                    removed_ids.append(task["id"])
+
+            cur.execute("""
+                SELECT DISTINCT entity_id FROM activity_log
+                WHERE entity_type = 'task' AND action = 'deleted' AND timestamp >= %s
+            """, (since,))
+            removed_ids.extend(r["entity_id"] for r in cur.fetchall())
+
+            return JsonResponse({
+                "tasks": tasks,
+                "removed_ids": removed_ids,
+                "sync_token": sync_token,
+            })
+
+        try:
+            limit = min(max(int(request.GET.get("limit", "20")), 1), 100)
+        except ValueError:
+            limit = 20
+
+        # one LIMIT branch per column (each served by idx_tasks_status_id) plus the rest
+        branches, params = [], []
+        card_sql = _BOARD_CARD_SELECT.format(extra=",\n        %s AS board_column")
+        for col in BOARD_STATUS_COLUMNS:
+            branches.append(f"({card_sql} WHERE {vis_sql} AND t.status = %s ORDER BY t.id DESC LIMIT %s)")
+            params.extend([col] + vis_params + [col, limit + 1])
+        placeholders = ",".join(["%s"] * len(BOARD_STATUS_COLUMNS))
+        branches.append(
+            f"({card_sql} WHERE {vis_sql} AND (t.status IS NULL OR t.status NOT IN ({placeholders}))"
+            f" ORDER BY t.id DESC LIMIT %s)"
+        )
+        params.extend(["other"] + vis_params + BOARD_STATUS_COLUMNS + [limit + 1])
+        cur.execute(" UNION ALL ".join(branches), tuple(params))
+        rows = _board_rows(cur, cur.fetchall())
+
+        # per-column totals (cached like board_data_api's total)
+        counts = _board_count_cache.get(tenant_key, user_id, "columns")
+        if counts is None:
+            generation = _board_count_cache.generation(tenant_key)
+            cur.execute(
+                f"SELECT t.status, COUNT(*) AS c FROM tasks t WHERE {vis_sql} GROUP BY t.status",
+                tuple(vis_params),
+            )
+            # status comparisons are case-insensitive in MySQL; count the same way
+            by_lower = {col.lower(): col for col in BOARD_STATUS_COLUMNS}
+            counts = {}
+            for r in cur.fetchall():
+                key = by_lower.get((r["status"] or "").lower(), "other")
+                counts[key] = counts.get(key, 0) + int(r["c"])
+            _board_count_cache.put(tenant_key, (user_id, "columns"), counts, generation)
+    finally:
+        cur.close()
+
+    grouped = {col: [] for col in BOARD_STATUS_COLUMNS + ["other"]}
+    for task in rows:
+        grouped[task.pop("board_column")].append(task)
+    columns = {}
+    for key, tasks in grouped.items():
+        has_more = len(tasks) > limit
+        tasks = tasks[:limit]
+        columns[key] = {
+            "tasks": tasks,
+            "count": counts.get(key, 0),
+            "has_more": has_more,
+            "next_after_id": tasks[-1]["id"] if has_more else None,
+        }
 
+    return JsonResponse({
+        "columns": columns,
+        "order": BOARD_STATUS_COLUMNS,
+        "limit": limit,
+        "sync_token": sync_token,
+    })
 
 
 # ==============================
@@ -528,11 +698,16 @@ def assign_task_api(request):
     cur.execute("SELECT title FROM tasks WHERE id=%s", (task_id,))
     task = cur.fetchone()
     task_title = task['title'] if task else 'A task'
+    tenant_key = request.session.get('tenant_id') or resolve_tenant_key_from_request(request)
+    queued = []
     
-    cur.execute(
-        "UPDATE tasks SET assigned_to=%s, assigned_type=%s, updated_at=NOW() WHERE id=%s",
-        (assigned_to, assigned_type, task_id),
-    )
+    # assignment, activity and notifications commit together
+    conn.begin()
+    with task_stats.tracking(conn, [task_id]):
+        cur.execute(
+            "UPDATE tasks SET assigned_to=%s, assigned_type=%s, updated_at=NOW() WHERE id=%s",
+            (assigned_to, assigned_type, task_id),
+        )
     cur.execute(
         "INSERT INTO activity_log (entity_type, entity_id, action, performed_by) VALUES (%s,%s,%s,%s)",
         ("task", task_id, f"assigned_to:{assignee}", assigned_by),
@@ -541,44 +716,39 @@ def assign_task_api(request):
     # Create notification for assigned member/team
     if assigned_type == "member":
         # Get assigner name
-        cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (assigned_by,))
-        assigner = cur.fetchone()
-        assigner_name = assigner['name'] if assigner else 'Someone'
+        assigner_name = member_directory.name_for(conn, assigned_by) or 'Someone'
         
-        cur.execute("""
-            INSERT INTO notifications (user_id, title, message, type, link)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (
-            assigned_to,
+        queued += NotificationManager.queue_bulk_notification(
+            conn, tenant_key, [assigned_to],
             "Task Assigned to You",
             f"{assigner_name} assigned you to '{task_title}'",
-            "task",
-            f"/tasks/{task_id}/view/"
-        ))
+            notification_type="task",
+            link=f"/tasks/{task_id}/view/",
+            created_by_id=assigned_by,
+        )
     
     elif assigned_type == "team":
-        cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (assigned_by,))
-        assigner = cur.fetchone()
-        assigner_name = assigner['name'] if assigner else 'Someone'
+        assigner_name = member_directory.name_for(conn, assigned_by) or 'Someone'
         
         # Get all team members
         cur.execute("SELECT member_id FROM team_memberships WHERE team_id=%s", (assigned_to,))
         team_members = cur.fetchall()
         
-        for member in team_members:
-            cur.execute("""
-                INSERT INTO notifications (user_id, title, message, type, link)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                member['member_id'],
-                "Team Task Assignment",
-                f"{assigner_name} assigned a task to your team: '{task_title}'",
-                "task",
-                f"/tasks/{task_id}/view/"
-            ))
+        # one multi-row insert for the whole team; sent by the outbox dispatcher
+        queued += NotificationManager.queue_bulk_notification(
+            conn, tenant_key,
+            [member['member_id'] for member in team_members],
+            "Team Task Assignment",
+            f"{assigner_name} assigned a task to your team: '{task_title}'",
+            notification_type="task",
+            link=f"/tasks/{task_id}/view/",
+            created_by_id=assigned_by,
+        )
     
     conn.commit()
     cur.close()
+    NotificationManager.dispatch_queued(queued)
+    _invalidate_task_caches(request)
     return JsonResponse({"ok": True, "task_id": task_id, "assignee": assignee})
 
 
@@ -600,24 +770,30 @@ def api_update_status(request):
     if not task_id or not new_status:
         return HttpResponseBadRequest("Missing parameters")
 
+    # status change, activity and notifications commit together
+    conn.begin()
+    queued = []
+
     # 2. SET CLOSURE DATE ONLY WHEN STATUS BECOMES 'Closed'
-    if new_status == "Closed":
-        cur.execute("""
-            UPDATE tasks
-            SET status=%s,
-                closure_date=NOW(),
-                updated_at=NOW()
-            WHERE id=%s
-        """, (new_status, task_id))
-    else:
-        # 3. FOR ANY OTHER STATUS → remove closure date?
-        cur.execute("""
-            UPDATE tasks
-            SET status=%s,
-                closure_date=NULL,
-                updated_at=NOW()
-            WHERE id=%s
-        """, (new_status, task_id))
+    with task_stats.tracking(conn, [task_id]):
+        if new_status == "Closed":
+            cur.execute("""
+                UPDATE tasks
+                SET status=%s,
+                    closure_date=NOW(),
+                    updated_at=NOW()
+                WHERE id=%s
+            """, (new_status, task_id))
+        else:
+            # 3. FOR ANY OTHER STATUS → remove closure date?
+            cur.execute("""
+                UPDATE tasks
+                SET status=%s,
+                    closure_date=NULL,
+                    updated_at=NOW()
+                WHERE id=%s
+            """, (new_status, task_id))
+    project_stats.mark_tasks(conn, [task_id])
 
     # 4. CREATE LOG ENTRY
     cur.execute("""
@@ -641,35 +817,35 @@ def api_update_status(request):
             updater_name = task_info['updater_name'] or 'Someone'
             task_title = task_info['title'] or 'A task'
             
+            tenant_key = request.session.get('tenant_id') or resolve_tenant_key_from_request(request)
+
             # Notify task creator if they're not the one who completed it
             if task_info['created_by'] and str(task_info['created_by']) != str(user_id):
-                cur.execute("""
-                    INSERT INTO notifications (user_id, title, message, type, link)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    task_info['created_by'],
+                queued += NotificationManager.queue_bulk_notification(
+                    conn, tenant_key, [task_info['created_by']],
                     "Task Completed",
                     f"{updater_name} completed task '{task_title}'",
-                    "success",
-                    f"/tasks/{task_id}/view/"
-                ))
+                    notification_type="success",
+                    link=f"/tasks/{task_id}/view/",
+                    created_by_id=user_id,
+                )
             
             # Notify assigned member if they're not the one who completed it
             if task_info['assigned_type'] == 'member' and task_info['assigned_to'] and str(task_info['assigned_to']) != str(user_id):
-                cur.execute("""
-                    INSERT INTO notifications (user_id, title, message, type, link)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    task_info['assigned_to'],
+                queued += NotificationManager.queue_bulk_notification(
+                    conn, tenant_key, [task_info['assigned_to']],
                     "Task Completed",
                     f"{updater_name} marked '{task_title}' as complete",
-                    "success",
-                    f"/tasks/{task_id}/view/"
-                ))
+                    notification_type="success",
+                    link=f"/tasks/{task_id}/view/",
+                    created_by_id=user_id,
+                )
 
     # 6. SAVE CHANGES
     conn.commit()
     cur.close()
+    NotificationManager.dispatch_queued(queued)
+    _invalidate_task_caches(request)
 
     return JsonResponse({"ok": True})
 
@@ -1074,444 +1250,74 @@ def download_csv_template(request):
 
 
 def bulk_import_csv_view(request):
-    """Upload & import CSV file of tasks with comprehensive validation"""
-    context = {"page": "bulk_import"}
+    """
+    Upload a CSV / Excel file of tasks. The import runs as a background job
+    (core.import_jobs); the page follows it through ?job=<id> and shows the
+    results once it has finished.
+    """
+    context = {"page": "bulk_import", "max_upload_mb": MAX_UPLOAD_BYTES // (1024 * 1024)}
 
     if request.method == "POST" and request.FILES.get("csv_file"):
         # Get work_type from POST data (passed from the form)
         work_type = request.POST.get("work_type", "Task")
-        
-        conn = get_tenant_conn(request)
-        cur = conn.cursor()
-        
+        tenant_key = resolve_tenant_key_from_request(request)
         try:
-            f = request.FILES["csv_file"]
-            
-            # Validate file size (max 5MB)
-            if f.size > 5 * 1024 * 1024:
-                context.update({
-                    "inserted": 0, 
-                    "errors": [{"row": 0, "error": "File size exceeds 5MB limit", "data": {}}]
-                })
-                cur.close()
-                return render(request, "core/tasks_bulk_import.html", context)
-            
-            # Validate file extension - accept both CSV and Excel
-            file_ext = f.name.lower()
-            if not (file_ext.endswith('.csv') or file_ext.endswith('.xlsx') or file_ext.endswith('.xls')):
-                context.update({
-                    "inserted": 0, 
-                    "errors": [{"row": 0, "error": "Invalid file type. Please upload a CSV or Excel file (.csv, .xlsx, .xls)", "data": {}}]
-                })
-                cur.close()
-                return render(request, "core/tasks_bulk_import.html", context)
-            
-            # Read file based on type
-            if file_ext.endswith('.csv'):
-                # Read and decode CSV file
-                try:
-                    text = f.read().decode("utf-8")
-                except UnicodeDecodeError:
-                    try:
-                        f.seek(0)
-                        text = f.read().decode("utf-8-sig")  # Try with BOM
-                    except Exception:
-                        context.update({
-                            "inserted": 0, 
-                            "errors": [{"row": 0, "error": "Unable to decode CSV file. Please ensure it's UTF-8 encoded.", "data": {}}]
-                        })
-                        cur.close()
-                        return render(request, "core/tasks_bulk_import.html", context)
-                
-                reader = csv.DictReader(io.StringIO(text))
-            else:
-                # Read Excel file
-                from openpyxl import load_workbook
-                try:
-                    wb = load_workbook(f, data_only=True)
-                    ws = wb.active
-                    
-                    # Convert Excel to dict format
-                    data = []
-                    headers = []
-                    for row_idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
-                        if row_idx == 1:
-                            headers = [str(cell).strip() if cell else '' for cell in row]
-                        else:
-                            if any(row):  # Skip empty rows
-                                row_dict = {}
-                                for col_idx, value in enumerate(row):
-                                    if col_idx < len(headers):
-                                        # Convert None to empty string, handle dates
-                                        if value is None:
-                                            row_dict[headers[col_idx]] = ''
-                                        elif hasattr(value, 'strftime'):  # Date object
-                                            row_dict[headers[col_idx]] = value.strftime('%Y-%m-%d')
-                                        else:
-                                            row_dict[headers[col_idx]] = str(value).strip()
-                                data.append(row_dict)
-                    
-                    # Create a simple class to mimic csv.DictReader
-                    class ExcelReader:
-                        def __init__(self, data, fieldnames):
-                            self.data = data
-                            self.fieldnames = fieldnames
-                        
-                        def __iter__(self):
-                            return iter(self.data)
-                    
-                    reader = ExcelReader(data, headers)
-                    
-                except Exception as e:
-                    context.update({
-                        "inserted": 0, 
-                        "errors": [{"row": 0, "error": f"Unable to read Excel file: {str(e)}", "data": {}}]
-                    })
-                    cur.close()
-                    return render(request, "core/tasks_bulk_import.html", context)
-            
-            inserted, errors, warnings = 0, [], []
-
-            # Enforce required header columns - Support both old (ID) and new (name) formats
-            required_cols_old = {"title", "project_id"}
-            required_cols_new = {"title", "project_name"}
-            
-            # Extended optional columns to support work-type-specific fields
-            optional_cols_old = {"description", "subproject_id", "status", "priority", "assigned_to", "due_date", "work_type", "file_attachment"}
-            optional_cols_new = {
-                "description", "subproject_name", "status", "priority", "assigned_to_name", "due_date", "work_type", "note", "file_attachment",
-                # Bug/Defect specific
-                "severity", "steps_to_reproduce", "expected_behavior", "actual_behavior",
-                # Story specific
-                "story_points", "acceptance_criteria",
-                # Subtask specific
-                "parent_task_id",
-                # Report specific
-                "report_type",
-                # Change Request specific
-                "change_type", "impact"
-            }
-            
-            present = set((reader.fieldnames or []))
-            
-            # Check if using old format (IDs) or new format (names)
-            using_names = "project_name" in present
-            
-            if using_names:
-                required_cols = required_cols_new
-                optional_cols = optional_cols_new
-            else:
-                required_cols = required_cols_old
-                optional_cols = optional_cols_old
-            
-            missing = required_cols - present
-            if missing:
-                errors.append({
-                    "row": 0, 
-                    "error": f"Missing required columns: {', '.join(sorted(missing))}", 
-                    "data": {}
-                })
-                context.update({"inserted": 0, "errors": errors})
-                cur.close()
-                return render(request, "core/tasks_bulk_import.html", context)
-            
-            # Warn about unexpected columns
-            expected = required_cols | optional_cols
-            unexpected = present - expected
-            if unexpected:
-                warnings.append(f"Unexpected columns will be ignored: {', '.join(sorted(unexpected))}")
-
-            # Build lookup dictionaries for name-to-ID conversion
-            cur.execute("SELECT id, name FROM projects")
-            projects_dict = {row['name']: row['id'] for row in cur.fetchall()}
-            projects_dict_by_id = {str(row['id']): row['id'] for row in cur.fetchall()}
-            
-            cur.execute("SELECT id FROM projects")
-            valid_projects = {str(row['id']) for row in cur.fetchall()}
-            
-            cur.execute("SELECT id, CONCAT(first_name, ' ', last_name) as name FROM members")
-            members_dict = {row['name']: row['id'] for row in cur.fetchall()}
-            
-            cur.execute("SELECT id FROM members")
-            valid_members = {str(row['id']) for row in cur.fetchall()}
-            
-            cur.execute("SELECT id, name, project_id FROM subprojects")
-            subprojects_list = cur.fetchall()
-            subprojects_dict = {(row['name'], row['project_id']): row['id'] for row in subprojects_list}
-            
-            cur.execute("SELECT id FROM teams")
-            valid_teams = {str(row['id']) for row in cur.fetchall()}
-
-            # Process each row
-            for i, raw_row in enumerate(reader, start=1):
-                try:
-                    # Normalize/strip all values
-                    row = {k: (v.strip() if isinstance(v, str) else v) for k, v in raw_row.items()}
-
-                    # Validate required fields
-                    if not row.get("title"):
-                        raise Exception("Missing required field: title")
-                    
-                    # Handle project - convert name to ID if using new format
-                    if using_names:
-                        project_name = row.get("project_name", "").strip()
-                        if not project_name:
-                            raise Exception("Missing required field: project_name")
-                        
-                        if project_name not in projects_dict:
-                            raise Exception(f"Invalid project_name: '{project_name}'. Project does not exist.")
-                        
-                        project_id = projects_dict[project_name]
-                    else:
-                        if not row.get("project_id"):
-                            raise Exception("Missing required field: project_id")
-                        
-                        project_id = str(row.get("project_id")).strip()
-                        if project_id not in valid_projects:
-                            raise Exception(f"Invalid project_id: {project_id}. Project does not exist.")
-                        project_id = int(project_id)
-
-                    # Handle subproject - convert name to ID if using new format
-                    subproject_id = None
-                    if using_names:
-                        subproject_name = row.get("subproject_name", "").strip()
-                        if subproject_name:
-                            # Look up subproject by name and project_id
-                            subproject_key = (subproject_name, project_id)
-                            if subproject_key not in subprojects_dict:
-                                raise Exception(f"Invalid subproject_name: '{subproject_name}' for selected project")
-                            subproject_id = subprojects_dict[subproject_key]
-                    else:
-                        subproject_id_str = row.get("subproject_id", "").strip()
-                        if subproject_id_str:
-                            cur.execute("SELECT id FROM subprojects WHERE id=%s AND project_id=%s", 
-                                      (subproject_id_str, project_id))
-                            if not cur.fetchone():
-                                raise Exception(f"Invalid subproject_id: {subproject_id_str} for project {project_id}")
-                            subproject_id = int(subproject_id_str)
-
-                    # Parse assigned_to - handle both old format (IDs) and new format (names)
-                    assigned_to, assigned_type = None, None
-                    
-                    if using_names:
-                        # New format: assigned_to_name column with member names
-                        assigned_name = row.get("assigned_to_name", "").strip()
-                        if assigned_name:
-                            if assigned_name not in members_dict:
-                                raise Exception(f"Invalid assigned_to_name: '{assigned_name}'. Member does not exist.")
-                            assigned_to = members_dict[assigned_name]
-                            assigned_type = "member"
-                    else:
-                        # Old format: assigned_to column with 'member:ID' or 'team:ID' or plain ID
-                        assigned_raw = row.get("assigned_to", "").strip()
-                        if assigned_raw:
-                            if ":" in assigned_raw:
-                                atype, aid = assigned_raw.split(":", 1)
-                                atype = atype.strip().lower()
-                                aid = aid.strip()
-                                if atype not in ("member", "team"):
-                                    raise Exception(f"Invalid assigned_to type '{atype}'. Use 'member:ID' or 'team:ID'.")
-                                if not aid.isdigit():
-                                    raise Exception(f"Invalid assigned_to id '{aid}'. Must be numeric.")
-                                
-                                # Validate member/team exists
-                                if atype == "member" and aid not in valid_members:
-                                    raise Exception(f"Invalid member ID: {aid}. Member does not exist.")
-                                elif atype == "team" and aid not in valid_teams:
-                                    raise Exception(f"Invalid team ID: {aid}. Team does not exist.")
-                                
-                                assigned_type, assigned_to = atype, int(aid)
-                            else:
-                                # Assume member id
-                                aid = assigned_raw.strip()
-                                if aid and not aid.isdigit():
-                                    raise Exception(f"Invalid assigned_to value '{aid}'. Use 'member:ID', 'team:ID', or numeric member ID.")
-                                if aid and aid not in valid_members:
-                                    raise Exception(f"Invalid member ID: {aid}. Member does not exist.")
-                                assigned_type, assigned_to = "member", int(aid) if aid else None
-
-                    # Validate status
-                    status = row.get("status") or "Open"
-                    valid_statuses = ["Open", "In Progress", "Review", "Blocked", "Closed", "Pending", "New"]
-                    if status not in valid_statuses:
-                        raise Exception(f"Invalid status: {status}. Must be one of: {', '.join(valid_statuses)}")
-
-                    # Validate priority
-                    priority = row.get("priority") or "Normal"
-                    valid_priorities = ["Low", "Normal", "High", "Critical"]
-                    if priority not in valid_priorities:
-                        raise Exception(f"Invalid priority: {priority}. Must be one of: {', '.join(valid_priorities)}")
-
-                    # Validate due_date (empty allowed)
-                    due_date = row.get("due_date") or None
-                    if due_date:
-                        try:
-                            # Accept YYYY-MM-DD only
-                            datetime.datetime.strptime(due_date, "%Y-%m-%d")
-                        except Exception:
-                            raise Exception("Invalid due_date. Use YYYY-MM-DD format (e.g., 2024-12-31).")
-
-                    # Optional work_type - use from Excel if present, otherwise use from form
-                    row_work_type = row.get("work_type", "").strip()
-                    if not row_work_type:
-                        row_work_type = work_type  # Use work_type from form/URL
-                    
-                    # Build description with work-type-specific fields
-                    base_description = row.get("description") or ""
-                    full_description = base_description
-                    
-                    # Add work-type-specific fields to description
-                    if row_work_type in ["Bug", "Defect"]:
-                        # Validate severity for bugs/defects
-                        severity = row.get("severity", "")
-                        if severity:
-                            valid_severities = ["Low", "Medium", "High", "Critical"]
-                            if severity not in valid_severities:
-                                raise Exception(f"Invalid severity: {severity}. Must be one of: {', '.join(valid_severities)}")
-                            # Use severity as priority for bugs/defects
-                            priority = severity
-                        
-                        # Append bug-specific fields to description
-                        if row.get("steps_to_reproduce"):
-                            full_description += f"\n\n**Steps to Reproduce:**\n{row.get('steps_to_reproduce')}"
-                        if row.get("expected_behavior"):
-                            full_description += f"\n\n**Expected Behavior:**\n{row.get('expected_behavior')}"
-                        if row.get("actual_behavior"):
-                            full_description += f"\n\n**Actual Behavior:**\n{row.get('actual_behavior')}"
-                    
-                    elif row_work_type == "Story":
-                        # Append story-specific fields to description
-                        if row.get("story_points"):
-                            full_description += f"\n\n**Story Points:** {row.get('story_points')}"
-                        if row.get("acceptance_criteria"):
-                            full_description += f"\n\n**Acceptance Criteria:**\n{row.get('acceptance_criteria')}"
-                    
-                    elif row_work_type == "Subtask":
-                        # Handle parent_task_id
-                        parent_task_id = row.get("parent_task_id", "").strip()
-                        if parent_task_id:
-                            # Validate parent task exists
-                            cur.execute("SELECT id FROM tasks WHERE id=%s", (parent_task_id,))
-                            if not cur.fetchone():
-                                raise Exception(f"Invalid parent_task_id: {parent_task_id}. Parent task does not exist.")
-                            full_description += f"\n\n**Parent Task ID:** {parent_task_id}"
-                    
-                    elif row_work_type == "Report":
-                        # Append report-specific fields
-                        if row.get("report_type"):
-                            full_description += f"\n\n**Report Type:** {row.get('report_type')}"
-                    
-                    elif row_work_type == "Change Request":
-                        # Append change request-specific fields
-                        if row.get("change_type"):
-                            full_description += f"\n\n**Change Type:** {row.get('change_type')}"
-                        if row.get("impact"):
-                            full_description += f"\n\n**Impact:** {row.get('impact')}"
-
-                    # Insert task
-                    cur.execute(
-                        """INSERT INTO tasks
-                           (project_id, subproject_id, title, description, status, priority, work_type,
-                            assigned_to, assigned_type, created_by, due_date, created_at)
-                           VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
-                        (
-                            int(project_id),
-                            int(subproject_id) if subproject_id else None,
-                            row["title"],
-                            full_description,  # Use full_description with work-type-specific fields
-                            status,
-                            priority,
-                            row_work_type,  # Use row_work_type
-                            assigned_to,
-                            assigned_type,
-                            request.session.get("user_id"),
-                            due_date,
-                        ),
-                    )
-                    
-                    task_id = cur.lastrowid
-                    
-                    # Handle file attachment if provided
-                    file_path = row.get("file_attachment", "").strip()
-                    if file_path:
-                        import os
-                        from django.core.files.base import ContentFile
-                        
-                        # Check if file exists
-                        if os.path.exists(file_path):
-                            try:
-                                # Read the file
-                                with open(file_path, 'rb') as f:
-                                    file_content = f.read()
-                                
-                                # Get filename
-                                filename = os.path.basename(file_path)
-                                
-                                # Generate unique filename
-                                import time
-                                timestamp = int(time.time())
-                                unique_filename = f"{task_id}_{timestamp}_{filename}"
-                                
-                                # Save to media/task_attachments/
-                                from django.conf import settings
-                                upload_dir = os.path.join(settings.MEDIA_ROOT, 'task_attachments')
-                                os.makedirs(upload_dir, exist_ok=True)
-                                
-                                file_save_path = os.path.join(upload_dir, unique_filename)
-                                with open(file_save_path, 'wb') as dest:
-                                    dest.write(file_content)
-                                
-                                # Store relative path in database
-                                relative_path = f'task_attachments/{unique_filename}'
-                                
-                                # Insert attachment record
-                                cur.execute(
-                                    """INSERT INTO task_attachments 
-                                       (task_id, file_path, uploaded_by, uploaded_at) 
-                                       VALUES (%s, %s, %s, NOW())""",
-                                    (task_id, relative_path, request.session.get("user_id"))
-                                )
-                            except Exception as e:
-                                warnings.append(f"Row {i}: Could not attach file '{file_path}': {str(e)}")
-                        else:
-                            warnings.append(f"Row {i}: File not found: '{file_path}'")
-                    
-                    # Log activity
-                    try:
-                        cur.execute(
-                            "INSERT INTO activity_log (entity_type, entity_id, action, performed_by) VALUES (%s,%s,%s,%s)",
-                            ("task", task_id, "created via bulk import", request.session.get("user_id")),
-                        )
-                    except Exception:
-                        pass  # Don't fail import if logging fails
-                    
-                    inserted += 1
-                    
-                except Exception as e:
-                    errors.append({"row": i, "error": str(e), "data": dict(raw_row)})
-
-            conn.commit()
+            job_id = enqueue_import(
+                get_tenant_conn(request), tenant_key,
+                request.session.get('tenant_id') or tenant_key,
+                request.FILES["csv_file"],
+                work_type=work_type,
+                user_id=request.session.get("user_id"),
+                member_id=request.session.get("member_id"),
+                on_inserted=lambda: _invalidate_tenant_task_caches(tenant_key),
+            )
+        except ImportFileError as e:
             context.update({
-                "inserted": inserted, 
-                "errors": errors,
-                "warnings": warnings,
-                "total_rows": i if 'i' in locals() else 0
+                "inserted": 0,
+                "errors": [{"row": 0, "error": str(e), "data": {}}]
             })
-            
+            return render(request, "core/tasks_bulk_import.html", context)
         except Exception as e:
-            conn.rollback()
             context.update({
-                "inserted": 0, 
+                "inserted": 0,
                 "errors": [{"row": 0, "error": f"Unexpected error: {str(e)}", "data": {}}]
             })
-        finally:
-            cur.close()
-        
-        return render(request, "core/tasks_bulk_import.html", context)
+            return render(request, "core/tasks_bulk_import.html", context)
+        return redirect(f"{request.path}?job={job_id}")
+
+    job_id = request.GET.get("job")
+    if job_id and job_id.isdigit():
+        job = job_status(get_tenant_conn(request), int(job_id),
+                         user_id=request.session.get("user_id"), with_errors=True)
+        if job and job["status"] in ("done", "failed"):
+            errors = job["errors"]
+            if job["status"] == "failed":
+                errors.insert(0, {"row": 0, "error": job["error"], "data": {}})
+            warnings = list(job["warnings"])
+            if job["error_count"] > len(job["errors"]):
+                warnings.append(f"Only the first {len(job['errors'])} of {job['error_count']} errors are listed.")
+            context.update({
+                "inserted": job["inserted"],
+                "total_rows": job["rows_processed"],
+                "errors": errors,
+                "error_count": job["error_count"],
+                "warnings": warnings,
+            })
+        elif job:
+            context["job"] = job
 
     return render(request, "core/tasks_bulk_import.html", context)
 
 
+@require_GET
+def api_import_job_status(request, job_id):
+    """Progress of a background import job started by the current user (core.import_jobs)."""
+    job = job_status(get_tenant_conn(request), job_id, user_id=request.session.get("user_id"))
+    if not job:
+        return JsonResponse({'error': 'not found'}, status=404)
+    return JsonResponse(job)
+
+
 @require_GET
 def api_task_detail(request):
     """
@@ -1595,7 +1401,8 @@ def api_task_detail(request):
 @require_GET
 def api_tasks_search(request):
     """
-    Simple task search used by the global quick-search UI.
+    Task search used by the global quick-search UI (core.search: full-text,
+    prefix matching, ranked).
     GET params: q
     Returns: { tasks: [ { id, title, status, assigned_to_display, project_name } ] }
     """
@@ -1604,53 +1411,7 @@ def api_tasks_search(request):
         return JsonResponse({'tasks': []})
 
     conn = get_tenant_conn(request)
-    cur = conn.cursor()
-    try:
-        like = f"%{q}%"
-        cur.execute("""
-            SELECT
-                t.id,
-                COALESCE(t.title, '') AS title,
-                COALESCE(t.status, '') AS status,
-                CASE
-                    WHEN t.assigned_type = 'member' THEN (SELECT CONCAT(m.first_name, ' ', m.last_name) FROM members m WHERE m.id = t.assigned_to)
-                    WHEN t.assigned_type = 'team' THEN (SELECT tm.name FROM teams tm WHERE tm.id = t.assigned_to)
-                    ELSE NULL
-                END AS assigned_to_display,
-                (SELECT p.name FROM projects p WHERE p.id = t.project_id) AS project_name
-            FROM tasks t
-            WHERE (t.title LIKE %s OR t.description LIKE %s)
-            ORDER BY t.id DESC
-            LIMIT 20
-        """, (like, like))
-
-        rows = cur.fetchall() or []
-        tasks = []
-        if rows:
-            if isinstance(rows[0], dict):
-                for r in rows:
-                    tasks.append({
-                        'id': r.get('id'),
-                        'title': r.get('title') or '',
-                        'status': r.get('status') or '',
-                        'assigned_to_display': r.get('assigned_to_display') or '',
-                        'project_name': r.get('project_name') or ''
-                    })
-            else:
-                cols = [d[0] for d in cur.description]
-                for r in rows:
-                    d = dict(zip(cols, r))
-                    tasks.append({
-                        'id': d.get('id'),
-                        'title': d.get('title') or '',
-                        'status': d.get('status') or '',
-                        'assigned_to_display': d.get('assigned_to_display') or '',
-                        'project_name': d.get('project_name') or ''
-                    })
-
-        return JsonResponse({'tasks': tasks})
-    finally:
-        cur.close()
+    return JsonResponse({'tasks': search_tasks(conn, q, limit=20)})
 
 
 @require_POST
@@ -1758,7 +1519,11 @@ def api_task_update(request):
         set_clause = ", ".join(updates)
         params.append(tid)
         sql = f"UPDATE tasks SET {set_clause}, updated_at = NOW() WHERE id = %s"
-        cur.execute(sql, tuple(params))
+        # update, activity, notification and its outbox row commit together
+        conn.begin()
+        with task_stats.tracking(conn, [tid]):
+            cur.execute(sql, tuple(params))
+            project_stats.mark_tasks(conn, [tid])
 
         # optional: log activity
         performed_by = request.session.get("user_id")
@@ -1771,39 +1536,41 @@ def api_task_update(request):
             # don't fail entire operation if logging fails
             pass
 
-        conn.commit()
-
         # If status changed to a closed/finished state and the closer is the assignee,
         # send a real-time pop notification to the assigner (created_by) only.
-        try:
-            closed_states = ('Closed', 'Finished', 'Completed')
-            new_status = status
-            # determine current user id (member or user session)
-            cur_user = request.session.get('user_id') or request.session.get('member_id')
-
-            assigned_type = existing.get('assigned_type') if isinstance(existing, dict) else None
-            assigned_to = existing.get('assigned_to') if isinstance(existing, dict) else None
-            creator_id = existing.get('created_by') if isinstance(existing, dict) else None
-            task_title = existing.get('title') if isinstance(existing, dict) else None
-
-            if new_status and new_status in closed_states and assigned_type == 'member' and assigned_to and cur_user and int(assigned_to) == int(cur_user):
-                # Only notify if creator exists and is different from the closer
-                if creator_id and int(creator_id) != int(cur_user):
-                    tenant_key = request.session.get('tenant_id') or resolve_tenant_key_from_request(request)
-                    # Build message
-                    message = f"{task_title or 'Task'} has been marked as {new_status} by the assignee."
-                    NotificationManager.send_notification(
-                        tenant_key,
-                        int(creator_id),
-                        "Task Completed",
-                        message,
-                        notification_type='task',
-                        link=f"/tasks/{tid}/view/",
-                        created_by_id=cur_user,
-                    )
-        except Exception:
-            # don't block API response if notification fails
-            pass
+        queued = []
+        # a failure here rolls the whole update back (below): a notification row
+        # must not commit without its outbox row
+        closed_states = ('Closed', 'Finished', 'Completed')
+        new_status = status
+        # determine current user id (member or user session)
+        cur_user = request.session.get('user_id') or request.session.get('member_id')
+
+        assigned_type = existing.get('assigned_type') if isinstance(existing, dict) else None
+        assigned_to = existing.get('assigned_to') if isinstance(existing, dict) else None
+        creator_id = existing.get('created_by') if isinstance(existing, dict) else None
+        task_title = existing.get('title') if isinstance(existing, dict) else None
+
+        if new_status and new_status in closed_states and assigned_type == 'member' and assigned_to and cur_user and int(assigned_to) == int(cur_user):
+            # Only notify if creator exists and is different from the closer
+            if creator_id and int(creator_id) != int(cur_user):
+                tenant_key = request.session.get('tenant_id') or resolve_tenant_key_from_request(request)
+                # Build message
+                message = f"{task_title or 'Task'} has been marked as {new_status} by the assignee."
+                queued = NotificationManager.queue_bulk_notification(
+                    conn,
+                    tenant_key,
+                    [int(creator_id)],
+                    "Task Completed",
+                    message,
+                    notification_type='task',
+                    link=f"/tasks/{tid}/view/",
+                    created_by_id=cur_user,
+                )
+
+        conn.commit()
+        _invalidate_task_caches(request)
+        NotificationManager.dispatch_queued(queued)
 
         return JsonResponse({'ok': True})
     except Exception as e:
@@ -1814,7 +1581,7 @@ def api_task_update(request):
         cur.close()
 
 def task_board_view(request):
-    status_columns = ["Open", "In Progress", "Review", "Blocked", "Closed"]
+    status_columns = BOARD_STATUS_COLUMNS
     conn = get_tenant_conn(request)
     cur = conn.cursor()
     cur.execute("SELECT id, name FROM projects ORDER BY name")
@@ -1904,13 +1671,16 @@ def edit_task_view(request, task_id):
         cur.execute("SELECT id, title, description, status, priority, due_date, created_by, assigned_to, assigned_type FROM tasks WHERE id=%s LIMIT 1", (task_id,))
         _existing = cur.fetchone()
 
-        # Perform update
-        cur.execute(
-            """UPDATE tasks
-               SET title=%s, description=%s, status=%s, priority=%s, due_date=%s, closure_date=%s, updated_at=NOW()
-               WHERE id=%s""",
-            (title, description, status, priority, due_date, closure_date, task_id),
-        )
+        # update, activity, notification and its outbox row commit together
+        conn.begin()
+        with task_stats.tracking(conn, [task_id]):
+            cur.execute(
+                """UPDATE tasks
+                   SET title=%s, description=%s, status=%s, priority=%s, due_date=%s, closure_date=%s, updated_at=NOW()
+                   WHERE id=%s""",
+                (title, description, status, priority, due_date, closure_date, task_id),
+            )
+        project_stats.mark_tasks(conn, [task_id])
 
         # Log changes to activity_log for timeline
         try:
@@ -1950,32 +1720,33 @@ def edit_task_view(request, task_id):
         except Exception:
             pass
 
-        conn.commit()
-
         # If status moved to closed and the closer is the assignee, notify the creator
-        try:
-            closed_states = ('Closed', 'Finished', 'Completed')
-            cur_user = request.session.get('user_id') or request.session.get('member_id')
-            if status in closed_states and _existing:
-                assigned_type = _existing.get('assigned_type') if isinstance(_existing, dict) else None
-                assigned_to = _existing.get('assigned_to') if isinstance(_existing, dict) else None
-                creator_id = _existing.get('created_by') if isinstance(_existing, dict) else None
-                task_title = _existing.get('title') if isinstance(_existing, dict) else None
-                if assigned_type == 'member' and assigned_to and cur_user and int(assigned_to) == int(cur_user):
-                    if creator_id and int(creator_id) != int(cur_user):
-                        tenant_key = request.session.get('tenant_id') or resolve_tenant_key_from_request(request)
-                        message = f"{task_title or 'Task'} has been marked as {status} by the assignee."
-                        NotificationManager.send_notification(
-                            tenant_key,
-                            int(creator_id),
-                            "Task Completed",
-                            message,
-                            notification_type='task',
-                            link=f"/tasks/{task_id}/view/",
-                            created_by_id=cur_user,
-                        )
-        except Exception:
-            pass
+        queued = []
+        closed_states = ('Closed', 'Finished', 'Completed')
+        cur_user = request.session.get('user_id') or request.session.get('member_id')
+        if status in closed_states and _existing:
+            assigned_type = _existing.get('assigned_type') if isinstance(_existing, dict) else None
+            assigned_to = _existing.get('assigned_to') if isinstance(_existing, dict) else None
+            creator_id = _existing.get('created_by') if isinstance(_existing, dict) else None
+            task_title = _existing.get('title') if isinstance(_existing, dict) else None
+            if assigned_type == 'member' and assigned_to and cur_user and int(assigned_to) == int(cur_user):
+                if creator_id and int(creator_id) != int(cur_user):
+                    tenant_key = request.session.get('tenant_id') or resolve_tenant_key_from_request(request)
+                    message = f"{task_title or 'Task'} has been marked as {status} by the assignee."
+                    queued = NotificationManager.queue_bulk_notification(
+                        conn,
+                        tenant_key,
+                        [int(creator_id)],
+                        "Task Completed",
+                        message,
+                        notification_type='task',
+                        link=f"/tasks/{task_id}/view/",
+                        created_by_id=cur_user,
+                    )
+
+        conn.commit()
+        _invalidate_task_caches(request)
+        NotificationManager.dispatch_queued(queued)
 
         # Re-fetch updated task
         cur.execute("SELECT id, title, description, status, priority, due_date, created_at FROM tasks WHERE id=%s", (task_id,))
@@ -2013,16 +1784,24 @@ def delete_task_view(request, task_id):
     cur = conn.cursor()
 
     # Check if task exists
-    cur.execute("SELECT id FROM tasks WHERE id=%s", (task_id,))
+    cur.execute("SELECT id, project_id FROM tasks WHERE id=%s", (task_id,))
     task = cur.fetchone()
     if not task:
         cur.close()
         return render(request, "core/404.html", status=404)
 
-    # Delete the task
-    cur.execute("DELETE FROM tasks WHERE id=%s", (task_id,))
+    # Delete the task; the log entry lets board delta syncs drop the card
+    conn.begin()
+    with task_stats.tracking(conn, [task_id]):
+        cur.execute("DELETE FROM tasks WHERE id=%s", (task_id,))
+    project_stats.mark_projects(conn, [task['project_id']])
+    cur.execute(
+        "INSERT INTO activity_log (entity_type, entity_id, action, performed_by) VALUES (%s,%s,%s,%s)",
+        ("task", task_id, "deleted", request.session.get("user_id")),
+    )
     conn.commit()
     cur.close()
+    _invalidate_task_caches(request)
 
     return redirect("my_tasks")
 
@@ -2325,32 +2104,37 @@ def create_bug_view(request):
                 assigned_type, assigned_to = "member", assigned_raw
 
         # INSERT
-        cur.execute(
-            """INSERT INTO tasks
-               (project_id, subproject_id, title, description, status, priority,
-                assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
-                si_browser, si_resolution, si_os, si_timestamp, created_at)
-               VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
-            (
-                project_id,
-                subproject_id,
-                title,
-                full_description,
-                status,
-                severity,  # Use severity as priority for bugs
-                assigned_to,
-                assigned_type,
-                created_by,
-                due_date,
-                closure_date,
-                work_type,
-                si_browser,
-                si_resolution,
-                si_os,
-                si_timestamp,
-            ),
-        )
-        task_id = cur.lastrowid
+        # task, activity, notifications and their outbox rows commit together
+        conn.begin()
+        with task_stats.tracking(conn) as tracked:
+            cur.execute(
+                """INSERT INTO tasks
+                   (project_id, subproject_id, title, description, status, priority,
+                    assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
+                    si_browser, si_resolution, si_os, si_timestamp, created_at)
+                   VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
+                (
+                    project_id,
+                    subproject_id,
+                    title,
+                    full_description,
+                    status,
+                    severity,  # Use severity as priority for bugs
+                    assigned_to,
+                    assigned_type,
+                    created_by,
+                    due_date,
+                    closure_date,
+                    work_type,
+                    si_browser,
+                    si_resolution,
+                    si_os,
+                    si_timestamp,
+                ),
+            )
+            task_id = cur.lastrowid
+            tracked.add([task_id])
+        project_stats.mark_projects(conn, [project_id])
 
         # Log activity
         cur.execute(
@@ -2359,27 +2143,28 @@ def create_bug_view(request):
         )
 
         # Create notification if task is assigned to a member
+        queued = []
         if assigned_type == "member" and assigned_to:
-            cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (created_by,))
-            creator = cur.fetchone()
-            creator_name = creator['name'] if creator else 'Someone'
+            creator_name = member_directory.name_for(conn, created_by) or 'Someone'
             
-            cur.execute("""
-                INSERT INTO notifications (user_id, title, message, type, link)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                assigned_to,
+            queued = NotificationManager.queue_bulk_notification(
+                conn,
+                request.session.get('tenant_id') or resolve_tenant_key_from_request(request),
+                [assigned_to],
                 "New Bug Assigned",
                 f"{creator_name} assigned you a bug: '{title}'",
-                "task",
-                f"/tasks/{task_id}/view/"
-            ))
+                notification_type="task",
+                link=f"/tasks/{task_id}/view/",
+                created_by_id=created_by,
+            )
 
         # Handle file attachments using helper function
         save_task_attachments(request, task_id, cur, created_by)
 
         conn.commit()
         cur.close()
+        _invalidate_task_caches(request)
+        NotificationManager.dispatch_queued(queued)
         return redirect("task_board")
 
     # GET
@@ -2461,32 +2246,37 @@ def create_story_view(request):
                 assigned_type, assigned_to = "member", assigned_raw
 
         # INSERT
-        cur.execute(
-            """INSERT INTO tasks
-               (project_id, subproject_id, title, description, status, priority,
-                assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
-                si_browser, si_resolution, si_os, si_timestamp, created_at)
-               VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
-            (
-                project_id,
-                subproject_id,
-                title,
-                full_description,
-                status,
-                priority,
-                assigned_to,
-                assigned_type,
-                created_by,
-                due_date,
-                closure_date,
-                work_type,
-                si_browser,
-                si_resolution,
-                si_os,
-                si_timestamp,
-            ),
-        )
-        task_id = cur.lastrowid
+        # task, activity, notifications and their outbox rows commit together
+        conn.begin()
+        with task_stats.tracking(conn) as tracked:
+            cur.execute(
+                """INSERT INTO tasks
+                   (project_id, subproject_id, title, description, status, priority,
+                    assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
+                    si_browser, si_resolution, si_os, si_timestamp, created_at)
+                   VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
+                (
+                    project_id,
+                    subproject_id,
+                    title,
+                    full_description,
+                    status,
+                    priority,
+                    assigned_to,
+                    assigned_type,
+                    created_by,
+                    due_date,
+                    closure_date,
+                    work_type,
+                    si_browser,
+                    si_resolution,
+                    si_os,
+                    si_timestamp,
+                ),
+            )
+            task_id = cur.lastrowid
+            tracked.add([task_id])
+        project_stats.mark_projects(conn, [project_id])
 
         # Log activity
         cur.execute(
@@ -2495,27 +2285,28 @@ def create_story_view(request):
         )
 
         # Create notification if task is assigned to a member
+        queued = []
         if assigned_type == "member" and assigned_to:
-            cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (created_by,))
-            creator = cur.fetchone()
-            creator_name = creator['name'] if creator else 'Someone'
+            creator_name = member_directory.name_for(conn, created_by) or 'Someone'
             
-            cur.execute("""
-                INSERT INTO notifications (user_id, title, message, type, link)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                assigned_to,
+            queued = NotificationManager.queue_bulk_notification(
+                conn,
+                request.session.get('tenant_id') or resolve_tenant_key_from_request(request),
+                [assigned_to],
                 "New Story Assigned",
                 f"{creator_name} assigned you a story: '{title}'",
-                "task",
-                f"/tasks/{task_id}/view/"
-            ))
+                notification_type="task",
+                link=f"/tasks/{task_id}/view/",
+                created_by_id=created_by,
+            )
 
         # Handle file attachments using helper function
         save_task_attachments(request, task_id, cur, created_by)
 
         conn.commit()
         cur.close()
+        _invalidate_task_caches(request)
+        NotificationManager.dispatch_queued(queued)
         return redirect("task_board")
 
     # GET
@@ -2594,32 +2385,37 @@ def create_defect_view(request):
                 assigned_type, assigned_to = "member", assigned_raw
 
         # INSERT
-        cur.execute(
-            """INSERT INTO tasks
-               (project_id, subproject_id, title, description, status, priority,
-                assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
-                si_browser, si_resolution, si_os, si_timestamp, created_at)
-               VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
-            (
-                project_id,
-                subproject_id,
-                title,
-                full_description,
-                status,
-                priority,
-                assigned_to,
-                assigned_type,
-                created_by,
-                due_date,
-                closure_date,
-                work_type,
-                si_browser,
-                si_resolution,
-                si_os,
-                si_timestamp,
-            ),
-        )
-        task_id = cur.lastrowid
+        # task, activity, notifications and their outbox rows commit together
+        conn.begin()
+        with task_stats.tracking(conn) as tracked:
+            cur.execute(
+                """INSERT INTO tasks
+                   (project_id, subproject_id, title, description, status, priority,
+                    assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
+                    si_browser, si_resolution, si_os, si_timestamp, created_at)
+                   VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
+                (
+                    project_id,
+                    subproject_id,
+                    title,
+                    full_description,
+                    status,
+                    priority,
+                    assigned_to,
+                    assigned_type,
+                    created_by,
+                    due_date,
+                    closure_date,
+                    work_type,
+                    si_browser,
+                    si_resolution,
+                    si_os,
+                    si_timestamp,
+                ),
+            )
+            task_id = cur.lastrowid
+            tracked.add([task_id])
+        project_stats.mark_projects(conn, [project_id])
 
         # Log activity
         cur.execute(
@@ -2628,27 +2424,28 @@ def create_defect_view(request):
         )
 
         # Create notification if task is assigned to a member
+        queued = []
         if assigned_type == "member" and assigned_to:
-            cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (created_by,))
-            creator = cur.fetchone()
-            creator_name = creator['name'] if creator else 'Someone'
+            creator_name = member_directory.name_for(conn, created_by) or 'Someone'
             
-            cur.execute("""
-                INSERT INTO notifications (user_id, title, message, type, link)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                assigned_to,
+            queued = NotificationManager.queue_bulk_notification(
+                conn,
+                request.session.get('tenant_id') or resolve_tenant_key_from_request(request),
+                [assigned_to],
                 "New Defect Assigned",
                 f"{creator_name} assigned you a defect: '{title}'",
-                "task",
-                f"/tasks/{task_id}/view/"
-            ))
+                notification_type="task",
+                link=f"/tasks/{task_id}/view/",
+                created_by_id=created_by,
+            )
 
         # Handle file attachments using helper function
         save_task_attachments(request, task_id, cur, created_by)
 
         conn.commit()
         cur.close()
+        _invalidate_task_caches(request)
+        NotificationManager.dispatch_queued(queued)
         return redirect("task_board")
 
     # GET
@@ -2731,32 +2528,37 @@ def create_subtask_view(request):
                 assigned_type, assigned_to = "member", assigned_raw
 
         # INSERT
-        cur.execute(
-            """INSERT INTO tasks
-               (project_id, subproject_id, title, description, status, priority,
-                assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
-                si_browser, si_resolution, si_os, si_timestamp, created_at)
-               VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
-            (
-                project_id,
-                subproject_id,
-                title,
-                full_description,
-                status,
-                priority,
-                assigned_to,
-                assigned_type,
-                created_by,
-                due_date,
-                closure_date,
-                work_type,
-                si_browser,
-                si_resolution,
-                si_os,
-                si_timestamp,
-            ),
-        )
-        task_id = cur.lastrowid
+        # task, activity, notifications and their outbox rows commit together
+        conn.begin()
+        with task_stats.tracking(conn) as tracked:
+            cur.execute(
+                """INSERT INTO tasks
+                   (project_id, subproject_id, title, description, status, priority,
+                    assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
+                    si_browser, si_resolution, si_os, si_timestamp, created_at)
+                   VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
+                (
+                    project_id,
+                    subproject_id,
+                    title,
+                    full_description,
+                    status,
+                    priority,
+                    assigned_to,
+                    assigned_type,
+                    created_by,
+                    due_date,
+                    closure_date,
+                    work_type,
+                    si_browser,
+                    si_resolution,
+                    si_os,
+                    si_timestamp,
+                ),
+            )
+            task_id = cur.lastrowid
+            tracked.add([task_id])
+        project_stats.mark_projects(conn, [project_id])
 
         # Log activity
         cur.execute(
@@ -2765,27 +2567,28 @@ def create_subtask_view(request):
         )
 
         # Create notification if task is assigned to a member
+        queued = []
         if assigned_type == "member" and assigned_to:
-            cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (created_by,))
-            creator = cur.fetchone()
-            creator_name = creator['name'] if creator else 'Someone'
+            creator_name = member_directory.name_for(conn, created_by) or 'Someone'
             
-            cur.execute("""
-                INSERT INTO notifications (user_id, title, message, type, link)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                assigned_to,
+            queued = NotificationManager.queue_bulk_notification(
+                conn,
+                request.session.get('tenant_id') or resolve_tenant_key_from_request(request),
+                [assigned_to],
                 "New Sub Task Assigned",
                 f"{creator_name} assigned you a sub task: '{title}'",
-                "task",
-                f"/tasks/{task_id}/view/"
-            ))
+                notification_type="task",
+                link=f"/tasks/{task_id}/view/",
+                created_by_id=created_by,
+            )
 
         # Handle file attachments using helper function
         save_task_attachments(request, task_id, cur, created_by)
 
         conn.commit()
         cur.close()
+        _invalidate_task_caches(request)
+        NotificationManager.dispatch_queued(queued)
         return redirect("task_board")
 
     # GET
@@ -2873,32 +2676,37 @@ def create_report_view(request):
                 assigned_type, assigned_to = "member", assigned_raw
 
         # INSERT
-        cur.execute(
-            """INSERT INTO tasks
-               (project_id, subproject_id, title, description, status, priority,
-                assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
-                si_browser, si_resolution, si_os, si_timestamp, created_at)
-               VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
-            (
-                project_id,
-                subproject_id,
-                title,
-                full_description,
-                status,
-                priority,
-                assigned_to,
-                assigned_type,
-                created_by,
-                due_date,
-                closure_date,
-                work_type,
-                si_browser,
-                si_resolution,
-                si_os,
-                si_timestamp,
-            ),
-        )
-        task_id = cur.lastrowid
+        # task, activity, notifications and their outbox rows commit together
+        conn.begin()
+        with task_stats.tracking(conn) as tracked:
+            cur.execute(
+                """INSERT INTO tasks
+                   (project_id, subproject_id, title, description, status, priority,
+                    assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
+                    si_browser, si_resolution, si_os, si_timestamp, created_at)
+                   VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
+                (
+                    project_id,
+                    subproject_id,
+                    title,
+                    full_description,
+                    status,
+                    priority,
+                    assigned_to,
+                    assigned_type,
+                    created_by,
+                    due_date,
+                    closure_date,
+                    work_type,
+                    si_browser,
+                    si_resolution,
+                    si_os,
+                    si_timestamp,
+                ),
+            )
+            task_id = cur.lastrowid
+            tracked.add([task_id])
+        project_stats.mark_projects(conn, [project_id])
 
         # Log activity
         cur.execute(
@@ -2907,24 +2715,25 @@ def create_report_view(request):
         )
 
         # Create notification if task is assigned to a member
+        queued = []
         if assigned_type == "member" and assigned_to:
-            cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (created_by,))
-            creator = cur.fetchone()
-            creator_name = creator['name'] if creator else 'Someone'
+            creator_name = member_directory.name_for(conn, created_by) or 'Someone'
             
-            cur.execute("""
-                INSERT INTO notifications (user_id, title, message, type, link)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                assigned_to,
+            queued = NotificationManager.queue_bulk_notification(
+                conn,
+                request.session.get('tenant_id') or resolve_tenant_key_from_request(request),
+                [assigned_to],
                 "New Report Task Assigned",
                 f"{creator_name} assigned you a report: '{title}'",
-                "task",
-                f"/tasks/detail/{task_id}"
-            ))
+                notification_type="task",
+                link=f"/tasks/detail/{task_id}",
+                created_by_id=created_by,
+            )
 
         conn.commit()
         cur.close()
+        _invalidate_task_caches(request)
+        NotificationManager.dispatch_queued(queued)
         return redirect("task_board")
 
     # GET
@@ -3013,32 +2822,37 @@ def create_change_request_view(request):
                 assigned_type, assigned_to = "member", assigned_raw
 
         # INSERT
-        cur.execute(
-            """INSERT INTO tasks
-               (project_id, subproject_id, title, description, status, priority,
-                assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
-                si_browser, si_resolution, si_os, si_timestamp, created_at)
-               VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
-            (
-                project_id,
-                subproject_id,
-                title,
-                full_description,
-                status,
-                priority,
-                assigned_to,
-                assigned_type,
-                created_by,
-                due_date,
-                closure_date,
-                work_type,
-                si_browser,
-                si_resolution,
-                si_os,
-                si_timestamp,
-            ),
-        )
-        task_id = cur.lastrowid
+        # task, activity, notifications and their outbox rows commit together
+        conn.begin()
+        with task_stats.tracking(conn) as tracked:
+            cur.execute(
+                """INSERT INTO tasks
+                   (project_id, subproject_id, title, description, status, priority,
+                    assigned_to, assigned_type, created_by, due_date, closure_date, work_type,
+                    si_browser, si_resolution, si_os, si_timestamp, created_at)
+                   VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())""",
+                (
+                    project_id,
+                    subproject_id,
+                    title,
+                    full_description,
+                    status,
+                    priority,
+                    assigned_to,
+                    assigned_type,
+                    created_by,
+                    due_date,
+                    closure_date,
+                    work_type,
+                    si_browser,
+                    si_resolution,
+                    si_os,
+                    si_timestamp,
+                ),
+            )
+            task_id = cur.lastrowid
+            tracked.add([task_id])
+        project_stats.mark_projects(conn, [project_id])
 
         # Log activity
         cur.execute(
@@ -3047,27 +2861,28 @@ def create_change_request_view(request):
         )
 
         # Create notification if task is assigned to a member
+        queued = []
         if assigned_type == "member" and assigned_to:
-            cur.execute("SELECT CONCAT(first_name, ' ', last_name) as name FROM members WHERE id=%s", (created_by,))
-            creator = cur.fetchone()
-            creator_name = creator['name'] if creator else 'Someone'
+            creator_name = member_directory.name_for(conn, created_by) or 'Someone'
             
-            cur.execute("""
-                INSERT INTO notifications (user_id, title, message, type, link)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                assigned_to,
+            queued = NotificationManager.queue_bulk_notification(
+                conn,
+                request.session.get('tenant_id') or resolve_tenant_key_from_request(request),
+                [assigned_to],
                 "New Change Request Assigned",
                 f"{creator_name} assigned you a change request: '{title}'",
-                "task",
-                f"/tasks/detail/{task_id}"
-            ))
+                notification_type="task",
+                link=f"/tasks/detail/{task_id}",
+                created_by_id=created_by,
+            )
 
         # Handle file attachments using helper function
         save_task_attachments(request, task_id, cur, created_by)
 
         conn.commit()
         cur.close()
+        _invalidate_task_caches(request)
+        NotificationManager.dispatch_queued(queued)
         return redirect("task_board")
 
     # GET
@@ -3393,12 +3208,15 @@ def update_task_status(request, task_id):
         task = cur.fetchone()
         old_status = task['status'] if task else None
         
-        # Update task status
-        cur.execute('''
-            UPDATE tasks 
-            SET status = %s, updated_at = NOW()
-            WHERE id = %s
-        ''', (new_status, task_id))
+        # Update task status (committed with its activity entry)
+        conn.begin()
+        with task_stats.tracking(conn, [task_id]):
+            cur.execute('''
+                UPDATE tasks 
+                SET status = %s, updated_at = NOW()
+                WHERE id = %s
+            ''', (new_status, task_id))
+        project_stats.mark_tasks(conn, [task_id])
         
         # Log activity
         user_id = request.session.get('user_id')
@@ -3410,6 +3228,7 @@ def update_task_status(request, task_id):
         
         conn.commit()
         cur.close()
+        _invalidate_task_caches(request)
         
         return JsonResponse({'success': True, 'message': 'Status updated successfully'})
         
@@ -3440,12 +3259,15 @@ def update_task_priority(request, task_id):
         task = cur.fetchone()
         old_priority = task['priority'] if task else None
         
-        # Update task priority
-        cur.execute('''
-            UPDATE tasks 
-            SET priority = %s, updated_at = NOW()
-            WHERE id = %s
-        ''', (new_priority, task_id))
+        # Update task priority (committed with its activity entry)
+        conn.begin()
+        with task_stats.tracking(conn, [task_id]):
+            cur.execute('''
+                UPDATE tasks 
+                SET priority = %s, updated_at = NOW()
+                WHERE id = %s
+            ''', (new_priority, task_id))
+        project_stats.mark_tasks(conn, [task_id])
         
         # Log activity
         user_id = request.session.get('user_id')
@@ -3457,6 +3279,7 @@ def update_task_priority(request, task_id):
         
         conn.commit()
         cur.close()
+        _invalidate_task_caches(request)
         
         return JsonResponse({'success': True, 'message': 'Priority updated successfully'})
         
@@ -3650,14 +3473,16 @@ def assign_member_to_task(request, task_id):
         conn = get_tenant_conn(request)
         cur = conn.cursor()
         
-        # Update task with member assignment
-        cur.execute('''
-            UPDATE tasks 
-            SET assigned_type = 'member',
-                assigned_to = %s,
-                updated_at = NOW()
-            WHERE id = %s
-        ''', (member_id, task_id))
+        # Update task with member assignment (committed with its activity entry)
+        conn.begin()
+        with task_stats.tracking(conn, [task_id]):
+            cur.execute('''
+                UPDATE tasks 
+                SET assigned_type = 'member',
+                    assigned_to = %s,
+                    updated_at = NOW()
+                WHERE id = %s
+            ''', (member_id, task_id))
         # Log activity: assignment
         try:
             performed_by = request.session.get('user_id')
@@ -3670,6 +3495,7 @@ def assign_member_to_task(request, task_id):
         
         conn.commit()
         cur.close()
+        _invalidate_task_caches(request)
         
         return JsonResponse({'success': True, 'message': 'Member assigned successfully'})
         
@@ -3693,8 +3519,8 @@ def task_analytics_view(request):
     if not user_id:
         user_id = request.session.get("member_id")
     
-    # Get visible task user IDs based on visibility rules
-    visible_user_ids = get_visible_task_user_ids(conn, user_id) if user_id else []
+    # Visibility rule of this tenant, compiled to a SQL predicate
+    vis_sql, vis_params = get_visibility_policy(resolve_tenant_key_from_request(request)).predicate(user_id)
     
     # Get tenant-specific work types
     work_types = get_tenant_work_types(request)
@@ -3710,9 +3536,7 @@ def task_analytics_view(request):
     }
     
     # Query tasks grouped by work type and status
-    if visible_user_ids:
-        placeholders = ','.join(['%s'] * len(visible_user_ids))
-        
+    if user_id:
         # Get all tasks with work type information
         cur.execute(f"""
             SELECT 
@@ -3728,24 +3552,22 @@ def task_analytics_view(request):
                 CONCAT(m.first_name, ' ', m.last_name) AS assigned_name
             FROM tasks t
             LEFT JOIN members m ON m.id = t.assigned_to
-            WHERE t.assigned_type='member' AND t.assigned_to IN ({placeholders})
+            WHERE {vis_sql}
             ORDER BY work_type, FIELD(t.status,'Open','In Progress','Review','Blocked','Closed'), t.created_at DESC
-        """, tuple(visible_user_ids))
+        """, tuple(vis_params))
         
         all_tasks = cur.fetchall()
         
-        # Get count statistics by work type
-        cur.execute(f"""
+        # Get count statistics by work type from the task count rollup
+        stats = task_stats.query(conn, f"""
             SELECT 
-                COALESCE(work_type, 'Task') AS work_type,
-                status,
-                COUNT(*) AS count
-            FROM tasks
-            WHERE assigned_type='member' AND assigned_to IN ({placeholders})
-            GROUP BY work_type, status
-        """, tuple(visible_user_ids))
-        
-        stats = cur.fetchall()
+                COALESCE(t.work_type, 'Task') AS work_type,
+                t.status,
+                SUM(t.task_count) AS count
+            FROM {{stats}} t
+            WHERE {vis_sql}
+            GROUP BY 1, t.status
+        """, tuple(vis_params))
         
         # Process statistics
         for row in stats:
@@ -10,6 +10,7 @@ from django.db import connection
 from django.contrib.auth.hashers import make_password
 from django.views.decorators.csrf import csrf_exempt
 from .db_helpers import get_tenant_conn
+from .member_directory import member_directory
 
 # ---------- helpers ----------
 
@@ -104,6 +105,7 @@ def api_create_member(request):
                 VALUES (%s,%s,%s,%s,%s)
                 ON DUPLICATE KEY UPDATE first_name=VALUES(first_name), last_name=VALUES(last_name), phone=VALUES(phone)
             """, [email, first, last, phone, request.session.get('user_id')])
+            member_directory.invalidate(conn)
 
             # fetch member id (DictCursor => dict)
             cur.execute("SELECT id FROM members WHERE email=%s", [email])
@@ -14,6 +14,9 @@ logger = logging.getLogger('project_management')
 import pymysql
 from .db_initializer import DBInitializer  # uses the file you already have. :contentReference[oaicite:1]{index=1}
 from .auth import hash_password, check_password  # same helper used in db_initializer
+from .tenant_registry import tenant_registry
+from .tenant_config import invalidate_tenant_config
+from .member_directory import member_directory
 
 MASTER_DB = os.environ.get('MASTER_DB_NAME', 'master_db')
 # Ensure ADMIN_CONF exists (same as elsewhere in your project)
@@ -77,6 +80,7 @@ def new_tenant_view(request):
                 db_engine VARCHAR(50) DEFAULT 'mysql',
                 db_user VARCHAR(255),
                 db_password VARCHAR(255),
+                task_visibility VARCHAR(20) DEFAULT 'all',
                 created_at DATETIME,
                 updated_at DATETIME,
                 UNIQUE KEY ux_clients_master_dbname (db_name),
@@ -107,6 +111,8 @@ def new_tenant_view(request):
 
         admin_cur.execute("SELECT * FROM master_db.clients_master WHERE db_name=%s LIMIT 1", (db_name,))
         client_row = admin_cur.fetchone()
+        # drop any cached "unknown tenant" answers for the new aliases
+        tenant_registry.invalidate(client_row['id'])
 
         admin_cur.close()
         admin_conn.close()
@@ -124,17 +130,20 @@ def new_tenant_view(request):
         return redirect('new_tenant')
 
     # Provision tenant DB + user
+    init = DBInitializer()
     try:
-        init = DBInitializer()
         tenant_user, tenant_pwd = init.create_db_and_user(client_row)
     except Exception as e:
         messages.error(request, f"Error creating tenant DB/user: {e}")
         return redirect('new_tenant')
+    finally:
+        init.close()
 
-    # Run DDL / seed roles
+    # Run DDL / seed roles (records the tenant's schema version)
     try:
-        init.run_ddl_on_tenant(client_row['db_name'], tenant_user, tenant_pwd)
-        init.seed_roles_and_permissions(client_row['db_name'], tenant_user, tenant_pwd)
+        from core.tenant_migrations import TenantMigrationRunner
+        TenantMigrationRunner(lock_timeout=30).migrate(
+            dict(client_row, db_user=tenant_user, db_password=tenant_pwd))
     except Exception as e:
         messages.error(request, f"Error running tenant DDL / seeding roles: {e}")
         return redirect('new_tenant')
@@ -205,6 +214,7 @@ def new_tenant_view(request):
         """, (tenant_user, tenant_pwd, client_row['id']))
         cur.close()
         admin_conn.close()
+        tenant_registry.invalidate(client_row['id'])
     except Exception:
         pass
 
@@ -222,6 +232,7 @@ def new_tenant_view(request):
                 """, (client_row['id'], work_type))
             cur.close()
             admin_conn.close()
+            invalidate_tenant_config(client_row['id'])
         except Exception as e:
             messages.warning(request, f"Work types saved with some issues: {e}")
 
@@ -517,6 +528,7 @@ def add_tenant_admin_view(request, tenant_id=None):
             
             # Get member_id
             member_id = tcur.lastrowid
+            member_directory.invalidate(tenant_conn)
             
             # Get role_id for the selected role
             tcur.execute("SELECT id FROM roles WHERE name=%s LIMIT 1", (user_role,))
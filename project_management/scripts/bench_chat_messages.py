@@ -0,0 +1,136 @@
+"""
+Benchmark chat message persistence throughput (messages/sec) for one Daphne worker.
+
+Compares:
+  before - the previous ChatConsumer path: sync_to_async(thread_sensitive=True),
+           a new master_db connection and a new tenant connection per message
+  after  - ChatConsumer.save_message through core.db_async (pooled connections,
+           tenant registry, dedicated DB worker threads)
+
+Both run on a single asyncio event loop with CONCURRENCY simulated sockets, which is
+how one Daphne process serves chat traffic. Messages are written to a throw-away
+conversation (tenant_id 'bench') that is deleted afterwards.
+
+Usage:
+    python scripts/bench_chat_messages.py <tenant id|db_name|domain> [messages] [concurrency]
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+import pymysql
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_management.settings')
+
+import django
+django.setup()
+
+from asgiref.sync import sync_to_async
+from core.auth import MASTER_DB_CONFIG
+from core import db_async
+from core.db_helpers import tenant_pool_stats
+from chat.consumers import ChatConsumer
+
+BENCH_TENANT_ID = 'bench'
+SENDER = 'bench.sender@example.invalid'
+RECEIVER = 'bench.receiver@example.invalid'
+
+
+def legacy_save_message(tenant, text):
+    """The per-message connect path ChatConsumer used before core.db_async."""
+    master_conn = pymysql.connect(
+        host=MASTER_DB_CONFIG['db_host'],
+        port=MASTER_DB_CONFIG['db_port'],
+        user=MASTER_DB_CONFIG['db_user'],
+        password=MASTER_DB_CONFIG['db_password'],
+        database=MASTER_DB_CONFIG['db_name'],
+        cursorclass=pymysql.cursors.DictCursor,
+        autocommit=True
+    )
+    try:
+        with master_conn.cursor() as cur:
+            cur.execute("""
+                SELECT db_name, db_host, db_user, db_password
+                FROM clients_master
+                WHERE id = %s OR client_name = %s OR domain_postfix = %s OR db_name = %s
+                LIMIT 1
+            """, [tenant, tenant, tenant, tenant])
+            row = cur.fetchone()
+    finally:
+        master_conn.close()
+
+    conn = pymysql.connect(
+        host=row['db_host'], port=3306, user=row['db_user'], password=row['db_password'],
+        database=row['db_name'], cursorclass=pymysql.cursors.DictCursor, autocommit=True
+    )
+    try:
+        return ChatConsumer.save_message(None, conn, BENCH_TENANT_ID, SENDER, RECEIVER, text)
+    finally:
+        conn.close()
+
+
+async def run(label, send_one, total, concurrency):
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async def socket():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await send_one(f"{label} message {i}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(socket() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed else float('inf')
+    print(f"{label:<8} {total} messages, {concurrency} sockets: {elapsed:.2f}s  ->  {rate:,.1f} msg/s")
+    return rate
+
+
+def cleanup(tenant):
+    async def _cleanup():
+        await db_async.execute(tenant, "DELETE FROM chat_conversation WHERE tenant_id=%s", [BENCH_TENANT_ID])
+    asyncio.run(_cleanup())
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    tenant = sys.argv[1]
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    print("\n" + "=" * 60)
+    print("CHAT MESSAGE PERSISTENCE BENCHMARK")
+    print("=" * 60 + "\n")
+
+    legacy = sync_to_async(legacy_save_message)
+
+    async def before(text):
+        await legacy(tenant, text)
+
+    def pooled_save_message(conn, text):
+        return ChatConsumer.save_message(None, conn, BENCH_TENANT_ID, SENDER, RECEIVER, text)
+
+    async def after(text):
+        await db_async.run_with_tenant_conn(tenant, pooled_save_message, text)
+
+    try:
+        rate_before = asyncio.run(run("before", before, total, concurrency))
+        rate_after = asyncio.run(run("after", after, total, concurrency))
+        print(f"\nspeedup: {rate_after / rate_before:.1f}x")
+        print(f"pool: {tenant_pool_stats()}")
+    finally:
+        cleanup(tenant)
+
+
+if __name__ == "__main__":
+    main()
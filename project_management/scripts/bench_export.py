@@ -0,0 +1,179 @@
+"""
+Benchmark peak memory of the report exports against row count.
+
+Each measurement runs in a fresh child process (peak RSS is per process) and
+feeds synthetic task rows through one export path:
+  legacy  - the previous export: every row in a list (fetchall), a regular
+            openpyxl Workbook styled cell by cell, saved to BytesIO
+  xlsx    - core.export_stream.write_xlsx (openpyxl write-only mode)
+  csv     - core.export_stream.iter_csv (what the StreamingHttpResponse sends)
+  asgi-sync  - the CSV StreamingHttpResponse over a sync iterator, sent through
+               Django's ASGI handler (which reads it all before sending)
+  asgi-csv   - core.export_stream.csv_response for an ASGI request, sent through
+               Django's ASGI handler
+  asgi-xlsx  - core.export_stream.xlsx_response for an ASGI request, likewise
+The database side is left out on purpose: with SSDictCursor the rows are
+fetched in EXPORT_CHUNK_SIZE chunks, so only the writer decides the peak.
+The asgi modes also report when the first body chunk was sent.
+
+Usage:
+    python scripts/bench_export.py [--rows 10000,100000,500000] [--modes legacy,xlsx,csv]
+"""
+
+import os
+import io
+import sys
+import time
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_management.settings')
+
+WORDS = ("login export report dashboard invoice payment timeout crash mobile layout "
+         "cache index query latency upload review checkout calendar permission").split()
+
+
+def fake_rows(count, seed=7):
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1)
+    for i in range(count):
+        yield {
+            'id': i + 1,
+            'title': " ".join(rng.choice(WORDS) for _ in range(6)).capitalize(),
+            'description': " ".join(rng.choice(WORDS) for _ in range(40)),
+            'status': rng.choice(['Open', 'In Progress', 'Completed', 'Review']),
+            'priority': rng.choice(['Low', 'Normal', 'High', 'Critical']),
+            'due_date': (now + timedelta(days=rng.randint(-30, 60))).date(),
+            'created_at': now - timedelta(minutes=i),
+            'assigned_type': 'member',
+            'assigned_to': rng.randint(1, 500),
+            'project_name': f"Project {rng.randint(1, 200)}",
+            'member_first_name': f"First{rng.randint(1, 500)}",
+            'member_last_name': "Last",
+            'assigned_team_name': None,
+            'created_by_name': "Admin",
+        }
+
+
+def run_legacy(rows, sheet):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+
+    rows = list(rows)  # fetchall()
+    wb = Workbook()
+    ws = wb.active
+    side = Side(style='thin', color='E5E7EB')
+    ws.append(sheet.headers)
+    for row_num, r in enumerate(rows, 2):
+        ws.append(sheet.row(r))
+        for col_num in range(1, len(sheet.headers) + 1):
+            cell = ws.cell(row=row_num, column=col_num)
+            cell.border = Border(left=side, right=side, top=side, bottom=side)
+            cell.alignment = Alignment(vertical='top', wrap_text=True)
+            if col_num == 4 and r['priority'] == 'Critical':
+                cell.fill = PatternFill(start_color='FEE2E2', end_color='FEE2E2', fill_type='solid')
+                cell.font = Font(color='991B1B', bold=True)
+    output = io.BytesIO()
+    wb.save(output)
+    return output.tell()
+
+
+def run_asgi(mode, rows, sheet):
+    """Send the export response through ASGIHandler; returns (bytes sent, seconds to first chunk)."""
+    import asyncio
+    from django.core.handlers.asgi import ASGIHandler, ASGIRequest
+    from django.http import StreamingHttpResponse
+    from core.export_stream import csv_response, iter_csv, xlsx_response
+
+    started = time.perf_counter()
+    sent = {'bytes': 0, 'first': None}
+
+    async def send(message):
+        if message['type'] == 'http.response.body' and message.get('body'):
+            if sent['first'] is None:
+                sent['first'] = time.perf_counter() - started
+            sent['bytes'] += len(message['body'])
+
+    def build():
+        request = ASGIRequest({'type': 'http', 'method': 'GET', 'path': '/export/', 'headers': [],
+                               'query_string': b''}, io.BytesIO())
+        if mode == 'asgi-sync':
+            return StreamingHttpResponse(iter_csv(rows, sheet), content_type='text/csv')
+        if mode == 'asgi-xlsx':
+            return xlsx_response(request, rows, sheet, 'Report.xlsx')
+        return csv_response(request, rows, sheet, 'Report.csv')
+
+    async def main():
+        from asgiref.sync import sync_to_async
+        # the view runs in a worker thread under ASGI too
+        response = await sync_to_async(build)()
+        await ASGIHandler().send_response(response, send)
+        await sync_to_async(response.close)()
+
+    asyncio.run(main())
+    return sent['bytes'], sent['first']
+
+
+def child(mode, count):
+    import django
+    django.setup()
+    from core.export_stream import iter_csv, write_xlsx
+    from core.views_export import TASKS_SHEET
+
+    started = time.perf_counter()
+    rows = fake_rows(count)
+    first = None
+    if mode.startswith('asgi'):
+        size, first = run_asgi(mode, rows, TASKS_SHEET)
+    elif mode == 'legacy':
+        size = run_legacy(rows, TASKS_SHEET)
+    elif mode == 'xlsx':
+        with tempfile.TemporaryFile() as out:
+            write_xlsx(rows, TASKS_SHEET, out)
+            size = out.tell()
+    else:
+        size = sum(len(chunk) for chunk in iter_csv(rows, TASKS_SHEET))
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{peak_mb:.1f} {elapsed:.2f} {size} {first if first is not None else -1:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export memory benchmark")
+    parser.add_argument("--rows", default="10000,100000,500000", help="comma separated row counts")
+    parser.add_argument("--modes", default="legacy,xlsx,csv", help="comma separated export paths")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], int(args.child[1]))
+        return
+
+    print("\n" + "=" * 60)
+    print("EXPORT PEAK MEMORY")
+    print("=" * 60 + "\n")
+    print(f"{'mode':<10} {'rows':>9} {'peak RSS':>10} {'time':>8} {'output':>10} {'1st chunk':>10}")
+    for count in [int(n) for n in args.rows.split(",")]:
+        for mode in args.modes.split(","):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, str(count)],
+                capture_output=True, text=True,
+            )
+            if out.returncode != 0:
+                print(f"{mode:<10} {count:>9,} failed: {out.stderr.strip().splitlines()[-1:]}")
+                continue
+            peak_mb, elapsed, size, first = out.stdout.split()[-4:]
+            first = f"{float(first):>9.2f}s" if float(first) >= 0 else f"{'-':>10}"
+            print(f"{mode:<10} {count:>9,} {float(peak_mb):>8.1f}MB {float(elapsed):>7.2f}s "
+                  f"{int(size) / 1024 / 1024:>8.1f}MB {first}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Benchmark task quick-search (api_tasks_search) on a large synthetic tenant.
+
+Creates a throw-away database with the tenant schema (TENANT_DDL and the index
+migrations, including the FULLTEXT indexes), fills it with ROWS tasks (default
+1,000,000) spread over projects, members and teams, then times every query in
+QUERIES with:
+  like      - the previous query: title/description LIKE '%q%' with correlated
+              subqueries for the assignee and project names
+  fulltext  - core.search.search_tasks (FULLTEXT, prefix terms, ranked)
+and prints median / p95 latency per query. The database is dropped afterwards
+unless --keep is given; --reuse skips the fill when it already exists.
+
+Usage:
+    python scripts/bench_task_search.py [--rows 1000000] [--repeat 20] [--keep] [--reuse]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+import pymysql
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_management.settings')
+
+import django
+django.setup()
+
+from core.db_initializer import ADMIN_HOST, ADMIN_PORT, ADMIN_USER, ADMIN_PWD, TENANT_DDL
+from core.index_migrations import apply_index_migrations
+from core.search import search_tasks
+
+BENCH_DB = 'bench_task_search'
+BATCH = 5000
+
+WORDS = (
+    "login logout password reset email notification dashboard report export import "
+    "invoice payment customer order shipment inventory warehouse supplier contract "
+    "timeout crash error exception validation permission role admin user profile "
+    "upload download attachment image preview search filter sort pagination cache "
+    "database migration index query performance memory leak latency mobile android "
+    "ios browser chrome firefox safari layout button modal tooltip calendar timezone "
+    "translation currency tax discount coupon checkout cart wishlist review rating"
+).split()
+
+STATUSES = ["Open", "In Progress", "Review", "Closed", "Blocked"]
+
+QUERIES = ["login", "pay", "timeout error", "dashboard export csv", "mobile safari layout", "zzzz"]
+
+LEGACY_SQL = """
+    SELECT
+        t.id,
+        COALESCE(t.title, '') AS title,
+        COALESCE(t.status, '') AS status,
+        CASE
+            WHEN t.assigned_type = 'member' THEN (SELECT CONCAT(m.first_name, ' ', m.last_name) FROM members m WHERE m.id = t.assigned_to)
+            WHEN t.assigned_type = 'team' THEN (SELECT tm.name FROM teams tm WHERE tm.id = t.assigned_to)
+            ELSE NULL
+        END AS assigned_to_display,
+        (SELECT p.name FROM projects p WHERE p.id = t.project_id) AS project_name
+    FROM tasks t
+    WHERE (t.title LIKE %s OR t.description LIKE %s)
+    ORDER BY t.id DESC
+    LIMIT 20
+"""
+
+
+def connect(database=None):
+    return pymysql.connect(
+        host=ADMIN_HOST, port=ADMIN_PORT, user=ADMIN_USER, password=ADMIN_PWD,
+        database=database, cursorclass=pymysql.cursors.DictCursor, autocommit=True
+    )
+
+
+def sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def fill(conn, rows, seed=42):
+    rng = random.Random(seed)
+    with conn.cursor() as cur:
+        cur.executemany(
+            "INSERT INTO members (email, first_name, last_name) VALUES (%s, %s, %s)",
+            [(f"bench{i}@example.invalid", f"First{i}", f"Last{i}") for i in range(500)],
+        )
+        cur.executemany("INSERT INTO teams (name) VALUES (%s)", [(f"Team {i}",) for i in range(20)])
+        cur.executemany(
+            "INSERT INTO projects (name, description, status) VALUES (%s, %s, 'Active')",
+            [(f"{sentence(rng, 2).title()} {i}", sentence(rng, 12)) for i in range(200)],
+        )
+
+        started = time.perf_counter()
+        done = 0
+        while done < rows:
+            batch = []
+            for _ in range(min(BATCH, rows - done)):
+                team = rng.random() < 0.1
+                batch.append((
+                    rng.randint(1, 200),
+                    sentence(rng, rng.randint(3, 8)).capitalize(),
+                    sentence(rng, rng.randint(10, 60)),
+                    rng.choice(STATUSES),
+                    'team' if team else 'member',
+                    rng.randint(1, 20) if team else rng.randint(1, 500),
+                ))
+            cur.executemany(
+                "INSERT INTO tasks (project_id, title, description, status, assigned_type, assigned_to) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                batch,
+            )
+            done += len(batch)
+            if done % 100000 == 0 or done == rows:
+                rate = done / (time.perf_counter() - started)
+                print(f"  {done:>9,} tasks  ({rate:,.0f} rows/s)")
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return statistics.median(samples), p95, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task search benchmark")
+    parser.add_argument("--rows", type=int, default=1000000, help="number of tasks in the fixture")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per query")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark database")
+    parser.add_argument("--reuse", action="store_true", help="reuse an existing benchmark database")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print("TASK SEARCH BENCHMARK")
+    print("=" * 60 + "\n")
+
+    admin = connect()
+    with admin.cursor() as cur:
+        cur.execute("SELECT SCHEMA_NAME FROM information_schema.SCHEMATA WHERE SCHEMA_NAME = %s", (BENCH_DB,))
+        exists = cur.fetchone() is not None
+        if exists and not args.reuse:
+            cur.execute(f"DROP DATABASE `{BENCH_DB}`")
+            exists = False
+        if not exists:
+            cur.execute(f"CREATE DATABASE `{BENCH_DB}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+
+    conn = connect(BENCH_DB)
+    try:
+        if not exists:
+            with conn.cursor() as cur:
+                for ddl in TENANT_DDL:
+                    cur.execute(ddl)
+            print(f"Filling {args.rows:,} tasks...")
+            fill(conn, args.rows)
+            started = time.perf_counter()
+            apply_index_migrations(conn, BENCH_DB)
+            print(f"Indexes built in {time.perf_counter() - started:.1f}s\n")
+
+        print(f"{'query':<24} {'like p50':>10} {'p95':>8} {'fulltext p50':>13} {'p95':>8} {'hits':>5}")
+        for q in QUERIES:
+            like = f"%{q}%"
+
+            def legacy():
+                with conn.cursor() as cur:
+                    cur.execute(LEGACY_SQL, (like, like))
+                    return cur.fetchall()
+
+            like_p50, like_p95, _ = timed(legacy, max(1, args.repeat // 4))
+            ft_p50, ft_p95, hits = timed(lambda: search_tasks(conn, q), args.repeat)
+            print(f"{q:<24} {like_p50:>8.1f}ms {like_p95:>6.1f}ms {ft_p50:>11.1f}ms {ft_p95:>6.1f}ms {len(hits):>5}")
+    finally:
+        conn.close()
+        if not args.keep:
+            with admin.cursor() as cur:
+                cur.execute(f"DROP DATABASE `{BENCH_DB}`")
+        admin.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Drain the notification outbox (core.notification_outbox) of every tenant.
+
+The web processes dispatch their own notifications in the background; run this
+after a restart or an outage to send what was left behind, or with --loop as a
+standalone dispatcher. --status only reports queue depth per tenant.
+
+Usage:
+    python scripts/dispatch_notifications.py [--tenant ID|db_name] [--loop SECONDS]
+    python scripts/dispatch_notifications.py --status
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_management.settings')
+
+import django
+django.setup()
+
+from core.auth import MASTER_DB_CONFIG
+from core.db_connector import get_connection_from_config
+from core.db_helpers import tenant_connection
+from core.notification_outbox import dispatcher, outbox_metrics
+
+
+def get_tenants(only=None):
+    conn = get_connection_from_config(MASTER_DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            if only:
+                cur.execute(
+                    "SELECT id, db_name FROM clients_master WHERE id = %s OR db_name = %s OR client_name = %s",
+                    (only, only, only),
+                )
+            else:
+                cur.execute("SELECT id, db_name FROM clients_master WHERE db_user IS NOT NULL ORDER BY id")
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def show_status(tenants):
+    total = 0
+    for t in tenants:
+        try:
+            with tenant_connection(tenant_key=str(t['id'])) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT status, COUNT(*) AS c, MIN(created_at) AS oldest
+                        FROM notification_outbox GROUP BY status
+                    """)
+                    rows = {r['status']: r for r in cur.fetchall()}
+        except Exception as e:
+            print(f"  {t['db_name']:<30} ? {e}")
+            continue
+        pending = rows.get('pending', {}).get('c', 0)
+        dead = rows.get('dead', {}).get('c', 0)
+        total += pending
+        oldest = rows.get('pending', {}).get('oldest')
+        print(f"  {t['db_name']:<30} pending={pending:<6} dead={dead:<6}"
+              + (f" oldest pending {oldest}" if oldest else ""))
+    print("\n" + "=" * 60)
+    print(f"{total} notification(s) pending")
+    print("=" * 60)
+
+
+def drain_all(tenants):
+    started = time.perf_counter()
+    for t in tenants:
+        try:
+            depth = dispatcher.drain(str(t['id']))
+        except Exception as e:
+            print(f"  {t['db_name']}: ERROR {e}")
+            continue
+        if depth:
+            print(f"  {t['db_name']}: {depth} left for retry")
+    m = outbox_metrics()
+    print(f"drained {len(tenants)} tenant(s) in {time.perf_counter() - started:.1f}s: "
+          f"{m['dispatched']} sent, {m['retried']} retrying, {m['dead']} dead")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notification outbox dispatcher")
+    parser.add_argument("--tenant", help="clients_master id, db_name or client_name (default: all)")
+    parser.add_argument("--loop", type=float, default=0, help="keep draining every N seconds")
+    parser.add_argument("--status", action="store_true", help="only report queue depth")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print("NOTIFICATION OUTBOX")
+    print("=" * 60 + "\n")
+
+    tenants = get_tenants(args.tenant)
+    if not tenants:
+        print("⚠️  No provisioned tenants found in clients_master")
+        sys.exit(1)
+
+    if args.status:
+        show_status(tenants)
+        return
+
+    drain_all(tenants)
+    while args.loop > 0:
+        time.sleep(args.loop)
+        drain_all(tenants)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Apply versioned secondary-index migrations (core.index_migrations) to tenant databases,
+and verify the app's hot queries with EXPLAIN.
+
+Tenants are migrated in parallel by a bounded worker pool. Re-running is safe: finished
+versions are skipped, interrupted ones continue where they stopped, and a tenant that
+another runner is migrating is reported as locked and left alone.
+
+Usage:
+    python scripts/migrate_tenant_indexes.py [--tenant ID|db_name] [--workers 4]
+                                              [--target VERSION] [--dry-run]
+    python scripts/migrate_tenant_indexes.py --verify [--tenant ...] [--min-rows 1000]
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_management.settings')
+
+import django
+django.setup()
+
+from core.auth import MASTER_DB_CONFIG
+from core.db_connector import get_connection_from_config
+from core.index_migrations import (
+    LATEST_INDEX_VERSION, MigrationLocked, apply_index_migrations, verify_hot_queries,
+)
+
+
+def get_tenants(only=None):
+    conn = get_connection_from_config(MASTER_DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            if only:
+                cur.execute(
+                    "SELECT * FROM clients_master WHERE id = %s OR db_name = %s OR client_name = %s",
+                    (only, only, only),
+                )
+            else:
+                cur.execute("SELECT * FROM clients_master WHERE db_user IS NOT NULL ORDER BY id")
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def migrate_tenant(tenant, target, dry_run):
+    started = time.perf_counter()
+    conn = get_connection_from_config(tenant)
+    try:
+        result = apply_index_migrations(conn, tenant['db_name'], target=target, dry_run=dry_run)
+    finally:
+        conn.close()
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def run_migrations(tenants, workers, target, dry_run):
+    print(f"Migrating {len(tenants)} tenant(s) to index version {target} with {workers} worker(s)"
+          + (" [dry run]" if dry_run else "") + "\n")
+    started = time.perf_counter()
+    ok = locked = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(migrate_tenant, t, target, dry_run): t for t in tenants}
+        for done, future in enumerate(as_completed(futures), 1):
+            tenant = futures[future]
+            prefix = f"[{done}/{len(tenants)}] {tenant['db_name']}"
+            try:
+                r = future.result()
+            except MigrationLocked:
+                locked += 1
+                print(f"{prefix}: locked by another runner, skipped")
+                continue
+            except Exception as e:
+                failed += 1
+                print(f"{prefix}: ERROR {e}")
+                continue
+            ok += 1
+            parts = [f"{r['seconds']:.1f}s"]
+            if r["created"]:
+                parts.append(("would create " if dry_run else "created ") + ", ".join(r["created"]))
+            if r["applied"]:
+                parts.append("recorded v" + ", v".join(str(v) for v in r["applied"]))
+            if r["skipped"]:
+                parts.append("missing tables for " + ", ".join(r["skipped"]))
+            if len(parts) == 1:
+                parts.append("up to date")
+            print(f"{prefix}: " + "; ".join(parts))
+
+    print("\n" + "=" * 60)
+    print(f"done in {time.perf_counter() - started:.1f}s: {ok} ok, {locked} locked, {failed} failed")
+    print("=" * 60)
+    return failed == 0
+
+
+def run_verify(tenants, min_rows):
+    flagged = 0
+    for tenant in tenants:
+        print(f"\n{tenant['db_name']}")
+        conn = get_connection_from_config(tenant)
+        try:
+            report = verify_hot_queries(conn, min_rows=min_rows)
+        finally:
+            conn.close()
+        for r in report:
+            if r["error"]:
+                print(f"  ? {r['name']}: {r['error']}")
+                continue
+            mark = "FULL SCAN" if r["full_scan"] else "ok"
+            if r["full_scan"]:
+                flagged += 1
+            print(f"  {mark:<9} {r['name']:<28} {r['table'] or '-':<18} type={r['type']} "
+                  f"key={r['key']} rows~{r['rows']}")
+    print("\n" + "=" * 60)
+    print(f"{flagged} full scan(s) flagged")
+    print("=" * 60)
+    return flagged == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tenant index migrations")
+    parser.add_argument("--tenant", help="clients_master id, db_name or client_name (default: all)")
+    parser.add_argument("--workers", type=int, default=4, help="tenants migrated concurrently")
+    parser.add_argument("--target", type=int, default=LATEST_INDEX_VERSION)
+    parser.add_argument("--dry-run", action="store_true", help="only report missing indexes")
+    parser.add_argument("--verify", action="store_true", help="EXPLAIN the hot query catalogue")
+    parser.add_argument("--min-rows", type=int, default=0,
+                        help="with --verify, ignore full scans of tables smaller than this")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print("TENANT INDEX MIGRATIONS")
+    print("=" * 60 + "\n")
+
+    tenants = get_tenants(args.tenant)
+    if not tenants:
+        print("⚠️  No provisioned tenants found in clients_master")
+        sys.exit(1)
+
+    if args.verify:
+        ok = run_verify(tenants, args.min_rows)
+    else:
+        ok = run_migrations(tenants, max(1, args.workers), args.target, args.dry_run)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Provision and migrate tenant databases to the latest schema version
+(core.tenant_migrations), several tenants at a time.
+
+Each tenant's version, status, last error and duration are recorded in
+master_db.tenant_schema_versions. Re-running is safe: tenants at the target are
+only reconciled (indexes), failed or interrupted ones resume at the first step
+they have not completed, and tenants without a database are created first.
+Replaces the one-off scripts/add_*.py column scripts for existing tenants.
+
+Usage:
+    python scripts/migrate_tenants.py [--tenant ID|db_name] [--workers 8]
+                                      [--target VERSION] [--dry-run]
+    python scripts/migrate_tenants.py --status
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_management.settings')
+
+import django
+django.setup()
+
+from core.auth import MASTER_DB_CONFIG
+from core.db_connector import get_connection_from_config
+from core.tenant_migrations import (
+    DEFAULT_WORKERS, LATEST_SCHEMA_VERSION, SCHEMA_MIGRATIONS, TenantMigrationRunner,
+    get_schema_versions,
+)
+
+
+def get_tenants(only=None):
+    conn = get_connection_from_config(MASTER_DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            if only:
+                cur.execute(
+                    "SELECT * FROM clients_master WHERE (id = %s OR db_name = %s OR client_name = %s) "
+                    "AND db_engine = 'mysql'",
+                    (only, only, only),
+                )
+            else:
+                cur.execute("SELECT * FROM clients_master WHERE db_engine = 'mysql' ORDER BY id")
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def show_status(tenants):
+    conn = get_connection_from_config(MASTER_DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            versions = get_schema_versions(cur)
+    finally:
+        conn.close()
+    behind = 0
+    for t in tenants:
+        v = versions.get(t['id'])
+        if not v:
+            behind += 1
+            print(f"  {t['db_name']:<30} never migrated")
+            continue
+        if v['schema_version'] < LATEST_SCHEMA_VERSION or v['status'] != 'ok':
+            behind += 1
+        line = f"  {t['db_name']:<30} v{v['schema_version']:<3} {v['status']:<8} {v['duration_ms'] or 0}ms"
+        if v['last_error']:
+            line += f"  {v['last_error'][:80]}"
+        print(line)
+    print("\n" + "=" * 60)
+    print(f"{len(tenants) - behind} at v{LATEST_SCHEMA_VERSION}, {behind} behind or failed")
+    print("=" * 60)
+    return behind == 0
+
+
+def report(dry_run):
+    def progress(done, total, r):
+        prefix = f"[{done}/{total}] {r['db_name']}"
+        if r.get("locked"):
+            print(f"{prefix}: locked by another runner, skipped")
+            return
+        if r.get("error"):
+            print(f"{prefix}: ERROR {r['error']}")
+            return
+        parts = [f"{r['seconds']:.1f}s"]
+        if r["created_db"]:
+            parts.append("created database")
+        if r["steps"]:
+            if dry_run:
+                parts.append("would run " + ", ".join(f"v{v} {name}" for v, name, _ in r["steps"]))
+            else:
+                parts.append("v{} -> v{} ({})".format(
+                    r["from_version"], r["version"],
+                    ", ".join(f"v{v} {ms}ms" for v, _, ms in r["steps"])))
+        if r["indexes"]:
+            parts.append("indexes " + ", ".join(r["indexes"]))
+        if len(parts) == 1:
+            parts.append(f"up to date at v{r['version']}")
+        print(f"{prefix}: " + "; ".join(parts))
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tenant schema migrations")
+    parser.add_argument("--tenant", help="clients_master id, db_name or client_name (default: all)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="tenants migrated concurrently")
+    parser.add_argument("--target", type=int, default=LATEST_SCHEMA_VERSION)
+    parser.add_argument("--dry-run", action="store_true", help="only report the steps each tenant needs")
+    parser.add_argument("--status", action="store_true", help="show recorded versions and exit")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print("TENANT SCHEMA MIGRATIONS")
+    print("=" * 60 + "\n")
+    for version, name, _ in SCHEMA_MIGRATIONS:
+        print(f"  v{version}: {name}")
+    print()
+
+    tenants = get_tenants(args.tenant)
+    if not tenants:
+        print("⚠️  No tenants found in clients_master")
+        sys.exit(1)
+
+    if args.status:
+        sys.exit(0 if show_status(tenants) else 1)
+
+    workers = max(1, args.workers)
+    print(f"Migrating {len(tenants)} tenant(s) to schema version {args.target} with {workers} worker(s)"
+          + (" [dry run]" if args.dry_run else "") + "\n")
+    started = time.perf_counter()
+    runner = TenantMigrationRunner(workers=workers, target=args.target, dry_run=args.dry_run)
+    results = runner.run(tenants, progress=report(args.dry_run))
+
+    locked = sum(1 for r in results if r.get("locked"))
+    failed = sum(1 for r in results if r.get("error")) - locked
+    timings = sorted((r for r in results if not r.get("error")), key=lambda r: r["seconds"], reverse=True)
+    print("\n" + "=" * 60)
+    print(f"done in {time.perf_counter() - started:.1f}s: {len(results) - locked - failed} ok, "
+          f"{locked} locked, {failed} failed")
+    if timings and not args.dry_run:
+        print("slowest: " + ", ".join(f"{r['db_name']} {r['seconds']:.1f}s" for r in timings[:5]))
+    print("=" * 60)
+    sys.exit(0 if failed == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Repair drift in the task count rollup (core.task_stats) of every tenant.
+
+Task writes keep task_stats in sync; this recomputes it from tasks and fixes
+the rows that differ (writes made outside the app, failed requests). Run it
+from cron, or with --loop as a standalone reconciler.
+
+Usage:
+    python scripts/reconcile_task_stats.py [--tenant ID|db_name] [--loop SECONDS]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_management.settings')
+
+import django
+django.setup()
+
+from core.auth import MASTER_DB_CONFIG
+from core.db_connector import get_connection_from_config
+from core.db_helpers import tenant_connection
+from core.task_stats import reconcile
+
+
+def get_tenants(only=None):
+    conn = get_connection_from_config(MASTER_DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            if only:
+                cur.execute(
+                    "SELECT id, db_name FROM clients_master WHERE id = %s OR db_name = %s OR client_name = %s",
+                    (only, only, only),
+                )
+            else:
+                cur.execute("SELECT id, db_name FROM clients_master WHERE db_user IS NOT NULL ORDER BY id")
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def reconcile_all(tenants):
+    started = time.perf_counter()
+    repaired = failed = 0
+    for t in tenants:
+        try:
+            with tenant_connection(tenant_key=str(t['id'])) as conn:
+                rows = reconcile(conn)
+        except Exception as e:
+            failed += 1
+            print(f"  {t['db_name']}: ERROR {e}")
+            continue
+        repaired += rows
+        if rows:
+            print(f"  {t['db_name']}: {rows} row(s) repaired")
+    print(f"reconciled {len(tenants)} tenant(s) in {time.perf_counter() - started:.1f}s: "
+          f"{repaired} row(s) repaired, {failed} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task count rollup reconciler")
+    parser.add_argument("--tenant", help="clients_master id, db_name or client_name (default: all)")
+    parser.add_argument("--loop", type=float, default=0, help="reconcile again every N seconds")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print("TASK STATS RECONCILER")
+    print("=" * 60 + "\n")
+
+    tenants = get_tenants(args.tenant)
+    if not tenants:
+        print("⚠️  No provisioned tenants found in clients_master")
+        sys.exit(1)
+
+    reconcile_all(tenants)
+    while args.loop > 0:
+        time.sleep(args.loop)
+        reconcile_all(tenants)
+
+
+if __name__ == "__main__":
+    main()